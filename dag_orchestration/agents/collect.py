@@ -10,21 +10,67 @@
 
 import os
 import asyncio
-from glob import glob
+import itertools
 from utils.logger import logger
 from utils.message import Message
 from utils.ChatModel import ChatModel
-from typing import List, Dict, Any, Tuple
+from dag_orchestration.registry import register_agent
+from utils.concurrency import DEFAULT_CONCURRENCY
+from utils.tokens import estimate_tokens
+from dag_orchestration.context import current_run_id
+from dag_orchestration.ingest import (
+    CorpusManifest, ManifestRecord, iter_files, read_text, scan_changes, DEFAULT_MMAP_THRESHOLD
+)
+from typing import List, Dict, Any, Optional, Tuple
 
 
+@register_agent()
 class CollectAgent:
     """
     文档收集智能体
     """
-    def __init__(self, name: str, docs_folder: str = "./data/docs") -> None:
-        agent_factory = ChatModel().get_agent_factory()
-        self.agent = agent_factory.create_agent()
+    def __init__(
+        self,
+        name: str,
+        docs_folder: str = "./data/docs",
+        concurrency: int = DEFAULT_CONCURRENCY,
+        title_mode: str = "batch",
+        title_prefix_chars: int = 800,
+        title_token_budget: int = 6000,
+        title_max_batch: int = 50,
+        patterns: Tuple[str, ...] = ("*.txt",),
+        recursive: bool = False,
+        incremental: bool = False,
+        manifest_path: str = "./data/collect_manifest.db",
+        mmap_threshold: int = DEFAULT_MMAP_THRESHOLD
+    ) -> None:
+        """
+        参数:
+            name (str): 智能体名称。
+            docs_folder (str): 文档所在文件夹。
+            concurrency (int): 同时进行的大模型调用数量上限。
+            title_mode (str): 标题提取方式，batch 为多文档合并到一次调用，single 为每个文档单独调用。
+            title_prefix_chars (int): 批量模式下每个文档送入模型的前缀字符数。
+            title_token_budget (int): 批量模式下单次调用的输入token预算，用于自动确定批大小。
+            title_max_batch (int): 批量模式下单次调用最多包含的文档数量。
+            patterns (Tuple[str, ...]): 文档文件名匹配模式。
+            recursive (bool): 是否递归遍历子目录。
+            incremental (bool): 是否增量采集，开启后只输出相对于文件清单新增或内容变化的文档。
+            manifest_path (str): 增量采集使用的文件清单数据库路径。
+            mmap_threshold (int): 使用内存映射读取的文件大小阈值（字节）。
+        """
+        self.agent_factory = ChatModel().get_agent_factory()
         self.docs_folder = docs_folder
+        self.concurrency = concurrency
+        self.title_mode = title_mode
+        self.title_prefix_chars = title_prefix_chars
+        self.title_token_budget = title_token_budget
+        self.title_max_batch = title_max_batch
+        self.patterns = tuple(patterns)
+        self.recursive = recursive
+        self.incremental = incremental
+        self.manifest_path = manifest_path
+        self.mmap_threshold = mmap_threshold
         self.name = name
 
     async def process(self, message: Message) -> Message:
@@ -42,10 +88,13 @@ class CollectAgent:
             RuntimeError: 如果文档预处理或验证失败时抛出。
         """
         logger.info(f"{self.name}开始收集文件")
+        # 运行参数中的 docs_folder 优先于构造参数，便于同一智能体服务不同的语料目录
+        params = message.content if isinstance(message.content, dict) else {}
+        docs_folder = params.get("docs_folder") or self.docs_folder
 
         try:
             # 从指定文件夹异步收集文档
-            docs = await self._collect_documents(self.docs_folder)
+            docs = await self._collect_documents(docs_folder)
         except Exception as e:
             logger.error(f"文档收集验证失败：{e}")
             raise RuntimeError(f"文档预处理失败: {e}")
@@ -64,27 +113,243 @@ class CollectAgent:
             Dict[str, List[Dict[str, Any]]]: 包含所收集文档元数据的字典。
 
         异常:
-            RuntimeError: 如果文档收集过程中出现任何失败情况。
+            RuntimeError: 如果任一文档读取失败。
         """
-        doc_files = glob(os.path.join(folder_path, "*.txt"))
-        docs = {"docs": []}
+        if self.incremental:
+            return await self._collect_incremental(folder_path)
 
-        for idx, filepath in enumerate(doc_files):
+        docs = {"docs": []}
+        for entry in iter_files(folder_path, self.patterns, self.recursive):
             try:
-                content, title = self._read_document(filepath)
-                extracted_title = await self._extract_title_from_llm(content)
-
-                docs["docs"].append({
-                    "id": f"doc{idx + 1}",
-                    "title": extracted_title if extracted_title else title,
-                    "content": content,
-                    "filepath": filepath
-                })
+                content, title = self._read_document(entry.path)
             except Exception as e:
-                logger.error(f"从 {filepath} 收集文档失败：{e}")
-                raise RuntimeError(f"从 {filepath} 收集文档失败: {e}")
+                logger.error(f"从 {entry.path} 收集文档失败：{e}")
+                raise RuntimeError(f"从 {entry.path} 收集文档失败: {e}")
+            docs["docs"].append({
+                "id": f"doc{len(docs['docs']) + 1}",
+                "title": title,
+                "content": content,
+                "filepath": entry.path
+            })
+
+        # 使用大模型提取标题，提取失败的文档保留文件名作为标题
+        titles = await self._extract_titles(docs["docs"])
+        for doc in docs["docs"]:
+            if titles.get(doc["id"]):
+                doc["title"] = titles[doc["id"]]
         return docs
 
+    async def _collect_incremental(self, folder_path: str) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        基于文件清单增量收集文档：只输出新增或内容发生变化的文档，文档ID在多次运行之间保持稳定。
+        扫描在线程中按批推进，每读完一批就开始为其提取标题，不会一次性把所有变化的文档读入再处理。
+        在 DAG 运行中，清单修改按运行ID暂存，整次运行成功后由 commit_run 提交；单独调用时直接写入清单。
+
+        参数:
+            folder_path (str): 语料根目录。
+
+        返回:
+            Dict[str, List[Dict[str, Any]]]: 包含新增或变化文档的字典。
+        """
+        manifest = CorpusManifest(self.manifest_path)
+        try:
+            scan = scan_changes(manifest, folder_path, self.patterns, self.recursive, self.mmap_threshold)
+            changes = iter(scan)
+            batch_size = max(1, int(self.title_max_batch))
+            llm_slots = asyncio.Semaphore(max(1, int(self.concurrency or 1)))
+            docs = {"docs": []}
+            pending: List[Tuple[List[Dict[str, Any]], List[Tuple[Any, str]], asyncio.Task]] = []
+            try:
+                while True:
+                    chunk = await asyncio.to_thread(lambda: list(itertools.islice(changes, batch_size)))
+                    if not chunk:
+                        break
+                    chunk_docs = [
+                        {
+                            "id": manifest.doc_id_for(entry.path),
+                            "title": os.path.splitext(os.path.basename(entry.path))[0],
+                            "content": content,
+                            "filepath": entry.path
+                        }
+                        for entry, content, _ in chunk
+                    ]
+                    docs["docs"].extend(chunk_docs)
+                    meta = [(entry, digest) for entry, _, digest in chunk]
+                    pending.append((chunk_docs, meta, asyncio.create_task(self._extract_titles(chunk_docs, llm_slots))))
+                logger.info(f"{self.name} 增量采集发现 {len(docs['docs'])} 个新增或变化的文档")
+
+                records = list(scan.touched)
+                for chunk_docs, meta, task in pending:
+                    titles = await task
+                    for doc, (entry, digest) in zip(chunk_docs, meta):
+                        if titles.get(doc["id"]):
+                            doc["title"] = titles[doc["id"]]
+                        records.append(
+                            ManifestRecord(entry.path, entry.size, entry.mtime_ns, digest, doc["id"], doc["title"])
+                        )
+            finally:
+                # 扫描中途失败（或被取消）时，取消已启动的标题提取任务并等待其结束
+                tasks = [task for _, _, task in pending if not task.done()]
+                for task in tasks:
+                    task.cancel()
+                if tasks:
+                    await asyncio.gather(*tasks, return_exceptions=True)
+
+            run_id = current_run_id()
+            if run_id:
+                manifest.stage(run_id, records, scan.removed)
+            else:
+                manifest.update(records)
+                manifest.remove(scan.removed)
+            return docs
+        finally:
+            manifest.close()
+
+    def commit_run(self, run_id: str) -> None:
+        """
+        DAG 运行成功后提交本次运行暂存的清单修改。
+        """
+        if not self.incremental:
+            return
+        manifest = CorpusManifest(self.manifest_path)
+        try:
+            count = manifest.commit(run_id)
+        finally:
+            manifest.close()
+        if count:
+            logger.info(f"{self.name} 提交了运行 {run_id} 的 {count} 条清单修改")
+
+    def abort_run(self, run_id: str) -> None:
+        """
+        DAG 运行失败后丢弃本次运行暂存的清单修改，输出过的文档在下次运行时重新采集。
+        """
+        if not self.incremental:
+            return
+        manifest = CorpusManifest(self.manifest_path)
+        try:
+            count = manifest.discard(run_id)
+        finally:
+            manifest.close()
+        if count:
+            logger.info(f"{self.name} 丢弃了失败运行 {run_id} 的 {count} 条清单修改")
+
+    async def _extract_titles(self, docs: List[Dict[str, Any]],
+                              llm_slots: Optional[asyncio.Semaphore] = None) -> Dict[str, str]:
+        """
+        为文档提取标题。批量模式下按token预算把多个文档的前缀合并到一次调用中。
+        所有大模型调用（包括批量失败后的逐个回退）共享一个并发上限 concurrency。
+
+        参数:
+            docs (List[Dict[str, Any]]): 包含id与content的文档列表。
+            llm_slots (Optional[asyncio.Semaphore]): 共享的大模型调用并发上限，未指定时按 concurrency 新建。
+
+        返回:
+            Dict[str, str]: 文档ID到标题的映射，未能提取标题的文档不包含在内。
+        """
+        if llm_slots is None:
+            llm_slots = asyncio.Semaphore(max(1, int(self.concurrency or 1)))
+        if self.title_mode == "single":
+            results = await asyncio.gather(
+                *(self._extract_title_from_llm(doc["content"], llm_slots) for doc in docs), return_exceptions=True
+            )
+            return {
+                doc["id"]: result for doc, result in zip(docs, results)
+                if result and not isinstance(result, Exception)
+            }
+
+        batches = self._plan_title_batches(docs)
+        logger.info(f"{self.name} 将 {len(docs)} 个文档的标题提取合并为 {len(batches)} 次调用")
+        results = await asyncio.gather(
+            *(self._extract_titles_batch(batch, llm_slots) for batch in batches), return_exceptions=True
+        )
+
+        titles: Dict[str, str] = {}
+        for result in results:
+            if not isinstance(result, Exception):
+                titles.update(result)
+        return titles
+
+    def _plan_title_batches(self, docs: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        """
+        按token预算和批大小上限划分标题提取批次。
+
+        参数:
+            docs (List[Dict[str, Any]]): 文档列表。
+
+        返回:
+            List[List[Dict[str, Any]]]: 文档批次列表。
+        """
+        batches: List[List[Dict[str, Any]]] = []
+        current: List[Dict[str, Any]] = []
+        current_tokens = 0
+        for doc in docs:
+            # 每个条目额外计入文档ID和分隔符的开销
+            doc_tokens = estimate_tokens(doc["content"][:self.title_prefix_chars]) + 16
+            if current and (current_tokens + doc_tokens > self.title_token_budget
+                            or len(current) >= self.title_max_batch):
+                batches.append(current)
+                current, current_tokens = [], 0
+            current.append(doc)
+            current_tokens += doc_tokens
+        if current:
+            batches.append(current)
+        return batches
+
+    async def _extract_titles_batch(self, batch: List[Dict[str, Any]], llm_slots: asyncio.Semaphore) -> Dict[str, str]:
+        """
+        在一次大模型调用中为一批文档提取标题；结果中缺失、为空或无法解析的文档逐个回退到单文档提取。
+
+        参数:
+            batch (List[Dict[str, Any]]): 同一批次的文档。
+            llm_slots (asyncio.Semaphore): 所有标题提取调用共享的并发上限，回退的单文档调用也在其中排队。
+
+        返回:
+            Dict[str, str]: 文档ID到标题的映射。
+        """
+        entries = "\n\n".join(
+            f"[文档ID：{doc['id']}]\n{doc['content'][:self.title_prefix_chars]}" for doc in batch
+        )
+        llm_input = (
+            "以下是多份文档的开头部分，每份文档以“[文档ID：...]”开头：\n\n"
+            f"{entries}\n\n"
+            "请分别为每份文档生成一个简洁、专业、简短的标题，准确反映文档的核心内容。"
+            "按文档ID逐一返回，不要遗漏或合并文档。"
+        )
+        logger.info(f"使用大模型批量提取 {len(batch)} 个文档的标题")
+
+        titles: Dict[str, str] = {}
+        try:
+            def blocking_call():
+                return (
+                    self.agent_factory.create_agent()
+                    .input(llm_input)
+                    .output({
+                        "titles": [{
+                            "id": ("str", "文档ID"),
+                            "title": ("str", "该文档的标题")
+                        }]
+                    })
+                    .start()
+                )
+            async with llm_slots:
+                result = await asyncio.to_thread(blocking_call)
+            for item in (result or {}).get("titles", []) or []:
+                if isinstance(item, dict) and item.get("id") and isinstance(item.get("title"), str):
+                    titles[str(item["id"]).strip()] = item["title"].strip()
+        except Exception as e:
+            logger.error(f"批量提取标题失败，将逐个文档提取: {e}")
+
+        missing = [doc for doc in batch if not titles.get(doc["id"])]
+        if missing:
+            logger.warning(f"{len(missing)} 个文档未在批量结果中返回标题，改为逐个提取")
+            fallback = await asyncio.gather(
+                *(self._extract_title_from_llm(doc["content"], llm_slots) for doc in missing), return_exceptions=True
+            )
+            for doc, title in zip(missing, fallback):
+                if title and not isinstance(title, Exception):
+                    titles[doc["id"]] = title
+        return {doc["id"]: titles[doc["id"]] for doc in batch if titles.get(doc["id"])}
+
     def _read_document(self, filepath: str) -> Tuple[str, str]:
         """
         读取文本文件并返回其内容及标题。
@@ -96,20 +361,20 @@ class CollectAgent:
             Tuple[str, str]: 文档内容与标题组成的元组。
         """
         try:
-            with open(filepath, "r", encoding="utf-8") as file:
-                content = file.read()
+            content = read_text(filepath, self.mmap_threshold)
             title = os.path.splitext(os.path.basename(filepath))[0]
             return content, title
         except Exception as e:
             logger.error(f"读取文档 {filepath} 失败: {e}")
             raise e
 
-    async def _extract_title_from_llm(self, document: str) -> str:
+    async def _extract_title_from_llm(self, document: str, llm_slots: Optional[asyncio.Semaphore] = None) -> str:
         """
         使用大型语言模型（LLM）为文档提取合适的标题。
 
         参数：
             document (str): 用于提取标题的文档内容。
+            llm_slots (Optional[asyncio.Semaphore]): 共享的大模型调用并发上限。
 
         返回值：
             str: 提取出的标题。
@@ -124,14 +389,16 @@ class CollectAgent:
         try:
             def blocking_call():
                 result = (
-                    self.agent
+                    self.agent_factory.create_agent()
                     .input(llm_input)
                     .output("生成精确且描述性标题")
                     .start()
                 )
                 return result.strip()
-            extracted_title = await asyncio.to_thread(blocking_call)
-            return extracted_title
+            if llm_slots is None:
+                return await asyncio.to_thread(blocking_call)
+            async with llm_slots:
+                return await asyncio.to_thread(blocking_call)
         except Exception as e:
             logger.error(f"使用大模型提取标题失败: {e}")
             return ""
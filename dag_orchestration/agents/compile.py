@@ -8,19 +8,24 @@
 # @desc    : 文档编译智能体
 
 
+import asyncio
+from typing import Optional
 from utils.logger import logger
 from utils.message import Message
 from utils.ChatModel import ChatModel
+from dag_orchestration.registry import register_agent
+from utils.concurrency import gather_with_concurrency, DEFAULT_CONCURRENCY
 
 
+@register_agent()
 class CompileAgent:
     """
     文档编译智能体
     该智能体负责将提取的关键信息编译成最终的文档格式。
     """
-    def __init__(self, name: str) -> None:
-        agent_factory = ChatModel().get_agent_factory()
-        self.agent = agent_factory.create_agent()
+    def __init__(self, name: str, concurrency: int = DEFAULT_CONCURRENCY) -> None:
+        self.agent_factory = ChatModel().get_agent_factory()
+        self.concurrency = concurrency
         self.name = name
 
     async def process(self, message: Message) -> Message:
@@ -36,39 +41,66 @@ class CompileAgent:
         logger.info(f"{self.name} 开始编译最终报告。")
         input_data = message.content
 
-        key_info_data = input_data['task3']["extracted_items"]
-        summaries_data = input_data['task4']["summaries"]
+        if "joined" in input_data:
+            # 协调器已按文档ID完成连接（任务配置了 join）
+            records = input_data["joined"]
+        else:
+            records = self._join_inputs(input_data['task3']["extracted_items"], input_data['task4']["summaries"])
+
+        # 在并发上限内并行编译各文档的报告部分，保持文档原有顺序
+        results = await gather_with_concurrency(
+            records,
+            lambda record: self._compile_report_section(record["key_info"], record.get("summary")),
+            self.concurrency
+        )
 
         report_sections = []
+        for record, result in zip(records, results):
+            if isinstance(result, Exception):
+                logger.error(f"编译文档ID '{record['key']}' 的报告部分失败: {result}")
+                continue
+            if result:
+                report_sections.append(result)
 
-        for key_info_entry in key_info_data:
-            try:
-                report_section = await self._compile_report_section(
-                    key_info_entry, summaries_data
-                )
-                if report_section:
-                    report_sections.append(report_section)
-            except Exception as e:
-                logger.error(f"编译文档ID '{key_info_entry['id']}' 的报告部分失败: {e}")
-                raise RuntimeError(f"编译文档 '{key_info_entry['id']}' 的报告部分时出错") from e
+        if records and not report_sections:
+            raise RuntimeError("编译报告失败：所有文档的报告部分均编译失败")
 
         report = {"report": "\n\n".join(report_sections)}
         logger.info(f"{self.name} 成功编译并验证了最终报告。")
         return Message(content=report, sender=self.name, recipient=message.sender)
 
-    async def _compile_report_section(self, key_info_entry: dict, summaries_data: list) -> str:
+    @staticmethod
+    def _join_inputs(key_info_data: list, summaries_data: list) -> list:
+        """
+        未配置 join 时，按文档ID为关键信息匹配摘要：先为摘要建立索引，再按关键信息的顺序对齐。
+
+        参数：
+            key_info_data (list): 所有文档的关键信息条目。
+            summaries_data (list): 所有文档的摘要数据。
+
+        返回值：
+            list: 与协调器 join 输出格式一致的记录 {"key", "key_info", "summary"}。
+        """
+        summaries_by_doc = {}
+        for summary_entry in summaries_data:
+            summaries_by_doc.setdefault(summary_entry["doc_name"], summary_entry)
+        return [
+            {"key": entry["id"], "key_info": entry, "summary": summaries_by_doc.get(entry["id"])}
+            for entry in key_info_data
+        ]
+
+    async def _compile_report_section(self, key_info_entry: dict, summary_entry: Optional[dict]) -> str:
         """
         根据关键信息和摘要编制报告部分。
 
         参数：
             key_info_entry (dict): 文档的关键信息条目。
-            summaries_data (list): 所有文档的摘要数据。
+            summary_entry (Optional[dict]): 文档的摘要条目。
 
         返回值：
             str: 编制的报告部分。
         """
         doc_id = key_info_entry["id"]
-        summary_entry = next((s for s in summaries_data if s["doc_name"] == doc_id), None)
 
         if not summary_entry:
             raise ValueError(f"未找到文档ID '{doc_id}' 的摘要")
@@ -90,13 +122,15 @@ class CompileAgent:
         )
 
         try:
-            report_section = (
-                self.agent
-                .general("你是一个经过训练的人工智能，擅长根据提供的信息整理出清晰、结构完善的报告。")
-                .input(llm_input)
-                .output("输出编制的报告部分，确保格式清晰且内容连贯。")
-                .start()
-            )
+            def blocking_call():
+                return (
+                    self.agent_factory.create_agent()
+                    .general("你是一个经过训练的人工智能，擅长根据提供的信息整理出清晰、结构完善的报告。")
+                    .input(llm_input)
+                    .output("输出编制的报告部分，确保格式清晰且内容连贯。")
+                    .start()
+                )
+            report_section = await asyncio.to_thread(blocking_call)
             return report_section
         except Exception as e:
             logger.error(f"未能为文档ID“{doc_id}”编译报告部分：{e}")
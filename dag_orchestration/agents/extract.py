@@ -8,20 +8,39 @@
 # @desc    : 文档内容提取智能体
 
 import asyncio
-from typing import Dict, Any
+from typing import Dict, Any, List, Tuple
 from utils.logger import logger
 from utils.message import Message
 from utils.ChatModel import ChatModel
+from dag_orchestration.registry import register_agent
+from utils.chunking import split_text, merge_unique, DEFAULT_CHUNK_TOKENS, DEFAULT_CHUNK_OVERLAP
+from utils.concurrency import gather_grouped, DEFAULT_CONCURRENCY
 
 
+@register_agent()
 class ExtractAgent:
     """
     文档内容提取智能体
     该智能体负责从预处理后的文档中提取关键信息。
     """
-    def __init__(self, name: str) -> None:
-        agent_factory = ChatModel().get_agent_factory()
-        self.agent = agent_factory.create_agent()
+    def __init__(
+        self,
+        name: str,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        chunk_tokens: int = DEFAULT_CHUNK_TOKENS,
+        chunk_overlap: int = DEFAULT_CHUNK_OVERLAP
+    ) -> None:
+        """
+        参数：
+            name (str): 智能体名称。
+            concurrency (int): 同时进行的大模型调用数量上限。
+            chunk_tokens (int): 每个分块的token上限，超过该长度的文档分块提取后取并集去重。
+            chunk_overlap (int): 相邻分块之间重叠的token数量。
+        """
+        self.agent_factory = ChatModel().get_agent_factory()
+        self.concurrency = concurrency
+        self.chunk_tokens = chunk_tokens
+        self.chunk_overlap = chunk_overlap
         self.name = name
 
     async def process(self, message: Message) -> Message:
@@ -37,26 +56,23 @@ class ExtractAgent:
         logger.info(f"{self.name} 开始文档内容提取")
         input_data = message.content
 
-        extracted_items = []
+        docs = input_data.get("preprocessed_docs", [])
+        # 长文档按token预算分块，所有文档的分块在同一并发上限内并行提取，结果按文档分组返回
+        chunked = [self._split_document(doc) for doc in docs]
+        results = await gather_grouped(chunked, self._extract_chunk, self.concurrency)
 
-        for doc in input_data.get("preprocessed_docs", []):
-            try:
-                extracted_data = await self._extract_key_information(doc["id"], doc["title"], doc["content"])
-
-                # 按照更新后的架构创建提取项
-                extracted_items.append({
-                    "id": doc["id"],
-                    "key_info": [
-                        {
-                            "characters": extracted_data.get("characters", []),
-                            "themes": extracted_data.get("themes", []),
-                            "plot_points": extracted_data.get("plot_points", [])
-                        }
-                    ]
-                })
-            except Exception as e:
-                logger.error(f"未能从标题为“{doc['title']}”、ID为“{doc['id']}”的文档中提取关键信息：{e}")
-                raise RuntimeError(f"文档内容提取错误：'{doc['title']}'")
+        extracted_items = []
+        for doc, chunk_results in zip(docs, results):
+            extracted = [result for result in chunk_results if not isinstance(result, Exception)]
+            if not extracted:
+                logger.error(f"未能从标题为“{doc['title']}”、ID为“{doc['id']}”的文档中提取关键信息：{chunk_results[0]}")
+                continue
+            if len(extracted) < len(chunk_results):
+                logger.warning(f"文档“{doc['id']}”有 {len(chunk_results) - len(extracted)} 个分块提取失败，已使用其余分块的结果")
+            extracted_items.append(self._merge_extracted(doc, extracted))
+
+        if docs and not extracted_items:
+            raise RuntimeError("文档内容提取错误：所有文档均提取失败")
 
         # 准备最终输出为所需格式
         output_data = {"extracted_items": extracted_items}
@@ -64,6 +80,49 @@ class ExtractAgent:
         logger.info(f"{self.name} 成功提取并验证了关键信息。")
         return Message(content=output_data, sender=self.name, recipient=message.sender)
 
+    def _split_document(self, doc: Dict[str, Any]) -> List[Tuple[Dict[str, Any], int, int, str]]:
+        """
+        把文档切分为相互重叠的分块，返回（文档、分块序号、分块总数、分块内容）列表。
+        """
+        chunks = split_text(doc["content"], self.chunk_tokens, self.chunk_overlap)
+        return [(doc, index, len(chunks), chunk) for index, chunk in enumerate(chunks)]
+
+    async def _extract_chunk(self, job: Tuple[Dict[str, Any], int, int, str]) -> Dict[str, Any]:
+        """
+        提取单个分块的关键信息。
+
+        参数:
+            job (Tuple[Dict[str, Any], int, int, str]): （文档、分块序号、分块总数、分块内容）。
+
+        返回:
+            Dict[str, Any]: 分块的提取结果。
+        """
+        doc, index, total, chunk = job
+        title = doc["title"] if total == 1 else f"{doc['title']}（第{index + 1}/{total}部分）"
+        return await self._extract_key_information(doc["id"], title, chunk)
+
+    @staticmethod
+    def _merge_extracted(doc: Dict[str, Any], extracted: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        合并文档各分块的提取结果（取并集并去重），并按照输出架构组织。
+
+        参数:
+            doc (Dict[str, Any]): 包含id、title、content的预处理文档。
+            extracted (List[Dict[str, Any]]): 按分块顺序排列的提取结果。
+
+        返回:
+            Dict[str, Any]: 文档的提取项。
+        """
+        return {
+            "id": doc["id"],
+            "key_info": [
+                {
+                    "characters": merge_unique(data.get("characters", []) for data in extracted),
+                    "themes": merge_unique(data.get("themes", []) for data in extracted),
+                    "plot_points": merge_unique(data.get("plot_points", []) for data in extracted)
+                }
+            ]
+        }
 
     async def _extract_key_information(self, doc_id: str, doc_title: str, doc_content: str) -> Dict[str, Any]:
         """
@@ -95,17 +154,20 @@ class ExtractAgent:
         logger.info(f"正在使用LLM从标题为“{doc_title}”、ID为“{doc_id}”的文档中提取关键信息。")
 
         try:
-            extracted_data = (
-                self.agent
-                .general("你是一个经过训练的AI，专门从文档中提取关键信息并输出完美的JSON格式数据。")
-                .input(llm_input)
-                .output({
-                    "characters": [("str", "主要角色姓名")],
-                    "themes": [("str", "文档中讨论或探讨的核心主题")],
-                    "plot_points": [("str", "对理解故事情节至关重要的关键情节")]
-                })
-                .start()
-            )
+            def blocking_call():
+                # 并发提取时各文档使用独立的模型智能体
+                return (
+                    self.agent_factory.create_agent()
+                    .general("你是一个经过训练的AI，专门从文档中提取关键信息并输出完美的JSON格式数据。")
+                    .input(llm_input)
+                    .output({
+                        "characters": [("str", "主要角色姓名")],
+                        "themes": [("str", "文档中讨论或探讨的核心主题")],
+                        "plot_points": [("str", "对理解故事情节至关重要的关键情节")]
+                    })
+                    .start()
+                )
+            extracted_data = await asyncio.to_thread(blocking_call)
             return extracted_data
         except Exception as e:
             logger.error(f"无法从标题为“{doc_title}”、ID为“{doc_id}”的文档中提取关键信息，原因：{e}")
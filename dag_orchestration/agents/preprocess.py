@@ -9,19 +9,31 @@
 
 
 import asyncio
+from typing import Dict, Any, List, Tuple
 from utils.logger import logger
 from utils.message import Message
 from utils.ChatModel import ChatModel
+from dag_orchestration.registry import register_agent
+from utils.chunking import split_text, DEFAULT_CHUNK_TOKENS
+from utils.concurrency import gather_grouped, DEFAULT_CONCURRENCY
 
 
+@register_agent()
 class PreprocessAgent:
     """
     文档预处理智能体
     该智能体负责对收集的文档内容进行清洗和预处理。
     """
-    def __init__(self, name: str) -> None:
-        agent_factory = ChatModel().get_agent_factory()
-        self.agent = agent_factory.create_agent()
+    def __init__(self, name: str, concurrency: int = DEFAULT_CONCURRENCY, chunk_tokens: int = DEFAULT_CHUNK_TOKENS) -> None:
+        """
+        参数：
+            name (str): 智能体名称。
+            concurrency (int): 同时进行的大模型调用数量上限。
+            chunk_tokens (int): 每个分块的token上限，超过该长度的文档分块清洗后按顺序拼接（分块之间不重叠）。
+        """
+        self.agent_factory = ChatModel().get_agent_factory()
+        self.concurrency = concurrency
+        self.chunk_tokens = chunk_tokens
         self.name = name
 
     async def process(self, message: Message) -> Message:
@@ -40,28 +52,49 @@ class PreprocessAgent:
         logger.info(f"{self.name} 开始文档预处理")
         input_data = message.content
 
+        docs = input_data.get("docs", [])
+        # 长文档按token预算分块，所有文档的分块在同一并发上限内并行清洗，结果按文档分组返回
+        chunked = [self._split_document(doc) for doc in docs]
+        results = await gather_grouped(chunked, self._clean_chunk, self.concurrency)
+
         preprocessed_docs = {"preprocessed_docs": []}
+        for doc, chunk_results in zip(docs, results):
+            errors = [result for result in chunk_results if isinstance(result, Exception)]
+            if errors:
+                logger.error(f"未能预处理标题为“{doc['title']}”、ID为“{doc['id']}”的文档：{errors[0]}")
+                continue
+            preprocessed_docs["preprocessed_docs"].append({
+                "id": doc["id"],
+                "title": doc["title"],
+                "content": "\n".join(result for result in chunk_results if result)
+            })
+
+        if docs and not preprocessed_docs["preprocessed_docs"]:
+            raise RuntimeError("文档预处理错误：所有文档均处理失败")
 
-        for doc in input_data.get("docs", []):
-            try:
-                # 假设文档内容需要清洗和预处理
-                cleaned_content = await self._clean_document_content(
-                    doc["id"], doc["title"], doc["content"]
-                )
+        logger.info(f"{self.name} 已成功完成文档的预处理与验证。")
+        return Message(content=preprocessed_docs, sender=self.name, recipient=message.sender)
 
-                preprocessed_docs["preprocessed_docs"].append({
-                    "id": doc["id"],
-                    "title": doc["title"],
-                    "content": cleaned_content
-                })
+    def _split_document(self, doc: Dict[str, Any]) -> List[Tuple[Dict[str, Any], int, int, str]]:
+        """
+        把文档切分为不重叠的分块，返回（文档、分块序号、分块总数、分块内容）列表。
+        """
+        chunks = split_text(doc["content"], self.chunk_tokens, overlap_tokens=0)
+        return [(doc, index, len(chunks), chunk) for index, chunk in enumerate(chunks)]
 
-            except Exception as e:
-                logger.error(f"未能预处理标题为“{doc['title']}”、ID为“{doc['id']}”的文档：{e}")
-                raise RuntimeError(f"文档预处理错误：'{doc['title']}'")
+    async def _clean_chunk(self, job: Tuple[Dict[str, Any], int, int, str]) -> str:
+        """
+        清洗单个分块。
 
-        logger.info(f"{self.name} 已成功完成文档的预处理与验证。")
-        return Message(content=preprocessed_docs, sender=self.name, recipient=message.sender)
+        参数：
+            job (Tuple[Dict[str, Any], int, int, str]): （文档、分块序号、分块总数、分块内容）。
 
+        返回：
+            str: 清洗后的分块内容。
+        """
+        doc, index, total, chunk = job
+        title = doc["title"] if total == 1 else f"{doc['title']}（第{index + 1}/{total}部分）"
+        return await self._clean_document_content(doc["id"], title, chunk)
 
     async def _clean_document_content(self, doc_id: str, doc_title: str, doc_content: str) -> str:
         """
@@ -87,12 +120,15 @@ class PreprocessAgent:
         logger.info(f"正在使用LLM处理标题为{doc_title}、ID为“{doc_id}”的文档，进行内容清理。")
 
         try:
-            cleaned_content = (
-                self.agent
-                .input(llm_input)
-                .output("请提供清理后的文档内容")
-                .start()
-            )
+            def blocking_call():
+                # 每次调用创建独立的模型智能体，避免并发请求共享提示状态
+                return (
+                    self.agent_factory.create_agent()
+                    .input(llm_input)
+                    .output("请提供清理后的文档内容")
+                    .start()
+                )
+            cleaned_content = await asyncio.to_thread(blocking_call)
             return cleaned_content
         except Exception as e:
             logger.error(f"未能清理文档“{doc_title}”（ID：{doc_id}）的内容：{e}")
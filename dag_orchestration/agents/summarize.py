@@ -13,17 +13,35 @@ from glob import glob
 from utils.logger import logger
 from utils.message import Message
 from utils.ChatModel import ChatModel
+from dag_orchestration.registry import register_agent
+from utils.chunking import split_text, pack_by_tokens, DEFAULT_CHUNK_TOKENS, DEFAULT_CHUNK_OVERLAP
+from utils.concurrency import gather_grouped, DEFAULT_CONCURRENCY
 from typing import List, Dict, Any, Tuple
 
 
+@register_agent()
 class SummarizeAgent:
     """
     文档摘要智能体
     """
-    def __init__(self, name: str) -> None:
-        agent_factory = ChatModel().get_agent_factory()
-        self.agent = agent_factory.create_agent()
-
+    def __init__(
+        self,
+        name: str,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        chunk_tokens: int = DEFAULT_CHUNK_TOKENS,
+        chunk_overlap: int = DEFAULT_CHUNK_OVERLAP
+    ) -> None:
+        """
+        参数：
+            name (str): 智能体名称。
+            concurrency (int): 同时进行的大模型调用数量上限。
+            chunk_tokens (int): 每个分块的token上限，超过该长度的文档先分块摘要，再逐层合并为一个摘要。
+            chunk_overlap (int): 相邻分块之间重叠的token数量。
+        """
+        self.agent_factory = ChatModel().get_agent_factory()
+        self.concurrency = concurrency
+        self.chunk_tokens = chunk_tokens
+        self.chunk_overlap = chunk_overlap
         self.name = name
 
     async def process(self, message: Message) -> Message:
@@ -42,25 +60,85 @@ class SummarizeAgent:
         logger.info(f"{self.name} 开始生成摘要")
         input_data = message.content
 
+        docs = input_data.get("preprocessed_docs", [])
+        # 长文档按token预算分块，所有文档的分块在同一并发上限内并行生成摘要
+        chunked = [self._split_document(doc) for doc in docs]
+        partials = await gather_grouped(chunked, self._summarize_chunk, self.concurrency)
+
+        # 分层归并：把同一文档的分块摘要按token预算分组合并，逐轮减少直到每个文档只剩一个摘要
+        failed = {}
+        while True:
+            for index, results in enumerate(partials):
+                errors = [result for result in results if isinstance(result, Exception)]
+                if errors and index not in failed:
+                    failed[index] = errors[0]
+            groups = [
+                [] if index in failed or len(results) <= 1
+                else [(docs[index], group) for group in pack_by_tokens(results, self.chunk_tokens)]
+                for index, results in enumerate(partials)
+            ]
+            if not any(groups):
+                break
+            merged = await gather_grouped(groups, self._combine_summaries, self.concurrency)
+            partials = [merged[index] if groups[index] else results for index, results in enumerate(partials)]
+
         summaries = {"summaries": []}
-        for doc in input_data.get("preprocessed_docs", []):
-            try:
-                summary = await self._generate_summary(
-                    doc_id=doc["id"],
-                    doc_title=doc["title"],
-                    doc_content=doc["content"]
-                )
-                summaries["summaries"].append({
-                    "doc_name": doc["id"],
-                    "summary": summary
-                })
-            except Exception as e:
-                logger.error(f"文档摘要生成失败: {e}")
-                raise RuntimeError(f"文档摘要生成失败: {e}")
+        for index, doc in enumerate(docs):
+            if index in failed:
+                logger.error(f"文档“{doc['id']}”摘要生成失败: {failed[index]}")
+                continue
+            summaries["summaries"].append({
+                "doc_name": doc["id"],
+                "summary": partials[index][0]
+            })
+
+        if docs and not summaries["summaries"]:
+            raise RuntimeError("文档摘要生成失败：所有文档均生成失败")
 
         logger.info(f"{self.name} 成功生成并验证了摘要")
         return Message(content=summaries, sender=self.name, recipient=message.sender)
 
+    def _split_document(self, doc: Dict[str, Any]) -> List[Tuple[Dict[str, Any], int, int, str]]:
+        """
+        把文档切分为相互重叠的分块，返回（文档、分块序号、分块总数、分块内容）列表。
+        """
+        chunks = split_text(doc["content"], self.chunk_tokens, self.chunk_overlap)
+        return [(doc, index, len(chunks), chunk) for index, chunk in enumerate(chunks)]
+
+    async def _summarize_chunk(self, job: Tuple[Dict[str, Any], int, int, str]) -> str:
+        """
+        为单个分块生成摘要。
+
+        参数：
+            job (Tuple[Dict[str, Any], int, int, str]): （文档、分块序号、分块总数、分块内容）。
+
+        返回：
+            str: 分块摘要，文档只有一个分块时即为文档摘要。
+        """
+        doc, index, total, chunk = job
+        title = doc["title"] if total == 1 else f"{doc['title']}（第{index + 1}/{total}部分）"
+        return await self._generate_summary(doc_id=doc["id"], doc_title=title, doc_content=chunk)
+
+    async def _combine_summaries(self, job: Tuple[Dict[str, Any], List[str]]) -> str:
+        """
+        把同一文档按顺序排列的若干分块摘要合并为一个摘要，只有一个摘要时直接返回。
+
+        参数：
+            job (Tuple[Dict[str, Any], List[str]]): （文档、分块摘要列表）。
+
+        返回：
+            str: 合并后的摘要。
+        """
+        doc, parts = job
+        if len(parts) == 1:
+            return parts[0]
+        content = "\n".join(f"第{index + 1}部分摘要：{part}" for index, part in enumerate(parts))
+        return await self._generate_summary(
+            doc_id=doc["id"],
+            doc_title=f"{doc['title']}（按顺序排列的各部分摘要）",
+            doc_content=content
+        )
+
     async def _generate_summary(self, doc_id: str, doc_title: str, doc_content: str) -> str:
         """
         使用大型语言模型(LLM)生成文档摘要。
@@ -91,7 +169,7 @@ class SummarizeAgent:
         try:
             def blocking_call():
                 result = (
-                    self.agent
+                    self.agent_factory.create_agent()
                     .general("你是一个经过训练的人工智能，专门用于总结文档并输出完美的JSON格式。")
                     .input(llm_input)
                     .output({
@@ -105,6 +183,3 @@ class SummarizeAgent:
         except Exception as e:
             logger.error(f"未能为标题为“{doc_title}”、ID为“{doc_id}”的文档生成摘要，原因：{e}")
             raise RuntimeError(f"未能为文档生成摘要: {e}")
-
-
-
@@ -0,0 +1,320 @@
+#!/usr/bin/env python
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @Author  : justin.郑
+# @mail    : 3907721@qq.com
+# @Time    : 2026/10/19 14:40
+# @File    : broker
+# @desc    : 基于 SQLite 的 DAG 任务代理，协调器发布就绪任务，工作进程领取并回传结果
+
+
+import os
+import json
+import time
+import uuid
+import sqlite3
+from contextlib import contextmanager
+from utils.logger import logger
+from typing import Any, Dict, Iterator, Optional
+
+
+# 任务状态
+PENDING = 'pending'
+RUNNING = 'running'
+COMPLETED = 'completed'
+FAILED = 'failed'
+
+# 已结束任务和失联工作进程记录的保留时间（秒），超过后在打开代理时清理
+FINISHED_TTL = 24 * 3600
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS broker_tasks (
+    job_id       TEXT PRIMARY KEY,
+    run_id       TEXT NOT NULL,
+    task_id      TEXT NOT NULL,
+    agent        TEXT NOT NULL,
+    agent_name   TEXT NOT NULL,
+    module       TEXT,
+    options      TEXT NOT NULL,
+    payload      TEXT NOT NULL,
+    status       TEXT NOT NULL,
+    worker_id    TEXT,
+    attempts     INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    heartbeat_at REAL,
+    created_at   REAL NOT NULL,
+    updated_at   REAL NOT NULL,
+    result       TEXT,
+    error        TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_broker_tasks_status ON broker_tasks (status, created_at);
+CREATE TABLE IF NOT EXISTS broker_workers (
+    worker_id    TEXT PRIMARY KEY,
+    host         TEXT,
+    pid          INTEGER,
+    started_at   REAL NOT NULL,
+    heartbeat_at REAL NOT NULL
+);
+"""
+
+
+class TaskBroker:
+    """
+    基于 SQLite 的任务代理。
+
+    协调器通过 publish 发布就绪任务并轮询结果；工作进程通过 claim 原子地领取任务，
+    定期发送心跳，完成后回传结果。心跳超时的任务会被重新置为待领取状态，
+    由其他工作进程接手，超过最大尝试次数后标记为失败。
+
+    数据库使用 WAL 模式，供同一台主机上的多个进程共享。WAL 依赖共享内存，
+    数据库文件不能放在 NFS/SMB 等网络文件系统上，协调器和工作进程需要运行在同一台主机上。
+
+    协调器取得结果后删除任务记录（任务输入中可能包含完整的文档内容）；
+    协调器异常退出时遗留的已结束任务在超过 FINISHED_TTL 后打开代理时清理。
+    """
+    def __init__(self, db_path: str, heartbeat_timeout: float = 30.0) -> None:
+        """
+        参数：
+            db_path (str): SQLite 数据库文件路径。
+            heartbeat_timeout (float): 运行中任务的心跳超时时间（秒），超时后任务会被重新分配。
+        """
+        self.db_path = db_path
+        self.heartbeat_timeout = heartbeat_timeout
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+        self.purge_finished()
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """
+        每次操作使用独立连接，便于在线程和进程之间安全使用。
+        """
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def publish(
+        self,
+        run_id: str,
+        task_id: str,
+        agent: str,
+        agent_name: str,
+        payload: Any,
+        options: Optional[Dict[str, Any]] = None,
+        module: Optional[str] = None,
+        max_attempts: int = 3
+    ) -> str:
+        """
+        发布一个就绪任务。
+
+        参数：
+            run_id (str): DAG运行ID。
+            task_id (str): DAG中的任务ID。
+            agent (str): 智能体类名。
+            agent_name (str): 智能体实例名称。
+            payload (Any): 传给智能体的消息内容，需可JSON序列化。
+            options (Optional[Dict[str, Any]]): 智能体构造参数。
+            module (Optional[str]): 智能体所在模块。
+            max_attempts (int): 工作进程失联时的最大尝试次数。
+
+        返回：
+            str: 任务在代理中的唯一ID。
+        """
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO broker_tasks (job_id, run_id, task_id, agent, agent_name, module, options, payload,"
+                " status, max_attempts, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, run_id, task_id, agent, agent_name, module,
+                 json.dumps(options or {}, ensure_ascii=False), json.dumps(payload, ensure_ascii=False),
+                 PENDING, max(1, max_attempts), now, now)
+            )
+        logger.info(f"任务 {task_id} 已发布到代理，job_id={job_id}")
+        return job_id
+
+    def claim(self, worker_id: str) -> Optional[Dict[str, Any]]:
+        """
+        原子地领取最早发布的待执行任务。
+
+        参数：
+            worker_id (str): 工作进程ID。
+
+        返回：
+            Optional[Dict[str, Any]]: 领取到的任务，没有待执行任务时返回None。
+        """
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT * FROM broker_tasks WHERE status = ? ORDER BY created_at LIMIT 1", (PENDING,)
+                ).fetchone()
+                if row is None:
+                    conn.execute("COMMIT")
+                    return None
+                conn.execute(
+                    "UPDATE broker_tasks SET status = ?, worker_id = ?, attempts = attempts + 1,"
+                    " heartbeat_at = ?, updated_at = ? WHERE job_id = ?",
+                    (RUNNING, worker_id, now, now, row['job_id'])
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        job = dict(row)
+        job['options'] = json.loads(job['options'])
+        job['payload'] = json.loads(job['payload'])
+        job['attempts'] += 1
+        return job
+
+    def heartbeat(self, worker_id: str, host: str = '', pid: int = 0) -> None:
+        """
+        更新工作进程及其运行中任务的心跳时间。
+
+        参数：
+            worker_id (str): 工作进程ID。
+            host (str): 工作进程所在主机名。
+            pid (int): 工作进程PID。
+        """
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO broker_workers (worker_id, host, pid, started_at, heartbeat_at) VALUES (?, ?, ?, ?, ?)"
+                " ON CONFLICT(worker_id) DO UPDATE SET heartbeat_at = excluded.heartbeat_at",
+                (worker_id, host, pid, now, now)
+            )
+            conn.execute(
+                "UPDATE broker_tasks SET heartbeat_at = ? WHERE worker_id = ? AND status = ?",
+                (now, worker_id, RUNNING)
+            )
+
+    def complete(self, job_id: str, worker_id: str, result: Any) -> bool:
+        """
+        回传任务结果。只有当前持有该任务的工作进程才能提交，防止被重新分配的任务重复提交。
+
+        参数：
+            job_id (str): 任务ID。
+            worker_id (str): 工作进程ID。
+            result (Any): 智能体输出，需可JSON序列化。
+
+        返回：
+            bool: 结果是否被接受。
+        """
+        return self._finish(job_id, worker_id, COMPLETED, result=json.dumps(result, ensure_ascii=False))
+
+    def fail(self, job_id: str, worker_id: str, error: str) -> bool:
+        """
+        标记任务执行失败。
+
+        参数：
+            job_id (str): 任务ID。
+            worker_id (str): 工作进程ID。
+            error (str): 错误信息。
+
+        返回：
+            bool: 状态是否被接受。
+        """
+        return self._finish(job_id, worker_id, FAILED, error=error)
+
+    def _finish(self, job_id: str, worker_id: str, status: str,
+                result: Optional[str] = None, error: Optional[str] = None) -> bool:
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE broker_tasks SET status = ?, result = ?, error = ?, updated_at = ?"
+                " WHERE job_id = ? AND worker_id = ? AND status = ?",
+                (status, result, error, time.time(), job_id, worker_id, RUNNING)
+            )
+            accepted = cursor.rowcount == 1
+        if not accepted:
+            logger.warning(f"任务 {job_id} 已被重新分配，忽略工作进程 {worker_id} 提交的状态")
+        return accepted
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        查询任务状态。
+
+        参数：
+            job_id (str): 任务ID。
+
+        返回：
+            Optional[Dict[str, Any]]: 包含 status、result、error、attempts 的任务信息。
+        """
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT job_id, task_id, status, result, error, attempts, worker_id FROM broker_tasks WHERE job_id = ?",
+                (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        if job['result'] is not None:
+            job['result'] = json.loads(job['result'])
+        return job
+
+    def requeue_stale(self) -> int:
+        """
+        将心跳超时的运行中任务重新置为待领取状态；超过最大尝试次数的任务标记为失败。
+
+        返回：
+            int: 被重新分配或标记失败的任务数量。
+        """
+        now = time.time()
+        deadline = now - self.heartbeat_timeout
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                failed = conn.execute(
+                    "UPDATE broker_tasks SET status = ?, error = ?, updated_at = ?"
+                    " WHERE status = ? AND heartbeat_at < ? AND attempts >= max_attempts",
+                    (FAILED, "工作进程心跳超时，已达到最大尝试次数", now, RUNNING, deadline)
+                ).rowcount
+                requeued = conn.execute(
+                    "UPDATE broker_tasks SET status = ?, worker_id = NULL, updated_at = ?"
+                    " WHERE status = ? AND heartbeat_at < ?",
+                    (PENDING, now, RUNNING, deadline)
+                ).rowcount
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        if requeued or failed:
+            logger.warning(f"心跳超时：{requeued} 个任务已重新分配，{failed} 个任务已标记失败")
+        return requeued + failed
+
+    def delete(self, job_id: str) -> None:
+        """
+        删除任务记录。协调器取得结果或放弃等待后调用；运行中的任务被删除后，工作进程回传的结果会被忽略。
+
+        参数：
+            job_id (str): 任务ID。
+        """
+        with self._connect() as conn:
+            conn.execute("DELETE FROM broker_tasks WHERE job_id = ?", (job_id,))
+
+    def purge_finished(self, max_age: float = FINISHED_TTL) -> int:
+        """
+        清理超过保留时间的已结束任务和失联工作进程的记录。
+
+        参数：
+            max_age (float): 保留时间（秒）。
+
+        返回：
+            int: 删除的任务数量。
+        """
+        deadline = time.time() - max_age
+        with self._connect() as conn:
+            purged = conn.execute(
+                "DELETE FROM broker_tasks WHERE status IN (?, ?) AND updated_at < ?", (COMPLETED, FAILED, deadline)
+            ).rowcount
+            conn.execute("DELETE FROM broker_workers WHERE heartbeat_at < ?", (deadline,))
+        if purged:
+            logger.info(f"清理了 {purged} 个已结束的任务记录")
+        return purged
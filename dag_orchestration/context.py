@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @Author  : justin.郑
+# @mail    : 3907721@qq.com
+# @Time    : 2026/10/19 20:10
+# @File    : context
+# @desc    : 单次 DAG 运行的执行上下文
+
+
+import os
+import time
+import uuid
+import contextvars
+from contextlib import contextmanager
+from dag_orchestration.dag import DagDefinition
+from dag_orchestration.results import ResultStore, create_result_store
+from utils.logger import logger
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+# 任务状态监听函数，参数为（任务ID、新状态）
+StateListener = Callable[[str, str], None]
+
+# 当前正在执行的 DAG 运行ID，智能体据此暂存运行成功后才生效的修改
+_current_run_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("dag_run_id", default=None)
+
+
+def current_run_id() -> Optional[str]:
+    """
+    返回当前正在执行的 DAG 运行ID，不在 DAG 运行中（例如单独调用智能体）时返回 None。
+    """
+    return _current_run_id.get()
+
+
+@contextmanager
+def run_scope(run_id: Optional[str]) -> Iterator[None]:
+    """
+    在 with 块内（包括其中创建的任务）把 run_id 设为当前运行ID。
+    """
+    token = _current_run_id.set(run_id)
+    try:
+        yield
+    finally:
+        _current_run_id.reset(token)
+
+
+class RunContext:
+    """
+    单次 DAG 运行的执行上下文。
+
+    编译后的 DagDefinition 在多次运行之间共享且只读，每次运行的可变状态都保存在各自的上下文中，
+    因此同一个协调器可以在一个事件循环中同时执行多次运行。
+
+    属性：
+        run_id (str): 运行ID。
+        definition (DagDefinition): 共享的 DAG 定义。
+        params (Dict[str, Any]): 运行参数，作为无依赖任务的输入（例如 {"docs_folder": ...}）。
+        output_dir (Optional[str]): 本次运行的输出目录，未指定输出根目录时为 None。
+        results (ResultStore): 本次运行的任务结果存储。
+        states (Dict[str, str]): 任务（及子任务）状态。
+        pending_consumers (Dict[str, int]): 每个任务结果尚未结束的下游任务数量。
+        listeners (List[StateListener]): 任务状态变化时调用的监听函数。
+    """
+    def __init__(self, definition: DagDefinition, params: Optional[Dict[str, Any]] = None,
+                 output_root: Optional[str] = None, run_id: Optional[str] = None) -> None:
+        """
+        参数：
+            definition (DagDefinition): 编译后的 DAG 定义。
+            params (Optional[Dict[str, Any]]): 运行参数。
+            output_root (Optional[str]): 输出根目录，指定后在其中创建以运行ID命名的输出目录。
+            run_id (Optional[str]): 运行ID，未指定时自动生成。
+        """
+        self.run_id = run_id or uuid.uuid4().hex
+        self.definition = definition
+        self.params = dict(params or {})
+        self.output_dir = os.path.join(output_root, self.run_id) if output_root else None
+        if self.output_dir:
+            os.makedirs(self.output_dir, exist_ok=True)
+        self.results: ResultStore = create_result_store(definition.results, self.run_id)
+        self.states: Dict[str, str] = {task_id: 'pending' for task_id in definition.tasks}
+        self.pending_consumers: Dict[str, int] = {
+            task_id: len(successors) for task_id, successors in definition.successors().items()
+        }
+        self.started_at = time.time()
+        self.listeners: List[StateListener] = []
+
+    def set_state(self, task_id: str, state: str) -> None:
+        """
+        更新任务（或子任务）状态并通知监听函数，监听函数抛出的异常只记录日志。
+        """
+        self.states[task_id] = state
+        for listener in self.listeners:
+            try:
+                listener(task_id, state)
+            except Exception as e:
+                logger.warning(f"运行 {self.run_id} 的状态监听函数执行失败: {e}")
+
+    def output(self, default: Any = None) -> Any:
+        """
+        返回输出任务的结果，尚未生成时返回默认值。
+        """
+        return self.results.get(self.definition.output, default)
+
+    def close(self) -> None:
+        """
+        释放本次运行的结果存储。
+        """
+        self.results.close()
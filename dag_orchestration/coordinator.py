@@ -8,34 +8,62 @@
 # @desc    : DAG 编排模式协调器
 
 
-import yaml
 import json
+import time
 import asyncio
-import importlib
 from utils.logger import logger
 from utils.message import Message
-from typing import List, Dict, Any, Optional
+from dag_orchestration.registry import registry
+from dag_orchestration.dag import load_dag, describe_plan, TaskDurationStore
+from dag_orchestration.broker import TaskBroker, COMPLETED, FAILED
+from dag_orchestration.fanout import resolve_items, replace_items, gather_results
+from dag_orchestration.join import hash_join
+from dag_orchestration.context import RunContext, run_scope
+from dag_orchestration.scheduler import PrioritySlots
+from dag_orchestration.history import RunHistory, payload_size
+from utils.llm_usage import track_llm_calls
+from utils.concurrency import gather_with_concurrency, DEFAULT_CONCURRENCY
+from typing import List, Dict, Any, ContextManager, Optional, Tuple
 
 
 class CoordinatorAgent:
     """
     DAG 编排模式协调器
     """
-    def __init__(self, name: str, dag_file: str) ->None:
+    def __init__(self, name: str, dag_file: str, broker: Optional[TaskBroker] = None,
+                 poll_interval: float = 0.5, output_root: Optional[str] = None,
+                 max_parallel_tasks: Optional[int] = None, history: Optional[RunHistory] = None,
+                 record_history: bool = True) ->None:
         """
         初始化CoordinatorAgent，需指定名称和DAG文件。
 
+        DAG 定义只在初始化时编译一次，每次运行的结果、状态和输出目录保存在独立的 RunContext 中，
+        同一个协调器可以在一个事件循环中同时执行多次运行。
+
         参数：
             - name (str): 协调器代理的名称。
             - dag_file (str): 定义DAG的YAML文件路径。
+            - broker (Optional[TaskBroker]): 任务代理。指定后就绪任务发布到代理，由工作进程执行；
+              未指定时在当前事件循环中执行。
+            - poll_interval (float): 工作进程模式下轮询任务结果的间隔（秒）。
+            - output_root (Optional[str]): 运行输出根目录，指定后每次运行在其中创建以运行ID命名的目录。
+            - max_parallel_tasks (Optional[int]): 同时运行的任务数量上限（所有运行共享），
+              未指定时使用DAG顶层的 `max_parallel_tasks`，两者都未配置时不限制。
+            - history (Optional[RunHistory]): 运行历史数据库，未指定时使用DAG文件同目录的 `<DAG文件名>.history.db`。
+            - record_history (bool): 是否记录运行历史。
         """
         self.name = name
         self.dag_file = dag_file
+        self.broker = broker
+        self.poll_interval = poll_interval
+        self.output_root = output_root
         self.tasks = {}
-        self.task_results = {}
-        self.task_states = {}
-        # 加载DAG定义
+        self.definition = None
+        self.duration_store = TaskDurationStore.for_dag_file(dag_file)
+        self.history = (history or RunHistory.for_dag_file(dag_file)) if record_history else None
+        # 加载并校验DAG定义
         self._load_dag()
+        self.slots = PrioritySlots(max_parallel_tasks or self.definition.max_parallel_tasks)
         logger.info(f"{self.name} 初始化.")
 
 
@@ -50,11 +78,12 @@ class CoordinatorAgent:
             Message: 执行DAG后的最终输出消息。
         """
         logger.info(f"{self.name} 开始处理消息")
+        # 字典类型的消息内容作为运行参数传给无依赖的任务
+        ctx = self.create_context(message.content if isinstance(message.content, dict) else None)
         try:
             # 根据任务间的依赖关系执行DAG中定义的任务。
-            await self._execute_dag()
-            final_task_id = self._find_final_task()
-            final_output = self.task_results.get(final_task_id, "未生成最终输出。")
+            await self.execute(ctx)
+            final_output = ctx.output("未生成最终输出。")
             return Message(content=final_output, sender=self.name, recipient=message.sender)
         except Exception as e:
             logger.error(f"处理消息时出错: {e}")
@@ -63,152 +92,404 @@ class CoordinatorAgent:
                 sender=self.name,
                 recipient=message.sender
             )
+        finally:
+            ctx.close()
+
+    def create_context(self, params: Optional[Dict[str, Any]] = None, run_id: Optional[str] = None) -> RunContext:
+        """
+        为一次运行创建执行上下文。
+
+        参数：
+            params (Optional[Dict[str, Any]]): 运行参数，作为无依赖任务的输入。
+            run_id (Optional[str]): 运行ID，未指定时自动生成。
+
+        返回：
+            RunContext: 新的执行上下文，使用完毕后需调用 close。
+        """
+        return RunContext(self.definition, params, self.output_root, run_id)
+
+    async def execute(self, ctx: RunContext) -> None:
+        """
+        在给定的执行上下文中运行DAG，运行结束后结果保存在上下文中。
+
+        参数：
+            ctx (RunContext): 执行上下文。
+        """
+        # 运行历史的 SQLite 写入在线程中执行，不阻塞协调器的事件循环
+        if self.history is not None:
+            await asyncio.to_thread(self.history.start_run, ctx.run_id, self.dag_file, ctx.started_at, ctx.params)
+        succeeded = False
+        try:
+            with run_scope(ctx.run_id):
+                await self._execute_dag(ctx)
+            succeeded = all(ctx.states.get(task_id) == 'completed' for task_id in self.definition.order)
+        finally:
+            await self._finish_agents(ctx, succeeded)
+            if self.history is not None:
+                # 因上游失败而未执行的任务记为 skipped
+                skipped = [task_id for task_id in self.definition.order if ctx.states.get(task_id) == 'pending']
+                for task_id in skipped:
+                    await asyncio.to_thread(
+                        self.history.record_task, ctx.run_id, task_id, self.tasks[task_id]['agent'], 'skipped'
+                    )
+                status = 'completed' if ctx.states.get(self.definition.output) == 'completed' else 'failed'
+                await asyncio.to_thread(self.history.finish_run, ctx.run_id, status, time.time())
+
+    async def _finish_agents(self, ctx: RunContext, succeeded: bool) -> None:
+        """
+        运行结束后通知暂存了运行级修改的智能体：全部任务成功时调用其 commit_run(run_id)，否则调用 abort_run(run_id)。
+        例如增量采集的文件清单在下游任务全部成功后才提交，失败的运行不会让下次运行漏掉文档。
+        钩子在线程中执行，失败只记录日志。
+
+        参数：
+            ctx (RunContext): 执行上下文。
+            succeeded (bool): 本次运行的所有任务是否都已完成。
+        """
+        hook = 'commit_run' if succeeded else 'abort_run'
+        for task_id in self.definition.order:
+            task_data = self.tasks[task_id]
+            try:
+                agent_class = registry.get_class(task_data['agent'], task_data.get('module'))
+                if not callable(getattr(agent_class, hook, None)):
+                    continue
+                with self._lease_agent(
+                    task_data['agent'], task_data['name'], self._agent_options(task_data), task_data.get('module')
+                ) as agent:
+                    await asyncio.to_thread(getattr(agent, hook), ctx.run_id)
+            except Exception as e:
+                logger.error(f"任务 {task_id} 的 {hook} 执行失败（运行ID: {ctx.run_id}）: {e}")
 
     def _find_final_task(self) -> Optional[str]:
         """
-        查找DAG中没有依赖项的最终任务。
+        查找DAG的输出任务。输出任务在加载时确定：优先使用顶层 `output` 字段，否则为唯一的汇点任务。
 
         返回：
-            Optional[str]: 最终任务的ID，若未找到则返回None。
+            Optional[str]: 输出任务的ID。
         """
-        all_tasks = set(self.tasks.keys())
-        dependent_tasks = {dep for task in self.tasks.values() for dep in task['dependencies']}
-        final_tasks = all_tasks - dependent_tasks
-        return final_tasks.pop() if final_tasks else None
+        return self.definition.output if self.definition else None
 
-    async def _execute_dag(self) -> None:
+    async def _execute_dag(self, ctx: RunContext) -> None:
         """
         根据任务间的依赖关系执行DAG中定义的任务。
+
+        参数：
+            ctx (RunContext): 执行上下文。
         """
-        logger.info(f"{self.name} 开始执行DAG任务")
+        logger.info(f"{self.name} 开始执行DAG任务，运行ID: {ctx.run_id}")
+        # 按历史耗时计算向上秩（剩余关键路径长度），作为就绪任务获取运行名额的优先级
+        ranks = self.definition.upward_ranks(self.duration_store.estimates())
+        position = {task_id: index for index, task_id in enumerate(self.definition.order)}
         # 初始化待执行任务集合
         pending_tasks = set(self.tasks.keys())
+        running = set()
 
-        while pending_tasks:
-            executable_tasks = self._find_executable_tasks(pending_tasks)
-            if not executable_tasks:
-                logger.warning("没有可执行的任务，可能存在循环依赖或未满足的依赖条件。")
-                break
-
-            tasks = []
+        # 事件驱动调度：任一任务结束后立即检查新的就绪任务，不等待同批次的其他任务
+        while pending_tasks or running:
+            executable_tasks = sorted(self._find_executable_tasks(ctx, pending_tasks), key=lambda t: (-ranks[t], position[t]))
             for task_id in executable_tasks:
-                task_data = self.tasks[task_id]
-                agent = self._create_agent(task_data['agent'], task_data['name'])
-                input_data = self._collect_inputs(task_data['dependencies'])
-                sub_message = Message(content=input_data, sender=self.name, recipient=agent.name)
-                task = asyncio.create_task(self._run_task(task_id, agent, sub_message))
-                tasks.append(task)
+                running.add(asyncio.create_task(self._run_task(ctx, task_id, self.tasks[task_id], ranks[task_id])))
                 pending_tasks.remove(task_id)
-                self.task_states[task_id] = 'running'
+                ctx.set_state(task_id, 'ready')
 
-            await asyncio.gather(*tasks)
+            if not running:
+                logger.warning(f"没有可执行的任务，以下任务的上游任务未成功完成: {', '.join(sorted(pending_tasks))}")
+                break
+            _, running = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
 
-    async def _run_task(self, task_id: str, agent, message: Message) -> None:
+        self.duration_store.save()
+
+    async def _run_task(self, ctx: RunContext, task_id: str, task_data: Dict[str, Any], priority: float = 0.0) -> None:
         """
-        使用指定代理和消息运行单个任务。
+        在运行名额内运行单个任务，并记录状态、结果和耗时。定义了 foreach 的任务会先扇出为子任务。
+        任务输入在获得运行名额后才准备，避免排队期间占用上游结果的内存。
 
         参数：
+        - ctx (RunContext): 执行上下文。
         - task_id (str): 要运行的任务ID。
-        - agent (Agent): 负责处理任务的代理程序。
-        - message (Message): 包含输入数据的消息对象。
+        - task_data (Dict[str, Any]): 任务定义。
+        - priority (float): 获取运行名额的优先级（向上秩）。
+        """
+        ready_at = time.time()
+        async with self.slots.slot(priority):
+            started_at = time.time()
+            ctx.set_state(task_id, 'running')
+            # 统计任务内（包括其并发子任务和线程中）的大模型调用次数
+            with track_llm_calls() as llm_calls:
+                input_bytes, output_bytes, error = await self._run_task_in_slot(ctx, task_id, task_data)
+        if self.history is not None:
+            await asyncio.to_thread(
+                self.history.record_task,
+                ctx.run_id, task_id, task_data['agent'], ctx.states[task_id], ready_at, started_at, time.time(),
+                input_bytes, output_bytes, llm_calls.count, error
+            )
+
+    async def _run_task_in_slot(self, ctx: RunContext, task_id: str,
+                                task_data: Dict[str, Any]) -> Tuple[Optional[int], Optional[int], Optional[str]]:
         """
-        logger.info(f"运行任务 {task_id} 使用代理 {agent.name}")
+        执行已获得运行名额的任务。
+
+        返回：
+            Tuple[Optional[int], Optional[int], Optional[str]]: 输入大小、输出大小（字节，未记录运行历史时为 None）和错误信息。
+        """
+        started_at = time.perf_counter()
+        input_bytes = output_bytes = error = None
         try:
-            result_message = await agent.process(message)
-            self.task_results[task_id] = result_message.content
-            self.task_states[task_id] = 'completed'
-            logger.info(f"任务 {task_id} 完成，结果: {result_message.content}")
+            input_data = self._prepare_inputs(ctx, task_data)
+            if self.history is not None:
+                input_bytes = payload_size(input_data)
+            if task_data.get('foreach'):
+                result = await self._run_foreach_task(ctx, task_id, task_data, input_data)
+            else:
+                result = await self._execute_agent(ctx, task_id, task_data, input_data)
+            ctx.results.put(task_id, result)
+            ctx.set_state(task_id, 'completed')
+            self.duration_store.record(task_id, time.perf_counter() - started_at)
+            if self.history is not None:
+                output_bytes = payload_size(result)
+            logger.info(f"任务 {task_id} 完成，结果: {result}")
         except Exception as e:
-            self.task_states[task_id] = 'failed'
+            ctx.set_state(task_id, 'failed')
+            error = str(e)
             logger.error(f"任务 {task_id} 执行失败: {e}")
+        finally:
+            self._release_inputs(ctx, task_data['dependencies'])
+        return input_bytes, output_bytes, error
 
+    def _release_inputs(self, ctx: RunContext, dependencies: List[str]) -> None:
+        """
+        任务结束后减少其上游结果的待消费计数，所有下游任务都结束的结果从结果存储中释放。
 
-    def _create_agent(self, agent_class_name: str, agent_name: str):
+        参数：
+            ctx (RunContext): 执行上下文。
+            dependencies (List[str]): 已结束任务的依赖列表。
         """
-        动态根据代理类名创建智能体实例。
+        for dep in dependencies:
+            ctx.pending_consumers[dep] -= 1
+            if ctx.pending_consumers[dep] == 0 and dep != self._find_final_task():
+                ctx.results.release(dep)
+                logger.info(f"任务 {dep} 的结果已无下游任务使用，已释放")
+
+    async def _execute_agent(self, ctx: RunContext, task_id: str, task_data: Dict[str, Any], input_data: Any) -> Any:
+        """
+        调用智能体处理输入：本地模式下直接调用，工作进程模式下发布到任务代理并等待结果。
+
+        参数：
+        - ctx (RunContext): 执行上下文。
+        - task_id (str): 任务（或子任务）ID。
+        - task_data (Dict[str, Any]): 任务定义。
+        - input_data (Any): 输入数据。
+
+        返回：
+            Any: 智能体输出的消息内容。
+        """
+        if self.broker is not None:
+            return await self._run_remote_task(ctx, task_id, task_data, input_data)
+
+        with self._lease_agent(
+            task_data['agent'], task_data['name'], self._agent_options(task_data), task_data.get('module')
+        ) as agent:
+            logger.info(f"运行任务 {task_id} 使用代理 {agent.name}")
+            message = Message(content=input_data, sender=self.name, recipient=agent.name)
+            return (await agent.process(message)).content
+
+    async def _run_foreach_task(self, ctx: RunContext, task_id: str, task_data: Dict[str, Any], input_data: Any) -> Any:
+        """
+        按 foreach 路径把任务扇出为每个元素一个子任务（ID 形如 task2[0]），
+        子任务各自调度、记录状态并按 `retries` 重试，最后按 gather 方式归并结果。
+
+        参数：
+        - ctx (RunContext): 执行上下文。
+        - task_id (str): 任务ID。
+        - task_data (Dict[str, Any]): 任务定义。
+        - input_data (Any): 从上游任务收集的输入数据。
+
+        返回：
+            Any: 归并后的任务结果。
+
+        异常：
+            RuntimeError: 所有子任务都失败时抛出。
+        """
+        dependencies = task_data['dependencies']
+        items = resolve_items(input_data, dependencies, task_data['foreach'])
+        retries = int(task_data.get('retries', 0))
+        logger.info(f"任务 {task_id} 按 {task_data['foreach']} 扇出为 {len(items)} 个子任务")
+
+        async def run_item(index: int) -> Any:
+            sub_task_id = f"{task_id}[{index}]"
+            sub_input = replace_items(input_data, dependencies, task_data['foreach'], [items[index]])
+            for attempt in range(retries + 1):
+                ctx.set_state(sub_task_id, 'running')
+                try:
+                    result = await self._execute_agent(ctx, sub_task_id, task_data, sub_input)
+                    ctx.set_state(sub_task_id, 'completed')
+                    return result
+                except Exception as e:
+                    ctx.set_state(sub_task_id, 'failed')
+                    logger.warning(f"子任务 {sub_task_id} 第 {attempt + 1} 次执行失败: {e}")
+                    if attempt == retries:
+                        raise
+
+        for index in range(len(items)):
+            ctx.set_state(f"{task_id}[{index}]", 'pending')
+        results = await gather_with_concurrency(
+            range(len(items)), run_item, task_data.get('concurrency') or DEFAULT_CONCURRENCY
+        )
+
+        outputs = [result for result in results if not isinstance(result, Exception)]
+        if items and not outputs:
+            raise RuntimeError(f"任务 {task_id} 的所有子任务均执行失败")
+        if len(outputs) < len(items):
+            logger.warning(f"任务 {task_id} 有 {len(items) - len(outputs)} 个子任务失败，已从结果中剔除")
+        return gather_results(outputs, task_data.get('gather', 'concat'))
+
+    async def _run_remote_task(self, ctx: RunContext, task_id: str, task_data: Dict[str, Any], input_data: Any) -> Any:
+        """
+        将任务发布到任务代理，轮询直到工作进程回传结果。
+        轮询期间同时负责把心跳超时的任务重新分配给其他工作进程。
+
+        参数：
+        - ctx (RunContext): 执行上下文。
+        - task_id (str): 任务ID。
+        - task_data (Dict[str, Any]): 任务定义。
+        - input_data (Any): 任务输入数据。
+
+        返回：
+            Any: 工作进程回传的任务结果。
+
+        异常：
+            RuntimeError: 任务执行失败或重试次数耗尽时抛出。
+        """
+        job_id = await asyncio.to_thread(
+            self.broker.publish,
+            ctx.run_id, task_id, task_data['agent'], task_data['name'], input_data,
+            self._agent_options(task_data), task_data.get('module'), int(task_data.get('max_attempts', 3))
+        )
+        logger.info(f"任务 {task_id} 已发布，等待工作进程执行")
+        try:
+            while True:
+                await asyncio.sleep(self.poll_interval)
+                await asyncio.to_thread(self.broker.requeue_stale)
+                job = await asyncio.to_thread(self.broker.get, job_id)
+                if job is None:
+                    raise RuntimeError(f"任务代理中不存在任务 {job_id}")
+                if job['status'] == COMPLETED:
+                    return job['result']
+                if job['status'] == FAILED:
+                    raise RuntimeError(job['error'] or "工作进程执行失败")
+        finally:
+            # 取得结果或放弃等待（运行被取消）后删除任务记录，未执行的任务不会再被领取
+            await asyncio.shield(asyncio.to_thread(self.broker.delete, job_id))
+
+    def _agent_options(self, task_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        从任务定义中提取传递给智能体构造函数的可选参数。
+
+        参数：
+            task_data (Dict[str, Any]): DAG中的任务定义。
+
+        返回：
+            Dict[str, Any]: 智能体构造参数：任务 `options` 字段中的参数，以及 concurrency（阶段内并发上限）。
+        """
+        options = dict(task_data.get('options') or {})
+        if task_data.get('concurrency') is not None:
+            options['concurrency'] = int(task_data['concurrency'])
+        return options
+
+    def _lease_agent(self, agent_class_name: str, agent_name: str, options: Optional[Dict[str, Any]] = None,
+                     module_path: Optional[str] = None) -> ContextManager[Any]:
+        """
+        从智能体注册表的实例池借出智能体实例，with 块结束后归还。
+        智能体模块在首次被DAG引用时才导入；实例在任务之间复用，但同一时间只被一个任务使用。
 
         参数：
             agent_class_name (str): 智能体类的名称。
             agent_name (str): 智能体实例的名称。
+            options (Optional[Dict[str, Any]]): 传递给智能体构造函数的可选参数。
+            module_path (Optional[str]): 智能体所在模块，未注册的自定义智能体可在任务中通过 `module` 字段指定。
 
         返回值：
-            Agent: 指定智能体类的实例对象。
+            ContextManager[Any]: 借出指定智能体类实例的上下文管理器。
         """
-        agent_module_map = {
-            'CollectAgent': 'collect',
-            'PreprocessAgent': 'preprocess',
-            'ExtractAgent': 'extract',
-            'CompileAgent': 'compile',
-            'SummarizeAgent': 'summarize',
-        }
+        return registry.lease(agent_class_name, agent_name, options, module_path)
 
-        module_name = agent_module_map.get(agent_class_name)
-        if not module_name:
-            raise ImportError(f"未找到智能体类“{agent_class_name}”对应的模块")
+    def _prepare_inputs(self, ctx: RunContext, task_data: Dict[str, Any]) -> Any:
+        """
+        准备任务输入。声明了 join 的任务会收到按键对齐后的记录 {"joined": [...]}，
+        否则按依赖关系收集上游结果。
 
-        try:
-            # 加载指定模块并获取智能体类
-            module = importlib.import_module(f'dag_orchestration.agents.{module_name}')
-            agent_class = getattr(module, agent_class_name)
-            return agent_class(name=agent_name)
-        except (ModuleNotFoundError, AttributeError) as e:
-            raise ImportError(f"无法从模块“{module_name}”创建代理“{agent_class_name}”：{e}")
+        参数:
+            ctx (RunContext): 执行上下文。
+            task_data (Dict[str, Any]): 任务定义。
 
-    def _collect_inputs(self, dependencies: list) -> Dict[str, Any]:
+        返回:
+            Any: 任务的输入数据。
+        """
+        if task_data.get('join'):
+            results = {dep: ctx.results[dep] for dep in task_data['dependencies']}
+            return {"joined": list(hash_join(task_data['join'], results))}
+        return self._collect_inputs(ctx, task_data['dependencies'])
+
+    def _collect_inputs(self, ctx: RunContext, dependencies: list) -> Dict[str, Any]:
         """
         根据任务依赖关系收集输入数据。
 
         参数:
+            ctx (RunContext): 执行上下文。
             dependencies (list): 依赖任务ID的列表。
 
         返回:
-            Dict[str, Any]: 为任务收集的输入数据。
+            Dict[str, Any]: 为任务收集的输入数据，无依赖的任务收到本次运行的参数。
         """
         if not dependencies:
-            return {}
+            return dict(ctx.params)
         elif len(dependencies) == 1:
             dep = dependencies[0]
-            return self.task_results[dep]
+            return ctx.results[dep]
         else:
-            return {dep: self.task_results[dep] for dep in dependencies}
+            return {dep: ctx.results[dep] for dep in dependencies}
 
-    def _find_executable_tasks(self, pending_tasks: set) -> List[str]:
+    def _find_executable_tasks(self, ctx: RunContext, pending_tasks: set) -> List[str]:
         """
         查找可根据其依赖关系执行的任务。
 
         参数：
+            ctx (RunContext): 执行上下文。
             pending_tasks (set)：待执行的任务集合。
 
         返回：
             List[str]：可执行的任务ID列表。
         """
-        return [task_id for task_id in pending_tasks if self._can_execute(task_id)]
+        return [task_id for task_id in pending_tasks if self._can_execute(ctx, task_id)]
 
 
-    def _can_execute(self, task_id: str) -> bool:
+    def _can_execute(self, ctx: RunContext, task_id: str) -> bool:
         """
         检查任务是否可根据其依赖项执行。
 
         参数：
+            ctx (RunContext): 执行上下文。
             task_id (str): 待检查任务的ID。
 
         返回：
             bool: 若所有依赖条件均满足则返回True，否则返回False。
         """
         dependencies = self.tasks[task_id]['dependencies']
-        return all(dep in self.task_results for dep in dependencies)
+        return all(ctx.states.get(dep) == 'completed' for dep in dependencies)
 
     def _load_dag(self) -> None:
         """
-        从指定的YAML文件加载DAG定义。
+        从指定的YAML文件加载DAG定义，校验依赖引用、循环依赖和输出任务，
+        并根据历史耗时输出预计总耗时与关键路径。
+
+        异常：
+            DagValidationError: DAG 定义不合法时抛出。
         """
-        with open(self.dag_file, 'r') as file:
-            dag_data = yaml.safe_load(file)
-            for task_data in dag_data.get('tasks', []):
-                task_id = task_data['id']
-                self.tasks[task_id] = task_data
-                self.task_states[task_id] = 'pending'
-                logger.info(f"任务 {task_id} 已加载: {task_data['description']}")
+        self.definition = load_dag(self.dag_file)
+        for task_id in self.definition.order:
+            task_data = self.definition.tasks[task_id]
+            self.tasks[task_id] = task_data
+            logger.info(f"任务 {task_id} 已加载: {task_data['description']}")
+        logger.info(f"{self.name} DAG执行计划:\n{describe_plan(self.definition, self.duration_store.estimates())}")
 
 
 if __name__ == '__main__':
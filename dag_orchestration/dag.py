@@ -0,0 +1,401 @@
+#!/usr/bin/env python
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @Author  : justin.郑
+# @mail    : 3907721@qq.com
+# @Time    : 2026/10/19 13:30
+# @File    : dag
+# @desc    : DAG 定义的编译、校验与关键路径估算
+
+
+import os
+import sys
+import json
+import yaml
+import statistics
+from collections import deque
+from types import MappingProxyType
+from utils.logger import logger
+from dag_orchestration.fanout import parse_foreach, GATHER_REDUCERS
+from dag_orchestration.join import validate_join_spec
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+
+# 没有历史耗时记录时，每个任务按该耗时（秒）估算
+DEFAULT_TASK_DURATION = 1.0
+# 每个任务保留的历史耗时样本数量
+MAX_DURATION_SAMPLES = 20
+
+
+class DagValidationError(ValueError):
+    """
+    DAG 定义不合法时抛出的异常。
+    """
+
+
+class DagDefinition:
+    """
+    经过校验的 DAG 定义。编译后只读，可以在多次（包括并发的）运行之间共享。
+
+    属性：
+        tasks (Mapping[str, Dict[str, Any]]): 按定义顺序排列的任务定义（只读映射）。
+        order (Tuple[str, ...]): 任务的拓扑排序。
+        output (str): 产出最终结果的任务ID。
+        results (Optional[Dict[str, Any]]): 顶层 `results` 字段中的结果存储配置，未配置时为 None。
+        max_parallel_tasks (Optional[int]): 顶层 `max_parallel_tasks` 字段，同时运行的任务数量上限，未配置时不限制。
+    """
+    def __init__(self, tasks: Dict[str, Dict[str, Any]], order: List[str], output: str,
+                 results: Optional[Dict[str, Any]] = None, max_parallel_tasks: Optional[int] = None) -> None:
+        self.tasks: Mapping[str, Dict[str, Any]] = MappingProxyType(tasks)
+        self.order: Tuple[str, ...] = tuple(order)
+        self.output = output
+        self.results = results
+        self.max_parallel_tasks = max_parallel_tasks
+
+    def successors(self) -> Dict[str, List[str]]:
+        """
+        返回每个任务的直接下游任务。
+
+        返回：
+            Dict[str, List[str]]: 任务ID到下游任务ID列表的映射。
+        """
+        successors = {task_id: [] for task_id in self.tasks}
+        for task_id in self.order:
+            for dep in self.tasks[task_id]['dependencies']:
+                successors[dep].append(task_id)
+        return successors
+
+    def critical_path(self, durations: Optional[Dict[str, float]] = None) -> Tuple[float, List[str]]:
+        """
+        按任务耗时计算关键路径（从任一源任务到输出任务的最长路径）。
+
+        参数：
+            durations (Optional[Dict[str, float]]): 各任务的估计耗时（秒），缺失的任务按默认耗时计算。
+
+        返回：
+            Tuple[float, List[str]]: 预计总耗时（makespan）与关键路径上的任务ID列表。
+        """
+        durations = durations or {}
+        finish: Dict[str, float] = {}
+        previous: Dict[str, Optional[str]] = {}
+        for task_id in self.order:
+            dependencies = self.tasks[task_id]['dependencies']
+            start, parent = 0.0, None
+            for dep in dependencies:
+                if finish[dep] > start:
+                    start, parent = finish[dep], dep
+            finish[task_id] = start + durations.get(task_id, DEFAULT_TASK_DURATION)
+            previous[task_id] = parent
+
+        path = []
+        node: Optional[str] = self.output
+        while node is not None:
+            path.append(node)
+            node = previous[node]
+        path.reverse()
+        return finish[self.output], path
+
+    def upward_ranks(self, durations: Optional[Dict[str, float]] = None) -> Dict[str, float]:
+        """
+        计算每个任务的向上秩（upward rank）：任务自身耗时加上其后继任务中最大的向上秩，
+        即从该任务开始到DAG结束的剩余关键路径长度。就绪任务按向上秩从大到小调度，长链优先启动。
+
+        参数：
+            durations (Optional[Dict[str, float]]): 各任务的估计耗时（秒），缺失的任务按默认耗时计算。
+
+        返回：
+            Dict[str, float]: 任务ID到向上秩的映射。
+        """
+        durations = durations or {}
+        successors = self.successors()
+        ranks: Dict[str, float] = {}
+        for task_id in reversed(self.order):
+            ranks[task_id] = durations.get(task_id, DEFAULT_TASK_DURATION) + max(
+                (ranks[successor] for successor in successors[task_id]), default=0.0
+            )
+        return ranks
+
+
+def compile_dag(dag_data: Any) -> DagDefinition:
+    """
+    校验 DAG 定义并生成 DagDefinition。
+
+    校验内容包括：任务字段完整、任务ID唯一、依赖引用存在、无循环依赖，
+    以及输出任务唯一（通过顶层 `output` 字段指定，未指定时要求只有一个汇点任务）。
+
+    参数：
+        dag_data (Any): 从YAML加载的DAG数据。
+
+    返回：
+        DagDefinition: 校验后的DAG定义。
+
+    异常：
+        DagValidationError: DAG 定义不合法时抛出。
+    """
+    if not isinstance(dag_data, dict) or not isinstance(dag_data.get('tasks'), list) or not dag_data['tasks']:
+        raise DagValidationError("DAG定义必须包含非空的 tasks 列表")
+
+    tasks: Dict[str, Dict[str, Any]] = {}
+    for index, task_data in enumerate(dag_data['tasks']):
+        if not isinstance(task_data, dict):
+            raise DagValidationError(f"第 {index + 1} 个任务定义不是映射类型")
+        missing = [field for field in ('id', 'name', 'agent') if not task_data.get(field)]
+        if missing:
+            raise DagValidationError(f"第 {index + 1} 个任务缺少字段: {', '.join(missing)}")
+        task_id = str(task_data['id'])
+        if task_id in tasks:
+            raise DagValidationError(f"任务ID重复: {task_id}")
+
+        if task_data.get('options') is not None and not isinstance(task_data['options'], dict):
+            raise DagValidationError(f"任务 {task_id} 的 options 必须是映射类型")
+
+        dependencies = task_data.get('dependencies') or []
+        if not isinstance(dependencies, list):
+            raise DagValidationError(f"任务 {task_id} 的 dependencies 必须是列表")
+        task = dict(task_data)
+        task['id'] = task_id
+        task['dependencies'] = [str(dep) for dep in dependencies]
+        task.setdefault('description', '')
+        tasks[task_id] = task
+
+    for task_id, task in tasks.items():
+        for dep in task['dependencies']:
+            if dep == task_id:
+                raise DagValidationError(f"任务 {task_id} 不能依赖自身")
+            if dep not in tasks:
+                raise DagValidationError(f"任务 {task_id} 依赖了不存在的任务 {dep}")
+        if len(set(task['dependencies'])) != len(task['dependencies']):
+            raise DagValidationError(f"任务 {task_id} 存在重复的依赖项")
+        _validate_fanout(task)
+        if task.get('join') is not None:
+            if task.get('foreach') is not None:
+                raise DagValidationError(f"任务 {task_id} 不能同时使用 join 和 foreach")
+            try:
+                validate_join_spec(task_id, task['join'], task['dependencies'])
+            except ValueError as e:
+                raise DagValidationError(str(e))
+
+    results = dag_data.get('results')
+    if results is not None and not isinstance(results, dict):
+        raise DagValidationError("顶层 results 必须是映射类型")
+    max_parallel_tasks = dag_data.get('max_parallel_tasks')
+    if max_parallel_tasks is not None and (
+            isinstance(max_parallel_tasks, bool) or not isinstance(max_parallel_tasks, int) or max_parallel_tasks < 1):
+        raise DagValidationError("顶层 max_parallel_tasks 必须是正整数")
+
+    order = _topological_sort(tasks)
+    output = _resolve_output(tasks, dag_data.get('output'))
+    return DagDefinition(
+        tasks=tasks, order=order, output=output, results=results, max_parallel_tasks=max_parallel_tasks
+    )
+
+
+def load_dag(dag_file: str) -> DagDefinition:
+    """
+    从YAML文件加载并编译DAG定义。
+
+    参数：
+        dag_file (str): DAG的YAML文件路径。
+
+    返回：
+        DagDefinition: 校验后的DAG定义。
+    """
+    with open(dag_file, 'r', encoding='utf-8') as file:
+        dag_data = yaml.safe_load(file)
+    try:
+        return compile_dag(dag_data)
+    except DagValidationError as e:
+        raise DagValidationError(f"DAG文件 {dag_file} 校验失败: {e}") from e
+
+
+def _validate_fanout(task: Dict[str, Any]) -> None:
+    """
+    校验任务的 foreach / gather 配置。
+
+    参数：
+        task (Dict[str, Any]): 任务定义。
+
+    异常：
+        DagValidationError: 配置不合法时抛出。
+    """
+    task_id = task['id']
+    foreach = task.get('foreach')
+    gather = task.get('gather')
+    if foreach is None:
+        if gather is not None:
+            raise DagValidationError(f"任务 {task_id} 的 gather 只能与 foreach 一起使用")
+        return
+
+    try:
+        dep_id, _ = parse_foreach(foreach)
+    except ValueError as e:
+        raise DagValidationError(f"任务 {task_id}：{e}")
+    if dep_id not in task['dependencies']:
+        raise DagValidationError(f"任务 {task_id} 的 foreach 引用了非依赖任务 {dep_id}")
+    if gather is not None and gather not in GATHER_REDUCERS and ':' not in str(gather):
+        raise DagValidationError(
+            f"任务 {task_id} 的 gather “{gather}”无效，应为 {', '.join(GATHER_REDUCERS)} 或 <模块>:<函数>"
+        )
+
+
+def _topological_sort(tasks: Dict[str, Dict[str, Any]]) -> List[str]:
+    """
+    使用Kahn算法对任务进行拓扑排序，同层任务保持定义顺序。
+
+    参数：
+        tasks (Dict[str, Dict[str, Any]]): 任务定义。
+
+    返回：
+        List[str]: 拓扑排序后的任务ID列表。
+
+    异常：
+        DagValidationError: 存在循环依赖时抛出。
+    """
+    in_degree = {task_id: len(task['dependencies']) for task_id, task in tasks.items()}
+    successors: Dict[str, List[str]] = {task_id: [] for task_id in tasks}
+    for task_id, task in tasks.items():
+        for dep in task['dependencies']:
+            successors[dep].append(task_id)
+
+    queue = deque(task_id for task_id, degree in in_degree.items() if degree == 0)
+    order = []
+    while queue:
+        task_id = queue.popleft()
+        order.append(task_id)
+        for successor in successors[task_id]:
+            in_degree[successor] -= 1
+            if in_degree[successor] == 0:
+                queue.append(successor)
+
+    if len(order) != len(tasks):
+        cyclic = [task_id for task_id, degree in in_degree.items() if degree > 0]
+        raise DagValidationError(f"检测到循环依赖，涉及任务: {', '.join(cyclic)}")
+    return order
+
+
+def _resolve_output(tasks: Dict[str, Dict[str, Any]], output: Optional[str]) -> str:
+    """
+    确定产出最终结果的任务。
+
+    参数：
+        tasks (Dict[str, Dict[str, Any]]): 任务定义。
+        output (Optional[str]): 顶层 `output` 字段指定的任务ID。
+
+    返回：
+        str: 输出任务ID。
+
+    异常：
+        DagValidationError: 指定的输出任务不存在，或未指定且汇点任务不唯一时抛出。
+    """
+    if output is not None:
+        output = str(output)
+        if output not in tasks:
+            raise DagValidationError(f"输出任务 {output} 不存在")
+        return output
+
+    dependent_tasks = {dep for task in tasks.values() for dep in task['dependencies']}
+    sinks = [task_id for task_id in tasks if task_id not in dependent_tasks]
+    if len(sinks) != 1:
+        raise DagValidationError(f"DAG存在多个汇点任务（{', '.join(sinks)}），请通过顶层 output 字段指定输出任务")
+    return sinks[0]
+
+
+class TaskDurationStore:
+    """
+    记录各任务历史耗时的JSON文件存储，用于估算关键路径。
+    """
+    def __init__(self, path: str) -> None:
+        """
+        参数：
+            path (str): 耗时记录文件路径。
+        """
+        self.path = path
+        self._samples: Dict[str, List[float]] = self._load()
+
+    @classmethod
+    def for_dag_file(cls, dag_file: str) -> 'TaskDurationStore':
+        """
+        创建与DAG文件同目录的耗时记录，例如 data/dag.yml 对应 data/dag.durations.json。
+        """
+        return cls(f"{os.path.splitext(dag_file)[0]}.durations.json")
+
+    def estimates(self) -> Dict[str, float]:
+        """
+        返回各任务的估计耗时（历史样本的中位数）。
+
+        返回：
+            Dict[str, float]: 任务ID到估计耗时（秒）的映射。
+        """
+        return {task_id: statistics.median(samples) for task_id, samples in self._samples.items() if samples}
+
+    def record(self, task_id: str, duration: float) -> None:
+        """
+        记录一次任务耗时。
+
+        参数：
+            task_id (str): 任务ID。
+            duration (float): 本次耗时（秒）。
+        """
+        samples = self._samples.setdefault(task_id, [])
+        samples.append(round(duration, 3))
+        del samples[:-MAX_DURATION_SAMPLES]
+
+    def save(self) -> None:
+        """
+        将耗时记录写回文件。
+        """
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, 'w', encoding='utf-8') as file:
+                json.dump(self._samples, file, ensure_ascii=False, indent=2)
+        except Exception as e:
+            logger.warning(f"保存任务耗时记录失败: {e}")
+
+    def _load(self) -> Dict[str, List[float]]:
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as file:
+                data = json.load(file)
+            return {str(task_id): [float(d) for d in samples] for task_id, samples in data.items()}
+        except Exception as e:
+            logger.warning(f"读取任务耗时记录 {self.path} 失败，将忽略历史耗时: {e}")
+            return {}
+
+
+def describe_plan(definition: DagDefinition, durations: Dict[str, float]) -> str:
+    """
+    生成执行计划说明：拓扑顺序、预计总耗时、关键路径和调度优先级。
+
+    参数：
+        definition (DagDefinition): DAG定义。
+        durations (Dict[str, float]): 各任务的估计耗时。
+
+    返回：
+        str: 执行计划说明文本。
+    """
+    makespan, path = definition.critical_path(durations)
+    missing = [task_id for task_id in definition.order if task_id not in durations]
+    lines = [
+        f"拓扑顺序: {' -> '.join(definition.order)}",
+        f"输出任务: {definition.output}",
+        f"预计总耗时: {makespan:.2f} 秒",
+        "关键路径: " + ' -> '.join(
+            f"{task_id}({durations.get(task_id, DEFAULT_TASK_DURATION):.2f}s)" for task_id in path
+        ),
+    ]
+    ranks = definition.upward_ranks(durations)
+    lines.append("调度优先级（剩余关键路径）: " + ', '.join(
+        f"{task_id}({ranks[task_id]:.2f}s)" for task_id in sorted(definition.order, key=lambda t: -ranks[t])
+    ))
+    if missing:
+        lines.append(f"以下任务无历史耗时，按 {DEFAULT_TASK_DURATION:.2f} 秒估算: {', '.join(missing)}")
+    return "\n".join(lines)
+
+
+if __name__ == '__main__':
+    dag_file = sys.argv[1] if len(sys.argv) > 1 else "data/dag.yml"
+    dag_definition = load_dag(dag_file)
+    print(describe_plan(dag_definition, TaskDurationStore.for_dag_file(dag_file).estimates()))
@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @Author  : justin.郑
+# @mail    : 3907721@qq.com
+# @Time    : 2026/10/19 16:10
+# @File    : fanout
+# @desc    : DAG 中 foreach 扇出与 gather 归并的辅助函数
+
+
+import importlib
+from typing import Any, Callable, Dict, List, Tuple
+
+
+# 内置的归并方式
+GATHER_REDUCERS = ('concat', 'list')
+
+
+def parse_foreach(path: str) -> Tuple[str, List[str]]:
+    """
+    解析 foreach 路径，例如 `task1.docs` 解析为 ('task1', ['docs'])。
+
+    参数：
+        path (str): foreach 路径，第一段为上游任务ID，其余为结果中的键。
+
+    返回：
+        Tuple[str, List[str]]: 上游任务ID与键路径。
+
+    异常：
+        ValueError: 路径格式不正确时抛出。
+    """
+    parts = [part for part in str(path).split('.') if part]
+    if len(parts) < 2:
+        raise ValueError(f"foreach 路径“{path}”格式不正确，应为 <上游任务ID>.<列表字段>")
+    return parts[0], parts[1:]
+
+
+def resolve_items(inputs: Any, dependencies: List[str], path: str) -> List[Any]:
+    """
+    从任务输入中取出 foreach 路径指向的列表。
+
+    参数：
+        inputs (Any): 协调器为任务收集的输入数据。
+        dependencies (List[str]): 任务的依赖列表。
+        path (str): foreach 路径。
+
+    返回：
+        List[Any]: 待扇出的元素列表。
+
+    异常：
+        ValueError: 路径不存在或指向的值不是列表时抛出。
+    """
+    dep_id, keys = parse_foreach(path)
+    value = _dependency_result(inputs, dependencies, dep_id)
+    for key in keys:
+        if not isinstance(value, dict) or key not in value:
+            raise ValueError(f"上游任务结果中不存在 foreach 路径“{path}”")
+        value = value[key]
+    if not isinstance(value, list):
+        raise ValueError(f"foreach 路径“{path}”指向的值不是列表")
+    return value
+
+
+def replace_items(inputs: Any, dependencies: List[str], path: str, items: List[Any]) -> Any:
+    """
+    生成子任务输入：把 foreach 路径指向的列表替换为指定元素，其他内容保持不变（浅拷贝）。
+
+    参数：
+        inputs (Any): 协调器为任务收集的输入数据。
+        dependencies (List[str]): 任务的依赖列表。
+        path (str): foreach 路径。
+        items (List[Any]): 子任务要处理的元素。
+
+    返回：
+        Any: 子任务的输入数据，结构与原输入一致，智能体无需感知扇出。
+    """
+    dep_id, keys = parse_foreach(path)
+
+    def _replace(container: Dict[str, Any], remaining: List[str]) -> Dict[str, Any]:
+        copied = dict(container)
+        if len(remaining) == 1:
+            copied[remaining[0]] = items
+        else:
+            copied[remaining[0]] = _replace(container[remaining[0]], remaining[1:])
+        return copied
+
+    if len(dependencies) == 1:
+        return _replace(inputs, keys)
+    replaced = dict(inputs)
+    replaced[dep_id] = _replace(inputs[dep_id], keys)
+    return replaced
+
+
+def gather_results(outputs: List[Any], reducer: str = 'concat') -> Any:
+    """
+    归并子任务输出。
+
+    参数：
+        outputs (List[Any]): 按元素顺序排列的子任务输出（已剔除失败的子任务）。
+        reducer (str): 归并方式：
+            - concat（默认）：字典输出按键合并，列表值依次拼接，其他值取第一个子任务的值；
+              列表输出依次拼接；字符串输出以空行连接；
+            - list：直接返回子任务输出列表；
+            - <模块>:<函数>：自定义归并函数，接收子任务输出列表并返回任务结果。
+
+    返回：
+        Any: 任务的最终结果。
+    """
+    if reducer == 'list':
+        return list(outputs)
+    if reducer != 'concat':
+        return load_reducer(reducer)(outputs)
+
+    if not outputs:
+        return {}
+    if all(isinstance(output, dict) for output in outputs):
+        merged: Dict[str, Any] = {}
+        for output in outputs:
+            for key, value in output.items():
+                if key not in merged:
+                    merged[key] = list(value) if isinstance(value, list) else value
+                elif isinstance(merged[key], list) and isinstance(value, list):
+                    merged[key].extend(value)
+        return merged
+    if all(isinstance(output, list) for output in outputs):
+        return [item for output in outputs for item in output]
+    return "\n\n".join(str(output) for output in outputs)
+
+
+def load_reducer(spec: str) -> Callable[[List[Any]], Any]:
+    """
+    按 `<模块>:<函数>` 加载自定义归并函数。
+
+    参数：
+        spec (str): 归并函数路径。
+
+    返回：
+        Callable[[List[Any]], Any]: 归并函数。
+
+    异常：
+        ValueError: 路径格式不正确或函数不存在时抛出。
+    """
+    module_path, _, func_name = str(spec).partition(':')
+    if not module_path or not func_name:
+        raise ValueError(f"gather 归并方式“{spec}”无效，应为 {', '.join(GATHER_REDUCERS)} 或 <模块>:<函数>")
+    try:
+        module = importlib.import_module(module_path)
+        return getattr(module, func_name)
+    except (ImportError, AttributeError) as e:
+        raise ValueError(f"无法加载 gather 归并函数“{spec}”：{e}")
+
+
+def _dependency_result(inputs: Any, dependencies: List[str], dep_id: str) -> Any:
+    """
+    按协调器的输入收集规则取出指定上游任务的结果：单依赖时输入即上游结果，多依赖时按任务ID索引。
+    """
+    if dep_id not in dependencies:
+        raise ValueError(f"foreach 引用的任务 {dep_id} 不是当前任务的依赖")
+    if len(dependencies) == 1:
+        return inputs
+    return inputs[dep_id]
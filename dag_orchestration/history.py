@@ -0,0 +1,335 @@
+#!/usr/bin/env python
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @Author  : justin.郑
+# @mail    : 3907721@qq.com
+# @Time    : 2026/10/19 22:10
+# @File    : history
+# @desc    : DAG 运行历史与任务耗时数据库，以及查询运行历史的命令行工具
+
+
+import os
+import json
+import math
+import time
+import sqlite3
+import argparse
+import threading
+from utils.logger import logger
+from typing import Any, Dict, List, Optional, Sequence
+
+
+# 统计任务耗时默认使用的百分位
+DEFAULT_PERCENTILES = (50, 90, 99)
+
+
+class RunHistory:
+    """
+    记录每次 DAG 运行及其中每个任务的状态、开始/结束时间、排队等待时间、输入/输出大小和大模型调用次数。
+    """
+    def __init__(self, db_path: str) -> None:
+        """
+        参数：
+            db_path (str): 历史数据库路径。
+        """
+        self.db_path = db_path
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # 同一进程的多个并发运行共享连接，写入在线程中执行，读写都加锁
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS runs ("
+            " run_id TEXT PRIMARY KEY, dag_file TEXT NOT NULL, status TEXT NOT NULL, params TEXT,"
+            " started_at REAL NOT NULL, finished_at REAL);"
+            "CREATE TABLE IF NOT EXISTS task_runs ("
+            " run_id TEXT NOT NULL, task_id TEXT NOT NULL, agent TEXT, status TEXT NOT NULL,"
+            " ready_at REAL, started_at REAL, finished_at REAL, queue_wait REAL, duration REAL,"
+            " input_bytes INTEGER, output_bytes INTEGER, llm_calls INTEGER, error TEXT,"
+            " PRIMARY KEY (run_id, task_id));"
+            "CREATE INDEX IF NOT EXISTS idx_runs_dag ON runs (dag_file, started_at);"
+        )
+        self._conn.commit()
+
+    @classmethod
+    def for_dag_file(cls, dag_file: str) -> 'RunHistory':
+        """
+        返回与DAG文件同目录、同名的历史数据库（例如 data/dag.yml 对应 data/dag.history.db）。
+        """
+        return cls(f"{os.path.splitext(dag_file)[0]}.history.db")
+
+    def start_run(self, run_id: str, dag_file: str, started_at: float, params: Optional[Dict[str, Any]] = None) -> None:
+        """
+        记录运行开始。
+        """
+        self._execute(
+            "INSERT OR REPLACE INTO runs (run_id, dag_file, status, params, started_at) VALUES (?, ?, 'running', ?, ?)",
+            (run_id, os.path.abspath(dag_file), json.dumps(params or {}, ensure_ascii=False, default=str), started_at)
+        )
+
+    def finish_run(self, run_id: str, status: str, finished_at: float) -> None:
+        """
+        记录运行结束。
+        """
+        self._execute("UPDATE runs SET status = ?, finished_at = ? WHERE run_id = ?", (status, finished_at, run_id))
+
+    def record_task(self, run_id: str, task_id: str, agent: Optional[str], status: str,
+                    ready_at: Optional[float] = None, started_at: Optional[float] = None,
+                    finished_at: Optional[float] = None, input_bytes: Optional[int] = None,
+                    output_bytes: Optional[int] = None, llm_calls: Optional[int] = None,
+                    error: Optional[str] = None) -> None:
+        """
+        记录单个任务的执行情况。排队等待时间为就绪到获得运行名额的间隔，耗时为开始到结束的间隔。
+        """
+        queue_wait = started_at - ready_at if started_at is not None and ready_at is not None else None
+        duration = finished_at - started_at if finished_at is not None and started_at is not None else None
+        self._execute(
+            "INSERT OR REPLACE INTO task_runs (run_id, task_id, agent, status, ready_at, started_at, finished_at,"
+            " queue_wait, duration, input_bytes, output_bytes, llm_calls, error)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (run_id, task_id, agent, status, ready_at, started_at, finished_at,
+             queue_wait, duration, input_bytes, output_bytes, llm_calls, error)
+        )
+
+    def list_runs(self, limit: int = 20, dag_file: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        按开始时间倒序列出运行，包含总耗时和大模型调用总数。
+        """
+        where, params = ("WHERE r.dag_file = ?", [os.path.abspath(dag_file)]) if dag_file else ("", [])
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT r.run_id, r.dag_file, r.status, r.started_at, r.finished_at,"
+                " r.finished_at - r.started_at AS duration, COALESCE(SUM(t.llm_calls), 0) AS llm_calls,"
+                " COUNT(t.task_id) AS tasks"
+                f" FROM runs r LEFT JOIN task_runs t ON t.run_id = r.run_id {where}"
+                " GROUP BY r.run_id ORDER BY r.started_at DESC LIMIT ?",
+                (*params, limit)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def get_tasks(self, run_id: str) -> List[Dict[str, Any]]:
+        """
+        返回一次运行中各任务的记录，按开始时间排序。
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM task_runs WHERE run_id = ? ORDER BY COALESCE(started_at, ready_at), task_id", (run_id,)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def compare(self, run_a: str, run_b: str) -> List[Dict[str, Any]]:
+        """
+        对比两次运行中同名任务的耗时、排队等待时间和大模型调用次数。
+
+        返回：
+            List[Dict[str, Any]]: 每个任务一行，包含两次运行的数值及耗时差（b - a）。
+        """
+        tasks_a = {task['task_id']: task for task in self.get_tasks(run_a)}
+        tasks_b = {task['task_id']: task for task in self.get_tasks(run_b)}
+        rows = []
+        for task_id in list(tasks_a) + [task_id for task_id in tasks_b if task_id not in tasks_a]:
+            a, b = tasks_a.get(task_id, {}), tasks_b.get(task_id, {})
+            duration_a, duration_b = a.get('duration'), b.get('duration')
+            rows.append({
+                "task_id": task_id,
+                "status_a": a.get('status'), "status_b": b.get('status'),
+                "duration_a": duration_a, "duration_b": duration_b,
+                "delta": duration_b - duration_a if duration_a is not None and duration_b is not None else None,
+                "queue_wait_a": a.get('queue_wait'), "queue_wait_b": b.get('queue_wait'),
+                "llm_calls_a": a.get('llm_calls'), "llm_calls_b": b.get('llm_calls'),
+            })
+        return rows
+
+    def task_percentiles(self, dag_file: Optional[str] = None, last_runs: int = 50,
+                         percentiles: Sequence[int] = DEFAULT_PERCENTILES) -> Dict[str, Dict[str, Any]]:
+        """
+        统计最近若干次运行中每个已完成任务的耗时与排队等待时间百分位。
+
+        参数：
+            dag_file (Optional[str]): 只统计该DAG文件的运行，未指定时统计全部运行。
+            last_runs (int): 统计最近的运行次数。
+            percentiles (Sequence[int]): 需要计算的百分位。
+
+        返回：
+            Dict[str, Dict[str, Any]]: 任务ID到统计结果（样本数、各百分位耗时与排队等待时间、平均调用次数）的映射。
+        """
+        run_ids = [run['run_id'] for run in self.list_runs(last_runs, dag_file)]
+        if not run_ids:
+            return {}
+        placeholders = ','.join('?' * len(run_ids))
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT task_id, duration, queue_wait, llm_calls FROM task_runs"
+                f" WHERE status = 'completed' AND run_id IN ({placeholders})",
+                run_ids
+            ).fetchall()
+
+        samples: Dict[str, Dict[str, List[float]]] = {}
+        for row in rows:
+            task = samples.setdefault(row['task_id'], {"duration": [], "queue_wait": [], "llm_calls": []})
+            for field in ("duration", "queue_wait", "llm_calls"):
+                if row[field] is not None:
+                    task[field].append(row[field])
+
+        stats = {}
+        for task_id, task in sorted(samples.items()):
+            stats[task_id] = {"count": len(task["duration"])}
+            for p in percentiles:
+                stats[task_id][f"p{p}"] = _percentile(task["duration"], p)
+                stats[task_id][f"wait_p{p}"] = _percentile(task["queue_wait"], p)
+            stats[task_id]["llm_calls_avg"] = (
+                sum(task["llm_calls"]) / len(task["llm_calls"]) if task["llm_calls"] else None
+            )
+        return stats
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def _execute(self, sql: str, params: Sequence[Any]) -> None:
+        try:
+            with self._lock:
+                self._conn.execute(sql, params)
+                self._conn.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"写入运行历史 {self.db_path} 失败: {e}")
+
+
+def payload_size(value: Any) -> Optional[int]:
+    """
+    估算任务输入或输出的大小（按 JSON 序列化后的 UTF-8 字节数计），只遍历数据结构而不生成序列化结果，
+    不会为了统计再占用一份与负载同样大的内存。元素很多的列表和很长的字符串按抽样推算，无法估算时返回 None。
+    """
+    try:
+        return _estimate_size(value)
+    except RecursionError:
+        return None
+
+
+# 列表超过该长度时只抽样这么多个元素推算总大小
+_SIZE_SAMPLE_ITEMS = 64
+# 字符串超过该长度时只按前缀推算 UTF-8 字节数
+_SIZE_SAMPLE_CHARS = 4096
+
+
+def _estimate_size(value: Any) -> int:
+    if isinstance(value, str):
+        if value.isascii():
+            return len(value) + 2
+        if len(value) <= _SIZE_SAMPLE_CHARS:
+            return len(value.encode('utf-8')) + 2
+        sample = value[:_SIZE_SAMPLE_CHARS]
+        return int(len(sample.encode('utf-8')) * len(value) / len(sample)) + 2
+    if value is None or isinstance(value, bool):
+        return 4
+    if isinstance(value, (int, float)):
+        return len(repr(value))
+    if isinstance(value, dict):
+        return 2 + sum(_estimate_size(str(key)) + 1 + _estimate_size(item)
+                       for key, item in value.items()) + max(0, len(value) - 1) * 2
+    if isinstance(value, (list, tuple)):
+        count = len(value)
+        if count <= _SIZE_SAMPLE_ITEMS:
+            items = sum(_estimate_size(item) for item in value)
+        else:
+            step = count / _SIZE_SAMPLE_ITEMS
+            sample = [value[int(i * step)] for i in range(_SIZE_SAMPLE_ITEMS)]
+            items = int(sum(_estimate_size(item) for item in sample) * count / _SIZE_SAMPLE_ITEMS)
+        return 2 + items + max(0, count - 1) * 2
+    return _estimate_size(str(value))
+
+
+def _percentile(values: List[float], p: float) -> Optional[float]:
+    """
+    按最近秩法计算百分位，没有样本时返回 None。
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(p / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def _format(value: Any, digits: int = 2) -> str:
+    if value is None:
+        return '-'
+    if isinstance(value, float):
+        return f"{value:.{digits}f}"
+    return str(value)
+
+
+def _format_time(timestamp: Optional[float]) -> str:
+    if timestamp is None:
+        return '-'
+    return time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(timestamp))
+
+
+def _print_table(headers: List[str], rows: List[List[Any]]) -> None:
+    cells = [headers] + [[_format(value) for value in row] for row in rows]
+    widths = [max(len(str(row[i])) for row in cells) for i in range(len(headers))]
+    for row in cells:
+        print("  ".join(str(value).ljust(width) for value, width in zip(row, widths)))
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="DAG运行历史")
+    parser.add_argument('--db', default="data/dag.history.db", help="运行历史数据库路径")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    list_parser = subparsers.add_parser('list', help="列出最近的运行")
+    list_parser.add_argument('--limit', type=int, default=20)
+    list_parser.add_argument('--dag', default=None, help="只列出该DAG文件的运行")
+
+    show_parser = subparsers.add_parser('show', help="查看一次运行中各任务的执行情况")
+    show_parser.add_argument('run_id')
+
+    compare_parser = subparsers.add_parser('compare', help="对比两次运行")
+    compare_parser.add_argument('run_a')
+    compare_parser.add_argument('run_b')
+
+    stats_parser = subparsers.add_parser('stats', help="统计各任务耗时的百分位")
+    stats_parser.add_argument('--dag', default=None, help="只统计该DAG文件的运行")
+    stats_parser.add_argument('--last', type=int, default=50, help="统计最近的运行次数")
+
+    args = parser.parse_args(argv)
+    if not os.path.exists(args.db):
+        parser.error(f"运行历史数据库不存在: {args.db}")
+    history = RunHistory(args.db)
+    try:
+        if args.command == 'list':
+            runs = history.list_runs(args.limit, args.dag)
+            _print_table(
+                ["run_id", "status", "started_at", "duration(s)", "tasks", "llm_calls"],
+                [[run['run_id'], run['status'], _format_time(run['started_at']), run['duration'],
+                  run['tasks'], run['llm_calls']] for run in runs]
+            )
+        elif args.command == 'show':
+            tasks = history.get_tasks(args.run_id)
+            _print_table(
+                ["task_id", "agent", "status", "wait(s)", "duration(s)", "input(B)", "output(B)", "llm_calls", "error"],
+                [[task['task_id'], task['agent'], task['status'], task['queue_wait'], task['duration'],
+                  task['input_bytes'], task['output_bytes'], task['llm_calls'], task['error']] for task in tasks]
+            )
+        elif args.command == 'compare':
+            rows = history.compare(args.run_a, args.run_b)
+            _print_table(
+                ["task_id", "status_a", "status_b", "duration_a", "duration_b", "delta", "llm_a", "llm_b"],
+                [[row['task_id'], row['status_a'], row['status_b'], row['duration_a'], row['duration_b'],
+                  row['delta'], row['llm_calls_a'], row['llm_calls_b']] for row in rows]
+            )
+        elif args.command == 'stats':
+            stats = history.task_percentiles(args.dag, args.last)
+            headers = ["task_id", "count"] + [f"p{p}(s)" for p in DEFAULT_PERCENTILES] \
+                + [f"wait_p{p}(s)" for p in DEFAULT_PERCENTILES] + ["llm_calls_avg"]
+            _print_table(headers, [
+                [task_id, stat['count']] + [stat[f"p{p}"] for p in DEFAULT_PERCENTILES]
+                + [stat[f"wait_p{p}"] for p in DEFAULT_PERCENTILES] + [stat['llm_calls_avg']]
+                for task_id, stat in stats.items()
+            ])
+    finally:
+        history.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,366 @@
+#!/usr/bin/env python
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @Author  : justin.郑
+# @mail    : 3907721@qq.com
+# @Time    : 2026/10/19 17:30
+# @File    : ingest
+# @desc    : 文档语料的增量采集：目录遍历、大文件内存映射读取与文件清单
+
+
+import os
+import mmap
+import time
+import fnmatch
+import hashlib
+import sqlite3
+from contextlib import contextmanager
+from utils.logger import logger
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+
+# 超过该大小（字节）的文件使用内存映射读取
+DEFAULT_MMAP_THRESHOLD = 1024 * 1024
+# 暂存修改的保留时间（秒），超过后视为异常退出的运行遗留的数据
+STAGED_TTL = 7 * 24 * 3600
+
+
+class FileEntry(NamedTuple):
+    """
+    遍历得到的文件及其元数据。
+    """
+    path: str
+    size: int
+    mtime_ns: int
+
+
+class ManifestRecord(NamedTuple):
+    """
+    文件清单中的一条记录。
+    """
+    path: str
+    size: int
+    mtime_ns: int
+    content_hash: str
+    doc_id: str
+    title: Optional[str]
+
+
+def iter_files(root: str, patterns: Iterable[str] = ("*.txt",), recursive: bool = False) -> Iterator[FileEntry]:
+    """
+    以生成器方式遍历目录中匹配模式的文件，每个目录内按文件名排序，不会一次性列出整个语料。
+
+    参数：
+        root (str): 语料根目录。
+        patterns (Iterable[str]): 文件名匹配模式。
+        recursive (bool): 是否递归遍历子目录。
+
+    返回：
+        Iterator[FileEntry]: 文件路径、大小和修改时间。
+    """
+    patterns = list(patterns)
+    try:
+        with os.scandir(root) as iterator:
+            entries = sorted(iterator, key=lambda entry: entry.name)
+    except OSError as e:
+        logger.error(f"无法遍历目录 {root}: {e}")
+        return
+
+    for entry in entries:
+        try:
+            if entry.is_dir(follow_symlinks=False):
+                if recursive and not entry.name.startswith('.'):
+                    yield from iter_files(entry.path, patterns, recursive)
+            elif entry.is_file() and any(fnmatch.fnmatch(entry.name, pattern) for pattern in patterns):
+                stat = entry.stat()
+                yield FileEntry(entry.path, stat.st_size, stat.st_mtime_ns)
+        except OSError as e:
+            logger.warning(f"跳过无法访问的文件 {entry.path}: {e}")
+
+
+@contextmanager
+def open_buffer(path: str, mmap_threshold: int = DEFAULT_MMAP_THRESHOLD) -> Iterator[Union[bytes, mmap.mmap]]:
+    """
+    打开文件内容的只读缓冲区：小文件直接读入内存，超过阈值的大文件返回内存映射，
+    哈希和解码都直接在映射上进行，不会再把整个文件拷贝成 bytes。缓冲区只在 with 块内有效。
+
+    参数：
+        path (str): 文件路径。
+        mmap_threshold (int): 使用内存映射的文件大小阈值（字节）。
+
+    返回：
+        Iterator[Union[bytes, mmap.mmap]]: 文件内容缓冲区。
+    """
+    with open(path, 'rb') as file:
+        size = os.fstat(file.fileno()).st_size
+        if size < max(1, mmap_threshold):
+            yield file.read()
+            return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            yield mapped
+
+
+def read_text(path: str, mmap_threshold: int = DEFAULT_MMAP_THRESHOLD, errors: str = 'strict') -> str:
+    """
+    以 UTF-8 读取文件内容，大文件从内存映射直接解码。
+
+    参数：
+        path (str): 文件路径。
+        mmap_threshold (int): 使用内存映射的文件大小阈值（字节）。
+        errors (str): 解码错误的处理方式。
+
+    返回：
+        str: 文件文本内容。
+    """
+    with open_buffer(path, mmap_threshold) as data:
+        return str(data, 'utf-8', errors)
+
+
+def content_hash(data: Union[bytes, mmap.mmap]) -> str:
+    """
+    计算文件内容的哈希值。
+    """
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+class CorpusManifest:
+    """
+    记录已采集文件（路径、大小、修改时间、内容哈希、文档ID、标题）的 SQLite 清单。
+
+    再次采集时，大小和修改时间都未变化的文件直接跳过，无需读取；
+    元数据变化但内容哈希相同的文件只更新元数据。
+    DAG 运行中的修改先按运行ID暂存（stage），运行成功后提交（commit），失败时丢弃（discard）。
+    """
+    def __init__(self, db_path: str) -> None:
+        """
+        参数：
+            db_path (str): 清单数据库路径。
+        """
+        self.db_path = db_path
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # 采集过程在工作线程中执行，连接不与创建线程绑定（同一时间只有一个使用者）
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS manifest ("
+            " path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL,"
+            " content_hash TEXT NOT NULL, doc_id TEXT NOT NULL, title TEXT, updated_at REAL NOT NULL)"
+        )
+        # 运行中暂存的修改，运行成功后才写入 manifest
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS manifest_staged ("
+            " run_id TEXT NOT NULL, path TEXT NOT NULL, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL,"
+            " content_hash TEXT NOT NULL, doc_id TEXT NOT NULL, title TEXT, removed INTEGER NOT NULL,"
+            " staged_at REAL NOT NULL, PRIMARY KEY (run_id, path))"
+        )
+        # 清理异常退出、既没有提交也没有撤销的运行留下的暂存
+        self._conn.execute("DELETE FROM manifest_staged WHERE staged_at < ?", (time.time() - STAGED_TTL,))
+        self._conn.commit()
+        self._load()
+
+    def _load(self) -> None:
+        """
+        从数据库加载清单记录。新文档ID同时避开已暂存的ID，未提交的运行与之后的运行不会分配到相同的ID。
+        """
+        self._records: Dict[str, ManifestRecord] = {
+            row[0]: ManifestRecord(*row)
+            for row in self._conn.execute("SELECT path, size, mtime_ns, content_hash, doc_id, title FROM manifest")
+        }
+        doc_ids = [record.doc_id for record in self._records.values()]
+        doc_ids.extend(row[0] for row in self._conn.execute("SELECT doc_id FROM manifest_staged WHERE removed = 0"))
+        self._next_id = 1 + max(
+            (int(doc_id[3:]) for doc_id in doc_ids if doc_id.startswith('doc') and doc_id[3:].isdigit()),
+            default=0
+        )
+
+    def get(self, path: str) -> Optional[ManifestRecord]:
+        """
+        查询文件的清单记录。
+        """
+        return self._records.get(path)
+
+    def doc_id_for(self, path: str) -> str:
+        """
+        返回文件的稳定文档ID：已记录的文件沿用原ID，新文件分配新的ID。
+        """
+        record = self._records.get(path)
+        if record is not None:
+            return record.doc_id
+        doc_id = f"doc{self._next_id}"
+        self._next_id += 1
+        return doc_id
+
+    def is_unchanged(self, entry: FileEntry) -> bool:
+        """
+        判断文件的大小和修改时间是否与清单记录一致。
+        """
+        record = self._records.get(entry.path)
+        return record is not None and record.size == entry.size and record.mtime_ns == entry.mtime_ns
+
+    def update(self, records: Iterable[ManifestRecord]) -> None:
+        """
+        批量写入清单记录。
+        """
+        rows = []
+        now = time.time()
+        for record in records:
+            self._records[record.path] = record
+            rows.append((*record, now))
+        if rows:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO manifest (path, size, mtime_ns, content_hash, doc_id, title, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            self._conn.commit()
+
+    def missing(self, seen_paths: set) -> List[str]:
+        """
+        返回清单中有记录、但本次遍历中不存在的文件路径（不修改清单）。
+
+        参数：
+            seen_paths (set): 本次遍历到的文件路径。
+
+        返回：
+            List[str]: 已删除的文件路径。
+        """
+        return [path for path in self._records if path not in seen_paths]
+
+    def remove(self, paths: Iterable[str]) -> None:
+        """
+        删除指定文件的清单记录。
+        """
+        paths = [path for path in paths if path in self._records]
+        if paths:
+            self._conn.executemany("DELETE FROM manifest WHERE path = ?", [(path,) for path in paths])
+            self._conn.commit()
+            for path in paths:
+                del self._records[path]
+
+    def stage(self, run_id: str, records: Iterable[ManifestRecord], removed: Iterable[str] = ()) -> None:
+        """
+        暂存一次运行对清单的修改，在 commit(run_id) 之前不影响变化检测。
+        这样下游任务失败时可以撤销，本次输出的文档在下次运行时会重新采集，而不会因为清单已更新而漏掉。
+
+        参数：
+            run_id (str): DAG运行ID。
+            records (Iterable[ManifestRecord]): 新增或更新的记录。
+            removed (Iterable[str]): 需要删除记录的文件路径。
+        """
+        now = time.time()
+        rows = [(run_id, *record, 0, now) for record in records]
+        rows.extend((run_id, path, 0, 0, '', '', None, 1, now) for path in removed)
+        if rows:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO manifest_staged"
+                " (run_id, path, size, mtime_ns, content_hash, doc_id, title, removed, staged_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            self._conn.commit()
+
+    def commit(self, run_id: str) -> int:
+        """
+        在一个事务中把运行暂存的修改写入清单。
+
+        返回：
+            int: 提交的修改数量。
+        """
+        now = time.time()
+        with self._conn:
+            count = self._conn.execute(
+                "SELECT COUNT(*) FROM manifest_staged WHERE run_id = ?", (run_id,)
+            ).fetchone()[0]
+            self._conn.execute(
+                "DELETE FROM manifest WHERE path IN"
+                " (SELECT path FROM manifest_staged WHERE run_id = ? AND removed = 1)",
+                (run_id,)
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO manifest (path, size, mtime_ns, content_hash, doc_id, title, updated_at)"
+                " SELECT path, size, mtime_ns, content_hash, doc_id, title, ? FROM manifest_staged"
+                " WHERE run_id = ? AND removed = 0",
+                (now, run_id)
+            )
+            self._conn.execute("DELETE FROM manifest_staged WHERE run_id = ?", (run_id,))
+        self._load()
+        return count
+
+    def discard(self, run_id: str) -> int:
+        """
+        丢弃运行暂存的修改。
+
+        返回：
+            int: 丢弃的修改数量。
+        """
+        with self._conn:
+            return self._conn.execute("DELETE FROM manifest_staged WHERE run_id = ?", (run_id,)).rowcount
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+class ChangeScan:
+    """
+    一次增量扫描。迭代时逐个产出新增或内容发生变化的文件（文件、UTF-8文本内容、内容哈希），
+    一次只在内存中保留一个文件的内容；迭代结束后，touched 为只有元数据变化的记录，removed 为已删除的文件。
+    与全量采集一致，文件读取失败或不是合法的 UTF-8 时直接抛出异常，不会跳过该文件。
+    扫描本身不修改清单，由调用方决定直接写入还是暂存到运行结束。
+    """
+    def __init__(self, manifest: CorpusManifest, root: str, patterns: Iterable[str] = ("*.txt",),
+                 recursive: bool = False, mmap_threshold: int = DEFAULT_MMAP_THRESHOLD) -> None:
+        self.manifest = manifest
+        self.root = root
+        self.patterns = tuple(patterns)
+        self.recursive = recursive
+        self.mmap_threshold = mmap_threshold
+        self.touched: List[ManifestRecord] = []
+        self.removed: List[str] = []
+
+    def __iter__(self) -> Iterator[Tuple[FileEntry, str, str]]:
+        seen = set()
+        self.touched, self.removed = [], []
+        for entry in iter_files(self.root, self.patterns, self.recursive):
+            seen.add(entry.path)
+            if self.manifest.is_unchanged(entry):
+                continue
+            record = self.manifest.get(entry.path)
+            try:
+                with open_buffer(entry.path, self.mmap_threshold) as data:
+                    digest = content_hash(data)
+                    if record is not None and record.content_hash == digest:
+                        self.touched.append(record._replace(size=entry.size, mtime_ns=entry.mtime_ns))
+                        continue
+                    content = str(data, 'utf-8')
+            except (OSError, UnicodeDecodeError) as e:
+                logger.error(f"读取文档 {entry.path} 失败: {e}")
+                raise
+            yield entry, content, digest
+
+        self.removed = self.manifest.missing(seen)
+        if self.removed:
+            logger.info(f"有 {len(self.removed)} 个已采集的文件已被删除")
+
+
+def scan_changes(
+    manifest: CorpusManifest,
+    root: str,
+    patterns: Iterable[str] = ("*.txt",),
+    recursive: bool = False,
+    mmap_threshold: int = DEFAULT_MMAP_THRESHOLD
+) -> ChangeScan:
+    """
+    创建一次增量扫描，见 ChangeScan。
+
+    参数：
+        manifest (CorpusManifest): 文件清单。
+        root (str): 语料根目录。
+        patterns (Iterable[str]): 文件名匹配模式。
+        recursive (bool): 是否递归遍历子目录。
+        mmap_threshold (int): 使用内存映射读取的文件大小阈值。
+
+    返回：
+        ChangeScan: 可迭代的扫描，产出（文件、UTF-8文本内容、内容哈希）。
+    """
+    return ChangeScan(manifest, root, patterns, recursive, mmap_threshold)
@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @Author  : justin.郑
+# @mail    : 3907721@qq.com
+# @Time    : 2026/10/19 18:20
+# @File    : join
+# @desc    : 按键连接多个上游任务输出的哈希连接算子
+
+
+from utils.logger import logger
+from typing import Any, Dict, Iterator, List
+
+
+# 支持的连接方式
+JOIN_TYPES = ('inner', 'left')
+
+
+def validate_join_spec(task_id: str, join: Any, dependencies: List[str]) -> None:
+    """
+    校验任务的 join 配置。
+
+    参数：
+        task_id (str): 任务ID。
+        join (Any): 任务定义中的 join 配置。
+        dependencies (List[str]): 任务的依赖列表。
+
+    异常：
+        ValueError: 配置不合法时抛出。
+    """
+    if not isinstance(join, dict) or not isinstance(join.get('inputs'), list) or len(join['inputs']) < 2:
+        raise ValueError(f"任务 {task_id} 的 join 必须包含至少两个 inputs")
+    if join.get('how', 'inner') not in JOIN_TYPES:
+        raise ValueError(f"任务 {task_id} 的 join.how 必须是 {', '.join(JOIN_TYPES)} 之一")
+
+    aliases = set()
+    for spec in join['inputs']:
+        if not isinstance(spec, dict) or not spec.get('task') or not spec.get('key'):
+            raise ValueError(f"任务 {task_id} 的 join.inputs 每一项都必须包含 task 和 key")
+        if spec['task'] not in dependencies:
+            raise ValueError(f"任务 {task_id} 的 join 引用了非依赖任务 {spec['task']}")
+        alias = spec.get('as', spec['task'])
+        if alias in aliases or alias == 'key':
+            raise ValueError(f"任务 {task_id} 的 join 别名“{alias}”重复或与保留字段 key 冲突")
+        aliases.add(alias)
+
+
+def hash_join(join: Dict[str, Any], results: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """
+    对多个上游任务的输出按声明的键做哈希连接。
+
+    第一个输入作为探测侧，按其原有顺序逐条产出连接结果；其余输入各自按键建立哈希索引，
+    整体复杂度为 O(n)。每条结果形如 {"key": 键值, <别名1>: 记录1, <别名2>: 记录2, ...}。
+
+    参数：
+        join (Dict[str, Any]): join 配置，包含 inputs（task、path、key、as）与 how（inner / left）。
+        results (Dict[str, Any]): 上游任务ID到任务结果的映射。
+
+    返回：
+        Iterator[Dict[str, Any]]: 对齐后的记录。inner 连接只产出所有输入都存在的键，
+        left 连接对缺失的输入填充 None。
+    """
+    probe_spec, *build_specs = join['inputs']
+    how = join.get('how', 'inner')
+
+    indexes = []
+    for spec in build_specs:
+        index: Dict[Any, Any] = {}
+        for record in _records(results, spec):
+            key = record.get(spec['key'])
+            if key in index:
+                logger.warning(f"任务 {spec['task']} 的输出中存在重复键 {key}，仅保留第一条记录")
+                continue
+            index[key] = record
+        indexes.append((spec.get('as', spec['task']), index))
+
+    for record in _records(results, probe_spec):
+        key = record.get(probe_spec['key'])
+        joined = {"key": key, probe_spec.get('as', probe_spec['task']): record}
+        matched = True
+        for alias, index in indexes:
+            other = index.get(key)
+            if other is None:
+                matched = False
+            joined[alias] = other
+        if matched or how == 'left':
+            yield joined
+        else:
+            logger.warning(f"键 {key} 在部分上游输出中不存在，已在内连接中跳过")
+
+
+def _records(results: Dict[str, Any], spec: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """
+    按 path（可多级，以点分隔）从上游任务结果中取出记录列表并逐条产出。
+    """
+    value = results[spec['task']]
+    for key in [part for part in str(spec.get('path', '')).split('.') if part]:
+        value = value.get(key, []) if isinstance(value, dict) else []
+    for record in value or []:
+        if isinstance(record, dict):
+            yield record
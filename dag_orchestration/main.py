@@ -8,10 +8,15 @@
 # @desc    :
 
 
+import os
 import json
 import asyncio
+import argparse
+from typing import Any, Dict, Optional
 from utils.logger import logger
 from utils.message import Message
+from dag_orchestration.broker import TaskBroker
+from dag_orchestration.context import StateListener
 from dag_orchestration.coordinator import CoordinatorAgent
 
 
@@ -20,61 +25,90 @@ class DagOrchestrationAgent:
     DAG编排智能体的主要入口点。
     该智能体负责协调执行DAG（有向无环图）中定义的任务。
     """
-    def __init__(self) -> None:
-        self.pattern_root_path = './data/'
-        self.dag_file_path = f"{self.pattern_root_path}dag.yml"
-        self.report_file_path = f"{self.pattern_root_path}final_report.md"
+    def __init__(self, broker_path: Optional[str] = None, dag_file_path: Optional[str] = None,
+                 output_root: Optional[str] = None) -> None:
+        """
+        DAG 定义在初始化时编译一次，之后的每次 run 使用独立的运行上下文和输出目录，
+        多次 run 可以在同一个事件循环中并发执行。
 
-    async def run(self) -> None:
+        :param broker_path: 任务代理数据库路径。指定后任务由工作进程（dag_orchestration.worker）执行。
+        :param dag_file_path: DAG文件路径，默认为 ./data/dag.yml。
+        :param output_root: 运行输出根目录，默认为 ./data/runs，每次运行的报告保存在 <output_root>/<运行ID>/ 下。
+        """
+        self.pattern_root_path = './data/'
+        self.dag_file_path = dag_file_path or f"{self.pattern_root_path}dag.yml"
+        self.output_root = output_root or f"{self.pattern_root_path}runs"
+        self.report_file_name = "final_report.md"
+        self.broker_path = broker_path
+
+        logger.info("正在使用DAG文件初始化协调器智能体。")
+        broker = TaskBroker(self.broker_path) if self.broker_path else None
+        self.coordinator = CoordinatorAgent(
+            name="CoordinatorAgent", dag_file=self.dag_file_path, broker=broker, output_root=self.output_root
+        )
+
+    async def run(self, params: Optional[Dict[str, Any]] = None, listener: Optional[StateListener] = None) -> str:
         """
-        主流程函数，用于通过协调者智能体（Coordinator agent）编排任务处理。
-        该函数处理主任务消息，并将最终输出保存为JSON文件。
+        主流程函数，用于通过协调者智能体（Coordinator agent）编排任务处理，并将最终报告保存到本次运行的输出目录。
 
         步骤：
-        1. 使用指定的DAG文件初始化协调者。
-        2. 向协调者发送主任务消息进行处理。
-        3. 接收响应并提取内容。
-        4. 将最终内容保存为JSON报告。
-
-        返回值：None
+        1. 为本次运行创建独立的执行上下文（运行ID、结果、状态、输出目录）。
+        2. 在该上下文中执行DAG。
+        3. 取出输出任务的结果。
+        4. 将最终报告保存到运行输出目录。
+
+        :param params: 运行参数，传给无依赖的任务，例如 {"docs_folder": "./data/docs"}。
+        :param listener: 任务状态监听函数，参数为（任务ID、新状态），用于上报运行进度。
+        :return: str: 最终报告文件路径。
         """
+        ctx = self.coordinator.create_context(params)
+        if listener is not None:
+            ctx.listeners.append(listener)
         try:
-            logger.info("正在使用DAG文件初始化协调器智能体。")
-            coordinator = CoordinatorAgent(name="CoordinatorAgent", dag_file=self.dag_file_path)
-
-            # 主要任务是编排DAG（有向无环图），因此消息无需包含特定内容。
-            message = Message(content='', sender="User", recipient="CoordinatorAgent")
-
-            logger.info("将主要任务消息发送给协调器进行处理。")
-            response = await coordinator.process(message)
+            logger.info(f"开始运行 {ctx.run_id}，输出目录: {ctx.output_dir}")
+            await self.coordinator.execute(ctx)
 
-            final_output = response.content
-            self.save_final_report(final_output['report'])
+            final_output = ctx.output()
+            if not isinstance(final_output, dict) or 'report' not in final_output:
+                raise RuntimeError(f"运行 {ctx.run_id} 未生成最终报告")
+            report_file_path = os.path.join(ctx.output_dir, self.report_file_name)
+            self.save_final_report(final_output['report'], report_file_path)
 
             logger.info("任务已成功完成。最终报告已保存。")
+            return report_file_path
 
         except Exception as e:
             logger.error(f"执行DAG编排智能体时发生错误: {e}")
             raise
+        finally:
+            ctx.close()
 
 
-    def save_final_report(self, report_data: str) -> None:
+    def save_final_report(self, report_data: str, report_file_path: str) -> None:
         """
-        将最终输出保存为JSON文件。
+        将最终输出保存为文件。
 
-        :param report_data: str: 处理后的输出内容，将被保存为JSON格式。
+        :param report_data: str: 处理后的输出内容。
+        :param report_file_path: str: 报告文件路径。
         :return: None
         """
         try:
-            with open(self.report_file_path, 'w', encoding='utf-8') as f:
+            with open(report_file_path, 'w', encoding='utf-8') as f:
                 # json.dump(report_data, f, ensure_ascii=False, indent=4)
                 f.write(report_data)
-            logger.info(f"最终报告已成功保存到 {self.report_file_path}")
+            logger.info(f"最终报告已成功保存到 {report_file_path}")
         except Exception as e:
             logger.error(f"保存最终报告时发生错误: {e}")
             raise
 
 
 if __name__ == "__main__":
-    agent = DagOrchestrationAgent()
-    asyncio.run(agent.run())
+    parser = argparse.ArgumentParser(description="DAG编排智能体")
+    parser.add_argument('--broker', default=None, help="任务代理数据库路径，指定后任务交由工作进程执行")
+    parser.add_argument('--dag', default=None, help="DAG文件路径，默认为 ./data/dag.yml")
+    parser.add_argument('--output-root', default=None, help="运行输出根目录，默认为 ./data/runs")
+    parser.add_argument('--docs-folder', default=None, help="文档目录，覆盖 CollectAgent 的默认目录")
+    args = parser.parse_args()
+
+    agent = DagOrchestrationAgent(broker_path=args.broker, dag_file_path=args.dag, output_root=args.output_root)
+    asyncio.run(agent.run({"docs_folder": args.docs_folder} if args.docs_folder else None))
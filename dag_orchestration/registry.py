@@ -0,0 +1,238 @@
+#!/usr/bin/env python
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @Author  : justin.郑
+# @mail    : 3907721@qq.com
+# @Time    : 2026/10/19 11:20
+# @File    : registry
+# @desc    : DAG 智能体注册表，负责智能体类的发现、延迟导入和智能体实例的池化复用
+
+
+import threading
+import importlib
+from importlib import metadata
+from contextlib import contextmanager
+from utils.logger import logger
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+
+# 第三方包可通过该入口点分组声明智能体类，例如：
+# [project.entry-points."dag_orchestration.agents"]
+# MyAgent = "my_package.agents:MyAgent"
+ENTRY_POINT_GROUP = "dag_orchestration.agents"
+
+# 内置智能体所在模块，只有DAG引用到时才会导入
+BUILTIN_AGENT_MODULES = {
+    'CollectAgent': 'dag_orchestration.agents.collect',
+    'PreprocessAgent': 'dag_orchestration.agents.preprocess',
+    'ExtractAgent': 'dag_orchestration.agents.extract',
+    'CompileAgent': 'dag_orchestration.agents.compile',
+    'SummarizeAgent': 'dag_orchestration.agents.summarize',
+}
+
+# 每组（类名、实例名、构造参数、模块）最多保留的空闲智能体实例数量
+MAX_IDLE_AGENTS = 8
+
+
+class AgentRegistry:
+    """
+    智能体注册表。
+
+    智能体类的来源（按查找顺序）：
+        1. 通过 @register_agent 装饰器注册的类；
+        2. 入口点分组 ENTRY_POINT_GROUP 中声明的类；
+        3. 任务定义中 `module` 字段指定的模块（导入后由装饰器完成注册）；
+        4. 内置智能体模块映射。
+
+    模块只在首次被引用时导入。智能体实例按（类名、实例名、构造参数、模块）池化：
+    lease() 借出一个空闲实例（没有时新建），任务结束后归还，之后的任务直接复用，不再重复构造；
+    借出期间实例只被一个任务使用，同时执行的多次DAG运行和同一任务的多个子任务之间不会同时共享实例。
+    在实例上保存跨调用状态的智能体可以把类属性 `reusable` 设为 False，每次借出都会新建实例且不归还到池中。
+    """
+    def __init__(self) -> None:
+        self._classes: Dict[str, type] = {}
+        self._lazy_modules: Dict[str, str] = dict(BUILTIN_AGENT_MODULES)
+        self._entry_points: Optional[Dict[str, Any]] = None
+        self._idle: Dict[Tuple, List[Any]] = {}
+        self._lock = threading.RLock()
+
+    def register(self, agent_class: type, name: Optional[str] = None) -> type:
+        """
+        注册智能体类。
+
+        参数：
+            agent_class (type): 智能体类，需实现 `async process(message)`。
+            name (Optional[str]): 在DAG中引用的名称，默认使用类名。
+
+        返回：
+            type: 原智能体类，便于作为装饰器使用。
+        """
+        class_name = name or agent_class.__name__
+        with self._lock:
+            existing = self._classes.get(class_name)
+            if existing is not None and existing is not agent_class:
+                logger.warning(f"智能体“{class_name}”被重复注册，将使用 {agent_class.__module__}.{agent_class.__qualname__}")
+            self._classes[class_name] = agent_class
+        return agent_class
+
+    def register_lazy(self, name: str, module_path: str) -> None:
+        """
+        声明智能体所在模块，首次引用时再导入。
+
+        参数：
+            name (str): 智能体类名。
+            module_path (str): 智能体所在模块的完整路径。
+        """
+        with self._lock:
+            self._lazy_modules[name] = module_path
+
+    def get_class(self, agent_class_name: str, module_path: Optional[str] = None) -> type:
+        """
+        获取智能体类，必要时延迟导入其所在模块。
+
+        参数：
+            agent_class_name (str): 智能体类名。
+            module_path (Optional[str]): 任务定义中指定的模块路径。
+
+        返回：
+            type: 智能体类。
+
+        异常：
+            ImportError: 找不到或无法导入指定的智能体类时抛出。
+        """
+        with self._lock:
+            if agent_class_name in self._classes:
+                return self._classes[agent_class_name]
+
+            entry_point = self._load_entry_points().get(agent_class_name)
+            if entry_point is not None:
+                try:
+                    return self.register(entry_point.load(), agent_class_name)
+                except Exception as e:
+                    raise ImportError(f"无法从入口点“{entry_point.value}”加载智能体“{agent_class_name}”：{e}")
+
+            module_path = module_path or self._lazy_modules.get(agent_class_name)
+            if not module_path:
+                raise ImportError(f"未找到智能体类“{agent_class_name}”对应的模块")
+
+            try:
+                module = importlib.import_module(module_path)
+            except ModuleNotFoundError as e:
+                raise ImportError(f"无法导入智能体“{agent_class_name}”所在模块“{module_path}”：{e}")
+
+            # 模块中的装饰器会完成注册；未使用装饰器的类按类名查找
+            if agent_class_name not in self._classes:
+                agent_class = getattr(module, agent_class_name, None)
+                if agent_class is None:
+                    raise ImportError(f"模块“{module_path}”中不存在智能体“{agent_class_name}”")
+                self.register(agent_class, agent_class_name)
+            return self._classes[agent_class_name]
+
+    def get_agent(
+        self,
+        agent_class_name: str,
+        agent_name: str,
+        options: Optional[Dict[str, Any]] = None,
+        module_path: Optional[str] = None
+    ) -> Any:
+        """
+        创建新的智能体实例（不经过实例池）。
+
+        参数：
+            agent_class_name (str): 智能体类名。
+            agent_name (str): 智能体实例的名称。
+            options (Optional[Dict[str, Any]]): 传递给智能体构造函数的可选参数。
+            module_path (Optional[str]): 任务定义中指定的模块路径。
+
+        返回：
+            Any: 智能体实例。
+        """
+        agent_class = self.get_class(agent_class_name, module_path)
+        return agent_class(name=agent_name, **(options or {}))
+
+    @contextmanager
+    def lease(
+        self,
+        agent_class_name: str,
+        agent_name: str,
+        options: Optional[Dict[str, Any]] = None,
+        module_path: Optional[str] = None
+    ) -> Iterator[Any]:
+        """
+        从实例池借出一个智能体实例，with 块结束后归还，供之后相同配置的任务复用。参数同 get_agent。
+
+        返回：
+            Iterator[Any]: 借出期间只由当前任务使用的智能体实例。
+        """
+        key = (agent_class_name, agent_name, self._freeze(options or {}), module_path)
+        with self._lock:
+            idle = self._idle.get(key)
+            agent = idle.pop() if idle else None
+        if agent is None:
+            agent = self.get_agent(agent_class_name, agent_name, options, module_path)
+            logger.debug(f"已创建智能体实例 {agent_class_name}({agent_name})")
+        try:
+            yield agent
+        finally:
+            if getattr(agent, 'reusable', True):
+                with self._lock:
+                    idle = self._idle.setdefault(key, [])
+                    if len(idle) < MAX_IDLE_AGENTS:
+                        idle.append(agent)
+
+    def clear_pool(self) -> None:
+        """
+        清空实例池中的空闲智能体实例。
+        """
+        with self._lock:
+            self._idle.clear()
+
+    def _load_entry_points(self) -> Dict[str, Any]:
+        """
+        读取入口点分组中声明的智能体，只读取一次且不导入对应模块。
+
+        返回：
+            Dict[str, Any]: 智能体名称到入口点对象的映射。
+        """
+        if self._entry_points is None:
+            try:
+                eps = metadata.entry_points()
+                if hasattr(eps, 'select'):
+                    group = eps.select(group=ENTRY_POINT_GROUP)
+                else:
+                    group = eps.get(ENTRY_POINT_GROUP, [])
+                self._entry_points = {ep.name: ep for ep in group}
+            except Exception as e:
+                logger.warning(f"读取智能体入口点失败: {e}")
+                self._entry_points = {}
+        return self._entry_points
+
+    @classmethod
+    def _freeze(cls, value: Any) -> Any:
+        """
+        将构造参数转换为可哈希的形式，用作实例池的键。
+        """
+        if isinstance(value, dict):
+            return tuple(sorted((k, cls._freeze(v)) for k, v in value.items()))
+        if isinstance(value, (list, tuple, set)):
+            return tuple(cls._freeze(v) for v in value)
+        return value
+
+
+# 进程级默认注册表
+registry = AgentRegistry()
+
+
+def register_agent(name: Optional[str] = None) -> Callable[[type], type]:
+    """
+    将智能体类注册到默认注册表的装饰器。
+
+    参数：
+        name (Optional[str]): 在DAG中引用的名称，默认使用类名。
+
+    返回：
+        Callable[[type], type]: 类装饰器。
+    """
+    def decorator(agent_class: type) -> type:
+        return registry.register(agent_class, name)
+    return decorator
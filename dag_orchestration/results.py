@@ -0,0 +1,190 @@
+#!/usr/bin/env python
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @Author  : justin.郑
+# @mail    : 3907721@qq.com
+# @Time    : 2026/10/19 19:40
+# @File    : results
+# @desc    : DAG 运行期间任务结果的存储：内存存储与带 LRU 缓存的 SQLite 溢出存储
+
+
+import os
+import json
+import sqlite3
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from utils.logger import logger
+from typing import Any, Dict, Optional
+
+
+# 溢出存储默认的内存上限（MB）
+DEFAULT_MEMORY_LIMIT_MB = 256
+# 溢出存储默认的数据库目录
+DEFAULT_SPILL_DIR = "./data/results"
+
+
+class ResultStore(ABC):
+    """
+    任务结果存储接口。协调器通过 put 写入任务结果，下游任务通过 get 读取，
+    所有下游任务结束后通过 release 释放，运行结束时调用 close。
+    子类必须实现 put / get / release / __contains__，缺少任何一个时无法实例化。
+    """
+    @abstractmethod
+    def put(self, task_id: str, result: Any) -> None:
+        ...
+
+    @abstractmethod
+    def get(self, task_id: str, default: Any = None) -> Any:
+        ...
+
+    @abstractmethod
+    def release(self, task_id: str) -> None:
+        ...
+
+    @abstractmethod
+    def __contains__(self, task_id: str) -> bool:
+        ...
+
+    def __getitem__(self, task_id: str) -> Any:
+        if task_id not in self:
+            raise KeyError(task_id)
+        return self.get(task_id)
+
+    def close(self) -> None:
+        pass
+
+
+class MemoryResultStore(ResultStore):
+    """
+    把所有任务结果保存在内存中的存储，未配置溢出存储时使用。
+    """
+    def __init__(self) -> None:
+        self._results: Dict[str, Any] = {}
+
+    def put(self, task_id: str, result: Any) -> None:
+        self._results[task_id] = result
+
+    def get(self, task_id: str, default: Any = None) -> Any:
+        return self._results.get(task_id, default)
+
+    def release(self, task_id: str) -> None:
+        self._results.pop(task_id, None)
+
+    def __contains__(self, task_id: str) -> bool:
+        return task_id in self._results
+
+    def close(self) -> None:
+        self._results.clear()
+
+
+class SpillResultStore(ResultStore):
+    """
+    内存中按 LRU 缓存最近使用的结果、全部结果写入 SQLite 的存储。
+
+    写入时结果以 JSON 序列化后落盘，序列化长度作为内存占用的估计值；
+    缓存总量超过上限时淘汰最久未使用的结果，之后读取时再从数据库加载。
+    每次运行使用独立的数据库文件，close 时删除。
+    """
+    def __init__(self, db_path: str, memory_limit_mb: float = DEFAULT_MEMORY_LIMIT_MB) -> None:
+        """
+        参数：
+            db_path (str): 溢出数据库路径。
+            memory_limit_mb (float): 内存缓存的上限（MB）。
+        """
+        self.db_path = db_path
+        self.memory_limit = int(memory_limit_mb * 1024 * 1024)
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # 同一运行的任务可能在不同线程中读取结果，连接不与创建线程绑定
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS results (task_id TEXT PRIMARY KEY, payload TEXT NOT NULL)")
+        self._conn.commit()
+        self._cache: 'OrderedDict[str, Any]' = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._memory_used = 0
+        # 无法序列化的结果只保存在内存中
+        self._pinned: Dict[str, Any] = {}
+
+    def put(self, task_id: str, result: Any) -> None:
+        self.release(task_id)
+        try:
+            payload = json.dumps(result, ensure_ascii=False)
+        except (TypeError, ValueError) as e:
+            logger.warning(f"任务 {task_id} 的结果无法序列化，将保留在内存中: {e}")
+            self._pinned[task_id] = result
+            return
+        self._conn.execute("INSERT OR REPLACE INTO results (task_id, payload) VALUES (?, ?)", (task_id, payload))
+        self._conn.commit()
+        self._cache_result(task_id, result, len(payload))
+
+    def get(self, task_id: str, default: Any = None) -> Any:
+        if task_id in self._pinned:
+            return self._pinned[task_id]
+        if task_id in self._cache:
+            self._cache.move_to_end(task_id)
+            return self._cache[task_id]
+        row = self._conn.execute("SELECT payload FROM results WHERE task_id = ?", (task_id,)).fetchone()
+        if row is None:
+            return default
+        logger.info(f"从溢出存储加载任务 {task_id} 的结果")
+        result = json.loads(row[0])
+        self._cache_result(task_id, result, len(row[0]))
+        return result
+
+    def release(self, task_id: str) -> None:
+        self._pinned.pop(task_id, None)
+        if task_id in self._cache:
+            del self._cache[task_id]
+            self._memory_used -= self._sizes.pop(task_id)
+        self._conn.execute("DELETE FROM results WHERE task_id = ?", (task_id,))
+        self._conn.commit()
+
+    def __contains__(self, task_id: str) -> bool:
+        if task_id in self._pinned or task_id in self._cache:
+            return True
+        return self._conn.execute("SELECT 1 FROM results WHERE task_id = ?", (task_id,)).fetchone() is not None
+
+    def close(self) -> None:
+        self._cache.clear()
+        self._pinned.clear()
+        self._conn.close()
+        try:
+            os.remove(self.db_path)
+        except OSError:
+            pass
+
+    def _cache_result(self, task_id: str, result: Any, size: int) -> None:
+        """
+        把结果放入内存缓存，并淘汰最久未使用的结果直到不超过内存上限。
+        超过上限的单个结果不进入缓存，每次读取都从数据库加载。
+        """
+        if size > self.memory_limit:
+            return
+        self._cache[task_id] = result
+        self._sizes[task_id] = size
+        self._memory_used += size
+        while self._memory_used > self.memory_limit:
+            evicted, _ = self._cache.popitem(last=False)
+            self._memory_used -= self._sizes.pop(evicted)
+            logger.info(f"任务 {evicted} 的结果已从内存中移出，仅保留在溢出存储中")
+
+
+def create_result_store(config: Optional[Dict[str, Any]], run_id: str) -> ResultStore:
+    """
+    按 DAG 顶层 `results` 配置创建本次运行的结果存储。
+
+    参数：
+        config (Optional[Dict[str, Any]]): 结果存储配置，包含 memory_limit_mb 和 spill_dir；未配置时使用内存存储。
+        run_id (str): 运行ID，用于区分每次运行的溢出数据库。
+
+    返回：
+        ResultStore: 结果存储。
+    """
+    if not config:
+        return MemoryResultStore()
+    spill_dir = config.get('spill_dir', DEFAULT_SPILL_DIR)
+    return SpillResultStore(
+        os.path.join(spill_dir, f"{run_id}.db"),
+        float(config.get('memory_limit_mb', DEFAULT_MEMORY_LIMIT_MB))
+    )
@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @Author  : justin.郑
+# @mail    : 3907721@qq.com
+# @Time    : 2026/10/19 21:30
+# @File    : scheduler
+# @desc    : 按优先级分配任务运行名额的并发控制
+
+
+import heapq
+import asyncio
+import itertools
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, List, Optional, Tuple
+
+
+class PrioritySlots:
+    """
+    有上限的任务运行名额。名额不足时等待中的任务按优先级（数值越大越优先）和等待顺序获得名额，
+    上限为 None 时不限制并发。
+
+    同一个协调器的所有运行共享一个实例，因此上限对并发的多次运行同样生效。
+    """
+    def __init__(self, limit: Optional[int] = None) -> None:
+        """
+        参数：
+            limit (Optional[int]): 同时运行的任务数量上限。
+        """
+        self.limit = limit
+        self.active = 0
+        self._waiters: List[Tuple[float, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+
+    async def acquire(self, priority: float = 0.0) -> None:
+        """
+        获取一个运行名额。
+
+        参数：
+            priority (float): 优先级，数值越大越先获得名额。
+        """
+        if self.limit is None or (self.active < self.limit and not self._waiters):
+            self.active += 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (-priority, next(self._sequence), future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            # 已分配名额但等待方被取消时，把名额转交给下一个等待者
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+
+    def release(self) -> None:
+        """
+        归还一个运行名额，并交给优先级最高的等待者。
+        """
+        self.active -= 1
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                self.active += 1
+                future.set_result(None)
+                break
+
+    @asynccontextmanager
+    async def slot(self, priority: float = 0.0) -> AsyncIterator[None]:
+        """
+        在运行名额内执行代码块。
+        """
+        await self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release()
@@ -0,0 +1,492 @@
+#!/usr/bin/env python
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @Author  : justin.郑
+# @mail    : 3907721@qq.com
+# @Time    : 2026/10/19 20:50
+# @File    : server
+# @desc    : DAG 编排的常驻作业服务：本地 HTTP / Unix 套接字接口、优先级队列与进度推送
+
+
+import os
+import json
+import time
+import uuid
+import asyncio
+import argparse
+import threading
+from utils.logger import logger
+from dag_orchestration.main import DagOrchestrationAgent
+from typing import Any, Dict, List, Optional, Tuple
+
+
+# 默认同时执行的作业数量
+DEFAULT_MAX_CONCURRENT_JOBS = 4
+# 内存中保留的已结束作业数量
+DEFAULT_MAX_FINISHED_JOBS = 1000
+# 请求体大小上限（字节）
+MAX_REQUEST_BODY = 1024 * 1024
+
+QUEUED = 'queued'
+RUNNING = 'running'
+COMPLETED = 'completed'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+_REASONS = {200: 'OK', 202: 'Accepted', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+            409: 'Conflict', 413: 'Payload Too Large', 500: 'Internal Server Error'}
+
+
+class Job:
+    """
+    一个排队执行的 DAG 作业及其进度事件。
+    """
+    def __init__(self, dag_file: str, params: Dict[str, Any], priority: int) -> None:
+        self.job_id = uuid.uuid4().hex
+        self.dag_file = dag_file
+        self.params = params
+        self.priority = priority
+        self.status = QUEUED
+        self.tasks: Dict[str, str] = {}
+        self.events: List[Dict[str, Any]] = []
+        self.report_path: Optional[str] = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._updated = asyncio.Event()
+        self.emit({"event": "status", "status": QUEUED})
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (COMPLETED, FAILED, CANCELLED)
+
+    def emit(self, event: Dict[str, Any]) -> None:
+        """
+        记录进度事件并唤醒等待中的进度流。
+        """
+        event = {"time": time.time(), **event}
+        self.events.append(event)
+        updated, self._updated = self._updated, asyncio.Event()
+        updated.set()
+
+    def on_task_state(self, task_id: str, state: str) -> None:
+        """
+        作为运行上下文的状态监听函数，记录任务状态变化。
+        """
+        self.tasks[task_id] = state
+        self.emit({"event": "task", "task_id": task_id, "state": state})
+
+    def set_status(self, status: str, **fields: Any) -> None:
+        self.status = status
+        self.emit({"event": "status", "status": status, **fields})
+
+    async def wait_for_update(self) -> None:
+        await self._updated.wait()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.job_id,
+            "dag_file": self.dag_file,
+            "params": self.params,
+            "priority": self.priority,
+            "status": self.status,
+            "tasks": dict(self.tasks),
+            "report_path": self.report_path,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class DagJobService:
+    """
+    常驻的 DAG 作业服务。
+
+    - 作业按优先级（数值越大越先执行）和提交顺序排队，同时执行的作业数量受全局上限控制
+    - 每个 DAG 文件只编译一次，文件修改后自动重新编译；智能体构造函数与模型工厂在作业之间共享
+    - 每个作业使用独立的运行上下文和输出目录，任务状态变化以事件形式推送给客户端
+    - 客户端只能提交 dag_dirs 目录中的 DAG 文件，运行参数中的 docs_folder 只能位于 docs_dirs 目录中
+
+    HTTP 接口：
+        POST /jobs                  提交作业，请求体 {"dag_file", "params", "priority"}，返回作业信息
+        GET  /jobs                  列出作业
+        GET  /jobs/<id>             查询作业状态与各任务状态
+        GET  /jobs/<id>/events      以 NDJSON 流推送进度事件，作业结束后关闭
+        GET  /jobs/<id>/report      返回最终报告（作业完成后）
+    """
+    def __init__(
+        self,
+        default_dag_file: str = "./data/dag.yml",
+        max_concurrent_jobs: int = DEFAULT_MAX_CONCURRENT_JOBS,
+        broker_path: Optional[str] = None,
+        output_root: Optional[str] = None,
+        max_finished_jobs: int = DEFAULT_MAX_FINISHED_JOBS,
+        dag_dirs: Optional[List[str]] = None,
+        docs_dirs: Optional[List[str]] = None
+    ) -> None:
+        """
+        参数：
+            default_dag_file (str): 提交作业时未指定 dag_file 使用的 DAG 文件。
+            max_concurrent_jobs (int): 同时执行的作业数量上限。
+            broker_path (Optional[str]): 任务代理数据库路径，指定后任务交由工作进程执行。
+            output_root (Optional[str]): 运行输出根目录。
+            max_finished_jobs (int): 内存中保留的已结束作业数量，超过后移除最早结束的作业。
+            dag_dirs (Optional[List[str]]): 允许提交的 DAG 文件所在目录（含子目录），默认为默认 DAG 文件所在目录。
+            docs_dirs (Optional[List[str]]): 运行参数 docs_folder 允许使用的目录（含子目录），
+                默认为默认 DAG 文件所在目录下的 docs 目录。
+        """
+        self.default_dag_file = default_dag_file
+        self.max_concurrent_jobs = max(1, int(max_concurrent_jobs))
+        self.broker_path = broker_path
+        self.output_root = output_root
+        self.max_finished_jobs = max_finished_jobs
+        self.dag_dirs = [
+            os.path.realpath(directory)
+            for directory in (dag_dirs or [os.path.dirname(os.path.abspath(default_dag_file))])
+        ]
+        self.docs_dirs = [
+            os.path.realpath(directory)
+            for directory in (docs_dirs or [os.path.join(os.path.dirname(os.path.abspath(default_dag_file)), 'docs')])
+        ]
+        self.jobs: Dict[str, Job] = {}
+        self._agents: Dict[str, Tuple[int, DagOrchestrationAgent]] = {}
+        # get_agent 在线程中执行，编译缓存需要加锁
+        self._agents_lock = threading.Lock()
+        self._queue: asyncio.PriorityQueue = asyncio.PriorityQueue()
+        self._sequence = 0
+        self._workers: List[asyncio.Task] = []
+
+    def resolve_dag_file(self, dag_file: str) -> str:
+        """
+        解析 DAG 文件路径（包括符号链接），只允许 dag_dirs 目录中的 .yml / .yaml 文件。
+
+        异常：
+            ValueError: 文件不在允许的目录中或扩展名不正确时抛出。
+        """
+        if not isinstance(dag_file, str) or not dag_file:
+            raise ValueError("dag_file 必须是非空字符串")
+        path = os.path.realpath(dag_file)
+        if os.path.splitext(path)[1].lower() not in ('.yml', '.yaml'):
+            raise ValueError(f"DAG文件必须是 .yml 或 .yaml 文件: {dag_file}")
+        if not _is_within(path, self.dag_dirs):
+            raise ValueError(f"DAG文件 {dag_file} 不在允许的目录中")
+        return path
+
+    def resolve_params(self, params: Any) -> Dict[str, Any]:
+        """
+        校验客户端提交的运行参数。参数必须是 JSON 对象；docs_folder 会被解析为真实路径，只允许 docs_dirs 目录中的路径。
+
+        异常：
+            ValueError: 参数不是对象，或 docs_folder 不在允许的目录中时抛出。
+        """
+        if params is None:
+            return {}
+        if not isinstance(params, dict):
+            raise ValueError("params 必须是JSON对象")
+        params = dict(params)
+        if params.get('docs_folder') is not None:
+            docs_folder = params['docs_folder']
+            if not isinstance(docs_folder, str) or not docs_folder:
+                raise ValueError("docs_folder 必须是非空字符串")
+            path = os.path.realpath(docs_folder)
+            if not _is_within(path, self.docs_dirs):
+                raise ValueError(f"文档目录 {docs_folder} 不在允许的目录中")
+            params['docs_folder'] = path
+        return params
+
+    def get_agent(self, dag_file: str) -> DagOrchestrationAgent:
+        """
+        返回 DAG 文件对应的编排智能体，DAG 定义按文件路径和修改时间缓存。
+        编译 DAG 和打开数据库都是阻塞操作，在事件循环中应通过 asyncio.to_thread 调用。
+
+        异常：
+            DagValidationError: DAG 定义不合法时抛出。
+            OSError: DAG 文件不存在时抛出。
+        """
+        path = os.path.abspath(dag_file)
+        mtime_ns = os.stat(path).st_mtime_ns
+        with self._agents_lock:
+            cached = self._agents.get(path)
+            if cached is None or cached[0] != mtime_ns:
+                agent = DagOrchestrationAgent(
+                    broker_path=self.broker_path, dag_file_path=path, output_root=self.output_root
+                )
+                self._agents[path] = (mtime_ns, agent)
+                logger.info(f"已编译并缓存DAG文件 {path}")
+            return self._agents[path][1]
+
+    async def submit(self, dag_file: Optional[str] = None, params: Optional[Dict[str, Any]] = None,
+                     priority: int = 0) -> Job:
+        """
+        提交作业。DAG 文件在提交时编译，路径、参数或优先级不合法时立即抛出异常。
+
+        参数：
+            dag_file (Optional[str]): DAG 文件路径。
+            params (Optional[Dict[str, Any]]): 运行参数，例如 {"docs_folder": "./data/docs"}。
+            priority (int): 优先级，数值越大越先执行。
+
+        返回：
+            Job: 已入队的作业。
+        """
+        if isinstance(priority, bool) or not isinstance(priority, int):
+            raise ValueError("priority 必须是整数")
+        dag_file = self.resolve_dag_file(dag_file or self.default_dag_file)
+        params = self.resolve_params(params)
+        await asyncio.to_thread(self.get_agent, dag_file)
+        job = Job(dag_file, params, priority)
+        self.jobs[job.job_id] = job
+        self._sequence += 1
+        self._queue.put_nowait((-job.priority, self._sequence, job.job_id))
+        logger.info(f"作业 {job.job_id} 已入队，优先级 {job.priority}，当前排队 {self._queue.qsize()} 个")
+        return job
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8765, unix_path: Optional[str] = None) -> asyncio.AbstractServer:
+        """
+        启动作业执行协程和 HTTP 服务。指定 unix_path 时监听 Unix 套接字，否则监听 TCP 端口。
+
+        返回：
+            asyncio.AbstractServer: 已启动的服务。
+        """
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.max_concurrent_jobs)]
+        if unix_path:
+            if os.path.exists(unix_path):
+                os.remove(unix_path)
+            server = await asyncio.start_unix_server(self._handle_connection, path=unix_path)
+            logger.info(f"DAG作业服务已启动: unix:{unix_path}，最多同时执行 {self.max_concurrent_jobs} 个作业")
+        else:
+            server = await asyncio.start_server(self._handle_connection, host, port)
+            logger.info(f"DAG作业服务已启动: http://{host}:{port}，最多同时执行 {self.max_concurrent_jobs} 个作业")
+        return server
+
+    async def stop(self) -> None:
+        """
+        停止作业执行协程，正在执行和仍在排队的作业都标记为 cancelled。
+        """
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        for job in self.jobs.values():
+            if job.status == QUEUED:
+                job.finished_at = time.time()
+                job.set_status(CANCELLED)
+
+    async def _worker(self) -> None:
+        """
+        从优先级队列中依次取出作业执行。
+        """
+        while True:
+            _, _, job_id = await self._queue.get()
+            job = self.jobs.get(job_id)
+            try:
+                if job is not None:
+                    await self._run_job(job)
+            finally:
+                self._queue.task_done()
+
+    async def _run_job(self, job: Job) -> None:
+        """
+        执行单个作业并记录结果。
+        """
+        job.started_at = time.time()
+        job.set_status(RUNNING)
+        try:
+            agent = await asyncio.to_thread(self.get_agent, job.dag_file)
+            job.report_path = await agent.run(job.params, listener=job.on_task_state)
+            job.finished_at = time.time()
+            job.set_status(COMPLETED, report_path=job.report_path)
+        except asyncio.CancelledError:
+            job.finished_at = time.time()
+            job.set_status(CANCELLED)
+            logger.warning(f"作业 {job.job_id} 已取消")
+            raise
+        except Exception as e:
+            job.error = str(e)
+            job.finished_at = time.time()
+            job.set_status(FAILED, error=job.error)
+            logger.error(f"作业 {job.job_id} 执行失败: {e}")
+        self._prune_finished_jobs()
+
+    def _prune_finished_jobs(self) -> None:
+        """
+        已结束的作业超过保留数量时，移除最早结束的作业。
+        """
+        finished = [job for job in self.jobs.values() if job.finished]
+        if len(finished) <= self.max_finished_jobs:
+            return
+        finished.sort(key=lambda job: job.finished_at or 0)
+        for job in finished[:len(finished) - self.max_finished_jobs]:
+            del self.jobs[job.job_id]
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """
+        处理单个 HTTP 请求（每个连接一个请求）。
+        """
+        try:
+            method, path, body = await self._read_request(reader)
+            await self._dispatch(method, path, body, writer)
+        except ValueError as e:
+            await self._send_json(writer, 400, {"error": str(e)})
+        except Exception as e:
+            logger.error(f"处理请求时出错: {e}")
+            await self._send_json(writer, 500, {"error": str(e)})
+        finally:
+            try:
+                writer.close()
+                await writer.wait_closed()
+            except (ConnectionError, OSError):
+                pass
+
+    async def _dispatch(self, method: str, path: str, body: bytes, writer: asyncio.StreamWriter) -> None:
+        """
+        按请求路径分发到对应的处理逻辑。
+        """
+        parts = [part for part in path.split('?', 1)[0].split('/') if part]
+        if parts == ['jobs'] and method == 'POST':
+            request = json.loads(body or b'{}')
+            if not isinstance(request, dict):
+                raise ValueError("请求体必须是JSON对象")
+            try:
+                job = await self.submit(request.get('dag_file'), request.get('params'), request.get('priority', 0))
+            except (OSError, ValueError, TypeError) as e:
+                await self._send_json(writer, 400, {"error": str(e)})
+                return
+            await self._send_json(writer, 202, job.to_dict())
+            return
+        if parts == ['jobs'] and method == 'GET':
+            await self._send_json(writer, 200, {"jobs": [job.to_dict() for job in self.jobs.values()]})
+            return
+        if len(parts) in (2, 3) and parts[0] == 'jobs':
+            if method != 'GET':
+                await self._send_json(writer, 405, {"error": "仅支持 GET 请求"})
+                return
+            job = self.jobs.get(parts[1])
+            if job is None:
+                await self._send_json(writer, 404, {"error": f"作业 {parts[1]} 不存在"})
+                return
+            if len(parts) == 2:
+                await self._send_json(writer, 200, job.to_dict())
+            elif parts[2] == 'events':
+                await self._stream_events(job, writer)
+            elif parts[2] == 'report':
+                await self._send_report(job, writer)
+            else:
+                await self._send_json(writer, 404, {"error": f"未知路径 {path}"})
+            return
+        await self._send_json(writer, 404, {"error": f"未知路径 {path}"})
+
+    async def _stream_events(self, job: Job, writer: asyncio.StreamWriter) -> None:
+        """
+        以分块传输的 NDJSON 流推送作业的全部历史事件和后续事件，作业结束后关闭。
+        """
+        writer.write(
+            b"HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson; charset=utf-8\r\n"
+            b"Transfer-Encoding: chunked\r\nConnection: close\r\n\r\n"
+        )
+        index = 0
+        while True:
+            while index < len(job.events):
+                line = (json.dumps(job.events[index], ensure_ascii=False) + "\n").encode('utf-8')
+                writer.write(f"{len(line):X}\r\n".encode('ascii') + line + b"\r\n")
+                index += 1
+            await writer.drain()
+            if job.finished and index >= len(job.events):
+                break
+            await job.wait_for_update()
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    async def _send_report(self, job: Job, writer: asyncio.StreamWriter) -> None:
+        """
+        返回作业的最终报告。
+        """
+        if job.status != COMPLETED or not job.report_path:
+            await self._send_json(writer, 409, {"error": f"作业 {job.job_id} 当前状态为 {job.status}，没有可用的报告"})
+            return
+        report = await asyncio.to_thread(_read_text, job.report_path)
+        await self._send(writer, 200, report.encode('utf-8'), "text/markdown; charset=utf-8")
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> Tuple[str, str, bytes]:
+        """
+        读取 HTTP 请求行、请求头和请求体。
+
+        异常：
+            ValueError: 请求格式不正确或请求体过大时抛出。
+        """
+        request_line = (await reader.readline()).decode('latin-1').strip()
+        try:
+            method, path, _ = request_line.split(' ', 2)
+        except ValueError:
+            raise ValueError(f"无效的请求行: {request_line!r}")
+        headers = {}
+        while True:
+            line = (await reader.readline()).decode('latin-1').strip()
+            if not line:
+                break
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+        length = int(headers.get('content-length') or 0)
+        if length > MAX_REQUEST_BODY:
+            raise ValueError(f"请求体超过 {MAX_REQUEST_BODY} 字节")
+        body = await reader.readexactly(length) if length else b''
+        return method.upper(), path, body
+
+    async def _send_json(self, writer: asyncio.StreamWriter, status: int, data: Any) -> None:
+        body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        await self._send(writer, status, body, "application/json; charset=utf-8")
+
+    async def _send(self, writer: asyncio.StreamWriter, status: int, body: bytes, content_type: str) -> None:
+        writer.write(
+            f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\nContent-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode('latin-1') + body
+        )
+        await writer.drain()
+
+
+def _is_within(path: str, directories: List[str]) -> bool:
+    return any(os.path.commonpath([path, directory]) == directory for directory in directories)
+
+
+def _read_text(path: str) -> str:
+    with open(path, 'r', encoding='utf-8') as file:
+        return file.read()
+
+
+async def serve(args: argparse.Namespace) -> None:
+    service = DagJobService(
+        default_dag_file=args.dag,
+        max_concurrent_jobs=args.max_concurrent,
+        broker_path=args.broker,
+        output_root=args.output_root,
+        dag_dirs=args.dag_dir,
+        docs_dirs=args.docs_dir
+    )
+    server = await service.start(args.host, args.port, args.unix)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="DAG编排作业服务")
+    parser.add_argument('--host', default="127.0.0.1", help="监听地址")
+    parser.add_argument('--port', type=int, default=8765, help="监听端口")
+    parser.add_argument('--unix', default=None, help="Unix套接字路径，指定后不监听TCP端口")
+    parser.add_argument('--dag', default="./data/dag.yml", help="默认DAG文件路径")
+    parser.add_argument('--max-concurrent', type=int, default=DEFAULT_MAX_CONCURRENT_JOBS, help="同时执行的作业数量上限")
+    parser.add_argument('--broker', default=None, help="任务代理数据库路径，指定后任务交由工作进程执行")
+    parser.add_argument('--dag-dir', action='append', default=None,
+                        help="允许提交的DAG文件目录，可重复指定，默认为 --dag 所在目录")
+    parser.add_argument('--docs-dir', action='append', default=None,
+                        help="运行参数 docs_folder 允许使用的目录，可重复指定，默认为 --dag 所在目录下的 docs 目录")
+    parser.add_argument('--output-root', default=None, help="运行输出根目录，默认为 ./data/runs")
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        logger.info("DAG作业服务已停止")
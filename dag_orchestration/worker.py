@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @Author  : justin.郑
+# @mail    : 3907721@qq.com
+# @Time    : 2026/10/19 15:20
+# @File    : worker
+# @desc    : DAG 工作进程，从任务代理领取任务、实例化智能体并回传结果
+
+
+import os
+import uuid
+import socket
+import asyncio
+import argparse
+import threading
+import multiprocessing
+from typing import Optional
+from utils.logger import logger
+from utils.message import Message
+from dag_orchestration.registry import registry
+from dag_orchestration.broker import TaskBroker
+from dag_orchestration.context import run_scope
+
+
+class DagWorker:
+    """
+    DAG 工作进程。
+
+    循环从任务代理领取任务，从智能体注册表的实例池借出智能体实例执行任务（实例在任务之间复用），
+    执行期间由后台线程定期发送心跳，保证CPU密集的任务也不会被误判为失联。
+    """
+    def __init__(self, broker_path: str, worker_id: Optional[str] = None, poll_interval: float = 1.0,
+                 heartbeat_interval: float = 5.0) -> None:
+        """
+        参数：
+            broker_path (str): 任务代理数据库路径。
+            worker_id (str): 工作进程ID，默认由主机名、PID和随机后缀组成。
+            poll_interval (float): 没有待执行任务时的轮询间隔（秒）。
+            heartbeat_interval (float): 心跳间隔（秒），应明显小于代理的心跳超时时间。
+        """
+        self.broker = TaskBroker(broker_path)
+        self.host = socket.gethostname()
+        self.pid = os.getpid()
+        self.worker_id = worker_id or f"{self.host}-{self.pid}-{uuid.uuid4().hex[:6]}"
+        self.name = f"DagWorker[{self.worker_id}]"
+        self.poll_interval = poll_interval
+        self.heartbeat_interval = heartbeat_interval
+        self._stopped = threading.Event()
+
+    def stop(self) -> None:
+        """
+        通知工作进程在完成当前任务后退出。
+        """
+        self._stopped.set()
+
+    async def run(self) -> None:
+        """
+        工作进程主循环。
+        """
+        logger.info(f"{self.name} 启动，任务代理: {self.broker.db_path}")
+        heartbeat_thread = threading.Thread(target=self._heartbeat_loop, daemon=True)
+        heartbeat_thread.start()
+        try:
+            while not self._stopped.is_set():
+                job = await asyncio.to_thread(self.broker.claim, self.worker_id)
+                if job is None:
+                    await asyncio.sleep(self.poll_interval)
+                    continue
+                await self._execute(job)
+        finally:
+            self._stopped.set()
+            logger.info(f"{self.name} 已退出")
+
+    async def _execute(self, job: dict) -> None:
+        """
+        执行领取到的任务并回传结果。
+
+        参数：
+            job (dict): 从任务代理领取的任务。
+        """
+        logger.info(f"{self.name} 领取任务 {job['task_id']}（第 {job['attempts']} 次尝试）")
+        try:
+            with registry.lease(job['agent'], job['agent_name'], job['options'], job['module']) as agent:
+                message = Message(content=job['payload'], sender=self.name, recipient=agent.name)
+                with run_scope(job['run_id']):
+                    result_message = await agent.process(message)
+            await asyncio.to_thread(self.broker.complete, job['job_id'], self.worker_id, result_message.content)
+            logger.info(f"{self.name} 完成任务 {job['task_id']}")
+        except Exception as e:
+            logger.error(f"{self.name} 执行任务 {job['task_id']} 失败: {e}")
+            await asyncio.to_thread(self.broker.fail, job['job_id'], self.worker_id, str(e))
+
+    def _heartbeat_loop(self) -> None:
+        """
+        后台心跳线程。
+        """
+        while not self._stopped.is_set():
+            try:
+                self.broker.heartbeat(self.worker_id, self.host, self.pid)
+            except Exception as e:
+                logger.warning(f"{self.name} 发送心跳失败: {e}")
+            self._stopped.wait(self.heartbeat_interval)
+
+
+def run_worker(broker_path: str, poll_interval: float = 1.0, heartbeat_interval: float = 5.0) -> None:
+    """
+    在当前进程中运行一个工作进程，直到被中断。
+    """
+    worker = DagWorker(broker_path, poll_interval=poll_interval, heartbeat_interval=heartbeat_interval)
+    try:
+        asyncio.run(worker.run())
+    except KeyboardInterrupt:
+        worker.stop()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="DAG 工作进程")
+    parser.add_argument('--broker', default='data/broker.db', help="任务代理数据库路径")
+    parser.add_argument('--processes', type=int, default=1, help="在本机启动的工作进程数量")
+    parser.add_argument('--poll-interval', type=float, default=1.0, help="空闲时的轮询间隔（秒）")
+    parser.add_argument('--heartbeat-interval', type=float, default=5.0, help="心跳间隔（秒）")
+    args = parser.parse_args()
+
+    if args.processes <= 1:
+        run_worker(args.broker, args.poll_interval, args.heartbeat_interval)
+    else:
+        processes = [
+            multiprocessing.Process(
+                target=run_worker, args=(args.broker, args.poll_interval, args.heartbeat_interval)
+            )
+            for _ in range(args.processes)
+        ]
+        for process in processes:
+            process.start()
+        try:
+            for process in processes:
+                process.join()
+        except KeyboardInterrupt:
+            for process in processes:
+                process.terminate()
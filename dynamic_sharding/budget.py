@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @Author  : justin.郑
+# @mail    : 3907721@qq.com
+# @Time    : 2026/10/20 01:00
+# @File    : budget
+# @desc    : 跨分片共享的全局并发预算：同时获取的实体数量与执行 WebAccess 的线程数量
+
+
+import asyncio
+import functools
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+
+# 默认同时获取的实体数量上限
+DEFAULT_MAX_IN_FLIGHT = 32
+
+
+class ConcurrencyBudget:
+    """
+    全局并发预算。一个协调器的所有分片和子代理共享一个实例：
+        - 同时执行的 WebAccess 调用不超过 max_in_flight 个，超出的在协程中等待，不占用线程；
+        - WebAccess 在专用的有界线程池中执行（不使用默认线程池），线程数不超过 max_threads。
+    """
+    def __init__(self, max_in_flight: int = DEFAULT_MAX_IN_FLIGHT, max_threads: Optional[int] = None) -> None:
+        """
+        Args:
+            max_in_flight (int): 同时获取的实体数量上限。
+            max_threads (Optional[int]): 执行 WebAccess 的线程数量上限，默认与 max_in_flight 相同。
+        """
+        self.max_in_flight = max(1, int(max_in_flight))
+        self.max_threads = max(1, int(max_threads or self.max_in_flight))
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_threads, thread_name_prefix="entity-lookup")
+
+    async def run_in_thread(self, func: Callable[..., Any], *args: Any) -> Any:
+        """
+        在预算内于线程池中执行阻塞函数。与 asyncio.to_thread 一样携带当前上下文（大模型调用计数等）。
+        """
+        async with self._semaphore:
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            try:
+                context = contextvars.copy_context()
+                return await asyncio.get_running_loop().run_in_executor(
+                    self._executor, functools.partial(context.run, func, *args)
+                )
+            finally:
+                self.in_flight -= 1
+
+    def close(self) -> None:
+        """
+        关闭线程池，不等待正在执行的调用。
+        """
+        self._executor.shutdown(wait=False)
@@ -8,68 +8,169 @@
 # @desc    :
 
 
-import asyncio
-from typing import List
+import math
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
 from utils.logger import logger
 from utils.message import Message
+from utils.concurrency import gather_bounded
 from dynamic_sharding.delegate import Delegate
+from dynamic_sharding.budget import ConcurrencyBudget
+from dynamic_sharding.entity_cache import EntityCache, EntityLookup, normalize_entity
+from dynamic_sharding.work_queue import WorkQueue, ResultCallback, DEFAULT_WORKERS, DEFAULT_MAX_WORKERS, DEFAULT_BATCH_SIZE
 
 
 class Coordinator:
-    def __init__(self, name: str):
+    def __init__(self, name: str, cache: Optional[EntityCache] = None, budget: Optional[ConcurrencyBudget] = None):
         """
         初始化 协调员
 
         Args:
             name (str): 智能体名.
+            cache (Optional[EntityCache]): 跨运行的实体信息缓存，为 None 时只合并同一实体的并发请求。
+            budget (Optional[ConcurrencyBudget]): 全局并发预算，默认按 DEFAULT_MAX_IN_FLIGHT 新建。
         """
         self.name = name
+        # 所有子代理共享：按归一化实体查询缓存、合并重复请求
+        self.entity_lookup = EntityLookup(cache)
+        # 所有分片和子代理共享：同时获取的实体数量和线程数量
+        self.budget = budget or ConcurrencyBudget()
         logger.info(f"{self.name} 初始化.")
 
+    def close(self) -> None:
+        """
+        释放并发预算中的线程池。
+        """
+        self.budget.close()
+
+    def _create_delegate(self, name: str) -> Delegate:
+        return Delegate(name=name, entity_lookup=self.entity_lookup, budget=self.budget)
+
     async def run(self, message: Message) -> Message:
         """
-        处理包含实体和分片大小的传入消息，根据分片大小对列表进行分片，动态创建子代理，并收集结果。
+        处理包含实体的传入消息，动态创建子代理获取实体信息，并按输入顺序汇总结果。
+
+        支持两种模式（消息中的 mode 字段）：
+            - queue（默认）：workers 个子代理从共享队列中按微批（batch_size）拉取实体，
+              adaptive 为真（默认）时按观测到的实体耗时调整批大小和子代理数量（不超过 max_workers）；
+            - static：按 shard_size 预先切分为固定分片，每个分片一个子代理。
 
         Args:
-            message (Message): 包含列表及分片大小的传入消息。
+            message (Message): 包含实体列表及调度参数的传入消息。
 
         Returns:
             Message: 输出消息。
         """
         logger.info(f"{self.name} 运行处理信息.")
         try:
-            # 从消息中获取实体列表和分片大小
+            # 从消息中获取实体列表和调度参数
             data = message.content
             entities: List[str] = data.get('entities', [])
-            shard_size: int = data.get('shard_size', 1)
 
             if not entities:
                 raise ValueError("No entities provided.")
 
-            # 对列表进行分片
-            shards = [entities[i:i + shard_size] for i in range(0, len(entities), shard_size)]
-            logger.info(f"将列表分片为 {len(shards)} 片.")
+            if data.get('mode', 'queue') == 'queue':
+                final_response = await self._run_work_queue(entities, data)
+            else:
+                final_response = await self._run_static_shards(entities, data.get('shard_size', 1), message.sender)
+
+            return Message(content=final_response, sender=self.name, recipient=message.sender)
+        except Exception as e:
+            logger.error(f"在 {self.name} 中发生错误: {e}")
+            return Message(content="发生错误，请稍后再试。", sender=self.name, recipient=message.sender)
 
-            tasks = []
-            for idx, shard in enumerate(shards):
-                agent_name = f"ShardProcessingAgent_{idx}"
-                # 创建子代理并处理每个分片
-                agent = Delegate(name=agent_name)
-                task = asyncio.create_task(
-                    agent.process(
-                        Message(content=shard, sender=self.name, recipient=message.sender)
-                    )
-                )
-                tasks.append(task)
+    async def _run_work_queue(self, entities: List[str], options: Dict[str, Any]) -> str:
+        """
+        以工作队列模式获取实体信息。归一化后相同的实体只获取一次，结果分发到每个原始输入位置。
 
-            sub_responses = await asyncio.gather(*tasks)
+        Args:
+            entities (List[str]): 实体列表。
+            options (Dict[str, Any]): 调度参数：workers、batch_size、max_workers、adaptive。
 
-            # 汇总结果
-            entity_info = [response.content for response in sub_responses if response.content]
+        Returns:
+            str: 按输入顺序汇总的实体信息。
+        """
+        positions: Dict[str, List[int]] = {}
+        unique: List[Tuple[str, str]] = []
+        for index, entity in enumerate(entities):
+            key = normalize_entity(entity)
+            if key not in positions:
+                positions[key] = []
+                unique.append((key, entity))
+            positions[key].append(index)
+        logger.info(f"以工作队列模式处理 {len(entities)} 个实体（去重后 {len(unique)} 个）.")
+        results: List[str] = [""] * len(entities)
 
-            final_response = "\n\n".join(entity_info)
+        def on_result(key: str, _: str, info: Optional[str], error: Optional[Exception]) -> None:
+            for index in positions[key]:
+                entity = entities[index]
+                results[index] = Delegate.format_info(entity, info) if error is None else Delegate.format_error(entity)
 
-            return Message(content=final_response, sender=self.name, recipient=message.sender)
-        except Exception as e:
-            logger.error(f"在 {self.name} 中发生错误: {e}")
-            return Message(content="发生错误，请稍后再试。", sender=self.name, recipient=message.sender)
\ No newline at end of file
+        options = dict(options, workers=min(options.get('workers', DEFAULT_WORKERS), len(unique)))
+        await self.stream(unique, on_result, options)
+        logger.info(self.entity_lookup.stats())
+        return "\n\n".join(info for info in results if info)
+
+    async def stream(
+        self,
+        items: Iterable[Tuple[Any, Any]],
+        on_result: ResultCallback,
+        options: Optional[Dict[str, Any]] = None,
+        fetch: Optional[Callable[[Delegate, Any], Awaitable[Any]]] = None
+    ) -> None:
+        """
+        以工作队列模式逐个获取实体信息，每个实体完成后立即回调，不在内存中汇总结果。
+
+        Args:
+            items (Iterable[Tuple[Any, Any]]): （键、实体）序列，按需惰性读取。
+            on_result (ResultCallback): 单个实体完成时的回调：(键, 实体, 信息, 异常)。
+            options (Optional[Dict[str, Any]]): 调度参数：workers、batch_size、max_workers、adaptive。
+            fetch (Optional[Callable[[Delegate, Any], Awaitable[Any]]]): 使用子代理获取单个实体的协程函数，
+                默认为 Delegate.lookup。
+        """
+        options = options or {}
+        # 超出并发预算的子代理只会排队等待，因此子代理数量不超过预算
+        max_in_flight = self.budget.max_in_flight
+        queue = WorkQueue(
+            worker_factory=lambda idx: self._create_delegate(f"QueueWorkerAgent_{idx}"),
+            fetch=fetch or (lambda agent, entity: agent.lookup(entity)),
+            workers=min(options.get('workers', DEFAULT_WORKERS), max_in_flight),
+            batch_size=options.get('batch_size', DEFAULT_BATCH_SIZE),
+            max_workers=min(options.get('max_workers', DEFAULT_MAX_WORKERS), max_in_flight),
+            adaptive=options.get('adaptive', True)
+        )
+        await queue.run(items, on_result)
+
+    async def _run_static_shards(self, entities: List[str], shard_size: int, sender: str) -> str:
+        """
+        以固定分片模式获取实体信息。
+
+        Args:
+            entities (List[str]): 实体列表。
+            shard_size (int): 每个分片的实体数量。
+            sender (str): 原始消息的发送者。
+
+        Returns:
+            str: 按输入顺序汇总的实体信息。
+        """
+        # 对列表进行分片
+        shards = [entities[i:i + shard_size] for i in range(0, len(entities), shard_size)]
+        # 同时处理的分片数量以填满并发预算为限，其余分片在前面的分片完成后才创建
+        shards_in_flight = math.ceil(self.budget.max_in_flight / shard_size)
+        logger.info(f"将列表分片为 {len(shards)} 片，同时处理 {shards_in_flight} 片.")
+
+        async def process_shard(entry: Tuple[int, List[str]]) -> Message:
+            idx, shard = entry
+            # 创建子代理并处理每个分片
+            agent = self._create_delegate(f"ShardProcessingAgent_{idx}")
+            return await agent.process(Message(content=shard, sender=self.name, recipient=sender))
+
+        sub_responses = await gather_bounded(enumerate(shards), process_shard, shards_in_flight)
+
+        # 汇总结果
+        entity_info = [
+            response.content for response in sub_responses
+            if isinstance(response, Message) and response.content
+        ]
+
+        return "\n\n".join(entity_info)
@@ -9,21 +9,32 @@
 
 
 import asyncio
-from typing import List
+from typing import List, Optional
 from utils.logger import logger
 from utils.message import Message
 from web_access.main import WebAccess
+from dynamic_sharding.budget import ConcurrencyBudget
+from dynamic_sharding.entity_cache import DegradedInfo, EntityLookup
 
 
 class Delegate:
-    def __init__(self, name: str) -> None:
+    def __init__(
+        self,
+        name: str,
+        entity_lookup: Optional[EntityLookup] = None,
+        budget: Optional[ConcurrencyBudget] = None
+    ) -> None:
         """
         初始化获取信息智能体
 
         Args:
             name (str): 智能体名.
+            entity_lookup (Optional[EntityLookup]): 与其他子代理共享的去重和缓存层，为 None 时每次都直接获取。
+            budget (Optional[ConcurrencyBudget]): 与其他子代理共享的全局并发预算，为 None 时使用默认线程池且不限并发。
         """
         self.name = name
+        self.entity_lookup = entity_lookup
+        self.budget = budget
         logger.info(f"{self.name} 初始化.")
 
 
@@ -69,12 +80,51 @@ class Delegate:
         Returns:
             str: 实体的相关信息。
         """
-        logger.info(f"{self.name} 获取 {entity} 的信息.")
         try:
-            # 调用 WebAccess 类来获取实体信息
-            info = await asyncio.to_thread(WebAccess().run, f"{entity} 消息")
-            return f"信息关于 {entity}:\n{info}"
+            return self.format_info(entity, await self.lookup(entity))
         except Exception as e:
             logger.error(f"{self.name} 获取 {entity} 的信息时出错: {str(e)}")
-            return f"获取 {entity} 的信息时出错。"
+            return self.format_error(entity)
+
+    async def lookup(self, entity: str) -> str:
+        """
+        获取实体的原始信息，出错时抛出异常。
+
+        Args:
+            entity (str): 要获取信息的实体。
+
+        Returns:
+            str: WebAccess 生成的实体信息摘要。
+        """
+        if self.entity_lookup is not None:
+            return await self.entity_lookup.fetch(entity, self._search)
+        return await self._search(entity)
+
+    async def _search(self, entity: str) -> str:
+        """
+        调用 WebAccess 获取实体信息。
+        """
+        logger.info(f"{self.name} 获取 {entity} 的信息.")
+        # 调用 WebAccess 类来获取实体信息
+        web_access = WebAccess()
+        if self.budget is not None:
+            info = await self.budget.run_in_thread(web_access.run, f"{entity} 消息")
+        else:
+            info = await asyncio.to_thread(web_access.run, f"{entity} 消息")
+        # 没有抓取到任何网页正文时，摘要只能基于空内容生成，标记为降级信息，缓存层只短期缓存
+        return DegradedInfo(info) if web_access.scraped_pages == 0 else info
+
+    @staticmethod
+    def format_info(entity: str, info: str) -> str:
+        """
+        把实体信息格式化为输出文本中的一段。
+        """
+        return f"信息关于 {entity}:\n{info}"
+
+    @staticmethod
+    def format_error(entity: str) -> str:
+        """
+        获取失败的实体在输出文本中的占位内容。
+        """
+        return f"获取 {entity} 的信息时出错。"
 
@@ -0,0 +1,210 @@
+#!/usr/bin/env python
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @Author  : justin.郑
+# @mail    : 3907721@qq.com
+# @Time    : 2026/10/20 00:20
+# @File    : entity_cache
+# @desc    : 实体归一化、同一实体的并发请求合并，以及跨运行的实体信息缓存
+
+
+import os
+import re
+import time
+import asyncio
+import sqlite3
+import threading
+import unicodedata
+from utils.logger import logger
+from typing import Awaitable, Callable, Dict, Optional
+
+
+# 默认的缓存数据库路径
+DEFAULT_CACHE_PATH = "../dynamic_sharding/data/entity_cache.db"
+# 默认的缓存有效期（秒）
+DEFAULT_CACHE_TTL = 7 * 24 * 3600
+# 降级结果（没有抓取到任何网页正文时生成的信息）的缓存有效期（秒），过期后重新获取
+DEFAULT_DEGRADED_TTL = 600
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_entity(entity: str) -> str:
+    """
+    归一化实体：全角/半角等兼容字符统一（NFKC）、合并连续空白、去除首尾空白并忽略大小写。
+
+    Args:
+        entity (str): 原始实体。
+
+    Returns:
+        str: 归一化后的实体，作为去重和缓存的键。
+    """
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFKC", entity)).strip().casefold()
+
+
+class DegradedInfo(str):
+    """
+    降级的实体信息：获取过程没有出错，但没有抓取到任何网页正文，信息只能基于空内容生成。
+    照常返回给调用方，缓存时只使用较短的有效期，之后的运行会重新获取。
+    """
+
+
+class EntityCache:
+    """
+    以归一化实体为键的实体信息缓存（SQLite），超过有效期的条目视为未命中。只缓存获取成功的信息，
+    条目可以单独指定有效期（用于降级结果）。
+    """
+    def __init__(self, db_path: str = DEFAULT_CACHE_PATH, ttl: float = DEFAULT_CACHE_TTL) -> None:
+        """
+        Args:
+            db_path (str): 缓存数据库路径。
+            ttl (float): 缓存有效期（秒）。
+        """
+        self.db_path = db_path
+        self.ttl = ttl
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entity_info ("
+            " key TEXT PRIMARY KEY, entity TEXT NOT NULL, info TEXT NOT NULL, fetched_at REAL NOT NULL, ttl REAL)"
+        )
+        # 旧版本创建的表没有 ttl 列
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(entity_info)")}
+        if 'ttl' not in columns:
+            self._conn.execute("ALTER TABLE entity_info ADD COLUMN ttl REAL")
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        返回未过期的缓存信息，没有、已过期或读取失败时返回 None。
+        """
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT info FROM entity_info WHERE key = ? AND fetched_at + COALESCE(ttl, ?) >= ?",
+                    (key, self.ttl, time.time())
+                ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"读取实体缓存 {self.db_path} 失败: {e}")
+            return None
+        return row[0] if row else None
+
+    def put(self, key: str, entity: str, info: str, ttl: Optional[float] = None) -> None:
+        """
+        写入（或覆盖）缓存信息，ttl 为该条目的有效期（秒），默认使用缓存的有效期。
+        """
+        try:
+            with self._lock:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO entity_info (key, entity, info, fetched_at, ttl) VALUES (?, ?, ?, ?, ?)",
+                    (key, entity, info, time.time(), ttl)
+                )
+                self._conn.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"写入实体缓存 {self.db_path} 失败: {e}")
+
+    def purge_expired(self) -> int:
+        """
+        删除已过期的条目，返回删除的数量。
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM entity_info WHERE fetched_at + COALESCE(ttl, ?) < ?", (self.ttl, time.time())
+            )
+            self._conn.commit()
+        return cursor.rowcount
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+class EntityLookup:
+    """
+    实体信息获取的去重层：同一实体正在获取（包括查询缓存）时后来的请求等待同一个结果，
+    按归一化实体查询缓存，未命中时才真正发起获取并写入缓存。一个协调器的所有子代理共享一个实例。
+
+    缓存的读写是同步的 SQLite 操作，在线程中执行，不阻塞事件循环。空信息不写入缓存，
+    降级信息（DegradedInfo）只按 degraded_ttl 短期缓存。
+    """
+    def __init__(self, cache: Optional[EntityCache] = None, degraded_ttl: float = DEFAULT_DEGRADED_TTL) -> None:
+        """
+        Args:
+            cache (Optional[EntityCache]): 跨运行的实体信息缓存，为 None 时只合并并发的重复请求。
+            degraded_ttl (float): 降级信息的缓存有效期（秒），0 表示不缓存。
+        """
+        self.cache = cache
+        self.degraded_ttl = degraded_ttl
+        self.hits = 0
+        self.coalesced = 0
+        self.misses = 0
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    async def fetch(self, entity: str, search: Callable[[str], Awaitable[str]]) -> str:
+        """
+        获取实体信息。
+
+        Args:
+            entity (str): 原始实体。
+            search (Callable[[str], Awaitable[str]]): 未命中时真正获取信息的协程函数。
+
+        Returns:
+            str: 实体信息。
+        """
+        key = normalize_entity(entity)
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.coalesced += 1
+            # shield：等待方被取消时不影响正在进行的获取
+            return await asyncio.shield(inflight)
+
+        # 先登记再查询缓存，查询期间到达的同一实体的请求也会合并
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        fetched = False
+        try:
+            info = await asyncio.to_thread(self.cache.get, key) if self.cache is not None else None
+            if info is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+                info = await search(entity)
+                fetched = True
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # 没有其他等待方时避免 "exception was never retrieved" 警告
+            future.exception()
+            raise
+        else:
+            future.set_result(info)
+        finally:
+            del self._inflight[key]
+
+        if fetched and self.cache is not None:
+            await self._store(key, entity, info)
+        return info
+
+    async def _store(self, key: str, entity: str, info: str) -> None:
+        """
+        把获取到的信息写入缓存：空信息不缓存，降级信息按 degraded_ttl 缓存。
+        """
+        if not info or not info.strip():
+            logger.info(f"{entity} 的信息为空，不写入缓存")
+            return
+        ttl = None
+        if isinstance(info, DegradedInfo):
+            if self.degraded_ttl <= 0:
+                return
+            ttl = self.degraded_ttl
+            logger.info(f"{entity} 的信息是在没有网页正文的情况下生成的，只缓存 {ttl:.0f} 秒")
+        await asyncio.to_thread(self.cache.put, key, entity, str(info), ttl)
+
+    def stats(self) -> str:
+        return f"缓存命中 {self.hits} 个，合并重复请求 {self.coalesced} 个，实际获取 {self.misses} 个"
@@ -0,0 +1,275 @@
+#!/usr/bin/env python
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @Author  : justin.郑
+# @mail    : 3907721@qq.com
+# @Time    : 2026/10/19 23:40
+# @File    : ledger
+# @desc    : 记录每个实体处理进度的台账，用于中断后续跑，以及失败原因的分类
+
+
+import os
+import time
+import errno
+import socket
+import asyncio
+import sqlite3
+import argparse
+import threading
+import requests
+from utils.logger import logger
+from web_access.fetcher import FetchError
+from typing import Any, Awaitable, Callable, Dict, Optional, Sequence, Tuple
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+
+# 每个实体的默认最大尝试次数（包括之前运行中的尝试）
+DEFAULT_MAX_ATTEMPTS = 3
+# 临时性错误重试前的基础等待时间（秒），按尝试次数指数增长
+RETRY_BACKOFF = 1.0
+
+# 错误分类：临时性错误可以重试，永久性错误重试也不会成功
+TRANSIENT = "transient"
+PERMANENT = "permanent"
+
+# 视为临时性错误的 HTTP 状态码
+TRANSIENT_STATUS_CODES = {408, 425, 429, 500, 502, 503, 504}
+# 视为临时性错误的系统错误码（连接被重置/拒绝、网络或主机不可达、超时），其余 OSError（文件不存在、权限不足等）为永久性错误
+TRANSIENT_ERRNOS = {
+    errno.ECONNRESET, errno.ECONNREFUSED, errno.ECONNABORTED, errno.EPIPE, errno.ETIMEDOUT,
+    errno.ENETDOWN, errno.ENETUNREACH, errno.ENETRESET, errno.EHOSTUNREACH, errno.EAGAIN,
+}
+
+# 超时和连接类异常（包括模型客户端使用的 httpx / aiohttp），无论是否带状态码都是临时性错误
+_TRANSIENT_TYPES: Tuple[type, ...] = (
+    TimeoutError, asyncio.TimeoutError, ConnectionError,
+    requests.Timeout, requests.ConnectionError, requests.exceptions.ChunkedEncodingError,
+)
+if httpx is not None:
+    _TRANSIENT_TYPES += (httpx.TimeoutException, httpx.NetworkError, httpx.RemoteProtocolError)
+if aiohttp is not None:
+    _TRANSIENT_TYPES += (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError)
+
+
+def classify_error(error: BaseException) -> str:
+    """
+    判断错误是临时性的（超时、连接失败、限流、服务端错误）还是永久性的。
+    只依据异常类型和异常上的状态码属性判断，不解析错误信息文本：
+    web_access 的 FetchError 直接使用其 transient 标记，超时和连接类异常为临时性错误，
+    其他异常按 status / status_code / response.status_code 判断，OSError 按错误码判断；
+    都无法判断时沿异常链（raise ... from e）查找原因，模型客户端包装的网络错误也能被识别为临时性错误。
+
+    Args:
+        error (BaseException): 获取实体信息时的异常。
+
+    Returns:
+        str: TRANSIENT 或 PERMANENT。
+    """
+    if isinstance(error, FetchError):
+        return TRANSIENT if error.transient else PERMANENT
+    if isinstance(error, _TRANSIENT_TYPES):
+        return TRANSIENT
+    status_code = getattr(getattr(error, 'response', None), 'status_code', None)
+    if status_code is None:
+        status_code = getattr(error, 'status_code', None) or getattr(error, 'status', None)
+    if isinstance(status_code, int):
+        return TRANSIENT if status_code in TRANSIENT_STATUS_CODES else PERMANENT
+    if isinstance(error, socket.gaierror):
+        # 只有域名解析暂时失败可以重试，域名不存在不能
+        return TRANSIENT if error.errno == socket.EAI_AGAIN else PERMANENT
+    if isinstance(error, OSError) and error.errno in TRANSIENT_ERRNOS:
+        return TRANSIENT
+    # 异常链中的原因（raise ... from e）决定被包装的错误的分类
+    cause = error.__cause__
+    if cause is not None and cause is not error:
+        return classify_error(cause)
+    return PERMANENT
+
+
+class EntityLedger:
+    """
+    实体处理台账。按输入文件的行号记录每个实体的状态（done/failed）、尝试次数、错误分类和结果在输出文件中的位置
+    （text 格式不写出失败条目，失败记录的位置为空）。没有记录的实体视为尚未处理。
+    """
+    def __init__(self, db_path: str) -> None:
+        """
+        Args:
+            db_path (str): 台账数据库路径。
+        """
+        self.db_path = db_path
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # 每个实体完成都会提交一次，WAL 模式下 NORMAL 同步级别即可保证进程崩溃后已提交的记录不丢失
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entities ("
+            " line INTEGER PRIMARY KEY, entity TEXT NOT NULL, status TEXT NOT NULL,"
+            " attempts INTEGER NOT NULL DEFAULT 0, error_class TEXT, error TEXT,"
+            " output_file TEXT, output_offset INTEGER, updated_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    @classmethod
+    def for_output_file(cls, output_file: str) -> 'EntityLedger':
+        """
+        返回与输出文件同目录的台账（例如 data/entity_info.jsonl 对应 data/entity_info.jsonl.ledger.db）。
+        """
+        return cls(f"{output_file}.ledger.db")
+
+    def reset(self) -> None:
+        """
+        清空台账，重新开始一个任务。
+        """
+        self._execute("DELETE FROM entities", ())
+
+    def pending_attempts(self, line: int, entity: str, max_attempts: int) -> Optional[int]:
+        """
+        判断续跑时是否需要处理该实体。
+
+        Args:
+            line (int): 实体所在行号。
+            entity (str): 实体。
+            max_attempts (int): 最大尝试次数。
+
+        Returns:
+            Optional[int]: 需要处理时返回已尝试的次数，否则返回 None
+                （已完成、永久性失败或已达到最大尝试次数）。
+        """
+        row = self._conn.execute(
+            "SELECT entity, status, attempts, error_class FROM entities WHERE line = ?", (line,)
+        ).fetchone()
+        # 没有记录，或输入文件在该行的内容已经变化
+        if row is None or row['entity'] != entity:
+            return 0
+        if row['status'] == 'done':
+            return None
+        if row['error_class'] == PERMANENT or row['attempts'] >= max_attempts:
+            return None
+        return row['attempts']
+
+    def record_done(self, line: int, entity: str, attempts: int, output_file: str, output_offset: int) -> None:
+        """
+        记录实体处理成功及结果在输出文件中的位置。
+        """
+        self._execute(
+            "INSERT OR REPLACE INTO entities (line, entity, status, attempts, output_file, output_offset, updated_at)"
+            " VALUES (?, ?, 'done', ?, ?, ?, ?)",
+            (line, entity, attempts, os.path.abspath(output_file), output_offset, time.time())
+        )
+
+    def record_failed(self, line: int, entity: str, attempts: int, error: BaseException,
+                      output_file: Optional[str] = None, output_offset: Optional[int] = None) -> None:
+        """
+        记录实体处理失败、尝试次数和错误分类。
+        """
+        self._execute(
+            "INSERT OR REPLACE INTO entities (line, entity, status, attempts, error_class, error,"
+            " output_file, output_offset, updated_at) VALUES (?, ?, 'failed', ?, ?, ?, ?, ?, ?)",
+            (line, entity, attempts, classify_error(error), str(error),
+             os.path.abspath(output_file) if output_file else None, output_offset, time.time())
+        )
+
+    def summary(self) -> Dict[str, int]:
+        """
+        按状态和错误分类统计实体数量，例如 {'done': 980, 'failed/transient': 15, 'failed/permanent': 5}。
+        """
+        rows = self._conn.execute(
+            "SELECT status, error_class, COUNT(*) AS n FROM entities GROUP BY status, error_class"
+        ).fetchall()
+        return {
+            (row['status'] if row['status'] == 'done' else f"{row['status']}/{row['error_class']}"): row['n']
+            for row in rows
+        }
+
+    def failures(self, limit: int = 20) -> Sequence[Dict[str, Any]]:
+        """
+        列出最近失败的实体。
+        """
+        rows = self._conn.execute(
+            "SELECT line, entity, attempts, error_class, error FROM entities WHERE status = 'failed'"
+            " ORDER BY updated_at DESC LIMIT ?", (limit,)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def _execute(self, sql: str, params: Sequence[Any]) -> None:
+        try:
+            with self._lock:
+                self._conn.execute(sql, params)
+                self._conn.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"写入台账 {self.db_path} 失败: {e}")
+
+
+class LookupFailed(Exception):
+    """
+    实体在允许的尝试次数内仍然获取失败。
+    """
+    def __init__(self, error: BaseException, attempts: int) -> None:
+        super().__init__(str(error))
+        self.error = error
+        self.attempts = attempts
+
+
+async def lookup_with_retry(lookup: Callable[[str], Awaitable[str]], entity: str, attempts: int, max_attempts: int) -> Tuple[str, int]:
+    """
+    获取实体信息，临时性错误按指数退避重试，直到达到最大尝试次数。
+
+    Args:
+        lookup (Callable[[str], Awaitable[str]]): 获取实体信息的协程函数。
+        entity (str): 实体。
+        attempts (int): 之前运行中已尝试的次数。
+        max_attempts (int): 最大尝试次数。
+
+    Returns:
+        Tuple[str, int]: 实体信息和累计尝试次数。
+
+    Raises:
+        LookupFailed: 永久性错误，或临时性错误达到最大尝试次数。
+    """
+    while True:
+        attempts += 1
+        try:
+            return await lookup(entity), attempts
+        except Exception as e:
+            if classify_error(e) == PERMANENT or attempts >= max_attempts:
+                raise LookupFailed(e, attempts) from e
+            delay = RETRY_BACKOFF * 2 ** (attempts - 1)
+            logger.warning(f"获取 {entity} 的信息时出现临时性错误（第 {attempts} 次）: {e}，{delay:.0f} 秒后重试")
+            await asyncio.sleep(delay)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="查看实体处理台账")
+    parser.add_argument("db_path", help="台账数据库路径")
+    parser.add_argument("--failures", type=int, default=20, help="列出最近失败的实体数量")
+    args = parser.parse_args()
+
+    ledger = EntityLedger(args.db_path)
+    try:
+        for status, count in sorted(ledger.summary().items()):
+            print(f"{status}\t{count}")
+        for failure in ledger.failures(args.failures):
+            print(f"{failure['line']}\t{failure['entity']}\t{failure['attempts']}\t{failure['error_class']}\t{failure['error']}")
+    finally:
+        ledger.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -9,33 +9,112 @@
 
 
 import asyncio
+import argparse
+from typing import Any, Optional, Tuple
 from utils.logger import logger
 from utils.message import Message
 from dynamic_sharding.coordinator import Coordinator
+from dynamic_sharding.streaming import OUTPUT_FORMATS, EntityWriter, iter_entities
+from dynamic_sharding.ledger import DEFAULT_MAX_ATTEMPTS, EntityLedger, LookupFailed, lookup_with_retry
+from web_access.limits import set_max_outbound
+from web_access.parsing import set_parse_workers
+from dynamic_sharding.budget import DEFAULT_MAX_IN_FLIGHT, ConcurrencyBudget
+from dynamic_sharding.entity_cache import DEFAULT_CACHE_PATH, DEFAULT_CACHE_TTL, EntityCache
+from dynamic_sharding.work_queue import DEFAULT_WORKERS, DEFAULT_MAX_WORKERS, DEFAULT_BATCH_SIZE
 
 
-async def run(input_file: str, output_file: str, shard_size: int = 3) -> None:
+async def run(
+    input_file: str,
+    output_file: str,
+    shard_size: int = 3,
+    mode: str = "queue",
+    workers: int = DEFAULT_WORKERS,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    adaptive: bool = True,
+    stream: bool = False,
+    output_format: str = "text",
+    resume: bool = False,
+    ledger_path: Optional[str] = None,
+    max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+    cache: bool = True,
+    cache_path: str = DEFAULT_CACHE_PATH,
+    cache_ttl: float = DEFAULT_CACHE_TTL,
+    max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+    max_threads: Optional[int] = None,
+    max_http: Optional[int] = None,
+    parse_workers: Optional[int] = None
+) -> None:
     """
     初始化协调器、处理输入数据，并将整合后的信息保存到输出文件中。
     Args:
         input_file (str): 输入文件的路径。
         output_file (str): 用于保存整合后信息的输出文件的路径。
-        shard_size (int): 用于处理的每个分片中的实体数量。
+        shard_size (int): static 模式下每个分片中的实体数量。
+        mode (str): queue（工作队列，默认）或 static（固定分片）。
+        workers (int): queue 模式下的初始子代理数量。
+        batch_size (int): queue 模式下每个子代理每次拉取的实体数量上限。
+        max_workers (int): queue 模式下自适应调整时的子代理数量上限。
+        adaptive (bool): queue 模式下是否按实体耗时自适应调整批大小和子代理数量。
+        stream (bool): 流式处理：逐行读取实体，每个实体完成后立即写出，内存占用与输入规模无关。
+            流式处理总是使用工作队列模式，条目按完成顺序写出。
+        output_format (str): 流式处理的输出格式，text（与整合文本一致）或 jsonl。
+        resume (bool): 续跑：根据台账只处理未完成或可重试的实体，结果追加到输出文件。隐含 stream。
+        ledger_path (Optional[str]): 流式处理的台账路径，默认为 <output_file>.ledger.db。
+        max_attempts (int): 每个实体的最大尝试次数（跨运行累计），临时性错误在此范围内重试。
+        cache (bool): 是否使用跨运行的实体信息缓存（按归一化实体），关闭时仍会合并同一实体的重复请求。
+        cache_path (str): 实体信息缓存的数据库路径。
+        cache_ttl (float): 实体信息缓存的有效期（秒）。
+        max_in_flight (int): 所有分片合计同时获取的实体数量上限。
+        max_threads (Optional[int]): 执行 WebAccess 的线程数量上限，默认与 max_in_flight 相同。
+        max_http (Optional[int]): 进程内出站 HTTP 请求的并发上限，默认沿用 web_access 的设置。
+        parse_workers (Optional[int]): 网页解析进程数量（0 表示在抓取线程中解析），默认沿用 web_access 的设置。
     """
+    if max_http is not None:
+        set_max_outbound(max_http)
+    if parse_workers is not None:
+        set_parse_workers(parse_workers)
+    entity_cache = EntityCache(cache_path, cache_ttl) if cache else None
+    coordinator = Coordinator(
+        name="CoordinatorAgent", cache=entity_cache, budget=ConcurrencyBudget(max_in_flight, max_threads)
+    )
+    try:
+        if stream or resume:
+            await run_streaming(
+                input_file, output_file, output_format,
+                {'workers': workers, 'batch_size': batch_size, 'max_workers': max_workers, 'adaptive': adaptive},
+                resume=resume, ledger_path=ledger_path, max_attempts=max_attempts, coordinator=coordinator
+            )
+        else:
+            await _run_batch(input_file, output_file, coordinator, {
+                'shard_size': shard_size,
+                'mode': mode,
+                'workers': workers,
+                'batch_size': batch_size,
+                'max_workers': max_workers,
+                'adaptive': adaptive
+            })
+        logger.info(f"同时获取的实体数量峰值: {coordinator.budget.peak_in_flight}（上限 {max_in_flight}）")
+    finally:
+        coordinator.close()
+        if entity_cache is not None:
+            entity_cache.close()
 
+
+async def _run_batch(input_file: str, output_file: str, coordinator: Coordinator, options: dict) -> None:
+    """
+    一次性读入全部实体，处理完成后整体写出。
+    """
     with open(input_file, 'r', encoding='utf-8') as file:
         entities = [line.strip() for line in file.readlines()]
 
-    # 创建包含实体和分片大小的消息
-    message_content = {
-        'entities': entities,
-        'shard_size': shard_size
-    }
+    # 创建包含实体和调度参数的消息
+    message_content = {'entities': entities, **options}
 
     message = Message(content=message_content, sender="User", recipient="CoordinatorAgent")
 
     # 通过智能体处理该消息并获取响应
-    response = await Coordinator(name="CoordinatorAgent").run(message)
+    response = await coordinator.run(message)
 
     # 将响应内容写入输出文件
     with open(output_file, 'w', encoding='utf-8') as file:
@@ -44,13 +123,127 @@ async def run(input_file: str, output_file: str, shard_size: int = 3) -> None:
     logger.info(f"整合后的信息已保存到 {output_file}")
 
 
+async def run_streaming(
+    input_file: str,
+    output_file: str,
+    output_format: str,
+    options: dict,
+    resume: bool = False,
+    ledger_path: Optional[str] = None,
+    max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+    coordinator: Optional[Coordinator] = None
+) -> None:
+    """
+    流式处理实体文件：输入按需读取，结果逐条写出并刷新到输出文件，同时在台账中记录每个实体的状态，
+    临时性错误在最大尝试次数内按指数退避重试。
+
+    Args:
+        input_file (str): 输入文件的路径。
+        output_file (str): 输出文件的路径。
+        output_format (str): text 或 jsonl。
+        options (dict): 工作队列的调度参数。
+        resume (bool): 根据台账续跑，结果追加到输出文件；否则清空台账并覆盖输出文件。
+        ledger_path (Optional[str]): 台账路径，默认为 <output_file>.ledger.db。
+        max_attempts (int): 每个实体的最大尝试次数。
+        coordinator (Optional[Coordinator]): 使用的协调器（决定实体信息缓存），默认新建一个不带缓存的协调器。
+    """
+    owns_coordinator = coordinator is None
+    coordinator = coordinator or Coordinator(name="CoordinatorAgent")
+    ledger = EntityLedger(ledger_path) if ledger_path else EntityLedger.for_output_file(output_file)
+    if not resume:
+        ledger.reset()
+    skipped = 0
+
+    def items():
+        nonlocal skipped
+        for line, entity in iter_entities(input_file):
+            attempts = ledger.pending_attempts(line, entity, max_attempts) if resume else 0
+            if attempts is None:
+                skipped += 1
+                continue
+            yield line, (entity, attempts)
+
+    async def fetch(agent, item: Tuple[str, int]) -> Tuple[str, int]:
+        entity, attempts = item
+        return await lookup_with_retry(agent.lookup, entity, attempts, max_attempts)
+
+    def on_result(line: int, item: Tuple[str, int], result: Optional[Tuple[str, int]], error: Optional[Exception]) -> None:
+        entity, attempts = item
+        if error is None:
+            info, attempts = result
+            offset = writer.write(line, entity, info)
+            ledger.record_done(line, entity, attempts, output_file, offset)
+            return
+        if isinstance(error, LookupFailed):
+            error, attempts = error.error, error.attempts
+        else:
+            attempts += 1
+        offset = writer.write(line, entity, None, error)
+        ledger.record_failed(line, entity, attempts, error, output_file, offset)
+
+    try:
+        with EntityWriter(output_file, output_format, append=resume) as writer:
+            await coordinator.stream(items(), on_result, options, fetch=fetch)
+        logger.info(
+            f"已流式写出 {writer.written} 个实体的信息（失败 {writer.failed} 个，续跑跳过 {skipped} 个）到 {output_file}，"
+            f"{coordinator.entity_lookup.stats()}，台账统计: {ledger.summary()}"
+        )
+    finally:
+        ledger.close()
+        if owns_coordinator:
+            coordinator.close()
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="动态分片获取实体信息")
+    parser.add_argument("--input", default="../dynamic_sharding/data/entities.txt", help="每行一个实体的输入文件")
+    parser.add_argument("--output", default="../dynamic_sharding/data/entity_info.txt", help="输出文件")
+    parser.add_argument("--mode", choices=["queue", "static"], default="queue", help="工作队列或固定分片模式")
+    parser.add_argument("--shard-size", type=int, default=3, help="static 模式下每个分片中的实体数量")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="初始子代理数量")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="每个子代理每次拉取的实体数量上限")
+    parser.add_argument("--max-workers", type=int, default=DEFAULT_MAX_WORKERS, help="自适应调整时的子代理数量上限")
+    parser.add_argument("--no-adaptive", action="store_true", help="关闭按耗时自适应调整")
+    parser.add_argument("--stream", action="store_true", help="流式读取实体并逐条写出结果")
+    parser.add_argument("--format", choices=OUTPUT_FORMATS, default="text", help="流式处理的输出格式")
+    parser.add_argument("--resume", action="store_true", help="根据台账续跑未完成或可重试的实体（隐含 --stream）")
+    parser.add_argument("--ledger", default=None, help="台账路径，默认为 <output>.ledger.db")
+    parser.add_argument("--max-attempts", type=int, default=DEFAULT_MAX_ATTEMPTS, help="每个实体的最大尝试次数")
+    parser.add_argument("--no-cache", action="store_true", help="不使用跨运行的实体信息缓存")
+    parser.add_argument("--cache-path", default=DEFAULT_CACHE_PATH, help="实体信息缓存的数据库路径")
+    parser.add_argument("--cache-ttl", type=float, default=DEFAULT_CACHE_TTL, help="实体信息缓存的有效期（秒）")
+    parser.add_argument("--max-in-flight", type=int, default=DEFAULT_MAX_IN_FLIGHT, help="同时获取的实体数量上限")
+    parser.add_argument("--max-threads", type=int, default=None, help="执行 WebAccess 的线程数量上限")
+    parser.add_argument("--max-http", type=int, default=None, help="出站 HTTP 请求的并发上限")
+    parser.add_argument("--parse-workers", type=int, default=None, help="网页解析进程数量，0 表示在抓取线程中解析")
+    return parser.parse_args()
+
+
 if __name__ == "__main__":
     """
     主函数入口，执行动态分片处理流程。
     """
-    input_file = "../dynamic_sharding/data/entities.txt"
-    output_file = "../dynamic_sharding/data/entity_info.txt"
-    shard_size = 3  # 每个分片中的实体数量
-
-    asyncio.run(run(input_file, output_file, shard_size))
+    args = parse_args()
+    asyncio.run(run(
+        args.input,
+        args.output,
+        shard_size=args.shard_size,
+        mode=args.mode,
+        workers=args.workers,
+        batch_size=args.batch_size,
+        max_workers=args.max_workers,
+        adaptive=not args.no_adaptive,
+        stream=args.stream,
+        output_format=args.format,
+        resume=args.resume,
+        ledger_path=args.ledger,
+        max_attempts=args.max_attempts,
+        cache=not args.no_cache,
+        cache_path=args.cache_path,
+        cache_ttl=args.cache_ttl,
+        max_in_flight=args.max_in_flight,
+        max_threads=args.max_threads,
+        max_http=args.max_http,
+        parse_workers=args.parse_workers
+    ))
 
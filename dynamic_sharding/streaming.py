@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @Author  : justin.郑
+# @mail    : 3907721@qq.com
+# @Time    : 2026/10/19 23:10
+# @File    : streaming
+# @desc    : 逐行读取实体、逐条写出实体信息，内存占用与输入规模无关
+
+
+import json
+from typing import Iterator, Optional, Tuple
+from dynamic_sharding.delegate import Delegate
+
+
+# 支持的输出格式：text 与原有的整合文本一致，jsonl 每行一个实体
+OUTPUT_FORMATS = ("text", "jsonl")
+
+
+def iter_entities(input_file: str) -> Iterator[Tuple[int, str]]:
+    """
+    按需逐行读取实体文件，跳过空行。
+
+    Args:
+        input_file (str): 每行一个实体的输入文件。
+
+    Returns:
+        Iterator[Tuple[int, str]]: （行号（从 1 开始）、实体）。
+    """
+    with open(input_file, 'r', encoding='utf-8') as file:
+        for line_no, line in enumerate(file, start=1):
+            entity = line.strip()
+            if entity:
+                yield line_no, entity
+
+
+class EntityWriter:
+    """
+    实体信息的增量写出器。每个实体完成后立即写入并刷新到文件，进程中途退出时已完成的结果不会丢失。
+
+    条目按完成顺序写出；jsonl 格式中的 line 字段为实体在输入文件中的行号，可据此还原输入顺序。
+    text 格式只写出成功的实体，失败只记录在台账中，续跑重试成功的实体不会在输出中出现两次；
+    jsonl 格式写出失败记录（status 为 error），续跑时同一行号以最后一条记录为准。
+    """
+    def __init__(self, output_file: str, output_format: str = "text", append: bool = False) -> None:
+        """
+        Args:
+            output_file (str): 输出文件路径。
+            output_format (str): text 或 jsonl。
+            append (bool): 追加到已有的输出文件（续跑时使用），否则覆盖。
+        """
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"不支持的输出格式: {output_format}，可选 {', '.join(OUTPUT_FORMATS)}")
+        self.output_file = output_file
+        self.output_format = output_format
+        self.written = 0
+        self.failed = 0
+        self._file = open(output_file, 'a' if append else 'w', encoding='utf-8')
+        self._empty = self._file.tell() == 0
+
+    def write(self, line_no: int, entity: str, info: Optional[str], error: Optional[Exception] = None) -> Optional[int]:
+        """
+        写出一个实体的结果。
+
+        Args:
+            line_no (int): 实体在输入文件中的行号。
+            entity (str): 实体。
+            info (Optional[str]): 实体信息，获取失败时为 None。
+            error (Optional[Exception]): 获取失败时的异常。
+
+        Returns:
+            Optional[int]: 该条目在输出文件中的起始字节位置，没有写出（text 格式的失败条目）时为 None。
+        """
+        if error is not None:
+            self.failed += 1
+            if self.output_format == "text":
+                return None
+        offset = self._file.tell()
+        if self.output_format == "jsonl":
+            record = {"line": line_no, "entity": entity}
+            if error is None:
+                record.update(status="ok", info=info)
+            else:
+                record.update(status="error", error=str(error))
+            self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        else:
+            text = Delegate.format_info(entity, info)
+            if not self._empty:
+                self._file.write("\n\n")
+                offset = self._file.tell()
+            self._file.write(text)
+        self._file.flush()
+        self._empty = False
+        self.written += 1
+        return offset
+
+    def close(self) -> None:
+        self._file.close()
+
+    def __enter__(self) -> "EntityWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
@@ -0,0 +1,207 @@
+#!/usr/bin/env python
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @Author  : justin.郑
+# @mail    : 3907721@qq.com
+# @Time    : 2026/10/19 22:40
+# @File    : work_queue
+# @desc    : 多个子代理从共享队列中拉取实体的工作队列，按观测到的实体耗时自适应调整批大小和子代理数量
+
+
+import time
+import asyncio
+import statistics
+from collections import deque
+from utils.logger import logger
+from typing import Any, Awaitable, Callable, Deque, Iterable, List, Optional, Set, Tuple
+
+
+# 默认的初始子代理数量
+DEFAULT_WORKERS = 4
+# 默认的子代理数量上限
+DEFAULT_MAX_WORKERS = 16
+# 默认的微批大小（每个子代理每次拉取的实体数量）
+DEFAULT_BATCH_SIZE = 1
+# 批内最慢实体耗时超过中位数的该倍数时，认为存在拖尾实体并缩小批大小
+STRAGGLER_RATIO = 2.0
+# 平均耗时不超过基线的该倍数时继续增加子代理
+SCALE_UP_RATIO = 1.5
+# 平均耗时超过基线的该倍数时减少子代理（不少于初始数量）
+SCALE_DOWN_RATIO = 2.0
+# 耗时指数移动平均的平滑系数
+EWMA_ALPHA = 0.3
+
+# 单个实体完成时的回调：(键, 实体, 结果, 异常)
+ResultCallback = Callable[[Any, Any, Optional[Any], Optional[Exception]], None]
+
+
+class WorkQueue:
+    """
+    实体工作队列。
+
+    子代理从共享队列中按微批拉取实体，批内实体并发获取，处理完一批后立即拉取下一批，
+    不再按固定分片把慢实体和其他实体绑在一起，总耗时接近平均耗时而不是最慢分片的耗时。
+
+    开启自适应后：
+        - 批内最慢实体明显慢于中位数时批大小减半，否则逐步恢复到配置的批大小；
+        - 实体耗时（批内中位数的移动平均，不受个别拖尾实体影响）接近历史最低水平时增加子代理
+          （不超过上限），耗时明显上升（下游服务趋于饱和）时减少子代理（不少于初始数量）。
+    """
+    def __init__(
+        self,
+        worker_factory: Callable[[int], Any],
+        fetch: Callable[[Any, Any], Awaitable[Any]],
+        workers: int = DEFAULT_WORKERS,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        adaptive: bool = True
+    ) -> None:
+        """
+        Args:
+            worker_factory (Callable[[int], Any]): 按序号创建子代理。
+            fetch (Callable[[Any, Any], Awaitable[Any]]): 使用子代理获取单个实体信息的协程函数，参数为（子代理、实体）。
+            workers (int): 初始子代理数量。
+            batch_size (int): 微批大小上限。
+            max_workers (int): 自适应时的子代理数量上限。
+            adaptive (bool): 是否按观测到的耗时调整批大小和子代理数量。
+        """
+        self.worker_factory = worker_factory
+        self.fetch = fetch
+        self.workers = max(1, int(workers))
+        self.batch_size = max(1, int(batch_size))
+        self.max_workers = max(self.workers, int(max_workers))
+        self.adaptive = adaptive
+
+        self._pending: Deque[Tuple[Any, Any]] = deque()
+        self._items: Optional[Iterable[Tuple[Any, Any]]] = None
+        self._on_result: Optional[ResultCallback] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self._next_worker_id = 0
+        self._active = 0
+        self._current_batch = self.batch_size
+        self._latency: Optional[float] = None
+        self._baseline: Optional[float] = None
+
+    async def run(self, items: Iterable[Tuple[Any, Any]], on_result: ResultCallback) -> None:
+        """
+        处理所有实体，每个实体完成后调用 on_result(键, 实体, 结果, 异常)。
+        获取成功时异常为 None，失败时结果为 None。
+
+        读取输入序列、创建子代理或 on_result 抛出异常时，取消其余子代理并重新抛出第一个异常，
+        调用方不会把只处理了一部分的结果当作完整结果。
+
+        Args:
+            items (Iterable[Tuple[Any, Any]]): （键、实体）序列，按需惰性读取，不会一次性载入内存。
+            on_result (ResultCallback): 单个实体完成时的回调。
+        """
+        self._items = iter(items)
+        self._on_result = on_result
+        for _ in range(self.workers):
+            self._spawn_worker()
+        try:
+            while self._tasks:
+                done, _ = await asyncio.wait(set(self._tasks), return_when=asyncio.FIRST_COMPLETED)
+                self._tasks -= done
+                errors = [task.exception() for task in done if task.exception() is not None]
+                if errors:
+                    logger.error(f"工作队列中的子代理异常退出: {errors[0]}")
+                    raise errors[0]
+        finally:
+            tasks, self._tasks = self._tasks, set()
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _spawn_worker(self) -> None:
+        worker_id = self._next_worker_id
+        self._next_worker_id += 1
+        self._active += 1
+        self._tasks.add(asyncio.create_task(self._worker(worker_id)))
+
+    def _take_batch(self) -> List[Tuple[Any, Any]]:
+        """
+        从队列中取出一批实体，队列为空时从输入序列中继续读取。
+        """
+        batch = []
+        while len(batch) < self._current_batch:
+            if self._pending:
+                batch.append(self._pending.popleft())
+                continue
+            item = next(self._items, None)
+            if item is None:
+                break
+            batch.append(item)
+        return batch
+
+    def _has_more(self) -> bool:
+        """
+        判断是否还有待处理的实体（会预读一个实体放回队列）。
+        """
+        if self._pending:
+            return True
+        item = next(self._items, None)
+        if item is None:
+            return False
+        self._pending.append(item)
+        return True
+
+    async def _worker(self, worker_id: int) -> None:
+        """
+        子代理循环：拉取微批、并发获取批内实体、上报结果，并按耗时调整批大小和子代理数量。
+        """
+        try:
+            agent = self.worker_factory(worker_id)
+            while True:
+                batch = self._take_batch()
+                if not batch:
+                    return
+                # 等批内的实体都结束后再抛出回调中的异常，不留下仍在运行的获取任务
+                outcomes = await asyncio.gather(
+                    *(self._fetch_one(agent, key, entity) for key, entity in batch), return_exceptions=True
+                )
+                for outcome in outcomes:
+                    if isinstance(outcome, BaseException):
+                        raise outcome
+                latencies = outcomes
+                if self.adaptive and self._adapt(latencies):
+                    logger.info(f"实体耗时上升，子代理 {worker_id} 退出，剩余 {self._active - 1} 个")
+                    return
+        finally:
+            self._active -= 1
+
+    async def _fetch_one(self, agent: Any, key: Any, entity: Any) -> float:
+        """
+        获取单个实体的信息并上报结果，返回耗时（秒）。
+        """
+        started_at = time.perf_counter()
+        try:
+            result = await self.fetch(agent, entity)
+        except Exception as e:
+            logger.error(f"获取 {entity} 的信息时出错: {e}")
+            self._on_result(key, entity, None, e)
+        else:
+            self._on_result(key, entity, result, None)
+        return time.perf_counter() - started_at
+
+    def _adapt(self, latencies: List[float]) -> bool:
+        """
+        根据一批实体的耗时调整批大小，并决定是否增加子代理或让当前子代理退出。
+
+        Returns:
+            bool: 当前子代理是否应当退出。
+        """
+        median = statistics.median(latencies)
+        self._latency = median if self._latency is None else EWMA_ALPHA * median + (1 - EWMA_ALPHA) * self._latency
+        self._baseline = self._latency if self._baseline is None else min(self._baseline, self._latency)
+
+        if len(latencies) > 1 and max(latencies) > STRAGGLER_RATIO * median:
+            self._current_batch = max(1, self._current_batch // 2)
+        elif self._current_batch < self.batch_size:
+            self._current_batch += 1
+
+        if self._latency > SCALE_DOWN_RATIO * self._baseline and self._active > self.workers:
+            return True
+        if self._latency <= SCALE_UP_RATIO * self._baseline and self._active < self.max_workers and self._has_more():
+            self._spawn_worker()
+            logger.info(f"实体平均耗时 {self._latency:.2f}s，增加子代理至 {self._active} 个")
+        return False
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @Author  : justin.郑
+# @mail    : 3907721@qq.com
+# @Time    : 2026/10/21 16:00
+# @File    : conftest
+# @desc    : 协调器测试共用的测试智能体和 DAG 构造方法
+
+
+import pytest
+
+
+# 测试智能体模块，DAG 任务通过 `module: dag_test_agents` 引用
+AGENT_MODULE = '''
+import asyncio
+from utils.message import Message
+
+# 每次调用记录（智能体名称、输入内容）
+calls = []
+
+
+class SourceAgent:
+    """
+    输出 {"items": ...}：运行参数中的 items 优先于构造参数。
+    """
+    def __init__(self, name, items=None, delay=0.0, concurrency=None):
+        self.name = name
+        self.items = items or []
+        self.delay = delay
+
+    async def process(self, message):
+        params = message.content if isinstance(message.content, dict) else {}
+        calls.append((self.name, message.content))
+        await asyncio.sleep(self.delay)
+        content = {"items": list(params.get("items", self.items)), "tag": params.get("tag")}
+        return Message(content=content, sender=self.name, recipient=message.sender)
+
+
+class ItemAgent:
+    """
+    把输入中 items 的每个元素乘以 2；元素等于 fail_on 时抛出异常。
+    """
+    def __init__(self, name, fail_on=None, delay=0.0, concurrency=None):
+        self.name = name
+        self.fail_on = fail_on
+        self.delay = delay
+
+    async def process(self, message):
+        items = message.content["items"]
+        calls.append((self.name, list(items)))
+        await asyncio.sleep(self.delay)
+        if self.fail_on is not None and self.fail_on in items:
+            raise RuntimeError(f"无法处理元素 {self.fail_on}")
+        return Message(content={"items": [item * 2 for item in items]}, sender=self.name, recipient=message.sender)
+
+
+class EchoAgent:
+    """
+    原样返回输入。
+    """
+    def __init__(self, name, delay=0.0, concurrency=None):
+        self.name = name
+        self.delay = delay
+
+    async def process(self, message):
+        calls.append((self.name, message.content))
+        await asyncio.sleep(self.delay)
+        return Message(content=message.content, sender=self.name, recipient=message.sender)
+'''
+
+
+@pytest.fixture(scope="session")
+def _agent_module_dir(tmp_path_factory):
+    directory = tmp_path_factory.mktemp("agents")
+    (directory / "dag_test_agents.py").write_text(AGENT_MODULE, encoding="utf-8")
+    return directory
+
+
+@pytest.fixture
+def test_agents(_agent_module_dir, monkeypatch):
+    """
+    导入测试智能体模块，返回模块对象（calls 已清空）。
+    """
+    monkeypatch.syspath_prepend(str(_agent_module_dir))
+    import dag_test_agents
+    dag_test_agents.calls.clear()
+    return dag_test_agents
+
+
+@pytest.fixture
+def make_coordinator(test_agents, tmp_path):
+    """
+    按 YAML 文本创建协调器，DAG 文件、耗时记录和运行历史都写在临时目录中。
+    """
+    from dag_orchestration.coordinator import CoordinatorAgent
+
+    def make(dag_yaml, **kwargs):
+        dag_file = tmp_path / "dag.yml"
+        dag_file.write_text(dag_yaml, encoding="utf-8")
+        kwargs.setdefault("record_history", False)
+        return CoordinatorAgent(name="Coordinator", dag_file=str(dag_file), **kwargs)
+    return make
@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @Author  : justin.郑
+# @mail    : 3907721@qq.com
+# @Time    : 2026/10/20 10:10
+# @File    : test_broker
+# @desc    : TaskBroker 的发布、领取、回传和心跳超时重新分配
+
+
+import time
+import pytest
+from dag_orchestration.broker import COMPLETED, FAILED, PENDING, RUNNING, TaskBroker
+
+
+@pytest.fixture
+def broker(tmp_path):
+    return TaskBroker(str(tmp_path / "broker.db"), heartbeat_timeout=0.05)
+
+
+def _publish(broker, task_id='t1', **kwargs):
+    return broker.publish('run-1', task_id, 'EchoAgent', 'echo', {'text': '你好'}, options={'k': 1}, **kwargs)
+
+
+def test_claim_returns_published_task(broker):
+    job_id = _publish(broker)
+    job = broker.claim('w1')
+    assert job['job_id'] == job_id
+    assert job['payload'] == {'text': '你好'}
+    assert job['options'] == {'k': 1}
+    assert job['attempts'] == 1
+    assert broker.get(job_id)['status'] == RUNNING
+    assert broker.claim('w2') is None
+
+
+def test_claim_in_publish_order(broker):
+    first = _publish(broker, 't1')
+    second = _publish(broker, 't2')
+    assert [broker.claim('w1')['job_id'], broker.claim('w2')['job_id']] == [first, second]
+
+
+def test_complete_and_fail(broker):
+    done, failed = _publish(broker, 't1'), _publish(broker, 't2')
+    broker.claim('w1')
+    broker.claim('w1')
+    assert broker.complete(done, 'w1', {'answer': 42})
+    assert broker.fail(failed, 'w1', 'boom')
+    assert broker.get(done)['status'] == COMPLETED
+    assert broker.get(done)['result'] == {'answer': 42}
+    assert broker.get(failed)['status'] == FAILED
+    assert broker.get(failed)['error'] == 'boom'
+
+
+def test_only_owner_can_finish(broker):
+    job_id = _publish(broker)
+    broker.claim('w1')
+    assert not broker.complete(job_id, 'w2', 'stolen')
+    assert broker.get(job_id)['status'] == RUNNING
+    assert broker.complete(job_id, 'w1', 'ok')
+    assert not broker.complete(job_id, 'w1', 'again')
+
+
+def test_stale_task_is_requeued_then_failed(broker):
+    job_id = _publish(broker, max_attempts=2)
+    broker.claim('w1')
+    time.sleep(0.1)
+    assert broker.requeue_stale() == 1
+    assert broker.get(job_id)['status'] == PENDING
+    # 被重新分配后原工作进程的结果不再被接受
+    assert not broker.complete(job_id, 'w1', 'late')
+
+    job = broker.claim('w2')
+    assert job['attempts'] == 2
+    time.sleep(0.1)
+    assert broker.requeue_stale() == 1
+    assert broker.get(job_id)['status'] == FAILED
+
+
+def test_heartbeat_keeps_task_running(broker):
+    job_id = _publish(broker)
+    broker.claim('w1')
+    time.sleep(0.1)
+    broker.heartbeat('w1', 'host', 1)
+    assert broker.requeue_stale() == 0
+    assert broker.get(job_id)['status'] == RUNNING
+
+
+def test_delete_discards_task(broker):
+    pending, running = _publish(broker, 't1'), _publish(broker, 't2')
+    broker.claim('w1')
+    broker.delete(pending)
+    broker.delete(running)
+    assert broker.get(pending) is None
+    assert broker.claim('w1') is None
+    # 协调器放弃等待后，工作进程回传的结果被忽略
+    assert not broker.complete(running, 'w1', 'late')
+
+
+def test_purge_finished(broker):
+    done, pending = _publish(broker, 't1'), _publish(broker, 't2')
+    broker.claim('w1')
+    broker.complete(done, 'w1', 'ok')
+    assert broker.purge_finished() == 0
+    time.sleep(0.05)
+    assert broker.purge_finished(max_age=0.01) == 1
+    assert broker.get(done) is None
+    assert broker.get(pending)['status'] == PENDING
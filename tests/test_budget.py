@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @Author  : justin.郑
+# @mail    : 3907721@qq.com
+# @Time    : 2026/10/20 17:00
+# @File    : test_budget
+# @desc    : 全局并发预算：同时获取的实体数量、线程数量、上下文传递，以及协调器内所有子代理共享预算
+
+
+import sys
+import time
+import types
+import asyncio
+import threading
+import contextvars
+import pytest
+from dynamic_sharding.budget import ConcurrencyBudget
+
+try:
+    import Agently  # noqa: F401
+except ImportError:
+    # WebAccess 被替换，不需要模型依赖
+    sys.modules.setdefault("Agently", types.ModuleType("Agently"))
+from dynamic_sharding import delegate
+from dynamic_sharding.coordinator import Coordinator
+
+
+@pytest.fixture
+def budget():
+    budget = ConcurrencyBudget(max_in_flight=3, max_threads=2)
+    yield budget
+    budget.close()
+
+
+def test_limits_in_flight_calls_and_threads(budget):
+    threads = set()
+
+    def work(i):
+        threads.add(threading.current_thread().name)
+        time.sleep(0.02)
+        return i * 2
+
+    async def scenario():
+        return await asyncio.gather(*(budget.run_in_thread(work, i) for i in range(10)))
+
+    assert asyncio.run(scenario()) == [i * 2 for i in range(10)]
+    # 线程池只有两个线程，同时在途的调用仍受 max_in_flight 限制
+    assert budget.peak_in_flight == 3
+    assert budget.in_flight == 0
+    assert len(threads) <= 2
+    assert all(name.startswith("entity-lookup") for name in threads)
+
+
+def test_defaults_threads_to_in_flight_limit():
+    budget = ConcurrencyBudget(max_in_flight=0)
+    try:
+        assert (budget.max_in_flight, budget.max_threads) == (1, 1)
+    finally:
+        budget.close()
+
+
+def test_propagates_context_and_exceptions(budget):
+    var = contextvars.ContextVar("var", default=None)
+
+    def fail():
+        raise ValueError(var.get())
+
+    async def scenario():
+        var.set("调用方的上下文")
+        with pytest.raises(ValueError, match="调用方的上下文"):
+            await budget.run_in_thread(fail)
+
+    asyncio.run(scenario())
+    assert budget.in_flight == 0
+
+
+def test_all_delegates_share_the_coordinator_budget(monkeypatch):
+    lock = threading.Lock()
+    state = {"running": 0, "peak": 0}
+
+    class FakeWebAccess:
+        scraped_pages = 1
+
+        def run(self, query):
+            with lock:
+                state["running"] += 1
+                state["peak"] = max(state["peak"], state["running"])
+            time.sleep(0.02)
+            with lock:
+                state["running"] -= 1
+            return f"{query}的摘要"
+
+    monkeypatch.setattr(delegate, "WebAccess", FakeWebAccess)
+    coordinator = Coordinator(name="Coordinator", budget=ConcurrencyBudget(max_in_flight=2))
+    results = {}
+
+    def on_result(key, entity, info, error):
+        results[key] = info if error is None else error
+
+    items = [(i, f"实体{i}") for i in range(8)]
+    try:
+        asyncio.run(coordinator.stream(items, on_result, {"workers": 8, "max_workers": 8, "adaptive": False}))
+    finally:
+        coordinator.close()
+
+    assert results == {i: f"实体{i} 消息的摘要" for i in range(8)}
+    assert state["peak"] <= 2
+    assert coordinator.budget.peak_in_flight <= 2
@@ -0,0 +1,163 @@
+#!/usr/bin/env python
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @Author  : justin.郑
+# @mail    : 3907721@qq.com
+# @Time    : 2026/10/21 17:10
+# @File    : test_chunking
+# @desc    : 长文档分块、分组打包、去重合并，以及 ExtractAgent / SummarizeAgent 的分块 map-reduce
+
+
+import sys
+import types
+import asyncio
+import pytest
+from utils.chunking import merge_unique, pack_by_tokens, split_text
+from utils.concurrency import gather_grouped
+from utils.message import Message
+from utils.tokens import estimate_tokens
+
+try:
+    import Agently  # noqa: F401
+except ImportError:
+    # 大模型调用在测试中被替换，不需要模型依赖
+    sys.modules.setdefault("Agently", types.ModuleType("Agently"))
+from dag_orchestration.agents import extract, preprocess, summarize
+
+
+TEXT = "".join(f"第{i}句话讲述了一件事情。" for i in range(200)) + "\n" + "long" * 500
+
+
+def test_short_text_is_a_single_chunk():
+    assert split_text("短文本。", max_tokens=100) == ["短文本。"]
+
+
+def test_chunks_without_overlap_reassemble_the_text():
+    chunks = split_text(TEXT, max_tokens=100, overlap_tokens=0)
+    assert len(chunks) > 1
+    assert "".join(chunks) == TEXT
+    assert all(estimate_tokens(chunk) <= 100 for chunk in chunks)
+    # 优先在句末断开
+    assert all(chunk.endswith("。") for chunk in chunks[:5])
+
+
+def test_overlapping_chunks_share_sentences():
+    chunks = split_text(TEXT, max_tokens=100, overlap_tokens=30)
+    assert all(estimate_tokens(chunk) <= 100 for chunk in chunks)
+    first_sentence_of_second = chunks[1].split("。")[0] + "。"
+    assert first_sentence_of_second in chunks[0]
+
+
+def test_pack_by_tokens_always_shrinks():
+    texts = ["摘要" * 40] * 5
+    groups = pack_by_tokens(texts, max_tokens=10)
+    assert [len(group) for group in groups] == [2, 2, 1]
+    assert sum(groups, []) == texts
+    assert pack_by_tokens(["a", "b", "c"], max_tokens=100) == [["a", "b", "c"]]
+
+
+def test_merge_unique():
+    assert merge_unique([["Alice", "Bob "], ["alice", "Carol", ""], None]) == ["Alice", "Bob ", "Carol"]
+
+
+def test_gather_grouped_keeps_groups_and_errors():
+    async def worker(item):
+        if item == "bad":
+            raise ValueError(item)
+        return item.upper()
+
+    results = asyncio.run(gather_grouped([["a", "b"], [], ["bad", "c"]], worker, limit=2))
+    assert results[0] == ["A", "B"] and results[1] == []
+    assert isinstance(results[2][0], ValueError) and results[2][1] == "C"
+
+
+@pytest.fixture
+def no_llm(monkeypatch):
+    monkeypatch.setattr(extract.ChatModel, "get_agent_factory", lambda self, *args, **kwargs: None)
+
+
+def _docs():
+    return {"preprocessed_docs": [
+        {"id": "doc1", "title": "长文档", "content": TEXT},
+        {"id": "doc2", "title": "短文档", "content": "短文档内容。"},
+    ]}
+
+
+def test_preprocess_cleans_chunks_in_order(no_llm):
+    agent = preprocess.PreprocessAgent("preprocess", chunk_tokens=200)
+
+    async def fake_clean(doc_id, doc_title, doc_content):
+        await asyncio.sleep(0.01 if "第1/" in doc_title else 0)
+        return doc_content.strip()
+    agent._clean_document_content = fake_clean
+
+    docs = {"docs": _docs()["preprocessed_docs"]}
+    result = asyncio.run(agent.process(Message(content=docs, sender="c", recipient="preprocess"))).content
+    cleaned = {doc["id"]: doc["content"] for doc in result["preprocessed_docs"]}
+    # 预处理的分块不重叠，清洗结果按分块顺序拼接
+    assert cleaned["doc1"] == "\n".join(chunk.strip() for chunk in split_text(TEXT, 200, 0))
+    assert cleaned["doc2"] == "短文档内容。"
+
+
+def test_extract_unions_chunk_results(no_llm):
+    agent = extract.ExtractAgent("extract", chunk_tokens=200, chunk_overlap=0)
+    calls = []
+
+    async def fake_extract(doc_id, title, content):
+        calls.append((doc_id, title))
+        index = sum(1 for call in calls if call[0] == doc_id)
+        return {"characters": ["主角", f"配角{index % 2}"], "themes": ["成长"], "plot_points": [title]}
+    agent._extract_key_information = fake_extract
+
+    result = asyncio.run(agent.process(Message(content=_docs(), sender="c", recipient="extract"))).content
+    items = {item["id"]: item["key_info"][0] for item in result["extracted_items"]}
+    chunk_count = len(split_text(TEXT, 200, 0))
+    assert sum(1 for doc_id, _ in calls if doc_id == "doc1") == chunk_count
+    assert items["doc1"]["characters"] == ["主角", "配角1", "配角0"]
+    assert items["doc1"]["themes"] == ["成长"]
+    assert items["doc1"]["plot_points"][0] == f"长文档（第1/{chunk_count}部分）"
+    assert items["doc2"]["plot_points"] == ["短文档"]
+
+
+def test_extract_keeps_documents_with_partial_chunk_failures(no_llm):
+    agent = extract.ExtractAgent("extract", chunk_tokens=200, chunk_overlap=0)
+
+    async def fake_extract(doc_id, title, content):
+        if "第1/" in title or doc_id == "doc2":
+            raise RuntimeError("提取失败")
+        return {"characters": ["主角"], "themes": [], "plot_points": []}
+    agent._extract_key_information = fake_extract
+
+    result = asyncio.run(agent.process(Message(content=_docs(), sender="c", recipient="extract"))).content
+    assert [item["id"] for item in result["extracted_items"]] == ["doc1"]
+
+
+def test_summarize_reduces_chunks_to_one_summary(no_llm):
+    agent = summarize.SummarizeAgent("summarize", chunk_tokens=200, chunk_overlap=20, concurrency=3)
+    calls = []
+
+    async def fake_summary(doc_id, doc_title, doc_content):
+        calls.append(doc_title)
+        return f"{doc_id}摘要" * 30
+    agent._generate_summary = fake_summary
+
+    result = asyncio.run(agent.process(Message(content=_docs(), sender="c", recipient="summarize"))).content
+    assert [item["doc_name"] for item in result["summaries"]] == ["doc1", "doc2"]
+    assert calls.count("短文档") == 1
+    # 长文档的分块摘要经过至少一轮合并
+    assert any("各部分摘要" in title for title in calls)
+    chunk_count = len(split_text(TEXT, 200, 20))
+    assert sum(1 for title in calls if title.startswith("长文档（第")) == chunk_count
+
+
+def test_summarize_drops_documents_whose_chunks_fail(no_llm):
+    agent = summarize.SummarizeAgent("summarize", chunk_tokens=200, chunk_overlap=0)
+
+    async def fake_summary(doc_id, doc_title, doc_content):
+        if doc_id == "doc1" and "第2/" in doc_title:
+            raise RuntimeError("摘要失败")
+        return "摘要"
+    agent._generate_summary = fake_summary
+
+    result = asyncio.run(agent.process(Message(content=_docs(), sender="c", recipient="summarize"))).content
+    assert result["summaries"] == [{"doc_name": "doc2", "summary": "摘要"}]
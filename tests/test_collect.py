@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @Author  : justin.郑
+# @mail    : 3907721@qq.com
+# @Time    : 2026/10/21 10:00
+# @File    : test_collect
+# @desc    : CollectAgent 的文档ID分配、读取失败和增量采集中途失败时的清理
+
+
+import sys
+import types
+import asyncio
+import pytest
+
+try:
+    import Agently  # noqa: F401
+except ImportError:
+    # 标题提取在测试中被替换，不需要模型依赖
+    sys.modules.setdefault("Agently", types.ModuleType("Agently"))
+from dag_orchestration.agents import collect
+from dag_orchestration.ingest import CorpusManifest
+from utils.message import Message
+
+
+@pytest.fixture
+def make_agent(monkeypatch, tmp_path):
+    monkeypatch.setattr(collect.ChatModel, "get_agent_factory", lambda self, *args, **kwargs: None)
+
+    def make(**options):
+        options.setdefault("manifest_path", str(tmp_path / "manifest.db"))
+        return collect.CollectAgent("collect", **options)
+    return make
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    root = tmp_path / "corpus"
+    root.mkdir()
+    for name in ("a", "b", "c"):
+        (root / f"{name}.txt").write_text(f"{name} 文档", encoding="utf-8")
+    return root
+
+
+async def _no_titles(docs, llm_slots=None):
+    return {}
+
+
+def test_collect_numbers_documents_in_order(make_agent, corpus):
+    agent = make_agent()
+    agent._extract_titles = _no_titles
+    result = asyncio.run(agent.process(Message(content={"docs_folder": str(corpus)}, sender="user", recipient="collect")))
+    assert [(doc["id"], doc["title"]) for doc in result.content["docs"]] == [
+        ("doc1", "a"), ("doc2", "b"), ("doc3", "c")
+    ]
+
+
+def test_collect_fails_on_unreadable_document(make_agent, corpus):
+    # 与原实现一致：任一文档读取失败时整个任务失败，而不是跳过后留下ID空洞
+    (corpus / "b.txt").write_bytes(b"\xff\xfe invalid utf-8")
+    agent = make_agent()
+    agent._extract_titles = _no_titles
+    with pytest.raises(RuntimeError, match="b.txt"):
+        asyncio.run(agent.process(Message(content={"docs_folder": str(corpus)}, sender="user", recipient="collect")))
+
+
+def test_incremental_failure_cancels_title_tasks(make_agent, corpus, tmp_path):
+    (corpus / "c.txt").write_bytes(b"\xff\xfe invalid utf-8")
+    agent = make_agent(incremental=True, title_max_batch=1)
+    started, cancelled = [], []
+
+    async def slow_titles(docs, llm_slots=None):
+        started.append([doc["id"] for doc in docs])
+        try:
+            await asyncio.Event().wait()
+        except asyncio.CancelledError:
+            cancelled.append([doc["id"] for doc in docs])
+            raise
+    agent._extract_titles = slow_titles
+
+    with pytest.raises(RuntimeError, match="文档预处理失败"):
+        asyncio.run(agent.process(Message(content={"docs_folder": str(corpus)}, sender="user", recipient="collect")))
+    assert started and sorted(cancelled) == sorted(started)
+
+    manifest = CorpusManifest(str(tmp_path / "manifest.db"))
+    try:
+        assert manifest.get(str(corpus / "a.txt")) is None
+    finally:
+        manifest.close()
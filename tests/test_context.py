@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @Author  : justin.郑
+# @mail    : 3907721@qq.com
+# @Time    : 2026/10/21 18:10
+# @File    : test_context
+# @desc    : 运行上下文：同一协调器上并发运行之间的结果、状态、输出目录和运行ID互不影响
+
+
+import os
+import asyncio
+from dag_orchestration.context import RunContext, current_run_id, run_scope
+from dag_orchestration.dag import compile_dag
+
+
+DAG = '''
+tasks:
+  - {id: source, name: Source, agent: SourceAgent, module: dag_test_agents, options: {delay: 0.02}}
+  - {id: double, name: Double, agent: ItemAgent, module: dag_test_agents, dependencies: [source],
+     options: {fail_on: 2, delay: 0.02}}
+'''
+
+
+def test_run_scope_is_task_local():
+    seen = {}
+
+    async def probe(name):
+        await asyncio.sleep(0)
+        seen[name] = current_run_id()
+
+    async def main():
+        with run_scope("run-a"):
+            task_a = asyncio.create_task(probe("a"))
+        with run_scope("run-b"):
+            task_b = asyncio.create_task(probe("b"))
+        await asyncio.gather(task_a, task_b)
+
+    asyncio.run(main())
+    assert seen == {"a": "run-a", "b": "run-b"} and current_run_id() is None
+
+
+def test_context_state_and_listeners(tmp_path):
+    definition = compile_dag({"tasks": [{"id": "a", "name": "A", "agent": "X"},
+                                        {"id": "b", "name": "B", "agent": "X", "dependencies": ["a"]}]})
+    ctx = RunContext(definition, {"p": 1}, output_root=str(tmp_path), run_id="r1")
+    events = []
+    ctx.listeners.append(lambda task_id, state: events.append((task_id, state)))
+    ctx.listeners.append(lambda task_id, state: 1 / 0)
+    ctx.set_state("a", "running")
+    assert events == [("a", "running")] and ctx.states == {"a": "running", "b": "pending"}
+    assert ctx.pending_consumers == {"a": 1, "b": 0}
+    assert ctx.output_dir == os.path.join(str(tmp_path), "r1") and os.path.isdir(ctx.output_dir)
+    ctx.close()
+
+
+def test_concurrent_runs_are_isolated(make_coordinator, tmp_path):
+    coordinator = make_coordinator(DAG, output_root=str(tmp_path / "runs"))
+    ctx_ok = coordinator.create_context({"items": [1, 3], "tag": "ok"})
+    ctx_bad = coordinator.create_context({"items": [2], "tag": "bad"})
+
+    async def main():
+        await asyncio.gather(coordinator.execute(ctx_ok), coordinator.execute(ctx_bad))
+
+    try:
+        asyncio.run(main())
+        assert ctx_ok.output() == {"items": [2, 6]}
+        assert ctx_ok.states == {"source": "completed", "double": "completed"}
+        assert ctx_bad.output() is None
+        assert ctx_bad.states == {"source": "completed", "double": "failed"}
+        assert ctx_ok.run_id != ctx_bad.run_id and ctx_ok.output_dir != ctx_bad.output_dir
+        # 共享的 DAG 定义不被运行修改
+        assert coordinator.definition.tasks["source"].get("options") == {"delay": 0.02}
+    finally:
+        ctx_ok.close()
+        ctx_bad.close()
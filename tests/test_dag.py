@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @Author  : justin.郑
+# @mail    : 3907721@qq.com
+# @Time    : 2026/10/21 15:00
+# @File    : test_dag
+# @desc    : DAG 定义的校验、输出任务确定、拓扑排序、关键路径与向上秩，以及历史耗时记录
+
+
+import json
+import pytest
+from dag_orchestration.dag import (
+    DEFAULT_TASK_DURATION, MAX_DURATION_SAMPLES, DagValidationError, TaskDurationStore,
+    compile_dag, describe_plan, load_dag
+)
+
+
+def _task(task_id, *dependencies, **extra):
+    return {"id": task_id, "name": f"{task_id}_agent", "agent": "Agent", "dependencies": list(dependencies), **extra}
+
+
+def _diamond():
+    # a -> b -> d, a -> c -> d
+    return {"tasks": [_task("a"), _task("b", "a"), _task("c", "a"), _task("d", "b", "c")]}
+
+
+def test_compile_orders_tasks_and_finds_single_sink():
+    definition = compile_dag(_diamond())
+    assert definition.order == ("a", "b", "c", "d")
+    assert definition.output == "d"
+    assert definition.successors() == {"a": ["b", "c"], "b": ["d"], "c": ["d"], "d": []}
+    # 编译后的定义只读
+    with pytest.raises(TypeError):
+        definition.tasks["e"] = {}
+
+
+@pytest.mark.parametrize("dag_data, message", [
+    (None, "非空的 tasks"),
+    ({"tasks": []}, "非空的 tasks"),
+    ({"tasks": ["a"]}, "不是映射类型"),
+    ({"tasks": [{"id": "a", "name": "n"}]}, "缺少字段: agent"),
+    ({"tasks": [_task("a"), _task("a")]}, "任务ID重复"),
+    ({"tasks": [_task("a", options=[1])]}, "options 必须是映射类型"),
+    ({"tasks": [_task("a", dependencies="b")]}, "dependencies 必须是列表"),
+    ({"tasks": [_task("a", "a")]}, "不能依赖自身"),
+    ({"tasks": [_task("a", "missing")]}, "不存在的任务 missing"),
+    ({"tasks": [_task("a"), _task("b", "a", "a")]}, "重复的依赖项"),
+    ({"tasks": [_task("a", "c"), _task("b", "a"), _task("c", "b"), _task("d", "c")]}, "循环依赖"),
+    ({"tasks": [_task("a"), _task("b")]}, "多个汇点任务"),
+    ({"tasks": [_task("a")], "output": "missing"}, "输出任务 missing 不存在"),
+    ({"tasks": [_task("a")], "results": []}, "results 必须是映射类型"),
+    ({"tasks": [_task("a")], "max_parallel_tasks": 0}, "max_parallel_tasks 必须是正整数"),
+    ({"tasks": [_task("a")], "max_parallel_tasks": True}, "max_parallel_tasks 必须是正整数"),
+    ({"tasks": [_task("a", gather="concat")]}, "gather 只能与 foreach 一起使用"),
+    ({"tasks": [_task("a"), _task("b", foreach="c.items")]}, "非依赖任务 c"),
+])
+def test_validation_errors(dag_data, message):
+    with pytest.raises(DagValidationError, match=message):
+        compile_dag(dag_data)
+
+
+def test_explicit_output_allows_multiple_sinks():
+    definition = compile_dag({"tasks": [_task("a"), _task("b")], "output": "b"})
+    assert definition.output == "b"
+
+
+def test_cycle_error_names_only_tasks_on_the_cycle():
+    with pytest.raises(DagValidationError) as info:
+        compile_dag({"tasks": [_task("a"), _task("b", "a", "c"), _task("c", "b")], "output": "c"})
+    assert "b, c" in str(info.value) and "a" not in str(info.value).split("涉及任务:")[1]
+
+
+def test_critical_path_and_upward_ranks():
+    definition = compile_dag(_diamond())
+    durations = {"a": 1.0, "b": 5.0, "c": 2.0, "d": 1.0}
+    assert definition.critical_path(durations) == (7.0, ["a", "b", "d"])
+    assert definition.upward_ranks(durations) == {"a": 7.0, "b": 6.0, "c": 3.0, "d": 1.0}
+    # 没有历史耗时的任务按默认耗时估算
+    assert definition.critical_path() == (3 * DEFAULT_TASK_DURATION, ["a", "b", "d"])
+
+
+def test_critical_path_ends_at_output_task():
+    definition = compile_dag({"tasks": [_task("a"), _task("b", "a"), _task("long")], "output": "b"})
+    assert definition.critical_path({"long": 100.0}) == (2 * DEFAULT_TASK_DURATION, ["a", "b"])
+
+
+def test_load_dag_reports_file(tmp_path):
+    dag_file = tmp_path / "dag.yml"
+    dag_file.write_text("tasks:\n  - {id: a, name: n, agent: A, dependencies: [b]}\n", encoding="utf-8")
+    with pytest.raises(DagValidationError, match="dag.yml 校验失败"):
+        load_dag(str(dag_file))
+
+
+def test_duration_store(tmp_path):
+    store = TaskDurationStore.for_dag_file(str(tmp_path / "dag.yml"))
+    assert store.path == str(tmp_path / "dag.durations.json")
+    for duration in (1.0, 3.0, 2.0):
+        store.record("a", duration)
+    for i in range(MAX_DURATION_SAMPLES + 5):
+        store.record("b", float(i))
+    store.save()
+
+    reloaded = TaskDurationStore(store.path)
+    assert reloaded.estimates()["a"] == 2.0
+    assert len(json.loads((tmp_path / "dag.durations.json").read_text(encoding="utf-8"))["b"]) == MAX_DURATION_SAMPLES
+
+    (tmp_path / "broken.json").write_text("{", encoding="utf-8")
+    assert TaskDurationStore(str(tmp_path / "broken.json")).estimates() == {}
+
+
+def test_describe_plan():
+    plan = describe_plan(compile_dag(_diamond()), {"a": 1.0, "b": 5.0})
+    assert "预计总耗时: 7.00 秒" in plan
+    assert "关键路径: a(1.00s) -> b(5.00s) -> d(1.00s)" in plan
+    assert "无历史耗时" in plan and "c, d" in plan
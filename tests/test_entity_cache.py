@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @Author  : justin.郑
+# @mail    : 3907721@qq.com
+# @Time    : 2026/10/20 16:40
+# @File    : test_entity_cache
+# @desc    : 实体归一化、并发请求合并、缓存有效期和降级信息的短期缓存
+
+
+import types
+import asyncio
+import pytest
+from dynamic_sharding import entity_cache
+from dynamic_sharding.entity_cache import DegradedInfo, EntityCache, EntityLookup, normalize_entity
+
+
+class Clock:
+    """
+    替换 entity_cache 模块中的 time.time，手动推进时间。
+    """
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(entity_cache, "time", types.SimpleNamespace(time=clock.time))
+    return clock
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = EntityCache(str(tmp_path / "cache" / "entity_cache.db"), ttl=3600)
+    yield cache
+    cache.close()
+
+
+def counting_search(calls, result=None, gate=None):
+    async def search(entity):
+        calls.append(entity)
+        if gate is not None:
+            await gate.wait()
+        return f"{entity}的信息" if result is None else result
+    return search
+
+
+def test_normalize_entity():
+    assert normalize_entity("  Apple　 Inc ") == "apple inc"
+    assert normalize_entity("ＡＢＣ１２３") == "abc123"
+    assert normalize_entity("北京") == normalize_entity(" 北京\n")
+
+
+def test_concurrent_requests_for_same_entity_are_coalesced():
+    calls = []
+
+    async def scenario():
+        gate = asyncio.Event()
+        lookup = EntityLookup()
+        search = counting_search(calls, gate=gate)
+        tasks = [asyncio.create_task(lookup.fetch(entity, search)) for entity in ("Apple", " apple", "APPLE", "Google")]
+        await asyncio.sleep(0)
+        gate.set()
+        return lookup, await asyncio.gather(*tasks)
+
+    lookup, results = asyncio.run(scenario())
+
+    # 归一化后相同的实体只获取一次，都拿到第一个请求的结果
+    assert calls == ["Apple", "Google"]
+    assert results == ["Apple的信息"] * 3 + ["Google的信息"]
+    assert (lookup.misses, lookup.coalesced, lookup.hits) == (2, 2, 0)
+
+
+def test_failure_reaches_all_waiters_and_is_not_cached(cache):
+    calls = []
+
+    async def failing(entity):
+        calls.append(entity)
+        await asyncio.sleep(0.01)
+        raise RuntimeError("获取失败")
+
+    async def scenario():
+        lookup = EntityLookup(cache)
+        results = await asyncio.gather(lookup.fetch("北京", failing), lookup.fetch("北京", failing), return_exceptions=True)
+        # 失败后不再登记为进行中，下一次请求重新获取
+        again = await lookup.fetch("北京", counting_search(calls))
+        return results, again
+
+    results, again = asyncio.run(scenario())
+
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert calls == ["北京", "北京"]
+    assert again == "北京的信息"
+
+
+def test_cancelled_waiter_does_not_cancel_the_fetch():
+    calls = []
+
+    async def scenario():
+        gate = asyncio.Event()
+        lookup = EntityLookup()
+        search = counting_search(calls, gate=gate)
+        owner = asyncio.create_task(lookup.fetch("北京", search))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(lookup.fetch("北京", search))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        gate.set()
+        return await owner, waiter
+
+    result, waiter = asyncio.run(scenario())
+
+    assert result == "北京的信息"
+    assert waiter.cancelled()
+    assert calls == ["北京"]
+
+
+def test_cache_hit_until_ttl_expires(cache, clock):
+    calls = []
+    search = counting_search(calls)
+
+    asyncio.run(EntityLookup(cache).fetch("北京", search))
+    clock.now += 3599
+    second = EntityLookup(cache)
+    assert asyncio.run(second.fetch(" 北京 ", search)) == "北京的信息"
+    assert calls == ["北京"]
+    assert second.hits == 1
+
+    clock.now += 2
+    asyncio.run(EntityLookup(cache).fetch("北京", search))
+    assert calls == ["北京", "北京"]
+
+
+def test_degraded_info_uses_short_ttl(cache, clock):
+    calls = []
+    search = counting_search(calls, result=DegradedInfo("没有网页正文"))
+    lookup = EntityLookup(cache, degraded_ttl=60)
+
+    asyncio.run(lookup.fetch("北京", search))
+    clock.now += 59
+    asyncio.run(lookup.fetch("北京", search))
+    assert calls == ["北京"]
+
+    clock.now += 2
+    asyncio.run(lookup.fetch("北京", search))
+    assert calls == ["北京", "北京"]
+    assert cache.purge_expired() == 0
+
+
+def test_empty_and_uncacheable_degraded_info_are_not_stored(cache):
+    calls = []
+    asyncio.run(EntityLookup(cache).fetch("北京", counting_search(calls, result="  ")))
+    asyncio.run(EntityLookup(cache, degraded_ttl=0).fetch("上海", counting_search(calls, result=DegradedInfo("降级"))))
+
+    assert cache.get(normalize_entity("北京")) is None
+    assert cache.get(normalize_entity("上海")) is None
+
+
+def test_purge_expired(cache, clock):
+    cache.put("a", "a", "信息")
+    cache.put("b", "b", "信息", ttl=10)
+    clock.now += 11
+
+    assert cache.purge_expired() == 1
+    assert cache.get("a") == "信息"
+    assert cache.get("b") is None
@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @Author  : justin.郑
+# @mail    : 3907721@qq.com
+# @Time    : 2026/10/21 16:10
+# @File    : test_fanout
+# @desc    : foreach 路径解析、子任务输入替换、gather 归并，以及协调器中的扇出执行
+
+
+import asyncio
+import pytest
+from dag_orchestration.fanout import gather_results, load_reducer, parse_foreach, replace_items, resolve_items
+
+
+def test_parse_foreach():
+    assert parse_foreach("task1.docs") == ("task1", ["docs"])
+    assert parse_foreach("task1.data.docs") == ("task1", ["data", "docs"])
+    with pytest.raises(ValueError):
+        parse_foreach("task1")
+
+
+def test_resolve_and_replace_single_dependency():
+    inputs = {"data": {"docs": [1, 2, 3], "meta": "m"}}
+    assert resolve_items(inputs, ["t1"], "t1.data.docs") == [1, 2, 3]
+    replaced = replace_items(inputs, ["t1"], "t1.data.docs", [2])
+    assert replaced == {"data": {"docs": [2], "meta": "m"}}
+    # 原输入不被修改
+    assert inputs["data"]["docs"] == [1, 2, 3]
+
+
+def test_resolve_and_replace_multiple_dependencies():
+    inputs = {"t1": {"docs": [1, 2]}, "t2": {"other": True}}
+    assert resolve_items(inputs, ["t1", "t2"], "t1.docs") == [1, 2]
+    assert replace_items(inputs, ["t1", "t2"], "t1.docs", [1]) == {"t1": {"docs": [1]}, "t2": {"other": True}}
+
+
+@pytest.mark.parametrize("inputs, path, message", [
+    ({"docs": [1]}, "t1.missing", "不存在"),
+    ({"docs": "not a list"}, "t1.docs", "不是列表"),
+    ({"docs": [1]}, "t9.docs", "不是当前任务的依赖"),
+])
+def test_resolve_errors(inputs, path, message):
+    with pytest.raises(ValueError, match=message):
+        resolve_items(inputs, ["t1"], path)
+
+
+def test_gather_concat():
+    outputs = [{"docs": [1], "meta": "a"}, {"docs": [2, 3], "meta": "b"}]
+    assert gather_results(outputs) == {"docs": [1, 2, 3], "meta": "a"}
+    # 合并结果不共享子任务输出中的列表
+    assert outputs[0]["docs"] == [1]
+    assert gather_results([[1], [2, 3]]) == [1, 2, 3]
+    assert gather_results(["a", "b"]) == "a\n\nb"
+    assert gather_results([]) == {}
+
+
+def test_gather_list_and_custom_reducer():
+    assert gather_results([{"a": 1}, {"a": 2}], "list") == [{"a": 1}, {"a": 2}]
+    assert gather_results([[1, 2], [3]], "builtins:len") == 2
+    assert load_reducer("json:dumps")([1]) == "[1]"
+    with pytest.raises(ValueError):
+        load_reducer("no_such_module_xyz:f")
+    with pytest.raises(ValueError):
+        load_reducer("concat-typo")
+
+
+FANOUT_DAG = '''
+tasks:
+  - id: source
+    name: Source
+    agent: SourceAgent
+    module: dag_test_agents
+  - id: double
+    name: Double
+    agent: ItemAgent
+    module: dag_test_agents
+    dependencies: [source]
+    foreach: source.items
+    concurrency: 2
+    options: {fail_on: %s}
+'''
+
+
+def _run(coordinator, params):
+    ctx = coordinator.create_context(params)
+    try:
+        asyncio.run(coordinator.execute(ctx))
+        return ctx, ctx.output()
+    finally:
+        ctx.close()
+
+
+def test_foreach_runs_one_subtask_per_item(make_coordinator, test_agents):
+    coordinator = make_coordinator(FANOUT_DAG % "null")
+    ctx, output = _run(coordinator, {"items": [1, 2, 3]})
+    assert output == {"items": [2, 4, 6]}
+    assert sorted(items for name, items in test_agents.calls if name == "Double") == [[1], [2], [3]]
+    assert [ctx.states[f"double[{i}]"] for i in range(3)] == ["completed"] * 3
+
+
+def test_foreach_drops_failed_subtasks(make_coordinator):
+    coordinator = make_coordinator(FANOUT_DAG % 2)
+    ctx, output = _run(coordinator, {"items": [1, 2, 3]})
+    assert output == {"items": [2, 6]}
+    assert ctx.states["double[1]"] == "failed" and ctx.states["double"] == "completed"
+
+
+def test_foreach_fails_when_every_subtask_fails(make_coordinator):
+    coordinator = make_coordinator(FANOUT_DAG % 1)
+    ctx, output = _run(coordinator, {"items": [1]})
+    assert output is None and ctx.states["double"] == "failed"
+
+
+def test_foreach_retries_subtasks(make_coordinator, test_agents):
+    coordinator = make_coordinator(FANOUT_DAG.replace("concurrency: 2", "retries: 2") % 1)
+    _run(coordinator, {"items": [1]})
+    assert [items for name, items in test_agents.calls if name == "Double"] == [[1]] * 3
+
+
+def test_foreach_over_empty_list(make_coordinator):
+    coordinator = make_coordinator(FANOUT_DAG % "null")
+    ctx, output = _run(coordinator, {"items": []})
+    assert output == {} and ctx.states["double"] == "completed"
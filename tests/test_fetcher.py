@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @Author  : justin.郑
+# @mail    : 3907721@qq.com
+# @Time    : 2026/10/20 11:10
+# @File    : test_fetcher
+# @desc    : HTTP 抓取层的重试、总截止时间、响应大小上限和按完成顺序产出结果（本地 http.server）
+
+
+import time
+import threading
+import collections
+import http.server
+import pytest
+from web_access import fetcher as fetcher_module
+from web_access.fetcher import FetchError, HttpFetcher, fetch_deadline
+from web_access.limits import outbound
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    hits = collections.Counter()
+
+    def do_GET(self):
+        self.hits[self.path] += 1
+        if self.path.startswith("/flaky") and self.hits[self.path] < 3:
+            return self._send(503)
+        if self.path == "/missing":
+            return self._send(404)
+        if self.path.startswith("/slow"):
+            time.sleep(0.5)
+        body = ("<p>" + self.path + "</p>").encode("utf-8") * (10000 if self.path == "/big" else 1)
+        self._send(200, body)
+
+    def _send(self, status, body=b""):
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope="module")
+def base_url():
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(scope="module")
+def fetcher():
+    backoff, fetcher_module.RETRY_BACKOFF = fetcher_module.RETRY_BACKOFF, 0.01
+    fetcher = HttpFetcher(backend="requests")
+    yield fetcher
+    fetcher.close()
+    fetcher_module.RETRY_BACKOFF = backoff
+
+
+def _wait_for_idle_slots(timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while outbound.active and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return outbound.active == 0
+
+
+def test_retries_transient_status(fetcher, base_url):
+    response = fetcher.fetch_sync(base_url + "/flaky")
+    assert response.status == 200
+    assert _Handler.hits["/flaky"] == 3
+
+
+def test_gives_up_after_max_retries(fetcher, base_url):
+    with pytest.raises(FetchError) as info:
+        fetcher.fetch_sync(base_url + "/flaky-once", retries=1)
+    assert (info.value.status, info.value.transient) == (503, True)
+    assert _Handler.hits["/flaky-once"] == 2
+
+
+def test_does_not_retry_client_errors(fetcher, base_url):
+    with pytest.raises(FetchError) as info:
+        fetcher.fetch_sync(base_url + "/missing")
+    assert (info.value.status, info.value.transient) == (404, False)
+    assert _Handler.hits["/missing"] == 1
+    assert fetcher.fetch_sync(base_url + "/missing", raise_for_status=False).status == 404
+
+
+def test_deadline(fetcher, base_url):
+    start = time.monotonic()
+    with fetch_deadline(0.1):
+        with pytest.raises(FetchError) as info:
+            fetcher.fetch_sync(base_url + "/slow")
+    assert time.monotonic() - start < 0.4
+    assert info.value.transient
+
+
+def test_size_cap(fetcher, base_url):
+    response = fetcher.fetch_sync(base_url + "/big", max_bytes=1000)
+    assert len(response.content) == 1000
+    assert response.truncated
+    assert not fetcher.fetch_sync(base_url + "/small").truncated
+
+
+def test_fetch_iter_sync_yields_in_completion_order(fetcher, base_url):
+    urls = [base_url + "/slow-iter", base_url + "/missing", base_url + "/fast"]
+    results = list(fetcher.fetch_iter_sync(urls))
+    assert [index for index, _ in results][-1] == 0
+    by_index = dict(results)
+    assert by_index[0].text() == "<p>/slow-iter</p>"
+    assert isinstance(by_index[1], FetchError)
+    assert [type(result) for result in fetcher.fetch_all_sync(urls)] == [type(by_index[0]), FetchError, type(by_index[2])]
+
+
+def test_abandoned_requests_keep_their_slots(fetcher, base_url):
+    # 之前的用例中放弃等待的请求可能还在占用名额
+    assert _wait_for_idle_slots()
+    limit = outbound.limit
+    outbound.set_limit(2)
+    try:
+        with fetch_deadline(0.1):
+            results = fetcher.fetch_all_sync([base_url + f"/slow-slot{i}" for i in range(4)])
+        assert all(isinstance(result, FetchError) and result.transient for result in results)
+        # 线程中的请求还没有结束，名额仍被占用；还在排队的请求不会再发出
+        assert outbound.active == 2
+        assert _wait_for_idle_slots()
+        assert sum(_Handler.hits[f"/slow-slot{i}"] for i in range(4)) == 2
+    finally:
+        outbound.set_limit(limit)
+
+
+def test_requests_executor_grows_with_outbound_limit(fetcher, base_url):
+    # requests 后端的线程数跟随调大后的出站名额，否则多出的名额只会在线程池中排队
+    limit = outbound.limit
+    try:
+        outbound.set_limit(fetcher._executor_size + 8)
+        assert fetcher.fetch_sync(base_url + "/grow").status == 200
+        assert fetcher._executor_size == outbound.limit
+    finally:
+        outbound.set_limit(limit)
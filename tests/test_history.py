@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @Author  : justin.郑
+# @mail    : 3907721@qq.com
+# @Time    : 2026/10/21 14:00
+# @File    : test_history
+# @desc    : 运行历史数据库的记录、查询、对比、耗时百分位和负载大小估算
+
+
+import json
+import asyncio
+import pytest
+from dag_orchestration import history as history_module
+from dag_orchestration.history import RunHistory, payload_size
+
+
+@pytest.fixture
+def history(tmp_path):
+    history = RunHistory(str(tmp_path / "dag.history.db"))
+    yield history
+    history.close()
+
+
+def _record_run(history, run_id, started_at, durations, dag_file="dag.yml", status="completed"):
+    history.start_run(run_id, dag_file, started_at, {"topic": run_id})
+    for task_id, duration in durations.items():
+        history.record_task(run_id, task_id, "Agent", "completed", ready_at=started_at,
+                            started_at=started_at + 1, finished_at=started_at + 1 + duration,
+                            input_bytes=10, output_bytes=20, llm_calls=2)
+    history.finish_run(run_id, status, started_at + 100)
+
+
+def test_record_and_list_runs(history):
+    _record_run(history, "r1", 1000.0, {"t1": 2.0, "t2": 3.0})
+    _record_run(history, "r2", 2000.0, {"t1": 4.0}, dag_file="other.yml", status="failed")
+
+    runs = history.list_runs()
+    assert [run["run_id"] for run in runs] == ["r2", "r1"]
+    assert runs[1]["duration"] == 100 and runs[1]["tasks"] == 2 and runs[1]["llm_calls"] == 4
+    assert [run["run_id"] for run in history.list_runs(dag_file="other.yml")] == ["r2"]
+    assert runs[0]["status"] == "failed"
+
+    task = history.get_tasks("r1")[0]
+    assert (task["task_id"], task["queue_wait"], task["duration"]) == ("t1", 1.0, 2.0)
+
+
+def test_unfinished_task_has_no_duration(history):
+    history.start_run("r1", "dag.yml", 1000.0)
+    history.record_task("r1", "t1", "Agent", "skipped")
+    task = history.get_tasks("r1")[0]
+    assert task["status"] == "skipped" and task["queue_wait"] is None and task["duration"] is None
+
+
+def test_compare(history):
+    _record_run(history, "a", 1000.0, {"t1": 2.0, "t2": 3.0})
+    _record_run(history, "b", 2000.0, {"t1": 5.0, "t3": 1.0})
+    rows = {row["task_id"]: row for row in history.compare("a", "b")}
+    assert list(rows) == ["t1", "t2", "t3"]
+    assert rows["t1"]["delta"] == 3.0
+    assert rows["t2"]["status_b"] is None and rows["t2"]["delta"] is None
+    assert rows["t3"]["status_a"] is None
+
+
+def test_task_percentiles(history):
+    for i in range(10):
+        _record_run(history, f"r{i}", 1000.0 + i, {"t1": float(i + 1)})
+    stats = history.task_percentiles()
+    assert stats["t1"]["count"] == 10
+    assert (stats["t1"]["p50"], stats["t1"]["p90"], stats["t1"]["p99"]) == (5.0, 9.0, 10.0)
+    assert stats["t1"]["wait_p50"] == 1.0 and stats["t1"]["llm_calls_avg"] == 2
+    # 只统计最近的运行
+    assert history.task_percentiles(last_runs=3)["t1"]["count"] == 3
+    assert history.task_percentiles(dag_file="missing.yml") == {}
+
+
+@pytest.mark.parametrize("value", [
+    None, True, 12, 3.5, "ascii", "中文内容", {"a": [1, 2, {"b": None}]}, ["x"] * 10
+])
+def test_payload_size_close_to_json_size(value):
+    exact = len(json.dumps(value, ensure_ascii=False).encode("utf-8"))
+    assert abs(payload_size(value) - exact) <= max(1, exact // 10)
+
+
+def test_payload_size_samples_large_values():
+    docs = [{"id": f"doc{i}", "content": "内容" * 100} for i in range(1000)]
+    exact = len(json.dumps(docs, ensure_ascii=False).encode("utf-8"))
+    assert abs(payload_size(docs) - exact) / exact < 0.05
+    text = "中文" * 10000
+    assert payload_size(text) == len(text.encode("utf-8")) + 2
+
+
+def test_payload_size_of_recursive_value():
+    value = []
+    value.append(value)
+    assert payload_size(value) is None
+
+
+def test_cli(history, capsys):
+    _record_run(history, "a", 1000.0, {"t1": 2.0})
+    _record_run(history, "b", 2000.0, {"t1": 3.0})
+    for argv in (["list"], ["show", "a"], ["compare", "a", "b"], ["stats"]):
+        history_module.main(["--db", history.db_path] + argv)
+    output = capsys.readouterr().out
+    assert "run_id" in output and "p50(s)" in output and "1.00" in output
+
+
+HISTORY_DAG = '''
+tasks:
+  - {id: source, name: Source, agent: SourceAgent, module: dag_test_agents}
+  - {id: double, name: Double, agent: ItemAgent, module: dag_test_agents, dependencies: [source],
+     options: {fail_on: 2}}
+  - {id: report, name: Report, agent: EchoAgent, module: dag_test_agents, dependencies: [double]}
+'''
+
+
+def test_coordinator_records_runs(make_coordinator, tmp_path):
+    coordinator = make_coordinator(HISTORY_DAG, record_history=True)
+    for items in ([1], [2]):
+        ctx = coordinator.create_context({"items": items})
+        try:
+            asyncio.run(coordinator.execute(ctx))
+        finally:
+            ctx.close()
+
+    history = RunHistory.for_dag_file(str(tmp_path / "dag.yml"))
+    try:
+        failed, completed = history.list_runs()
+        assert (completed["status"], failed["status"]) == ("completed", "failed")
+        assert {task["task_id"]: task["status"] for task in history.get_tasks(failed["run_id"])} == {
+            "source": "completed", "double": "failed", "report": "skipped"
+        }
+        task = history.get_tasks(completed["run_id"])[0]
+        assert task["input_bytes"] > 0 and task["output_bytes"] > 0 and task["duration"] >= 0
+    finally:
+        history.close()
@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @Author  : justin.郑
+# @mail    : 3907721@qq.com
+# @Time    : 2026/10/20 10:30
+# @File    : test_ingest_manifest
+# @desc    : 增量采集的变化检测、清单暂存/提交/撤销、文档ID分配和内存映射读取
+
+
+import os
+import mmap
+import pytest
+from dag_orchestration.ingest import (
+    CorpusManifest, ManifestRecord, content_hash, open_buffer, read_text, scan_changes
+)
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    root = tmp_path / "corpus"
+    root.mkdir()
+    (root / "a.txt").write_text("甲文档", encoding="utf-8")
+    (root / "b.txt").write_text("乙文档", encoding="utf-8")
+    (root / "skip.md").write_text("不匹配", encoding="utf-8")
+    return root
+
+
+@pytest.fixture
+def manifest(tmp_path):
+    manifest = CorpusManifest(str(tmp_path / "manifest.db"))
+    yield manifest
+    manifest.close()
+
+
+def _records(manifest, changes):
+    return [
+        ManifestRecord(entry.path, entry.size, entry.mtime_ns, digest, manifest.doc_id_for(entry.path), None)
+        for entry, _, digest in changes
+    ]
+
+
+def _ingest(manifest, root):
+    changes = scan_changes(manifest, str(root))
+    manifest.update(_records(manifest, changes))
+    manifest.update(changes.touched)
+    manifest.remove(changes.removed)
+    return changes
+
+
+def test_scan_yields_new_files_with_content(manifest, corpus):
+    changes = list(scan_changes(manifest, str(corpus)))
+    assert [os.path.basename(entry.path) for entry, _, _ in changes] == ["a.txt", "b.txt"]
+    assert changes[0][1] == "甲文档"
+    assert changes[0][2] == content_hash("甲文档".encode("utf-8"))
+
+
+def test_scan_skips_unchanged_and_detects_changes(manifest, corpus):
+    _ingest(manifest, corpus)
+    assert list(scan_changes(manifest, str(corpus))) == []
+
+    # 内容不变、只有修改时间变化：不产出，只更新元数据
+    stat = os.stat(corpus / "a.txt")
+    os.utime(corpus / "a.txt", ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    (corpus / "b.txt").write_text("乙文档（修订）", encoding="utf-8")
+    os.remove(corpus / "skip.md")
+    (corpus / "c.txt").write_text("丙文档", encoding="utf-8")
+
+    changes = scan_changes(manifest, str(corpus))
+    assert sorted(os.path.basename(entry.path) for entry, _, _ in changes) == ["b.txt", "c.txt"]
+    assert [os.path.basename(record.path) for record in changes.touched] == ["a.txt"]
+    assert changes.removed == []
+
+
+def test_scan_reports_removed_files_without_mutating(manifest, corpus):
+    _ingest(manifest, corpus)
+    os.remove(corpus / "a.txt")
+    changes = scan_changes(manifest, str(corpus))
+    assert list(changes) == []
+    assert changes.removed == [str(corpus / "a.txt")]
+    assert manifest.get(str(corpus / "a.txt")) is not None
+
+
+def test_doc_ids_are_stable(manifest, corpus):
+    _ingest(manifest, corpus)
+    a, b = str(corpus / "a.txt"), str(corpus / "b.txt")
+    assert (manifest.get(a).doc_id, manifest.get(b).doc_id) == ("doc1", "doc2")
+
+    (corpus / "a.txt").write_text("甲文档（修订）", encoding="utf-8")
+    _ingest(manifest, corpus)
+    assert manifest.get(a).doc_id == "doc1"
+
+    reopened = CorpusManifest(manifest.db_path)
+    try:
+        assert reopened.doc_id_for(str(corpus / "new.txt")) == "doc3"
+    finally:
+        reopened.close()
+
+
+def test_staged_changes_apply_only_on_commit(manifest, corpus):
+    changes = scan_changes(manifest, str(corpus))
+    manifest.stage("run-1", _records(manifest, changes), changes.removed)
+    assert manifest.get(str(corpus / "a.txt")) is None
+    assert len(list(scan_changes(manifest, str(corpus)))) == 2
+
+    assert manifest.commit("run-1") == 2
+    assert manifest.get(str(corpus / "a.txt")).doc_id == "doc1"
+    assert list(scan_changes(manifest, str(corpus))) == []
+
+
+def test_discard_keeps_manifest_and_reserves_doc_ids(manifest, corpus):
+    _ingest(manifest, corpus)
+    os.remove(corpus / "a.txt")
+    (corpus / "c.txt").write_text("丙文档", encoding="utf-8")
+    changes = scan_changes(manifest, str(corpus))
+    manifest.stage("run-2", _records(manifest, changes), changes.removed)
+
+    # 未提交的运行已分配的ID不会被之后重新打开的清单再次分配
+    reopened = CorpusManifest(manifest.db_path)
+    try:
+        assert reopened.doc_id_for(str(corpus / "d.txt")) == "doc4"
+    finally:
+        reopened.close()
+
+    assert manifest.discard("run-2") == 2
+    assert manifest.commit("run-2") == 0
+    assert manifest.get(str(corpus / "a.txt")) is not None
+    assert manifest.get(str(corpus / "c.txt")) is None
+
+
+def test_commit_applies_removals(manifest, corpus):
+    _ingest(manifest, corpus)
+    os.remove(corpus / "b.txt")
+    changes = scan_changes(manifest, str(corpus))
+    list(changes)
+    manifest.stage("run-3", [], changes.removed)
+    assert manifest.get(str(corpus / "b.txt")) is not None
+    manifest.commit("run-3")
+    assert manifest.get(str(corpus / "b.txt")) is None
+
+
+def test_large_files_are_read_through_mmap(tmp_path):
+    path = tmp_path / "big.txt"
+    text = "大文件内容\n" * 1000
+    path.write_text(text, encoding="utf-8")
+
+    with open_buffer(str(path), mmap_threshold=1024) as data:
+        assert isinstance(data, mmap.mmap)
+        assert content_hash(data) == content_hash(text.encode("utf-8"))
+    with open_buffer(str(path), mmap_threshold=1024 * 1024) as data:
+        assert isinstance(data, bytes)
+    assert read_text(str(path), mmap_threshold=1024) == text
+
+
+def test_scan_decodes_mmap_content(manifest, tmp_path):
+    root = tmp_path / "big"
+    root.mkdir()
+    text = "映射读取\n" * 1000
+    (root / "big.txt").write_text(text, encoding="utf-8")
+    [(_, content, digest)] = list(scan_changes(manifest, str(root), mmap_threshold=1024))
+    assert content == text
+    assert digest == content_hash(text.encode("utf-8"))
+
+
+def test_scan_raises_on_invalid_utf8(manifest, corpus):
+    (corpus / "b.txt").write_bytes(b"\xff\xfe invalid utf-8")
+    with pytest.raises(UnicodeDecodeError):
+        list(scan_changes(manifest, str(corpus)))
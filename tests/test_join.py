@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @Author  : justin.郑
+# @mail    : 3907721@qq.com
+# @Time    : 2026/10/21 16:40
+# @File    : test_join
+# @desc    : join 配置校验、哈希连接（内连接/左连接、重复键、嵌套路径），以及协调器为 join 任务准备的输入
+
+
+import asyncio
+import pytest
+from dag_orchestration.dag import DagValidationError
+from dag_orchestration.join import hash_join, validate_join_spec
+
+
+RESULTS = {
+    "extract": {"data": {"docs": [{"id": "d1", "info": 1}, {"id": "d2", "info": 2}, {"id": "d3", "info": 3}]}},
+    "summarize": {"docs": [{"doc_id": "d3", "text": "c"}, {"doc_id": "d1", "text": "a"},
+                           {"doc_id": "d1", "text": "duplicate"}, "not a record"]},
+}
+
+
+def _join(how="inner"):
+    return {
+        "how": how,
+        "inputs": [
+            {"task": "extract", "path": "data.docs", "key": "id", "as": "info"},
+            {"task": "summarize", "path": "docs", "key": "doc_id", "as": "summary"},
+        ],
+    }
+
+
+def test_inner_join_follows_probe_order():
+    joined = list(hash_join(_join(), RESULTS))
+    assert [row["key"] for row in joined] == ["d1", "d3"]
+    # 重复键只保留第一条记录
+    assert joined[0] == {"key": "d1", "info": {"id": "d1", "info": 1}, "summary": {"doc_id": "d1", "text": "a"}}
+
+
+def test_left_join_fills_missing_with_none():
+    joined = list(hash_join(_join("left"), RESULTS))
+    assert [(row["key"], row["summary"] and row["summary"]["text"]) for row in joined] == [
+        ("d1", "a"), ("d2", None), ("d3", "c")
+    ]
+
+
+def test_missing_path_yields_nothing():
+    join = _join()
+    join["inputs"][0]["path"] = "data.missing"
+    assert list(hash_join(join, RESULTS)) == []
+
+
+def test_alias_defaults_to_task_id():
+    join = {"inputs": [{"task": "extract", "path": "data.docs", "key": "id"},
+                       {"task": "summarize", "path": "docs", "key": "doc_id"}]}
+    assert set(next(hash_join(join, RESULTS))) == {"key", "extract", "summarize"}
+
+
+@pytest.mark.parametrize("join, message", [
+    ("extract", "至少两个 inputs"),
+    ({"inputs": [{"task": "extract", "key": "id"}]}, "至少两个 inputs"),
+    ({"how": "outer", "inputs": [{"task": "extract", "key": "id"}, {"task": "summarize", "key": "id"}]}, "join.how"),
+    ({"inputs": [{"task": "extract"}, {"task": "summarize", "key": "id"}]}, "task 和 key"),
+    ({"inputs": [{"task": "extract", "key": "id"}, {"task": "other", "key": "id"}]}, "非依赖任务 other"),
+    ({"inputs": [{"task": "extract", "key": "id", "as": "x"}, {"task": "summarize", "key": "id", "as": "x"}]},
+     "别名“x”重复"),
+    ({"inputs": [{"task": "extract", "key": "id", "as": "key"}, {"task": "summarize", "key": "id"}]}, "保留字段 key"),
+])
+def test_validate_join_spec(join, message):
+    with pytest.raises(ValueError, match=message):
+        validate_join_spec("compile", join, ["extract", "summarize"])
+
+
+JOIN_DAG = '''
+tasks:
+  - id: left
+    name: Left
+    agent: EchoAgent
+    module: dag_test_agents
+  - id: right
+    name: Right
+    agent: EchoAgent
+    module: dag_test_agents
+  - id: compile
+    name: Compile
+    agent: EchoAgent
+    module: dag_test_agents
+    dependencies: [left, right]
+    join:
+      how: left
+      inputs:
+        - {task: left, path: a, key: id}
+        - {task: right, path: b, key: id, as: other}
+'''
+
+
+def test_coordinator_passes_joined_records(make_coordinator):
+    coordinator = make_coordinator(JOIN_DAG)
+    ctx = coordinator.create_context({"a": [{"id": 1}, {"id": 2}], "b": [{"id": 2, "v": "x"}]})
+    try:
+        asyncio.run(coordinator.execute(ctx))
+        assert ctx.output() == {"joined": [
+            {"key": 1, "left": {"id": 1}, "other": None},
+            {"key": 2, "left": {"id": 2}, "other": {"id": 2, "v": "x"}},
+        ]}
+    finally:
+        ctx.close()
+
+
+def test_join_cannot_be_combined_with_foreach(make_coordinator):
+    with pytest.raises(DagValidationError, match="不能同时使用 join 和 foreach"):
+        make_coordinator(JOIN_DAG + "    foreach: left.a\n")
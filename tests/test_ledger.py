@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @Author  : justin.郑
+# @mail    : 3907721@qq.com
+# @Time    : 2026/10/20 10:50
+# @File    : test_ledger
+# @desc    : 实体台账的续跑判断、错误分类、重试，以及输出文件中失败条目的写出
+
+
+import sys
+import json
+import errno
+import types
+import socket
+import asyncio
+import pytest
+import requests
+from web_access.fetcher import FetchError
+from dynamic_sharding import ledger
+from dynamic_sharding.ledger import (
+    PERMANENT, TRANSIENT, EntityLedger, LookupFailed, classify_error, lookup_with_retry
+)
+
+try:
+    import Agently  # noqa: F401
+except ImportError:
+    # EntityWriter 只用到 Delegate.format_info，不需要模型依赖
+    sys.modules.setdefault("Agently", types.ModuleType("Agently"))
+from dynamic_sharding.streaming import EntityWriter
+
+
+@pytest.fixture
+def entity_ledger(tmp_path):
+    entity_ledger = EntityLedger(str(tmp_path / "out.txt.ledger.db"))
+    yield entity_ledger
+    entity_ledger.close()
+
+
+def test_pending_attempts(entity_ledger):
+    assert entity_ledger.pending_attempts(1, "北京", 3) == 0
+
+    entity_ledger.record_done(1, "北京", 1, "out.txt", 0)
+    assert entity_ledger.pending_attempts(1, "北京", 3) is None
+    # 输入文件在该行的内容变化后重新处理
+    assert entity_ledger.pending_attempts(1, "上海", 3) == 0
+
+    entity_ledger.record_failed(2, "广州", 1, FetchError("503", 503, transient=True))
+    assert entity_ledger.pending_attempts(2, "广州", 3) == 1
+    assert entity_ledger.pending_attempts(2, "广州", 1) is None
+
+    entity_ledger.record_failed(3, "深圳", 1, FetchError("404", 404))
+    assert entity_ledger.pending_attempts(3, "深圳", 3) is None
+
+    assert entity_ledger.summary() == {"done": 1, f"failed/{TRANSIENT}": 1, f"failed/{PERMANENT}": 1}
+
+
+def test_reopened_ledger_resumes(tmp_path):
+    db_path = str(tmp_path / "out.txt.ledger.db")
+    first = EntityLedger(db_path)
+    first.record_failed(1, "北京", 2, TimeoutError())
+    first.close()
+
+    second = EntityLedger(db_path)
+    try:
+        assert second.pending_attempts(1, "北京", 3) == 2
+        second.reset()
+        assert second.pending_attempts(1, "北京", 3) == 0
+    finally:
+        second.close()
+
+
+class _StatusError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+
+
+@pytest.mark.parametrize("error, expected", [
+    (FetchError("timeout", transient=True), TRANSIENT),
+    (FetchError("not found", 404), PERMANENT),
+    (FetchError("unavailable", 503, transient=True), TRANSIENT),
+    (asyncio.TimeoutError(), TRANSIENT),
+    (ConnectionResetError(), TRANSIENT),
+    (requests.ConnectionError(), TRANSIENT),
+    (_StatusError(429), TRANSIENT),
+    (_StatusError(401), PERMANENT),
+    (ValueError("status code 503"), PERMANENT),
+    (KeyError("organic_results"), PERMANENT),
+    (OSError(errno.ETIMEDOUT, "timed out"), TRANSIENT),
+    (OSError(errno.ENETUNREACH, "network unreachable"), TRANSIENT),
+    (FileNotFoundError(errno.ENOENT, "missing"), PERMANENT),
+    (PermissionError(errno.EACCES, "denied"), PERMANENT),
+    (OSError("no errno"), PERMANENT),
+    (socket.gaierror(socket.EAI_AGAIN, "temporary failure in name resolution"), TRANSIENT),
+    (socket.gaierror(socket.EAI_NONAME, "name or service not known"), PERMANENT),
+    (requests.exceptions.ChunkedEncodingError(), TRANSIENT),
+    (requests.exceptions.InvalidURL(), PERMANENT),
+    (requests.exceptions.TooManyRedirects(), PERMANENT),
+])
+def test_classify_error(error, expected):
+    assert classify_error(error) == expected
+
+
+def test_classify_error_follows_cause():
+    try:
+        try:
+            raise FetchError("unavailable", 503, transient=True)
+        except FetchError as e:
+            raise RuntimeError("搜索失败") from e
+    except RuntimeError as e:
+        assert classify_error(e) == TRANSIENT
+
+
+def test_classify_error_unwraps_model_client_errors():
+    # 模型客户端把网络错误包装成自己的异常（没有状态码）时，按异常链中的原因分类
+    class ModelError(Exception):
+        pass
+
+    for cause, expected in ((TimeoutError(), TRANSIENT), (ConnectionResetError(), TRANSIENT),
+                            (ValueError("bad output"), PERMANENT)):
+        try:
+            try:
+                raise cause
+            except Exception as e:
+                raise ModelError("调用模型失败") from e
+        except ModelError as e:
+            assert classify_error(e) == expected
+
+
+def test_classify_error_httpx():
+    httpx = pytest.importorskip("httpx")
+    assert classify_error(httpx.ReadTimeout("timed out")) == TRANSIENT
+    assert classify_error(httpx.ConnectError("refused")) == TRANSIENT
+    assert classify_error(httpx.InvalidURL("bad")) == PERMANENT
+
+
+def test_lookup_with_retry(monkeypatch):
+    monkeypatch.setattr(ledger, "RETRY_BACKOFF", 0)
+    calls = []
+
+    async def flaky(entity):
+        calls.append(entity)
+        if len(calls) < 3:
+            raise FetchError("unavailable", 503, transient=True)
+        return "信息"
+
+    assert asyncio.run(lookup_with_retry(flaky, "北京", 0, 3)) == ("信息", 3)
+
+    async def missing(entity):
+        calls.append(entity)
+        raise FetchError("not found", 404)
+
+    calls.clear()
+    with pytest.raises(LookupFailed) as info:
+        asyncio.run(lookup_with_retry(missing, "北京", 1, 3))
+    assert (info.value.attempts, len(calls)) == (2, 1)
+
+
+def test_text_writer_skips_failed_entities(tmp_path):
+    output_file = tmp_path / "out.txt"
+    with EntityWriter(str(output_file)) as writer:
+        assert writer.write(1, "北京", "首都") == 0
+        assert writer.write(2, "广州", None, FetchError("503", 503, transient=True)) is None
+        offset = writer.write(3, "深圳", "特区")
+    assert (writer.written, writer.failed) == (2, 1)
+    text = output_file.read_text(encoding="utf-8")
+    assert "广州" not in text
+    assert output_file.read_bytes()[offset:].decode("utf-8").startswith("信息关于 深圳")
+
+    # 续跑时追加重试成功的实体，不会出现重复条目
+    with EntityWriter(str(output_file), append=True) as writer:
+        writer.write(2, "广州", "花城")
+    assert output_file.read_text(encoding="utf-8").count("信息关于 广州") == 1
+
+
+def test_jsonl_writer_records_failures(tmp_path):
+    output_file = tmp_path / "out.jsonl"
+    with EntityWriter(str(output_file), "jsonl") as writer:
+        writer.write(1, "北京", "首都")
+        assert writer.write(2, "广州", None, FetchError("503", 503, transient=True)) is not None
+    records = [json.loads(line) for line in output_file.read_text(encoding="utf-8").splitlines()]
+    assert [(record["line"], record["status"]) for record in records] == [(1, "ok"), (2, "error")]
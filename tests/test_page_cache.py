@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @Author  : justin.郑
+# @mail    : 3907721@qq.com
+# @Time    : 2026/10/20 11:30
+# @File    : test_page_cache
+# @desc    : 网页正文缓存的有效期、条件请求重新验证、no-store 和按总大小淘汰
+
+
+import time
+import pytest
+from web_access.fetcher import FetchError, FetchResponse
+from web_access.page_cache import PageCache, freshness_lifetime
+from web_access.scrape import WebScrapeAgent
+
+
+URL = "https://example.com/page"
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = PageCache(str(tmp_path / "page_cache.db"), ttl=60, max_bytes=1024 * 1024)
+    yield cache
+    cache.close()
+
+
+@pytest.mark.parametrize("cache_control, expected", [
+    ("", 60),
+    ("public, max-age=300", 300),
+    ("s-maxage=120", 120),
+    ('max-age="30"', 30),
+    ("no-cache", 0.0),
+    ("private, no-store", None),
+])
+def test_freshness_lifetime(cache_control, expected):
+    assert freshness_lifetime({'Cache-Control': cache_control}, 60) == expected
+
+
+def test_put_and_get(cache):
+    assert cache.get(URL) is None
+    cache.put(URL, "正文", {'ETag': '"v1"', 'Last-Modified': 'Mon, 19 Oct 2026 00:00:00 GMT'})
+    page = cache.get(URL)
+    assert (page.text, page.fresh) == ("正文", True)
+    assert page.conditional_headers() == {
+        'If-None-Match': '"v1"', 'If-Modified-Since': 'Mon, 19 Oct 2026 00:00:00 GMT'
+    }
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_no_store_is_not_cached(cache):
+    cache.put(URL, "正文", {'Cache-Control': 'no-store'})
+    assert cache.get(URL) is None
+
+
+def test_no_cache_is_always_revalidated(cache):
+    cache.put(URL, "正文", {'Cache-Control': 'no-cache', 'ETag': '"v1"'})
+    page = cache.get(URL)
+    assert not page.fresh
+    assert page.conditional_headers() == {'If-None-Match': '"v1"'}
+
+
+def test_refresh_extends_lifetime_and_updates_validators(cache):
+    cache.put(URL, "正文", {'Cache-Control': 'max-age=0', 'ETag': '"v1"'})
+    stale = cache.get(URL)
+    assert not stale.fresh
+
+    cache.refresh(stale, {'Cache-Control': 'max-age=300', 'ETag': '"v2"'})
+    page = cache.get(URL)
+    assert page.fresh
+    assert (page.text, page.etag) == ("正文", '"v2"')
+    assert cache.revalidated == 1
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = PageCache(str(tmp_path / "page_cache.db"), ttl=60, max_bytes=250)
+    try:
+        for name in ("a", "b", "c"):
+            cache.put(f"https://example.com/{name}", name * 100, {})
+            time.sleep(0.01)
+        assert cache.get("https://example.com/a") is None
+        # 读取会更新最近使用时间，下一次淘汰的是 b
+        assert cache.get("https://example.com/c") is not None
+        time.sleep(0.01)
+        cache.put("https://example.com/d", "d" * 100, {})
+        assert cache.get("https://example.com/b") is None
+        assert cache.get("https://example.com/c") is not None
+        assert cache.get("https://example.com/d") is not None
+    finally:
+        cache.close()
+
+
+def test_scraper_uses_cache_on_304_and_transient_errors(cache):
+    agent = WebScrapeAgent(page_cache=cache)
+    cache.put(URL, "缓存正文", {'Cache-Control': 'max-age=0', 'ETag': '"v1"'})
+    stale = cache.get(URL)
+
+    not_modified = FetchResponse(URL, 304, {'Cache-Control': 'max-age=300'}, b"")
+    assert agent._resolve_content(URL, stale, not_modified) == "缓存正文"
+    assert cache.get(URL).fresh
+
+    assert agent._resolve_content(URL, stale, FetchError("unavailable", 503, transient=True)) == "缓存正文"
+    assert agent._resolve_content(URL, stale, FetchError("timeout", transient=True)) == "缓存正文"
+    assert agent._resolve_content(URL, stale, FetchError("gone", 410)) == ""
+    assert agent._resolve_content(URL, None, FetchError("unavailable", 503, transient=True)) == ""
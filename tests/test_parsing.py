@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @Author  : justin.郑
+# @mail    : 3907721@qq.com
+# @Time    : 2026/10/21 11:00
+# @File    : test_parsing
+# @desc    : 网页正文提取引擎的一致性、字符集识别，以及解析进程池的回退和关闭
+
+
+import pytest
+from concurrent.futures.process import BrokenProcessPool
+from web_access import parsing
+from web_access.parsing import ParserPool, available_engines, detect_encoding, extract_text
+
+
+PAGE = """<html><head><title>标题</title><style>p { color: red }</style>
+<script>var p = "<p>脚本</p>";</script></head>
+<body><nav><p>导航</p></nav>
+<h1>第一章</h1>
+<p>第一段 <b>加粗</b>
+<p>第二段&amp;实体</p>
+<div><h2>小节</h2><p>嵌套 <span>段落</span></p></div>
+<noscript><p>不显示</p></noscript>
+</body></html>""".encode("utf-8")
+
+
+# bs4 是保留用于对比的原实现，不跳过 nav/noscript，也会重复收集嵌套的正文标签
+@pytest.mark.parametrize("engine", [engine for engine in available_engines() if engine != "bs4"])
+def test_engines_extract_the_same_text(engine):
+    assert extract_text(PAGE, "utf-8", engine=engine) == "第一章 第一段 加粗 第二段&实体 小节 嵌套 段落"
+
+
+def test_bs4_engine_keeps_original_behaviour():
+    text = extract_text(PAGE, "utf-8", engine="bs4")
+    assert text.startswith("导航 第一章") and "脚本" not in text
+
+
+def test_unknown_engine_falls_back_to_fastest():
+    assert extract_text(PAGE, "utf-8", engine="missing") == extract_text(PAGE, "utf-8", engine=available_engines()[0])
+
+
+def test_detect_encoding():
+    assert detect_encoding(b'\xef\xbb\xbf<p>x</p>') == "utf-8-sig"
+    assert detect_encoding(b'<meta charset="gb2312"><p>x</p>') == "gb18030"
+    assert detect_encoding(b'<p>x</p>', "GBK") == "gb18030"
+    assert detect_encoding(b'<p>x</p>', "no-such-charset") == "utf-8"
+    gbk_page = '<meta charset="gbk"><p>中文</p>'.encode("gbk")
+    assert extract_text(gbk_page, engine="stream") == "中文"
+
+
+def test_max_bytes_truncates_before_parsing():
+    page = b"<p>" + b"a" * 100 + b"</p><p>tail</p>"
+    assert extract_text(page, "utf-8", engine="stream", max_bytes=50) == "a" * 47
+
+
+def test_small_pages_and_zero_workers_parse_inline(monkeypatch):
+    pool = ParserPool(workers=0, inline_max_bytes=0)
+    monkeypatch.setattr(pool, "_get_executor", lambda: pytest.fail("不应创建进程池"))
+    assert pool.parse(PAGE, "utf-8")
+
+    pool = ParserPool(workers=2, inline_max_bytes=len(PAGE) + 1)
+    monkeypatch.setattr(pool, "_get_executor", lambda: pytest.fail("不应创建进程池"))
+    assert pool.parse(PAGE, "utf-8")
+
+
+class _BrokenExecutor:
+    def __init__(self, error):
+        self.error = error
+        self.shutdown_calls = 0
+
+    def submit(self, *args, **kwargs):
+        raise self.error
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        self.shutdown_calls += 1
+
+
+@pytest.mark.parametrize("error", [BrokenProcessPool("worker died"), RuntimeError("cannot schedule new futures")])
+def test_falls_back_to_inline_parse(error):
+    pool = ParserPool(workers=1, inline_max_bytes=0)
+    executor = _BrokenExecutor(error)
+    pool._executor = executor
+    assert pool.parse(PAGE, "utf-8") == extract_text(PAGE, "utf-8")
+    if isinstance(error, BrokenProcessPool):
+        # 异常退出的进程池被丢弃，下次使用时重建
+        assert pool._executor is None and executor.shutdown_calls == 1
+    else:
+        assert pool._executor is executor
+
+
+def test_process_pool_parse_and_shutdown():
+    pool = ParserPool(workers=1, inline_max_bytes=0)
+    try:
+        assert pool.parse(PAGE, "utf-8") == extract_text(PAGE, "utf-8")
+        assert pool._executor is not None
+    finally:
+        pool.shutdown()
+    assert pool._executor is None
+    # 关闭后仍可使用，进程数量为 0 时不再创建进程池
+    pool.configure(0)
+    assert pool.parse(PAGE, "utf-8") == extract_text(PAGE, "utf-8")
+    assert pool._executor is None
+
+
+def test_default_workers_leave_a_core_for_the_main_process():
+    if "WEB_ACCESS_PARSE_WORKERS" not in parsing.os.environ:
+        assert parsing.DEFAULT_PARSE_WORKERS == parsing._CPU_COUNT - 1
@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @Author  : justin.郑
+# @mail    : 3907721@qq.com
+# @Time    : 2026/10/21 16:00
+# @File    : test_politeness
+# @desc    : 按主机的礼貌性调度：并发上限、请求间隔、主机之间互不等待，以及单独配置的主机
+
+
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from web_access.politeness import PolitenessScheduler
+
+
+def _run_threads(scheduler, urls, hold=0.05):
+    """
+    每个 URL 在一个线程中占用名额 hold 秒，返回每个主机的并发峰值和每个请求的开始时间。
+    """
+    lock = threading.Lock()
+    active, peak, starts = {}, {}, []
+
+    def request(url):
+        host = url.split("/")[2]
+        with scheduler.slot(url):
+            with lock:
+                starts.append((host, time.monotonic()))
+                active[host] = active.get(host, 0) + 1
+                peak[host] = max(peak.get(host, 0), active[host])
+            time.sleep(hold)
+            with lock:
+                active[host] -= 1
+
+    with ThreadPoolExecutor(max_workers=len(urls)) as executor:
+        list(executor.map(request, urls))
+    return peak, starts
+
+
+def test_limits_concurrency_per_host_without_blocking_other_hosts():
+    scheduler = PolitenessScheduler(concurrency=2, min_interval=0)
+    urls = [f"http://a.example/{i}" for i in range(6)] + [f"http://b.example/{i}" for i in range(2)]
+
+    peak, starts = _run_threads(scheduler, urls)
+
+    assert peak == {"a.example": 2, "b.example": 2}
+    # b.example 的请求不等待 a.example 排队：都在 a.example 的第二批请求之前开始
+    a_starts = sorted(start for host, start in starts if host == "a.example")
+    assert all(start < a_starts[2] for host, start in starts if host == "b.example")
+
+
+def test_min_interval_between_request_starts():
+    scheduler = PolitenessScheduler(concurrency=4, min_interval=0.05)
+
+    _, starts = _run_threads(scheduler, [f"http://a.example/{i}" for i in range(3)], hold=0)
+
+    times = sorted(start for _, start in starts)
+    assert all(later - earlier >= 0.045 for earlier, later in zip(times, times[1:]))
+
+
+def test_host_policies():
+    scheduler = PolitenessScheduler(concurrency=4, min_interval=0.1, policies="A.example=1:0, b.example=2,c.example=:0.5")
+
+    assert scheduler.policy("a.example") == (1, 0.0)
+    assert scheduler.policy("b.example") == (2, 0.1)
+    assert scheduler.policy("c.example") == (4, 0.5)
+    assert scheduler.policy("other.example") == (4, 0.1)
+
+    peak, _ = _run_threads(scheduler, [f"http://a.example/{i}" for i in range(3)], hold=0.02)
+    assert peak == {"a.example": 1}
+
+
+def test_set_policy_wakes_waiters():
+    scheduler = PolitenessScheduler(concurrency=1, min_interval=0)
+    entered = threading.Event()
+
+    def second():
+        with scheduler.slot("http://a.example/2"):
+            entered.set()
+
+    with scheduler.slot("http://a.example/1"):
+        thread = threading.Thread(target=second)
+        thread.start()
+        assert not entered.wait(0.05)
+        scheduler.set_policy("a.example", 2, 0)
+        assert entered.wait(1)
+    thread.join()
+
+
+def test_async_slot_waits_without_blocking_the_loop():
+    scheduler = PolitenessScheduler(concurrency=1, min_interval=0)
+    events = []
+
+    async def request(name):
+        async with scheduler.aslot("http://a.example/" + name):
+            events.append(("start", name))
+            await asyncio.sleep(0.02)
+            events.append(("end", name))
+
+    async def ticker():
+        # 等待名额时事件循环仍在运行其他协程
+        await asyncio.sleep(0.01)
+        events.append(("tick", None))
+
+    async def scenario():
+        await asyncio.gather(request("1"), request("2"), ticker())
+
+    asyncio.run(scenario())
+
+    assert [event for event in events if event[0] != "tick"] == [
+        ("start", "1"), ("end", "1"), ("start", "2"), ("end", "2")
+    ]
+    assert events.index(("tick", None)) < events.index(("end", "1"))
@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @Author  : justin.郑
+# @mail    : 3907721@qq.com
+# @Time    : 2026/10/20 14:40
+# @File    : test_registry
+# @desc    : 智能体注册表的注册、延迟导入和实例池
+
+
+import sys
+import pytest
+from dag_orchestration import registry as registry_module
+from dag_orchestration.registry import AgentRegistry
+
+
+class EchoAgent:
+    created = 0
+
+    def __init__(self, name, prefix=""):
+        EchoAgent.created += 1
+        self.name = name
+        self.prefix = prefix
+
+
+class StatefulAgent(EchoAgent):
+    reusable = False
+
+
+@pytest.fixture
+def registry():
+    EchoAgent.created = 0
+    registry = AgentRegistry()
+    registry.register(EchoAgent)
+    registry.register(StatefulAgent)
+    return registry
+
+
+def test_lazy_import_from_module_path(registry, tmp_path, monkeypatch):
+    (tmp_path / "lazy_agents.py").write_text(
+        "class LazyAgent:\n    def __init__(self, name):\n        self.name = name\n", encoding="utf-8"
+    )
+    monkeypatch.syspath_prepend(str(tmp_path))
+    registry.register_lazy("LazyAgent", "lazy_agents")
+    assert "lazy_agents" not in sys.modules
+    assert registry.get_class("LazyAgent").__module__ == "lazy_agents"
+    monkeypatch.delitem(sys.modules, "lazy_agents")
+
+
+def test_unknown_agent_raises_import_error(registry):
+    with pytest.raises(ImportError):
+        registry.get_class("MissingAgent")
+    with pytest.raises(ImportError):
+        registry.get_class("MissingAgent", "no_such_module_for_tests")
+
+
+def test_lease_reuses_released_instances(registry):
+    with registry.lease("EchoAgent", "echo", {"prefix": ">"}) as first:
+        assert first.prefix == ">"
+    with registry.lease("EchoAgent", "echo", {"prefix": ">"}) as second:
+        assert second is first
+    assert EchoAgent.created == 1
+
+
+def test_concurrent_leases_get_separate_instances(registry):
+    with registry.lease("EchoAgent", "echo") as first, registry.lease("EchoAgent", "echo") as second:
+        assert first is not second
+    with registry.lease("EchoAgent", "echo") as third:
+        assert third in (first, second)
+
+
+def test_pool_key_includes_options_name_and_module(registry):
+    with registry.lease("EchoAgent", "echo", {"prefix": ">"}) as agent:
+        pass
+    with registry.lease("EchoAgent", "echo", {"prefix": "<"}) as other_options:
+        assert other_options is not agent
+    with registry.lease("EchoAgent", "echo2", {"prefix": ">"}) as other_name:
+        assert other_name is not agent
+    with registry.lease("EchoAgent", "echo", {"prefix": ">"}, module_path=__name__) as other_module:
+        assert other_module is not agent
+
+
+def test_instance_is_returned_when_task_fails(registry):
+    with pytest.raises(RuntimeError):
+        with registry.lease("EchoAgent", "echo") as agent:
+            raise RuntimeError("任务失败")
+    with registry.lease("EchoAgent", "echo") as again:
+        assert again is agent
+
+
+def test_non_reusable_agents_are_not_pooled(registry):
+    with registry.lease("StatefulAgent", "stateful") as first:
+        pass
+    with registry.lease("StatefulAgent", "stateful") as second:
+        assert second is not first
+
+
+def test_idle_pool_is_bounded(registry, monkeypatch):
+    monkeypatch.setattr(registry_module, "MAX_IDLE_AGENTS", 2)
+    leases = [registry.lease("EchoAgent", "echo") for _ in range(3)]
+    agents = [lease.__enter__() for lease in leases]
+    for lease in leases:
+        lease.__exit__(None, None, None)
+    with registry.lease("EchoAgent", "echo") as a, registry.lease("EchoAgent", "echo") as b, \
+            registry.lease("EchoAgent", "echo") as c:
+        assert sum(agent in agents for agent in (a, b, c)) == 2
+    registry.clear_pool()
+    with registry.lease("EchoAgent", "echo") as fresh:
+        assert fresh not in agents and fresh not in (a, b, c)
@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @Author  : justin.郑
+# @mail    : 3907721@qq.com
+# @Time    : 2026/10/21 17:40
+# @File    : test_results
+# @desc    : 任务结果存储（内存 / SQLite 溢出 + LRU）以及协调器按下游任务数量释放结果
+
+
+import os
+import asyncio
+import pytest
+from dag_orchestration.results import (
+    MemoryResultStore, ResultStore, SpillResultStore, create_result_store
+)
+
+
+@pytest.fixture
+def store(tmp_path):
+    # 上限约 100 字节，便于触发淘汰
+    store = SpillResultStore(str(tmp_path / "spill" / "run.db"), memory_limit_mb=100 / (1024 * 1024))
+    yield store
+    store.close()
+
+
+def test_spill_store_round_trip(store):
+    store.put("a", {"docs": ["x"]})
+    assert "a" in store and store["a"] == {"docs": ["x"]}
+    assert store.get("missing", "default") == "default"
+    with pytest.raises(KeyError):
+        store["missing"]
+
+
+def test_lru_eviction_reloads_from_disk(store):
+    store.put("a", {"v": "a" * 40})
+    store.put("b", {"v": "b" * 40})
+    store.get("a")
+    store.put("c", {"v": "c" * 40})
+    # 最久未使用的 b 被移出内存，但仍可从数据库读取
+    assert list(store._cache) == ["a", "c"]
+    assert store.get("b") == {"v": "b" * 40}
+    assert "b" in store._cache and store._memory_used <= store.memory_limit
+
+
+def test_oversized_result_is_never_cached(store):
+    store.put("big", {"v": "x" * 500})
+    assert "big" not in store._cache and store._memory_used == 0
+    assert store.get("big") == {"v": "x" * 500}
+
+
+def test_unserializable_result_is_pinned(store):
+    value = {"obj": object()}
+    store.put("pinned", value)
+    assert store.get("pinned") is value and "pinned" in store
+    store.release("pinned")
+    assert "pinned" not in store
+
+
+def test_release_and_close(tmp_path):
+    store = SpillResultStore(str(tmp_path / "run.db"))
+    store.put("a", [1, 2])
+    store.release("a")
+    assert "a" not in store and store._memory_used == 0
+    store.put("b", [3])
+    store.close()
+    assert not os.path.exists(store.db_path)
+
+
+def test_create_result_store(tmp_path):
+    assert isinstance(create_result_store(None, "run"), MemoryResultStore)
+    store = create_result_store({"spill_dir": str(tmp_path), "memory_limit_mb": 1}, "run1")
+    try:
+        assert isinstance(store, SpillResultStore) and store.db_path == os.path.join(str(tmp_path), "run1.db")
+    finally:
+        store.close()
+
+
+def test_incomplete_store_cannot_be_instantiated():
+    class NoRelease(ResultStore):
+        def put(self, task_id, result):
+            pass
+
+        def get(self, task_id, default=None):
+            return default
+
+        def __contains__(self, task_id):
+            return False
+
+    with pytest.raises(TypeError):
+        NoRelease()
+
+
+RELEASE_DAG = '''
+results:
+  spill_dir: %s
+  memory_limit_mb: 1
+tasks:
+  - {id: a, name: A, agent: SourceAgent, module: dag_test_agents}
+  - {id: b, name: B, agent: EchoAgent, module: dag_test_agents, dependencies: [a], options: {delay: 0.05}}
+  - {id: c, name: C, agent: EchoAgent, module: dag_test_agents, dependencies: [a]}
+  - {id: d, name: D, agent: EchoAgent, module: dag_test_agents, dependencies: [b, c]}
+'''
+
+
+def test_results_are_released_after_last_consumer(make_coordinator, tmp_path):
+    coordinator = make_coordinator(RELEASE_DAG % (tmp_path / "spill"))
+    ctx = coordinator.create_context({"items": [1]})
+    released = []
+    release = ctx.results.release
+
+    def spy(task_id):
+        # 记录释放已有结果时各下游任务的状态（put 写入前也会调用 release，此时结果尚不存在）
+        if task_id in ctx.results:
+            released.append((task_id, {task: ctx.states[task] for task in ("b", "c", "d")}))
+        release(task_id)
+    ctx.results.release = spy
+    try:
+        asyncio.run(coordinator.execute(ctx))
+        assert sorted(task_id for task_id, _ in released) == ["a", "b", "c"] and released[0][0] == "a"
+        # a 在两个下游任务都结束后才释放
+        assert released[0][1]["b"] == "completed" and released[0][1]["c"] == "completed"
+        assert "a" not in ctx.results and "b" not in ctx.results
+        # 输出任务的结果保留到运行结束
+        assert ctx.output() == {"b": {"items": [1], "tag": None}, "c": {"items": [1], "tag": None}}
+    finally:
+        ctx.close()
+    assert not os.path.exists(ctx.results.db_path)
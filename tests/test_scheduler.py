@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @Author  : justin.郑
+# @mail    : 3907721@qq.com
+# @Time    : 2026/10/21 18:30
+# @File    : test_scheduler
+# @desc    : 按优先级分配运行名额，以及协调器按向上秩（剩余关键路径）启动就绪任务
+
+
+import json
+import asyncio
+import pytest
+from dag_orchestration.scheduler import PrioritySlots
+
+
+async def _acquire_in_order(slots, order, priority, name):
+    async with slots.slot(priority):
+        order.append(name)
+        await asyncio.sleep(0)
+
+
+def test_waiters_get_slots_by_priority_then_fifo():
+    async def main():
+        slots = PrioritySlots(1)
+        order = []
+        await slots.acquire()
+        waiters = [
+            asyncio.create_task(_acquire_in_order(slots, order, priority, name))
+            for name, priority in (("low", 1), ("high-1", 5), ("mid", 3), ("high-2", 5))
+        ]
+        await asyncio.sleep(0)
+        slots.release()
+        await asyncio.gather(*waiters)
+        return order, slots.active
+
+    order, active = asyncio.run(main())
+    assert order == ["high-1", "high-2", "mid", "low"] and active == 0
+
+
+def test_unlimited_slots_never_wait():
+    async def main():
+        slots = PrioritySlots(None)
+        for _ in range(100):
+            await slots.acquire()
+        return slots.active
+
+    assert asyncio.run(main()) == 100
+
+
+def test_new_arrivals_do_not_jump_the_queue():
+    async def main():
+        slots = PrioritySlots(1)
+        order = []
+        await slots.acquire()
+        waiter = asyncio.create_task(_acquire_in_order(slots, order, 1, "waiting"))
+        await asyncio.sleep(0)
+        slots.release()
+        # 名额已交给等待者，新来的任务即使优先级更高也要排队
+        await _acquire_in_order(slots, order, 10, "late")
+        await waiter
+        return order
+
+    assert asyncio.run(main()) == ["waiting", "late"]
+
+
+def test_cancelled_waiter_passes_its_slot_on():
+    async def main():
+        slots = PrioritySlots(1)
+        order = []
+        await slots.acquire()
+        cancelled = asyncio.create_task(slots.acquire(5))
+        other = asyncio.create_task(_acquire_in_order(slots, order, 1, "other"))
+        await asyncio.sleep(0)
+        # 名额分配给 cancelled 之后、它恢复运行之前被取消
+        slots.release()
+        cancelled.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await cancelled
+        await other
+        return order, slots.active
+
+    assert asyncio.run(main()) == (["other"], 0)
+
+
+def test_cancelled_before_grant_is_skipped():
+    async def main():
+        slots = PrioritySlots(1)
+        await slots.acquire()
+        cancelled = asyncio.create_task(slots.acquire(5))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        await asyncio.gather(cancelled, return_exceptions=True)
+        slots.release()
+        return slots.active, len(slots._waiters)
+
+    assert asyncio.run(main()) == (0, 0)
+
+
+# b 和 c 同时就绪；c 后面还有 d，剩余关键路径更长
+RANK_DAG = '''
+max_parallel_tasks: 1
+tasks:
+  - {id: a, name: A, agent: SourceAgent, module: dag_test_agents}
+  - {id: b, name: B, agent: EchoAgent, module: dag_test_agents, dependencies: [a]}
+  - {id: c, name: C, agent: EchoAgent, module: dag_test_agents, dependencies: [a]}
+  - {id: d, name: D, agent: EchoAgent, module: dag_test_agents, dependencies: [c]}
+  - {id: e, name: E, agent: EchoAgent, module: dag_test_agents, dependencies: [b, d]}
+'''
+
+
+def _run_order(coordinator, test_agents):
+    ctx = coordinator.create_context({"items": []})
+    try:
+        asyncio.run(coordinator.execute(ctx))
+    finally:
+        ctx.close()
+    return [name for name, _ in test_agents.calls]
+
+
+def test_ready_tasks_start_by_upward_rank(make_coordinator, test_agents):
+    coordinator = make_coordinator(RANK_DAG)
+    assert _run_order(coordinator, test_agents) == ["A", "C", "B", "D", "E"]
+
+
+def test_upward_rank_uses_recorded_durations(make_coordinator, test_agents, tmp_path):
+    (tmp_path / "dag.durations.json").write_text(json.dumps({"b": [10.0]}), encoding="utf-8")
+    coordinator = make_coordinator(RANK_DAG)
+    assert _run_order(coordinator, test_agents) == ["A", "B", "C", "D", "E"]
@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @Author  : justin.郑
+# @mail    : 3907721@qq.com
+# @Time    : 2026/10/21 15:30
+# @File    : test_scrape
+# @desc    : 网页抓取的大小上限、正文提取和结果顺序（本地 http.server）
+
+
+import time
+import threading
+import http.server
+import pytest
+from web_access import scrape
+from web_access.fetcher import HttpFetcher
+from web_access.scrape import WebScrapeAgent
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        if self.path == "/missing":
+            return self._send(404)
+        if self.path == "/empty":
+            return self._send(200, b"<script>var x = 1;</script>")
+        if self.path == "/slow":
+            time.sleep(0.2)
+        repeat = 10000 if self.path == "/big" else 1
+        self._send(200, ("<p>" + self.path.strip("/") + "</p>").encode("utf-8") * repeat)
+
+    def _send(self, status, body=b""):
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope="module")
+def base_url():
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def agent(monkeypatch):
+    fetcher = HttpFetcher(backend="requests", max_retries=0)
+    monkeypatch.setattr(scrape, "fetcher", fetcher)
+    yield WebScrapeAgent(use_page_cache=False)
+    fetcher.close()
+
+
+def test_page_over_size_cap_is_truncated_before_parsing(agent, base_url):
+    agent.MAX_PAGE_BYTES = 200
+
+    content = agent.scrape_website(base_url + "/big")
+
+    # 只解析前 200 字节（18 个完整段落加上被截断的第 19 个）
+    assert content.split()[:18] == ["big"] * 18
+    assert len(content) < 200
+
+
+def test_scrape_website_extracts_text(agent, base_url):
+    assert agent.scrape_website(base_url + "/page") == "page"
+    assert agent.scrape_website(base_url + "/missing") == ""
+
+
+def test_scrape_results_keep_search_order_and_skip_empty_pages(agent, base_url):
+    agent.MAX_PAGE_BYTES = 200
+    results = [
+        {"Title": title, "Link": base_url + path, "Snippet": f"{title}摘要"}
+        for title, path in [("慢", "/slow"), ("缺失", "/missing"), ("大", "/big"), ("空", "/empty"), ("快", "/fast")]
+    ]
+
+    scraped = agent.scrape_results(results)
+
+    assert [item["title"] for item in scraped] == ["慢", "大", "快"]
+    assert scraped[0] == {"title": "慢", "url": base_url + "/slow", "snippet": "慢摘要", "content": "slow"}
+    assert len(scraped[1]["content"]) < 200
+    assert "CONTENT:\nfast\n" in WebScrapeAgent.format_results(scraped)
@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @Author  : justin.郑
+# @mail    : 3907721@qq.com
+# @Time    : 2026/10/20 15:10
+# @File    : test_server
+# @desc    : DAG 作业服务的请求校验、优先级队列和 HTTP 接口
+
+
+import os
+import json
+import asyncio
+import pytest
+from dag_orchestration.server import COMPLETED, DagJobService
+
+
+AGENT_MODULE = '''
+import asyncio
+from utils.message import Message
+
+started = []
+
+
+class ServerTestAgent:
+    def __init__(self, name):
+        self.name = name
+
+    async def process(self, message):
+        params = message.content if isinstance(message.content, dict) else {}
+        started.append(params.get("tag"))
+        await asyncio.sleep(0.01)
+        return Message(content={"report": f"# {params.get('tag')}"}, sender=self.name, recipient=message.sender)
+'''
+
+DAG = '''
+tasks:
+  - id: report
+    name: Report
+    agent: ServerTestAgent
+    module: server_test_agents
+    dependencies: []
+'''
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    (tmp_path / "server_test_agents.py").write_text(AGENT_MODULE, encoding="utf-8")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    dag_dir = tmp_path / "dags"
+    (dag_dir / "docs" / "tenant").mkdir(parents=True)
+    (dag_dir / "dag.yml").write_text(DAG, encoding="utf-8")
+    (tmp_path / "outside.yml").write_text(DAG, encoding="utf-8")
+    service = DagJobService(default_dag_file=str(dag_dir / "dag.yml"), max_concurrent_jobs=1,
+                            output_root=str(tmp_path / "runs"))
+    import server_test_agents
+    server_test_agents.started.clear()
+    return service
+
+
+async def _wait_finished(jobs, timeout=5.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not all(job.finished for job in jobs):
+        assert asyncio.get_running_loop().time() < deadline
+        await asyncio.sleep(0.01)
+
+
+@pytest.mark.parametrize("priority", [None, [1], {"p": 1}, True, "5", 1.5])
+def test_rejects_non_integer_priority(service, priority):
+    with pytest.raises(ValueError):
+        asyncio.run(service.submit(priority=priority))
+
+
+@pytest.mark.parametrize("params", [[], "docs", 3])
+def test_rejects_non_object_params(service, params):
+    with pytest.raises(ValueError):
+        asyncio.run(service.submit(params=params))
+
+
+def test_restricts_dag_file_and_docs_folder(service, tmp_path):
+    with pytest.raises(ValueError):
+        asyncio.run(service.submit(str(tmp_path / "outside.yml")))
+    for docs_folder in ("/etc", str(tmp_path), str(tmp_path / "dags" / "docs" / ".." / "..")):
+        with pytest.raises(ValueError):
+            service.resolve_params({"docs_folder": docs_folder})
+    params = service.resolve_params({"docs_folder": str(tmp_path / "dags" / "docs" / "tenant"), "tag": "a"})
+    assert params == {"docs_folder": os.path.realpath(tmp_path / "dags" / "docs" / "tenant"), "tag": "a"}
+
+
+def test_jobs_run_by_priority_then_submission_order(service):
+    import server_test_agents
+
+    async def main():
+        jobs = [await service.submit(params={"tag": tag}, priority=priority)
+                for tag, priority in (("low", 0), ("high", 5), ("mid", 1), ("high2", 5))]
+        server = await service.start(port=0)
+        try:
+            await _wait_finished(jobs)
+        finally:
+            server.close()
+            await service.stop()
+        return jobs
+
+    jobs = asyncio.run(main())
+    assert server_test_agents.started == ["high", "high2", "mid", "low"]
+    assert all(job.status == COMPLETED for job in jobs)
+    with open(jobs[0].report_path, encoding="utf-8") as file:
+        assert file.read() == "# low"
+
+
+async def _request(port, method, path, body=None):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    data = json.dumps(body).encode("utf-8") if body is not None else b""
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {len(data)}\r\n\r\n".encode() + data)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, payload = response.partition(b"\r\n\r\n")
+    return int(head.split()[1]), payload
+
+
+def test_http_interface(service):
+    async def main():
+        server = await service.start(port=0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            for body in ({"priority": None}, {"priority": [1]}, {"params": []}, {"params": {"docs_folder": "/etc"}},
+                         {"dag_file": "/etc/passwd"}, [1, 2]):
+                status, _ = await _request(port, "POST", "/jobs", body)
+                assert status == 400, body
+            status, payload = await _request(port, "POST", "/jobs", {"params": {"tag": "http"}, "priority": 2})
+            assert status == 202
+            job_id = json.loads(payload)["job_id"]
+            await _wait_finished([service.jobs[job_id]])
+            status, payload = await _request(port, "GET", f"/jobs/{job_id}")
+            assert (status, json.loads(payload)["status"]) == (200, COMPLETED)
+            status, payload = await _request(port, "GET", f"/jobs/{job_id}/report")
+            assert (status, payload.decode("utf-8")) == (200, "# http")
+            status, _ = await _request(port, "GET", "/jobs/missing")
+            assert status == 404
+        finally:
+            server.close()
+            await service.stop()
+
+    asyncio.run(main())
@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @Author  : justin.郑
+# @mail    : 3907721@qq.com
+# @Time    : 2026/10/20 16:10
+# @File    : test_streaming
+# @desc    : 流式处理：按需读取输入、逐条写出并刷新结果、按台账续跑
+
+
+import sys
+import json
+import types
+import asyncio
+import pytest
+from web_access.fetcher import FetchError
+
+try:
+    import Agently  # noqa: F401
+except ImportError:
+    # 查询函数被替换，不需要模型依赖
+    sys.modules.setdefault("Agently", types.ModuleType("Agently"))
+from dynamic_sharding import main
+from dynamic_sharding.delegate import Delegate
+from dynamic_sharding.streaming import iter_entities
+
+
+@pytest.fixture
+def searched(monkeypatch):
+    """
+    替换 Delegate._search：记录查询过的实体，按 failures 中的配置抛出异常，
+    并在查询时记录输出文件当前已写出的行数。
+    """
+    state = {"calls": [], "failures": {}, "output": None, "seen_lines": {}}
+
+    async def fake_search(self, entity):
+        state["calls"].append(entity)
+        if state["output"] is not None:
+            with open(state["output"], encoding="utf-8") as file:
+                state["seen_lines"][entity] = len(file.read().splitlines())
+        if entity in state["failures"]:
+            raise state["failures"][entity]
+        return f"{entity}的信息"
+
+    monkeypatch.setattr(Delegate, "_search", fake_search)
+    return state
+
+
+def read_jsonl(path):
+    with open(path, encoding="utf-8") as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+def run_streaming(input_file, output_file, **kwargs):
+    # 单个子代理、每批一个实体，实体按输入顺序依次处理
+    options = {"workers": 1, "max_workers": 1, "batch_size": 1, "adaptive": False}
+    asyncio.run(main.run_streaming(str(input_file), str(output_file), "jsonl", options, **kwargs))
+
+
+def test_iter_entities_skips_blank_lines(tmp_path):
+    input_file = tmp_path / "entities.txt"
+    input_file.write_text("北京\n\n  上海  \n\n广州", encoding="utf-8")
+
+    assert list(iter_entities(str(input_file))) == [(1, "北京"), (3, "上海"), (5, "广州")]
+
+
+def test_results_are_flushed_as_each_entity_completes(tmp_path, searched):
+    input_file = tmp_path / "entities.txt"
+    input_file.write_text("北京\n上海\n广州\n", encoding="utf-8")
+    output_file = tmp_path / "out.jsonl"
+    searched["output"] = str(output_file)
+
+    run_streaming(input_file, output_file)
+
+    # 每个实体开始查询时，之前完成的实体已经写入文件
+    assert searched["seen_lines"] == {"北京": 0, "上海": 1, "广州": 2}
+    assert read_jsonl(output_file) == [
+        {"line": 1, "entity": "北京", "status": "ok", "info": "北京的信息"},
+        {"line": 2, "entity": "上海", "status": "ok", "info": "上海的信息"},
+        {"line": 3, "entity": "广州", "status": "ok", "info": "广州的信息"},
+    ]
+
+
+def test_resume_only_retries_transient_failures(tmp_path, searched):
+    input_file = tmp_path / "entities.txt"
+    input_file.write_text("北京\n上海\n深圳\n广州\n", encoding="utf-8")
+    output_file = tmp_path / "out.jsonl"
+    ledger_path = str(tmp_path / "ledger.db")
+    searched["failures"] = {
+        "上海": FetchError("超时", transient=True),
+        "深圳": FetchError("未找到", status=404),
+    }
+
+    run_streaming(input_file, output_file, ledger_path=ledger_path, max_attempts=1)
+
+    first = read_jsonl(output_file)
+    assert [(r["entity"], r["status"]) for r in first] == [
+        ("北京", "ok"), ("上海", "error"), ("深圳", "error"), ("广州", "ok")
+    ]
+
+    searched["calls"].clear()
+    searched["failures"].pop("上海")
+    run_streaming(input_file, output_file, resume=True, ledger_path=ledger_path, max_attempts=2)
+
+    # 已完成和永久性失败的实体不再查询，结果追加到原输出文件之后
+    assert searched["calls"] == ["上海"]
+    records = read_jsonl(output_file)
+    assert records[:len(first)] == first
+    assert records[len(first):] == [{"line": 2, "entity": "上海", "status": "ok", "info": "上海的信息"}]
+
+
+def test_rerun_without_resume_overwrites_output(tmp_path, searched):
+    input_file = tmp_path / "entities.txt"
+    input_file.write_text("北京\n", encoding="utf-8")
+    output_file = tmp_path / "out.jsonl"
+    ledger_path = str(tmp_path / "ledger.db")
+
+    run_streaming(input_file, output_file, ledger_path=ledger_path)
+    run_streaming(input_file, output_file, ledger_path=ledger_path)
+
+    assert searched["calls"] == ["北京", "北京"]
+    assert len(read_jsonl(output_file)) == 1
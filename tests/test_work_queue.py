@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @Author  : justin.郑
+# @mail    : 3907721@qq.com
+# @Time    : 2026/10/20 14:10
+# @File    : test_work_queue
+# @desc    : 工作队列的结果上报、批大小和子代理数量的自适应调整，以及输入序列或回调异常时的处理
+
+
+import asyncio
+import pytest
+from dynamic_sharding.work_queue import WorkQueue
+
+
+def _run(queue, items):
+    results = {}
+
+    def on_result(key, entity, result, error):
+        assert key not in results
+        results[key] = (entity, result, error)
+
+    asyncio.run(queue.run(items, on_result))
+    return results
+
+
+def test_processes_every_entity_once():
+    async def fetch(agent, entity):
+        await asyncio.sleep(0.001)
+        if entity == "坏":
+            raise ValueError("查询失败")
+        return f"{agent}:{entity}"
+
+    queue = WorkQueue(worker_factory=lambda idx: f"agent{idx}", fetch=fetch, workers=3, batch_size=2)
+    items = [(index, entity) for index, entity in enumerate(["甲", "乙", "坏", "丙", "丁"] * 4)]
+    results = _run(queue, items)
+
+    assert sorted(results) == list(range(20))
+    for key, (entity, result, error) in results.items():
+        if entity == "坏":
+            assert result is None and isinstance(error, ValueError)
+        else:
+            assert error is None and result.endswith(f":{entity}")
+
+
+def test_straggler_shrinks_batch_then_recovers():
+    queue = None
+    batch_sizes = []
+
+    async def fetch(agent, entity):
+        batch_sizes.append(queue._current_batch)
+        await asyncio.sleep(0.3 if entity == "慢" else 0.02)
+        return entity
+
+    queue = WorkQueue(worker_factory=lambda idx: None, fetch=fetch, workers=1, batch_size=4, max_workers=1)
+    _run(queue, enumerate(["慢"] + ["快"] * 11))
+    # 第一批有拖尾实体，批大小减半后逐步恢复
+    assert batch_sizes == [4] * 4 + [2] * 2 + [3] * 3 + [4] * 3
+
+
+def test_scales_workers_up_and_back_down():
+    calls = 0
+    in_flight = 0
+    concurrency = []
+
+    async def fetch(agent, entity):
+        nonlocal calls, in_flight
+        calls += 1
+        in_flight += 1
+        concurrency.append(in_flight)
+        # 前半段耗时稳定，后半段下游变慢
+        await asyncio.sleep(0.005 if calls <= 60 else 0.05)
+        in_flight -= 1
+        return entity
+
+    queue = WorkQueue(worker_factory=lambda idx: None, fetch=fetch, workers=1, max_workers=4)
+    results = _run(queue, ((index, index) for index in range(120)))
+
+    assert len(results) == 120
+    assert max(concurrency[:60]) == 4
+    assert max(concurrency[-10:]) == 1
+
+
+def test_no_adaptation_when_disabled():
+    async def fetch(agent, entity):
+        await asyncio.sleep(0.001)
+        return entity
+
+    queue = WorkQueue(worker_factory=lambda idx: None, fetch=fetch, workers=2, max_workers=8, adaptive=False)
+    _run(queue, ((index, index) for index in range(30)))
+    assert queue._next_worker_id == 2
+
+
+def test_iterator_error_is_raised_and_workers_cancelled():
+    cancelled = []
+
+    async def fetch(agent, entity):
+        try:
+            await asyncio.sleep(0.5 if entity == "慢" else 0.001)
+        except asyncio.CancelledError:
+            cancelled.append(entity)
+            raise
+        return entity
+
+    def items():
+        yield 0, "慢"
+        for index in range(1, 5):
+            yield index, index
+        raise OSError("读取实体文件失败")
+
+    queue = WorkQueue(worker_factory=lambda idx: None, fetch=fetch, workers=2, adaptive=False)
+    with pytest.raises(OSError, match="读取实体文件失败"):
+        _run(queue, items())
+    assert cancelled == ["慢"]
+    assert not queue._tasks
+
+
+def test_callback_error_is_raised():
+    async def fetch(agent, entity):
+        await asyncio.sleep(0.001)
+        return entity
+
+    def on_result(key, entity, result, error):
+        if key == 3:
+            raise RuntimeError("写出结果失败")
+
+    queue = WorkQueue(worker_factory=lambda idx: None, fetch=fetch, workers=2, batch_size=2)
+    with pytest.raises(RuntimeError, match="写出结果失败"):
+        asyncio.run(queue.run(((index, index) for index in range(10)), on_result))
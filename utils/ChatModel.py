@@ -9,14 +9,28 @@
 
 
 import os
+import threading
 from dotenv import load_dotenv
 load_dotenv()
 
 import Agently
+from utils.llm_usage import CountingAgentFactory
 
 class ChatModel:
-    # 创建agent
+    # 按模型源缓存的模型工厂，进程内所有智能体共享
+    _factories = {}
+    _lock = threading.Lock()
+
+    # 获取（复用）agent工厂
     def get_agent_factory(self, model_source="doubao_deepseek"):
+        with ChatModel._lock:
+            if model_source not in ChatModel._factories:
+                # 包装后可按执行上下文统计调用次数（utils.llm_usage.track_llm_calls）
+                ChatModel._factories[model_source] = CountingAgentFactory(self._create_agent_factory(model_source))
+            return ChatModel._factories[model_source]
+
+    # 创建agent工厂
+    def _create_agent_factory(self, model_source):
         if model_source == "doubao_deepseek":
             agent_factory = Agently.AgentFactory()
             (
@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @Author  : justin.郑
+# @mail    : 3907721@qq.com
+# @Time    : 2026/10/19 19:00
+# @File    : chunking
+# @desc    : 长文档按token预算分块及分块结果的合并工具
+
+
+import re
+from typing import Iterable, List
+from utils.tokens import estimate_tokens
+
+# 默认每个分块的token上限
+DEFAULT_CHUNK_TOKENS = 3000
+# 默认相邻分块之间重叠的token数量
+DEFAULT_CHUNK_OVERLAP = 200
+
+# 在句末标点和换行之后切分，分隔符保留在前一段末尾，各段拼接后与原文完全一致
+_SEGMENT_PATTERN = re.compile(r'(?<=[。！？!?；;\n])')
+
+
+def split_text(
+    text: str,
+    max_tokens: int = DEFAULT_CHUNK_TOKENS,
+    overlap_tokens: int = DEFAULT_CHUNK_OVERLAP
+) -> List[str]:
+    """
+    按token预算把文本切分为若干分块，优先在句子和换行处断开，超长的句子按字符强制切分。
+    不超过预算的文本原样作为唯一分块返回。
+
+    参数：
+        text (str): 待切分的文本。
+        max_tokens (int): 每个分块的token上限。
+        overlap_tokens (int): 相邻分块之间重叠的token数量，为0时各分块依次拼接即为原文。
+
+    返回：
+        List[str]: 分块列表。
+    """
+    max_tokens = max(1, int(max_tokens))
+    overlap_tokens = max(0, min(int(overlap_tokens), max_tokens // 2))
+    if estimate_tokens(text) <= max_tokens:
+        return [text]
+
+    segments = []
+    for segment in _SEGMENT_PATTERN.split(text):
+        if segment:
+            segments.extend(_split_long_segment(segment, max_tokens))
+
+    chunks = []
+    current: List[str] = []
+    current_tokens = 0
+    for segment in segments:
+        tokens = estimate_tokens(segment)
+        if current and current_tokens + tokens > max_tokens:
+            chunks.append("".join(current))
+            # 从上一分块末尾取不超过重叠预算的若干段作为下一分块的开头
+            overlap: List[str] = []
+            overlap_size = 0
+            for previous in reversed(current):
+                size = estimate_tokens(previous)
+                if overlap_size + size > overlap_tokens or overlap_size + size + tokens > max_tokens:
+                    break
+                overlap.insert(0, previous)
+                overlap_size += size
+            current, current_tokens = overlap, overlap_size
+        current.append(segment)
+        current_tokens += tokens
+    if current:
+        chunks.append("".join(current))
+    return chunks
+
+
+def pack_by_tokens(texts: List[str], max_tokens: int = DEFAULT_CHUNK_TOKENS) -> List[List[str]]:
+    """
+    按token预算把多段文本依次打包成组，用于分层归并。为保证每轮归并都能减少文本数量，
+    除最后一组外每组至少包含两段文本。
+
+    参数：
+        texts (List[str]): 待打包的文本。
+        max_tokens (int): 每组的token预算。
+
+    返回：
+        List[List[str]]: 分组后的文本。
+    """
+    groups: List[List[str]] = []
+    current: List[str] = []
+    current_tokens = 0
+    for text in texts:
+        tokens = estimate_tokens(text)
+        if len(current) >= 2 and current_tokens + tokens > max_tokens:
+            groups.append(current)
+            current, current_tokens = [], 0
+        current.append(text)
+        current_tokens += tokens
+    if current:
+        groups.append(current)
+    return groups
+
+
+def merge_unique(lists: Iterable[Iterable[str]]) -> List[str]:
+    """
+    合并多个分块的提取结果并去重（忽略首尾空白和大小写），保留首次出现的顺序。
+
+    参数：
+        lists (Iterable[Iterable[str]]): 各分块的提取结果。
+
+    返回：
+        List[str]: 去重后的并集。
+    """
+    merged = []
+    seen = set()
+    for values in lists:
+        for value in values or []:
+            key = str(value).strip().casefold()
+            if key and key not in seen:
+                seen.add(key)
+                merged.append(value)
+    return merged
+
+
+def _split_long_segment(segment: str, max_tokens: int) -> List[str]:
+    """
+    把超过token上限的单个片段按字符切分为不超过上限的若干段。
+    """
+    tokens = estimate_tokens(segment)
+    if tokens <= max_tokens:
+        return [segment]
+    step = max(1, len(segment) * max_tokens // tokens)
+    parts = []
+    start = 0
+    while start < len(segment):
+        end = min(len(segment), start + step)
+        while end - start > 1 and estimate_tokens(segment[start:end]) > max_tokens:
+            end = start + max(1, (end - start) * 9 // 10)
+        parts.append(segment[start:end])
+        start = end
+    return parts
@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @Author  : justin.郑
+# @mail    : 3907721@qq.com
+# @Time    : 2026/10/19 10:05
+# @File    : concurrency
+# @desc    : 有界并发执行工具
+
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, TypeVar
+
+T = TypeVar("T")
+
+# 默认的单阶段并发上限
+DEFAULT_CONCURRENCY = 4
+
+
+async def gather_with_concurrency(
+    items: Iterable[T],
+    worker: Callable[[T], Awaitable[Any]],
+    limit: int = DEFAULT_CONCURRENCY
+) -> List[Any]:
+    """
+    在并发上限内对每个元素执行异步处理函数，结果顺序与输入顺序一致。
+
+    单个元素处理失败时，对应位置返回异常对象而不是抛出，
+    由调用方决定如何处理失败的元素，其余元素不受影响。
+
+    参数：
+        items (Iterable[T]): 待处理的元素。
+        worker (Callable[[T], Awaitable[Any]]): 处理单个元素的异步函数。
+        limit (int): 同时运行的最大协程数量，小于1时按1处理。
+
+    返回：
+        List[Any]: 与输入顺序一致的处理结果或异常对象列表。
+    """
+    semaphore = asyncio.Semaphore(max(1, int(limit or 1)))
+
+    async def _run(item: T) -> Any:
+        async with semaphore:
+            return await worker(item)
+
+    return await asyncio.gather(*(_run(item) for item in items), return_exceptions=True)
+
+
+async def gather_bounded(
+    items: Iterable[T],
+    worker: Callable[[T], Awaitable[Any]],
+    limit: int = DEFAULT_CONCURRENCY
+) -> List[Any]:
+    """
+    与 gather_with_concurrency 相同，但按需读取元素、创建任务：任意时刻最多存在 limit 个任务，
+    元素数量很大（或是惰性生成的）时内存占用不随元素数量增长。
+
+    参数：
+        items (Iterable[T]): 待处理的元素，按需读取。
+        worker (Callable[[T], Awaitable[Any]]): 处理单个元素的异步函数。
+        limit (int): 同时存在的最大任务数量，小于1时按1处理。
+
+    返回：
+        List[Any]: 与输入顺序一致的处理结果或异常对象列表。
+    """
+    limit = max(1, int(limit or 1))
+    results: Dict[int, Any] = {}
+    pending: Dict[asyncio.Future, int] = {}
+    iterator = iter(enumerate(items))
+    try:
+        while True:
+            while len(pending) < limit:
+                entry = next(iterator, None)
+                if entry is None:
+                    break
+                index, item = entry
+                pending[asyncio.ensure_future(worker(item))] = index
+            if not pending:
+                break
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                index = pending.pop(task)
+                results[index] = task.exception() if task.exception() is not None else task.result()
+    finally:
+        for task in pending:
+            task.cancel()
+    return [results[index] for index in range(len(results))]
+
+
+async def gather_grouped(
+    groups: List[List[T]],
+    worker: Callable[[T], Awaitable[Any]],
+    limit: int = DEFAULT_CONCURRENCY
+) -> List[List[Any]]:
+    """
+    把多组元素展开后在同一个并发上限内处理，再按原分组返回结果。
+    用于文档分块：不同文档的分块共享并发额度，长文档的分块可以与其他文档并行处理。
+
+    参数：
+        groups (List[List[T]]): 分组后的元素，例如每个文档的分块列表。
+        worker (Callable[[T], Awaitable[Any]]): 处理单个元素的异步函数。
+        limit (int): 同时运行的最大协程数量。
+
+    返回：
+        List[List[Any]]: 与输入分组一致的处理结果或异常对象。
+    """
+    flat = [item for group in groups for item in group]
+    results = await gather_with_concurrency(flat, worker, limit)
+    grouped = []
+    offset = 0
+    for group in groups:
+        grouped.append(results[offset:offset + len(group)])
+        offset += len(group)
+    return grouped
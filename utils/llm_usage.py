@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @Author  : justin.郑
+# @mail    : 3907721@qq.com
+# @Time    : 2026/10/19 22:00
+# @File    : llm_usage
+# @desc    : 按执行上下文统计大模型调用次数
+
+
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Any, Iterator, Optional
+
+
+class CallCounter:
+    """
+    线程安全的调用计数器。
+    """
+    def __init__(self) -> None:
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def increment(self) -> None:
+        with self._lock:
+            self.count += 1
+
+
+# 当前执行上下文的计数器。asyncio 子任务和 asyncio.to_thread 会继承创建时的上下文，
+# 因此任务内部并发发起的调用都计入同一个计数器
+_current_counter: contextvars.ContextVar[Optional[CallCounter]] = contextvars.ContextVar(
+    "llm_call_counter", default=None
+)
+
+
+@contextmanager
+def track_llm_calls() -> Iterator[CallCounter]:
+    """
+    在代码块内统计大模型调用次数。
+
+    返回：
+        Iterator[CallCounter]: 代码块内（包括其创建的子任务和线程中）的调用计数器。
+    """
+    counter = CallCounter()
+    token = _current_counter.set(counter)
+    try:
+        yield counter
+    finally:
+        _current_counter.reset(token)
+
+
+def record_llm_call() -> None:
+    """
+    在当前计数器（如果有）上记录一次调用。
+    """
+    counter = _current_counter.get()
+    if counter is not None:
+        counter.increment()
+
+
+class CountingAgent:
+    """
+    包装模型智能体，每次 start() 发起请求时记录一次调用；链式调用（input / output 等）返回包装后的对象，
+    只创建而没有发起请求的智能体不计入。
+    """
+    def __init__(self, agent: Any) -> None:
+        self._agent = agent
+
+    def start(self, *args: Any, **kwargs: Any) -> Any:
+        record_llm_call()
+        return self._agent.start(*args, **kwargs)
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._agent, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args: Any, **kwargs: Any) -> Any:
+            result = attr(*args, **kwargs)
+            return self if result is self._agent else result
+        return call
+
+
+class CountingAgentFactory:
+    """
+    包装模型工厂，创建的模型智能体在每次 start() 时记录一次调用，其余属性直接转发给原工厂。
+    """
+    def __init__(self, factory: Any) -> None:
+        self._factory = factory
+
+    def create_agent(self, *args: Any, **kwargs: Any) -> Any:
+        return CountingAgent(self._factory.create_agent(*args, **kwargs))
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._factory, name)
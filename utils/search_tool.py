@@ -16,6 +16,9 @@ load_dotenv()
 import requests
 from typing import Dict, Any
 
+# 请求的连接超时和读取超时（秒）
+REQUEST_TIMEOUT = (3, 5)
+
 
 def baidu_search(query: str, max_results: int = 10) -> Dict[str, Any]:
     r"""
@@ -42,7 +45,8 @@ def baidu_search(query: str, max_results: int = 10) -> Dict[str, Any]:
         }
         params = {"wd": query, "rn": str(max_results)}
 
-        response = requests.get(url, headers=headers, params=params)
+        response = requests.get(url, headers=headers, params=params, timeout=REQUEST_TIMEOUT)
+        response.raise_for_status()
         response.encoding = "utf-8"
 
         soup = BeautifulSoup(response.text, "html.parser")
@@ -110,13 +114,16 @@ def bocha_search(query: str, count: int = 10) -> str:
         "answer": True
     }
 
-    response = requests.post(url, headers=headers, json=data)
+    try:
+        response = requests.post(url, headers=headers, json=data, timeout=REQUEST_TIMEOUT)
+    except requests.RequestException as e:
+        return f"搜索API请求失败，原因是: {e}"
 
     if response.status_code == 200:
-        json_response = response.json()
         try:
+            json_response = response.json()
             if json_response["code"] != 200 or not json_response["messages"]:
-                return f"搜索API请求失败，原因是: {response.msg or '未知错误'}"
+                return f"搜索API请求失败，原因是: {json_response.get('msg') or '未知错误'}"
 
             webpages = json_response["messages"]
             if not webpages:
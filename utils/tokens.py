@@ -0,0 +1,34 @@
+#!/usr/bin/env python
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @Author  : justin.郑
+# @mail    : 3907721@qq.com
+# @Time    : 2026/10/19 16:50
+# @File    : tokens
+# @desc    : 文本token数量估算
+
+
+import re
+
+# 中日韩字符及全角标点，通常每个字符约占1个token
+_CJK_PATTERN = re.compile(r'[　-〿぀-ヿ㐀-䶿一-鿿豈-﫿＀-￯]')
+# 其他字符平均每个token对应的字符数
+_CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    粗略估算文本的token数量：中日韩字符按每字1个token计算，其余字符按每4个字符1个token计算。
+    该估算不依赖具体模型的分词器，用于批量大小和分块长度的预算控制。
+
+    参数：
+        text (str): 待估算的文本。
+
+    返回：
+        int: 估算的token数量。
+    """
+    if not text:
+        return 0
+    cjk_count = len(_CJK_PATTERN.findall(text))
+    other_count = len(text) - cjk_count
+    return cjk_count + (other_count + _CHARS_PER_TOKEN - 1) // _CHARS_PER_TOKEN
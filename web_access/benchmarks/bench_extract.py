@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @Author  : justin.郑
+# @mail    : 3907721@qq.com
+# @Time    : 2026/10/20 01:50
+# @File    : bench_extract
+# @desc    : 网页正文提取引擎的微基准：在保存的网页样本上对比各引擎的吞吐量（页/秒）和峰值内存
+
+
+import os
+import time
+import argparse
+import tracemalloc
+from typing import List, Set
+from web_access.parsing import available_engines, extract_text
+
+
+# 默认的网页样本目录
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def _tokens(text: str) -> Set[str]:
+    return set(text.split())
+
+
+def _similarity(text: str, reference: str) -> float:
+    """
+    与原实现提取结果的词集合相似度（Jaccard）。
+    """
+    a, b = _tokens(text), _tokens(reference)
+    return len(a & b) / len(a | b) if a | b else 1.0
+
+
+def bench(content: bytes, engine: str, repeat: int) -> dict:
+    """
+    对单个网页样本测量一个引擎：平均吞吐量、单次解析的 Python 峰值内存和提取的文本。
+    """
+    extract_text(content, engine=engine)
+    started_at = time.perf_counter()
+    for _ in range(repeat):
+        text = extract_text(content, engine=engine)
+    elapsed = time.perf_counter() - started_at
+
+    tracemalloc.start()
+    extract_text(content, engine=engine)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"pages_per_sec": repeat / elapsed, "peak_kb": peak / 1024, "text": text}
+
+
+def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(description="网页正文提取引擎微基准")
+    parser.add_argument("--fixtures", default=FIXTURES_DIR, help="网页样本目录（*.html）")
+    parser.add_argument("--repeat", type=int, default=20, help="每个样本每个引擎的解析次数")
+    parser.add_argument("--engines", nargs="+", default=None, help="参与对比的引擎，默认为 bs4 和所有可用引擎")
+    args = parser.parse_args(argv)
+
+    engines = args.engines or ["bs4"] + [engine for engine in available_engines() if engine != "bs4"]
+    files = sorted(name for name in os.listdir(args.fixtures) if name.endswith(".html"))
+    print(f"{'fixture':<28}{'KB':>7}  {'engine':<11}{'pages/s':>9}{'speedup':>9}{'peak KB':>10}{'chars':>8}{'similar':>9}")
+    for name in files:
+        with open(os.path.join(args.fixtures, name), "rb") as file:
+            content = file.read()
+        baseline = None
+        for engine in engines:
+            result = bench(content, engine, args.repeat)
+            if baseline is None:
+                baseline = result
+            print(
+                f"{name:<28}{len(content) / 1024:>7.0f}  {engine:<11}{result['pages_per_sec']:>9.1f}"
+                f"{result['pages_per_sec'] / baseline['pages_per_sec']:>8.1f}x{result['peak_kb']:>10.0f}"
+                f"{len(result['text']):>8}{_similarity(result['text'], baseline['text']):>9.2f}"
+            )
+    print("peak KB 为 tracemalloc 统计的 Python 内存峰值，不包含 lxml/selectolax 在 C 层分配的内存。")
+
+
+if __name__ == "__main__":
+    main()
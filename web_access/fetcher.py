@@ -0,0 +1,419 @@
+#!/usr/bin/env python
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @Author  : justin.郑
+# @mail    : 3907721@qq.com
+# @Time    : 2026/10/20 02:40
+# @File    : fetcher
+# @desc    : 进程内共享的异步 HTTP 抓取层：连接池、分开的连接/读取超时、瞬时错误带抖动重试、按调用的总截止时间
+
+
+import os
+import json
+import time
+import atexit
+import random
+import asyncio
+import functools
+import threading
+import contextvars
+import requests
+from requests.adapters import HTTPAdapter
+from contextlib import contextmanager
+from utils.logger import logger
+from web_access.limits import DEFAULT_MAX_OUTBOUND, outbound
+from web_access.politeness import host_scheduler
+from web_access.parsing import charset_from_content_type, detect_encoding
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Tuple, Union
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+
+# 建立连接的超时时间（秒），可通过环境变量 WEB_ACCESS_CONNECT_TIMEOUT 调整
+CONNECT_TIMEOUT = float(os.getenv("WEB_ACCESS_CONNECT_TIMEOUT", "3"))
+# 两次读到数据之间的超时时间（秒），可通过环境变量 WEB_ACCESS_READ_TIMEOUT 调整
+READ_TIMEOUT = float(os.getenv("WEB_ACCESS_READ_TIMEOUT", "5"))
+# 瞬时错误（超时、连接错误、408/425/429/5xx）的最大重试次数，可通过环境变量 WEB_ACCESS_MAX_RETRIES 调整
+MAX_RETRIES = int(os.getenv("WEB_ACCESS_MAX_RETRIES", "2"))
+# 同一主机保持的最大连接数，可通过环境变量 WEB_ACCESS_MAX_PER_HOST 调整
+MAX_PER_HOST = int(os.getenv("WEB_ACCESS_MAX_PER_HOST", "16"))
+# 一次 WebAccess 调用中所有请求的默认总截止时间（秒），可通过环境变量 WEB_ACCESS_DEADLINE 调整，0 表示不限制
+DEFAULT_DEADLINE = float(os.getenv("WEB_ACCESS_DEADLINE", "60"))
+# 重试的基础退避时间（秒），第 n 次重试在 [0, RETRY_BACKOFF * 2^n] 内随机等待
+RETRY_BACKOFF = 0.5
+# 最多跟随的重定向次数
+MAX_REDIRECTS = 10
+# 视为瞬时错误、可以重试的状态码
+TRANSIENT_STATUS_CODES = {408, 425, 429, 500, 502, 503, 504}
+
+_CHUNK_SIZE = 64 * 1024
+# 当前上下文中请求的总截止时间（time.monotonic() 的值）
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("web_access_deadline", default=None)
+
+
+class FetchError(Exception):
+    """
+    请求失败。status 为响应的状态码（没有响应时为 None），transient 表示是否为可重试的瞬时错误。
+    """
+    def __init__(self, message: str, status: Optional[int] = None, transient: bool = False) -> None:
+        super().__init__(message)
+        self.status = status
+        self.transient = transient
+
+
+class FetchResponse:
+    """
+    已读取完毕的响应。content 为原始字节（超过 max_bytes 时只保留前面部分，truncated 为 True），url 为重定向后的地址。
+    """
+    def __init__(self, url: str, status: int, headers: Mapping[str, str], content: bytes, truncated: bool = False) -> None:
+        self.url = url
+        self.status = status
+        self.headers = headers
+        self.content = content
+        self.truncated = truncated
+
+    @property
+    def charset(self) -> Optional[str]:
+        """
+        Content-Type 响应头中声明的字符集。
+        """
+        return charset_from_content_type(self.headers.get('Content-Type'))
+
+    @property
+    def encoding(self) -> str:
+        """
+        按 BOM、响应头、网页中的 meta 声明依次确定的字符集。
+        """
+        return detect_encoding(self.content, self.charset)
+
+    def text(self, encoding: Optional[str] = None) -> str:
+        return self.content.decode(encoding or self.encoding, errors='replace')
+
+    def json(self) -> Any:
+        return json.loads(self.text())
+
+
+@contextmanager
+def fetch_deadline(seconds: Optional[float]) -> Iterator[None]:
+    """
+    在 with 块内（包括复制了当前上下文的线程和协程）发出的所有请求共享一个总截止时间，
+    嵌套时取较早的截止时间。seconds 为 None 或 0 时不限制。
+    """
+    if not seconds:
+        yield
+        return
+    deadline = time.monotonic() + seconds
+    current = _deadline.get()
+    token = _deadline.set(deadline if current is None else min(deadline, current))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def _retry_after(headers: Mapping[str, str]) -> float:
+    try:
+        return max(0.0, float(headers.get('Retry-After') or 0))
+    except ValueError:
+        return 0.0
+
+
+class HttpFetcher:
+    """
+    进程内共享的 HTTP 抓取器。所有请求都在抓取器自己的事件循环（后台线程）中执行，共享连接池，
+    一个事件循环可以同时进行成千上万个请求：
+        - 协程中 await fetch()，可以在任意事件循环中调用；
+        - 线程中调用 fetch_sync() / fetch_all_sync() 阻塞等待结果，或用 fetch_iter_sync() 按完成顺序逐个取得结果。
+    安装了 aiohttp 时使用其连接池，否则在线程池中通过带连接池的 requests.Session 发出请求。
+    每个请求占用进程内共享的出站请求名额，polite=True 时还受按主机的礼貌性调度约束。
+    """
+    def __init__(self, connect_timeout: float = CONNECT_TIMEOUT, read_timeout: float = READ_TIMEOUT,
+                 max_retries: int = MAX_RETRIES, max_per_host: int = MAX_PER_HOST,
+                 backend: Optional[str] = None) -> None:
+        """
+        Args:
+            connect_timeout (float): 建立连接的超时时间（秒）。
+            read_timeout (float): 两次读到数据之间的超时时间（秒）。
+            max_retries (int): 瞬时错误的最大重试次数。
+            max_per_host (int): 同一主机保持的最大连接数。
+            backend (Optional[str]): aiohttp 或 requests，默认在安装了 aiohttp 时使用 aiohttp。
+        """
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_retries = max(0, int(max_retries))
+        self.max_per_host = max(1, int(max_per_host))
+        self.backend = backend or ("aiohttp" if aiohttp is not None else "requests")
+        if self.backend == "aiohttp" and aiohttp is None:
+            raise ValueError("未安装 aiohttp")
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._session = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_size = 0
+
+    async def fetch(self, url: str, method: str = "GET", **kwargs: Any) -> FetchResponse:
+        """
+        发出请求并读取完整的响应，可以在任意事件循环中 await。参数见 _fetch。
+        """
+        loop = self._get_loop()
+        coro = self._fetch(url, method, deadline=_deadline.get(), **kwargs)
+        if asyncio.get_running_loop() is loop:
+            return await coro
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, loop))
+
+    def fetch_sync(self, url: str, method: str = "GET", **kwargs: Any) -> FetchResponse:
+        """
+        fetch() 的同步版本，在调用线程中阻塞等待结果。
+        """
+        coro = self._fetch(url, method, deadline=_deadline.get(), **kwargs)
+        return asyncio.run_coroutine_threadsafe(coro, self._get_sync_loop(coro)).result()
+
+    def fetch_all_sync(self, urls: List[str], method: str = "GET",
+                       headers_list: Optional[List[Optional[Dict[str, str]]]] = None,
+                       **kwargs: Any) -> List[Union[FetchResponse, FetchError]]:
+        """
+        并发请求多个 URL，按输入顺序返回响应或 FetchError。headers_list 为与 urls 一一对应的请求头。
+        """
+        results: List[Union[FetchResponse, FetchError, None]] = [None] * len(urls)
+        for index, result in self.fetch_iter_sync(urls, method, headers_list, **kwargs):
+            results[index] = result
+        return results
+
+    def fetch_iter_sync(self, urls: List[str], method: str = "GET",
+                        headers_list: Optional[List[Optional[Dict[str, str]]]] = None,
+                        **kwargs: Any) -> Iterator[Tuple[int, Union[FetchResponse, FetchError]]]:
+        """
+        并发请求多个 URL，按完成顺序逐个产出 (下标, 响应或 FetchError)，调用方可以在其余请求进行的同时处理已经完成的响应。
+        提前停止迭代时取消尚未完成的请求。
+        """
+        if not urls:
+            return
+        deadline = _deadline.get()
+        headers_list = headers_list or [None] * len(urls)
+        loop = self._get_sync_loop()
+        futures = {
+            asyncio.run_coroutine_threadsafe(
+                self._fetch(url, method, headers=headers, deadline=deadline, **kwargs), loop
+            ): index
+            for index, (url, headers) in enumerate(zip(urls, headers_list))
+        }
+        try:
+            for future in as_completed(futures):
+                error = future.exception()
+                if error is not None and not isinstance(error, FetchError):
+                    raise error
+                yield futures[future], error or future.result()
+        finally:
+            for future in futures:
+                future.cancel()
+
+    async def _fetch(self, url: str, method: str = "GET", params: Optional[Dict[str, Any]] = None,
+                     headers: Optional[Dict[str, str]] = None, json: Any = None, max_bytes: Optional[int] = None,
+                     polite: bool = False, raise_for_status: bool = True, retries: Optional[int] = None,
+                     deadline: Optional[float] = None) -> FetchResponse:
+        """
+        在抓取器的事件循环中执行请求，瞬时错误按带抖动的指数退避重试，直到成功、重试次数用完或到达总截止时间。
+
+        Args:
+            url (str): 请求地址。
+            method (str): 请求方法。
+            params (Optional[Dict[str, Any]]): 查询参数。
+            headers (Optional[Dict[str, str]]): 请求头。
+            json (Any): 以 JSON 发送的请求体。
+            max_bytes (Optional[int]): 最多读取的响应字节数，超出部分不再下载。
+            polite (bool): 是否受按主机的礼貌性调度约束（抓取网页时使用）。
+            raise_for_status (bool): 状态码 >= 400 时是否抛出 FetchError。
+            retries (Optional[int]): 最大重试次数，默认为 max_retries。
+            deadline (Optional[float]): 总截止时间（time.monotonic() 的值）。
+
+        Returns:
+            FetchResponse: 响应。
+        """
+        retries = self.max_retries if retries is None else retries
+        attempt = 0
+        while True:
+            timeout = None
+            if deadline is not None:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    raise FetchError(f"请求 {url} 前已超过总截止时间", transient=True)
+            retry_after = 0.0
+            try:
+                response = await asyncio.wait_for(
+                    self._request_in_slot(url, method, params, headers, json, max_bytes, polite), timeout
+                )
+                if not raise_for_status or response.status < 400:
+                    return response
+                retry_after = _retry_after(response.headers)
+                error = FetchError(
+                    f"请求 {url} 失败，status code {response.status}", response.status,
+                    response.status in TRANSIENT_STATUS_CODES
+                )
+            except FetchError as e:
+                error = e
+            except asyncio.TimeoutError:
+                raise FetchError(f"请求 {url} 超过总截止时间", transient=True) from None
+
+            if not error.transient or attempt >= retries:
+                raise error
+            delay = max(retry_after, random.uniform(0, RETRY_BACKOFF * 2 ** attempt))
+            if deadline is not None and time.monotonic() + delay >= deadline:
+                raise error
+            attempt += 1
+            logger.info(f"{error}，{delay:.2f} 秒后第 {attempt} 次重试")
+            await asyncio.sleep(delay)
+
+    async def _request_in_slot(self, url: str, method: str, params: Optional[Dict[str, Any]],
+                               headers: Optional[Dict[str, str]], json: Any, max_bytes: Optional[int],
+                               polite: bool) -> FetchResponse:
+        slot = host_scheduler.aslot(url) if polite else outbound.aslot()
+        if self.backend == "aiohttp":
+            async with slot:
+                return await self._request_aiohttp(url, method, params, headers, json, max_bytes)
+
+        # requests 后端的请求在线程中执行，无法中断。调用方因总截止时间或取消放弃等待时，
+        # 已经发出的请求继续在后台任务中占用名额，直到线程结束才释放，并发上限不会被突破
+        loop = asyncio.get_running_loop()
+        request = functools.partial(self._request_requests, url, method, params, headers, json, max_bytes)
+        started = False
+
+        async def request_in_slot() -> FetchResponse:
+            nonlocal started
+            async with slot:
+                future = loop.run_in_executor(self._ensure_executor(), request)
+                started = True
+                return await future
+
+        task = loop.create_task(request_in_slot())
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            # 还在等待名额时可以直接取消
+            if not started:
+                task.cancel()
+            raise
+
+    async def _request_aiohttp(self, url: str, method: str, params: Optional[Dict[str, Any]],
+                               headers: Optional[Dict[str, str]], json: Any,
+                               max_bytes: Optional[int]) -> FetchResponse:
+        try:
+            async with self._session.request(method, url, params=params, headers=headers, json=json,
+                                             max_redirects=MAX_REDIRECTS) as response:
+                chunks, size, truncated = [], 0, False
+                async for chunk in response.content.iter_chunked(_CHUNK_SIZE):
+                    chunks.append(chunk)
+                    size += len(chunk)
+                    if max_bytes and size >= max_bytes:
+                        truncated = True
+                        break
+                content = b''.join(chunks)[:max_bytes] if max_bytes else b''.join(chunks)
+                return FetchResponse(str(response.url), response.status, response.headers, content, truncated)
+        except aiohttp.TooManyRedirects as e:
+            raise FetchError(f"请求 {url} 重定向次数过多: {e}") from e
+        except (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError, asyncio.TimeoutError) as e:
+            raise FetchError(f"请求 {url} 时连接出错或超时: {e!r}", transient=True) from e
+        except aiohttp.ClientError as e:
+            raise FetchError(f"请求 {url} 失败: {e}") from e
+
+    def _request_requests(self, url: str, method: str, params: Optional[Dict[str, Any]],
+                          headers: Optional[Dict[str, str]], json: Any,
+                          max_bytes: Optional[int]) -> FetchResponse:
+        try:
+            with self._session.request(method, url, params=params, headers=headers, json=json, stream=True,
+                                       timeout=(self.connect_timeout, self.read_timeout)) as response:
+                chunks, size, truncated = [], 0, False
+                for chunk in response.iter_content(chunk_size=_CHUNK_SIZE):
+                    chunks.append(chunk)
+                    size += len(chunk)
+                    if max_bytes and size >= max_bytes:
+                        truncated = True
+                        break
+                content = b''.join(chunks)[:max_bytes] if max_bytes else b''.join(chunks)
+                return FetchResponse(response.url, response.status_code, response.headers, content, truncated)
+        except requests.TooManyRedirects as e:
+            raise FetchError(f"请求 {url} 重定向次数过多: {e}") from e
+        except (requests.ConnectionError, requests.Timeout) as e:
+            raise FetchError(f"请求 {url} 时连接出错或超时: {e}", transient=True) from e
+        except requests.RequestException as e:
+            raise FetchError(f"请求 {url} 失败: {e}") from e
+
+    def _get_sync_loop(self, coro=None) -> asyncio.AbstractEventLoop:
+        loop = self._get_loop()
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            if coro is not None:
+                coro.close()
+            raise RuntimeError("不能在抓取器的事件循环中同步等待请求，请使用 await fetch()")
+        return loop
+
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        """
+        返回抓取器的事件循环，第一次使用时在后台线程中启动并创建连接池。
+        """
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="web-access-fetcher", daemon=True).start()
+                asyncio.run_coroutine_threadsafe(self._open(), loop).result()
+                self._loop = loop
+            return self._loop
+
+    async def _open(self) -> None:
+        if self.backend == "aiohttp":
+            # 总连接数由出站请求名额控制，连接池只限制同一主机的连接数
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=0, limit_per_host=self.max_per_host, ttl_dns_cache=300),
+                timeout=aiohttp.ClientTimeout(total=None, sock_connect=self.connect_timeout,
+                                              sock_read=self.read_timeout)
+            )
+        else:
+            self._session = requests.Session()
+            self._session.max_redirects = MAX_REDIRECTS
+            adapter = HTTPAdapter(pool_connections=DEFAULT_MAX_OUTBOUND, pool_maxsize=self.max_per_host)
+            self._session.mount("http://", adapter)
+            self._session.mount("https://", adapter)
+            self._ensure_executor()
+
+    def _ensure_executor(self) -> ThreadPoolExecutor:
+        """
+        返回 requests 后端的线程池，只在抓取器的事件循环中调用。出站请求名额调大后线程数不足时，
+        换成按新上限创建的线程池，旧线程池中已经开始的请求照常执行完毕。
+        """
+        size = max(DEFAULT_MAX_OUTBOUND, outbound.limit)
+        if self._executor is None or self._executor_size < size:
+            previous = self._executor
+            self._executor = ThreadPoolExecutor(max_workers=size, thread_name_prefix="web-access-http")
+            self._executor_size = size
+            if previous is not None:
+                previous.shutdown(wait=False)
+        return self._executor
+
+    def close(self) -> None:
+        """
+        关闭连接池和事件循环。
+        """
+        with self._lock:
+            loop, self._loop = self._loop, None
+        if loop is None:
+            return
+        if self.backend == "aiohttp":
+            try:
+                asyncio.run_coroutine_threadsafe(self._session.close(), loop).result(timeout=5)
+            except Exception as e:
+                logger.warning(f"关闭 HTTP 连接池时出错: {e}")
+        else:
+            self._session.close()
+            self._executor.shutdown(wait=False)
+        loop.call_soon_threadsafe(loop.stop)
+
+
+# 进程内共享的抓取器
+fetcher = HttpFetcher()
+atexit.register(fetcher.close)
@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @Author  : justin.郑
+# @mail    : 3907721@qq.com
+# @Time    : 2026/10/20 00:50
+# @File    : limits
+# @desc    : 进程内所有 WebAccess 调用共享的出站 HTTP 请求并发上限
+
+
+import os
+import asyncio
+import threading
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Iterator, List, Tuple
+
+
+# 默认的出站 HTTP 请求并发上限，可通过环境变量 WEB_ACCESS_MAX_OUTBOUND 调整
+DEFAULT_MAX_OUTBOUND = int(os.getenv("WEB_ACCESS_MAX_OUTBOUND", "32"))
+
+
+def _set_done(waiter: asyncio.Future) -> None:
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+class AsyncWaiters:
+    """
+    等待 threading.Condition 所保护状态的协程（可能属于不同的事件循环）。
+    调用方持有锁时 add() 登记等待，状态变化时在持有锁的情况下调用 wake_all()，被唤醒的协程重新检查状态。
+    """
+    def __init__(self) -> None:
+        self._waiters: List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+
+    def add(self) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+        waiter = loop.create_future()
+        self._waiters.append((loop, waiter))
+        return waiter
+
+    def wake_all(self) -> None:
+        waiters, self._waiters = self._waiters, []
+        for loop, waiter in waiters:
+            try:
+                loop.call_soon_threadsafe(_set_done, waiter)
+            except RuntimeError:
+                # 事件循环已关闭
+                pass
+
+
+class OutboundLimit:
+    """
+    线程安全的并发上限。各阶段的 HTTP 请求都在 slot()（线程中）或 aslot()（协程中）内发出，
+    上限对同一进程中并发的所有 WebAccess 调用生效，运行中也可以调整。
+    """
+    def __init__(self, limit: int = DEFAULT_MAX_OUTBOUND) -> None:
+        self.limit = max(1, int(limit))
+        self.active = 0
+        self._condition = threading.Condition()
+        self._async_waiters = AsyncWaiters()
+
+    def set_limit(self, limit: int) -> None:
+        """
+        调整上限，调大时立即唤醒等待中的请求。
+        """
+        with self._condition:
+            self.limit = max(1, int(limit))
+            self._condition.notify_all()
+            self._async_waiters.wake_all()
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        """
+        在上限内发出一个请求，名额不足时阻塞等待。
+        """
+        with self._condition:
+            self._condition.wait_for(lambda: self.active < self.limit)
+            self.active += 1
+        try:
+            yield
+        finally:
+            self._release()
+
+    @asynccontextmanager
+    async def aslot(self) -> AsyncIterator[None]:
+        """
+        slot() 的协程版本，名额不足时挂起当前协程而不阻塞事件循环。
+        """
+        while True:
+            with self._condition:
+                if self.active < self.limit:
+                    self.active += 1
+                    break
+                waiter = self._async_waiters.add()
+            await waiter
+        try:
+            yield
+        finally:
+            self._release()
+
+    def _release(self) -> None:
+        with self._condition:
+            self.active -= 1
+            self._condition.notify()
+            self._async_waiters.wake_all()
+
+
+# 进程内共享的出站请求上限
+outbound = OutboundLimit()
+
+
+def set_max_outbound(limit: int) -> None:
+    """
+    调整进程内出站 HTTP 请求的并发上限。
+    """
+    outbound.set_limit(limit)
@@ -9,48 +9,52 @@
 
 
 import os
-import shutil
+import json
+import uuid
+from typing import Optional
 from utils.logger import logger
+from web_access.fetcher import DEFAULT_DEADLINE, fetch_deadline
 from web_access.search import WebSearchAgent
 from web_access.scrape import WebScrapeAgent
 from web_access.summarize import WebSummarizeAgent
 
 
-
 class WebAccess:
     """
     负责协调执行搜索、抓取和总结任务的类。
+
+    各阶段之间在内存中传递搜索结果和抓取内容，不再经过共享的输出目录，
+    因此可以在多个线程或协程中并发调用。
     """
-    def __init__(self):
+    def __init__(self, artifact_dir: Optional[str] = None, deadline: Optional[float] = DEFAULT_DEADLINE):
         """
-        初始化 WebAccess 类，设置日志记录器。
+        Args:
+            artifact_dir (Optional[str]): 中间产物的保存目录。设置后每次运行在其下创建独立的子目录，
+                保存 search.json、scrape.txt 和 summarize.txt；默认不保存。
+            deadline (Optional[float]): 一次运行中搜索和抓取的所有 HTTP 请求共享的总截止时间（秒），
+                None 或 0 表示不限制；默认为 WEB_ACCESS_DEADLINE。
         """
-        self._output_folders = [
-            '../web_access/data/output/search',
-            '../web_access/data/output/scrape',
-            '../web_access/data/output/summarize'
-        ]
+        self.artifact_dir = artifact_dir
+        self.deadline = deadline
+        # 最近一次运行抓取到正文的网页数量，为 0 时摘要只能基于空内容生成
+        self.scraped_pages: Optional[int] = None
 
-    def _flush_output_folders(self):
+    def _save_artifacts(self, query: str, search_results: list, scraped_content: str, summary: str) -> None:
         """
-        在启动流程之前，会清空输出文件夹中的所有文件。
+        把本次运行的中间产物保存到独立的子目录中，保存失败不影响返回结果。
         """
-        for folder in self._output_folders:
-            try:
-                if os.path.exists(folder):
-                    for filename in os.listdir(folder):
-                        file_path = os.path.join(folder, filename)
-                        if os.path.isfile(file_path):
-                            os.unlink(file_path)
-                        elif os.path.isdir(file_path):
-                            shutil.rmtree(file_path)
-                    logger.info(f"Flushed output folder: {folder}")
-                else:
-                    logger.warning(f"Output folder does not exist: {folder}")
-            except Exception as e:
-                logger.error(f"清空输出文件夹 {folder} 时出错: {str(e)}")
-                raise
-
+        run_dir = os.path.join(self.artifact_dir, uuid.uuid4().hex)
+        try:
+            os.makedirs(run_dir, exist_ok=True)
+            with open(os.path.join(run_dir, 'search.json'), 'w', encoding='utf-8') as file:
+                json.dump({"Query": query, "Top Results": search_results}, file, ensure_ascii=False, indent=4)
+            with open(os.path.join(run_dir, 'scrape.txt'), 'w', encoding='utf-8') as file:
+                file.write(scraped_content)
+            with open(os.path.join(run_dir, 'summarize.txt'), 'w', encoding='utf-8') as file:
+                file.write(summary)
+            logger.info(f"中间产物已保存到 {run_dir}")
+        except Exception as e:
+            logger.error(f"保存中间产物到 {run_dir} 时出错: {str(e)}")
 
     def run(self, query: str, location: str = 'china') -> str:
         """
@@ -62,17 +66,21 @@ class WebAccess:
             str: 由搜索结果生成的摘要。
         """
         try:
-            # 清空文件夹
-            self._flush_output_folders()
+            with fetch_deadline(self.deadline):
+                logger.info("执行搜索任务")
+                search_results = WebSearchAgent().search(query, location)
 
-            logger.info("执行搜索任务")
-            WebSearchAgent().run(query, location)
-
-            logger.info("执行采集任务")
-            WebScrapeAgent().run(query, location)
+                logger.info("执行采集任务")
+                scrape_agent = WebScrapeAgent()
+                scraped_results = scrape_agent.scrape_results(search_results)
+                self.scraped_pages = len(scraped_results)
+                scraped_content = scrape_agent.format_results(scraped_results)
 
             logger.info("执行汇总任务")
-            summarize = WebSummarizeAgent().run(query)
+            summarize = WebSummarizeAgent().summarize(query, scraped_content)
+
+            if self.artifact_dir:
+                self._save_artifacts(query, search_results, scraped_content, summarize)
             return summarize
         except Exception as e:
             logger.error(f"执行期间发生错误: {str(e)}")
@@ -0,0 +1,213 @@
+#!/usr/bin/env python
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @Author  : justin.郑
+# @mail    : 3907721@qq.com
+# @Time    : 2026/10/20 03:10
+# @File    : page_cache
+# @desc    : 网页正文的本地缓存：新鲜的条目直接使用，过期的条目用条件请求重新验证，按总大小淘汰最久未使用的条目
+
+
+import os
+import re
+import time
+import sqlite3
+import threading
+from utils.logger import logger
+from typing import Dict, Mapping, Optional
+
+
+# 默认的缓存数据库路径，可通过环境变量 WEB_ACCESS_PAGE_CACHE_PATH 调整
+DEFAULT_PAGE_CACHE_PATH = os.getenv("WEB_ACCESS_PAGE_CACHE_PATH", "../web_access/data/page_cache.db")
+# 响应没有给出 max-age 时的默认有效期（秒），可通过环境变量 WEB_ACCESS_PAGE_CACHE_TTL 调整
+DEFAULT_PAGE_CACHE_TTL = float(os.getenv("WEB_ACCESS_PAGE_CACHE_TTL", 6 * 3600))
+# 缓存正文的总大小上限（MB），可通过环境变量 WEB_ACCESS_PAGE_CACHE_MB 调整，0 表示不使用缓存
+DEFAULT_PAGE_CACHE_MB = float(os.getenv("WEB_ACCESS_PAGE_CACHE_MB", "256"))
+# 超过上限时淘汰到上限的该比例，避免每次写入都触发淘汰
+_EVICT_TO = 0.9
+
+_MAX_AGE = re.compile(r'(?:^|,)\s*(?:s-maxage|max-age)\s*=\s*"?(\d+)', re.IGNORECASE)
+
+
+def freshness_lifetime(headers: Mapping[str, str], default_ttl: float) -> Optional[float]:
+    """
+    根据 Cache-Control 响应头确定条目的有效期（秒）：no-store 不缓存（返回 None），no-cache 每次使用前都重新验证，
+    max-age 按声明，其余使用默认有效期。
+    """
+    cache_control = (headers.get('Cache-Control') or '').lower()
+    if 'no-store' in cache_control:
+        return None
+    if 'no-cache' in cache_control:
+        return 0.0
+    match = _MAX_AGE.search(cache_control)
+    return float(match.group(1)) if match else default_ttl
+
+
+class CachedPage:
+    """
+    缓存的网页正文及重新验证使用的 ETag / Last-Modified。
+    """
+    __slots__ = ("url", "text", "etag", "last_modified", "expires_at")
+
+    def __init__(self, url: str, text: str, etag: Optional[str], last_modified: Optional[str],
+                 expires_at: float) -> None:
+        self.url = url
+        self.text = text
+        self.etag = etag
+        self.last_modified = last_modified
+        self.expires_at = expires_at
+
+    @property
+    def fresh(self) -> bool:
+        return time.time() < self.expires_at
+
+    def conditional_headers(self) -> Dict[str, str]:
+        """
+        重新验证时附加的条件请求头。
+        """
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+
+class PageCache:
+    """
+    以 URL 为键的网页正文缓存（SQLite）。只缓存提取出的正文而不是原始网页；
+    正文总大小超过 max_bytes 时按最近使用时间淘汰。可以在多个线程中共享。
+    """
+    def __init__(self, db_path: str = DEFAULT_PAGE_CACHE_PATH, ttl: float = DEFAULT_PAGE_CACHE_TTL,
+                 max_bytes: int = int(DEFAULT_PAGE_CACHE_MB * 1024 * 1024)) -> None:
+        """
+        Args:
+            db_path (str): 缓存数据库路径。
+            ttl (float): 响应没有给出 max-age 时的默认有效期（秒）。
+            max_bytes (int): 缓存正文的总大小上限（字节）。
+        """
+        self.db_path = db_path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            " url TEXT PRIMARY KEY, text TEXT NOT NULL, etag TEXT, last_modified TEXT,"
+            " size INTEGER NOT NULL, expires_at REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS pages_last_access ON pages (last_access)")
+        self._conn.commit()
+
+    def get(self, url: str) -> Optional[CachedPage]:
+        """
+        返回缓存的条目（可能已过期，由调用方决定是否重新验证），没有时返回 None。
+        """
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT text, etag, last_modified, expires_at FROM pages WHERE url = ?", (url,)
+                ).fetchone()
+                if row is None:
+                    self.misses += 1
+                    return None
+                self._conn.execute("UPDATE pages SET last_access = ? WHERE url = ?", (time.time(), url))
+                self._conn.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"读取网页缓存 {self.db_path} 失败: {e}")
+            return None
+        page = CachedPage(url, *row)
+        if page.fresh:
+            self.hits += 1
+        return page
+
+    def put(self, url: str, text: str, headers: Mapping[str, str]) -> None:
+        """
+        按响应头写入（或覆盖）条目，Cache-Control 为 no-store 时不写入。
+        """
+        lifetime = freshness_lifetime(headers, self.ttl)
+        if lifetime is None:
+            return
+        now = time.time()
+        size = len(text.encode('utf-8'))
+        try:
+            with self._lock:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO pages (url, text, etag, last_modified, size, expires_at, last_access)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (url, text, headers.get('ETag'), headers.get('Last-Modified'), size, now + lifetime, now)
+                )
+                self._evict_locked()
+                self._conn.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"写入网页缓存 {self.db_path} 失败: {e}")
+
+    def refresh(self, page: CachedPage, headers: Mapping[str, str]) -> None:
+        """
+        重新验证返回 304 时延长条目的有效期，响应中带有新的 ETag / Last-Modified 时一并更新。
+        """
+        self.revalidated += 1
+        lifetime = freshness_lifetime(headers, self.ttl)
+        now = time.time()
+        try:
+            with self._lock:
+                self._conn.execute(
+                    "UPDATE pages SET etag = ?, last_modified = ?, expires_at = ?, last_access = ? WHERE url = ?",
+                    (headers.get('ETag') or page.etag, headers.get('Last-Modified') or page.last_modified,
+                     now + (lifetime or 0.0), now, page.url)
+                )
+                self._conn.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"更新网页缓存 {self.db_path} 失败: {e}")
+
+    def _evict_locked(self) -> None:
+        """
+        总大小超过上限时，按最近使用时间从旧到新删除条目，直到不超过上限的 90%。
+        """
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        excess = total - int(self.max_bytes * _EVICT_TO)
+        evicted = []
+        for url, size in self._conn.execute("SELECT url, size FROM pages ORDER BY last_access"):
+            if excess <= 0:
+                break
+            evicted.append((url,))
+            excess -= size
+        self._conn.executemany("DELETE FROM pages WHERE url = ?", evicted)
+        logger.info(f"网页缓存超过 {self.max_bytes} 字节，淘汰 {len(evicted)} 个最久未使用的条目")
+
+    def stats(self) -> str:
+        return f"网页缓存命中 {self.hits} 个，重新验证未变化 {self.revalidated} 个，未缓存 {self.misses} 个"
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+_page_cache: Optional[PageCache] = None
+_page_cache_lock = threading.Lock()
+
+
+def get_page_cache() -> Optional[PageCache]:
+    """
+    返回进程内共享的网页缓存，第一次使用时创建；WEB_ACCESS_PAGE_CACHE_MB 为 0 或无法打开数据库时返回 None。
+    """
+    global _page_cache
+    if DEFAULT_PAGE_CACHE_MB <= 0:
+        return None
+    with _page_cache_lock:
+        if _page_cache is None:
+            try:
+                _page_cache = PageCache()
+            except (OSError, sqlite3.Error) as e:
+                logger.warning(f"无法打开网页缓存 {DEFAULT_PAGE_CACHE_PATH}，不使用缓存: {e}")
+                return None
+        return _page_cache
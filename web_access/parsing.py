@@ -0,0 +1,309 @@
+#!/usr/bin/env python
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @Author  : justin.郑
+# @mail    : 3907721@qq.com
+# @Time    : 2026/10/20 01:20
+# @File    : parsing
+# @desc    : 网页正文提取引擎，以及把解析放到进程池中执行以绕开 GIL
+
+
+import os
+import re
+import atexit
+import codecs
+import threading
+import multiprocessing
+from html.parser import HTMLParser
+from bs4 import BeautifulSoup
+from utils.logger import logger
+from typing import List, Optional
+from concurrent.futures import CancelledError, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+try:
+    from selectolax.parser import HTMLParser as SelectolaxParser
+except ImportError:
+    SelectolaxParser = None
+
+try:
+    from lxml import etree as lxml_etree, html as lxml_html
+except ImportError:
+    lxml_html = None
+
+
+# 解析进程数量，可通过环境变量 WEB_ACCESS_PARSE_WORKERS 按部署调整，0 表示在抓取线程中直接解析。
+# 默认为 CPU 核数减一，给主进程（抓取线程和事件循环）留出一个核，单核机器上不启用进程池
+_CPU_COUNT = os.cpu_count() or 1
+DEFAULT_PARSE_WORKERS = int(os.getenv("WEB_ACCESS_PARSE_WORKERS", _CPU_COUNT - 1))
+# 小于该字节数的网页直接在当前线程解析，进程间传输的开销比解析本身更大
+INLINE_PARSE_MAX_BYTES = int(os.getenv("WEB_ACCESS_INLINE_PARSE_BYTES", 16 * 1024))
+# 每个网页最多读取和解析的字节数，超出部分直接丢弃
+MAX_PAGE_BYTES = int(os.getenv("WEB_ACCESS_MAX_PAGE_BYTES", 2 * 1024 * 1024))
+# 正文提取引擎：auto（按 selectolax、lxml、stream 的顺序选择已安装的）、selectolax、lxml、stream 或 bs4（原实现）
+EXTRACT_ENGINE = os.getenv("WEB_ACCESS_EXTRACT_ENGINE", "auto")
+
+# 提取正文的标签
+TEXT_TAGS = ['p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6']
+# 整个子树都跳过的标签
+SKIP_TAGS = ['script', 'style', 'nav', 'noscript', 'template']
+
+# 流式解析每次送入的字符数
+_FEED_CHUNK = 64 * 1024
+_WHITESPACE = re.compile(r'\s+')
+_META_CHARSET = re.compile(rb'<meta[^>]+charset\s*=\s*["\']?\s*([\w.:-]+)', re.IGNORECASE)
+_CONTENT_TYPE_CHARSET = re.compile(r'charset\s*=\s*["\']?([\w.:-]+)', re.IGNORECASE)
+# 中文网页常把实际为 GBK/GB18030 的内容声明为 gb2312，统一按超集解码
+_CHARSET_ALIASES = {'gb2312': 'gb18030', 'gbk': 'gb18030', 'x-gbk': 'gb18030'}
+
+
+def clean_text(text: str) -> str:
+    """
+    清理提取的文本，去除多余的空格和换行符。
+    """
+    return _WHITESPACE.sub(' ', text).strip()
+
+
+def charset_from_content_type(content_type: Optional[str]) -> Optional[str]:
+    """
+    从 Content-Type 响应头中取出显式声明的字符集，没有声明时返回 None。
+    """
+    match = _CONTENT_TYPE_CHARSET.search(content_type or '')
+    return match.group(1) if match else None
+
+
+def detect_encoding(content: bytes, declared: Optional[str] = None) -> str:
+    """
+    确定网页的字符集：BOM、响应头声明、网页开头的 meta 声明，都没有时按 UTF-8 处理。
+    """
+    if content.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    if not declared:
+        match = _META_CHARSET.search(content[:4096])
+        declared = match.group(1).decode('ascii', 'ignore') if match else None
+    if declared:
+        declared = _CHARSET_ALIASES.get(declared.lower(), declared)
+        try:
+            return codecs.lookup(declared).name
+        except LookupError:
+            pass
+    return 'utf-8'
+
+
+class _TextCollector(HTMLParser):
+    """
+    只收集正文标签内文本的流式解析器，不构建文档树，跳过 SKIP_TAGS 的整个子树。
+    嵌套的正文标签只收集一次；未闭合的 p 在下一个正文标签开始时视为结束（与 HTML 规范一致）。
+    """
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=True)
+        self.parts: List[str] = []
+        self._current: List[str] = []
+        self._open: List[str] = []
+        self._skip_depth = 0
+
+    def handle_starttag(self, tag: str, attrs) -> None:
+        if tag in SKIP_TAGS:
+            self._skip_depth += 1
+        elif tag in TEXT_TAGS:
+            if self._open and self._open[-1] == 'p':
+                self._close_to('p')
+            self._open.append(tag)
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag in SKIP_TAGS:
+            self._skip_depth = max(0, self._skip_depth - 1)
+        elif tag in self._open:
+            self._close_to(tag)
+
+    def handle_data(self, data: str) -> None:
+        if self._open and not self._skip_depth:
+            self._current.append(data)
+
+    def close(self) -> None:
+        super().close()
+        if self._open:
+            self._open = [self._open[0]]
+            self._close_to(self._open[0])
+
+    def _close_to(self, tag: str) -> None:
+        while self._open:
+            if self._open.pop() == tag:
+                break
+        if not self._open:
+            self.parts.append(''.join(self._current))
+            self._current = []
+
+
+def _extract_stream(content: bytes, encoding: str) -> str:
+    decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+    collector = _TextCollector()
+    for offset in range(0, len(content), _FEED_CHUNK):
+        collector.feed(decoder.decode(content[offset:offset + _FEED_CHUNK]))
+    collector.feed(decoder.decode(b'', final=True))
+    collector.close()
+    return clean_text(' '.join(collector.parts))
+
+
+def _extract_selectolax(content: bytes, encoding: str) -> str:
+    tree = SelectolaxParser(content.decode(encoding, errors='replace'))
+    for node in tree.css(', '.join(SKIP_TAGS)):
+        node.decompose()
+    return clean_text(' '.join(node.text(deep=True) for node in tree.css(', '.join(TEXT_TAGS))))
+
+
+def _extract_lxml(content: bytes, encoding: str) -> str:
+    text = content.decode(encoding, errors='replace')
+    if not text.strip():
+        return ''
+    document = lxml_html.document_fromstring(text, parser=lxml_html.HTMLParser(remove_comments=True))
+    for element in document.iter(*SKIP_TAGS):
+        element.drop_tree()
+    return clean_text(' '.join(element.text_content() for element in document.iter(*TEXT_TAGS)))
+
+
+def _extract_bs4(content: bytes, encoding: Optional[str] = None) -> str:
+    soup = BeautifulSoup(content, 'html.parser', from_encoding=encoding)
+    text_elements = soup.find_all(TEXT_TAGS)
+    return clean_text(' '.join(elem.get_text() for elem in text_elements))
+
+
+def available_engines() -> List[str]:
+    """
+    返回当前环境可用的提取引擎，按速度从快到慢排列。
+    """
+    engines = []
+    if SelectolaxParser is not None:
+        engines.append('selectolax')
+    if lxml_html is not None:
+        engines.append('lxml')
+    return engines + ['stream', 'bs4']
+
+
+def resolve_engine(engine: Optional[str] = None) -> str:
+    """
+    解析提取引擎名称，auto 或未安装的引擎选择可用引擎中最快的一个。
+    """
+    engine = engine or EXTRACT_ENGINE
+    engines = available_engines()
+    if engine in engines:
+        return engine
+    if engine != 'auto':
+        logger.warning(f"网页提取引擎 {engine} 不可用，改用 {engines[0]}")
+    return engines[0]
+
+
+def extract_text(content: bytes, encoding: Optional[str] = None, engine: Optional[str] = None,
+                 max_bytes: Optional[int] = None) -> str:
+    """
+    从网页的原始字节中提取标题和段落文本（跳过 script/style/nav 等子树）。模块级函数，可以在子进程中执行。
+
+    Args:
+        content (bytes): 网页响应的原始字节。
+        encoding (Optional[str]): 响应头中声明的字符集。
+        engine (Optional[str]): 提取引擎，默认为 WEB_ACCESS_EXTRACT_ENGINE。
+        max_bytes (Optional[int]): 最多解析的字节数，默认为 MAX_PAGE_BYTES。
+
+    Returns:
+        str: 提取并清理后的文本。
+    """
+    content = content[:max_bytes or MAX_PAGE_BYTES]
+    engine = resolve_engine(engine)
+    if engine == 'bs4':
+        return _extract_bs4(content, encoding)
+    encoding = detect_encoding(content, encoding)
+    if engine == 'selectolax':
+        return _extract_selectolax(content, encoding)
+    if engine == 'lxml':
+        try:
+            return _extract_lxml(content, encoding)
+        except (lxml_etree.ParserError, ValueError) as e:
+            logger.warning(f"lxml 解析失败，改用流式解析: {e}")
+    return _extract_stream(content, encoding)
+
+
+class ParserPool:
+    """
+    网页解析进程池。网络请求仍在抓取线程中进行，只把原始字节交给子进程解析，子进程只返回提取的文本。
+    进程池在第一次需要时创建，子进程异常退出时当次在本线程解析并在下次重建进程池。
+    调整进程数量时旧进程池不取消已提交的任务，与之并发的解析在旧进程池中完成或退回本线程解析，不会抛出异常。
+    """
+    def __init__(self, workers: int = DEFAULT_PARSE_WORKERS, inline_max_bytes: int = INLINE_PARSE_MAX_BYTES) -> None:
+        """
+        Args:
+            workers (int): 解析进程数量，0 表示不使用进程池。
+            inline_max_bytes (int): 小于该字节数的网页直接在当前线程解析。
+        """
+        self.workers = max(0, int(workers))
+        self.inline_max_bytes = inline_max_bytes
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def configure(self, workers: int) -> None:
+        """
+        调整解析进程数量，已有的进程池会被关闭并在下次使用时按新数量重建；
+        已提交的任务仍在旧进程池中完成，旧进程池在这些任务结束后退出。
+        """
+        with self._lock:
+            self.workers = max(0, int(workers))
+            self._shutdown_locked()
+
+    def parse(self, content: bytes, encoding: Optional[str] = None) -> str:
+        """
+        提取网页文本。
+
+        Args:
+            content (bytes): 网页响应的原始字节。
+            encoding (Optional[str]): 响应头中声明的字符集。
+
+        Returns:
+            str: 提取并清理后的文本。
+        """
+        if self.workers <= 0 or len(content) < self.inline_max_bytes:
+            return extract_text(content, encoding)
+        executor = self._get_executor()
+        try:
+            return executor.submit(extract_text, content, encoding).result()
+        except BrokenProcessPool as e:
+            logger.warning(f"网页解析进程异常退出，改为在当前线程解析: {e}")
+            with self._lock:
+                if self._executor is executor:
+                    self._shutdown_locked()
+            return extract_text(content, encoding)
+        except (CancelledError, RuntimeError) as e:
+            # 进程池在取得之后被其他线程关闭：提交时抛出 RuntimeError，或排队的任务被 shutdown() 取消
+            logger.debug(f"网页解析进程池已关闭，改为在当前线程解析: {e!r}")
+            return extract_text(content, encoding)
+
+    def shutdown(self) -> None:
+        """
+        关闭进程池并取消尚未开始的任务，等待这些任务的线程改为在本线程解析。
+        """
+        with self._lock:
+            self._shutdown_locked(cancel_futures=True)
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # 调用方通常是多线程程序，使用 spawn 避免 fork 时复制其他线程持有的锁
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._executor
+
+    def _shutdown_locked(self, cancel_futures: bool = False) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=cancel_futures)
+            self._executor = None
+
+
+# 进程内共享的解析进程池
+parser_pool = ParserPool()
+atexit.register(parser_pool.shutdown)
+
+
+def set_parse_workers(workers: int) -> None:
+    """
+    调整进程内网页解析进程的数量，0 表示在抓取线程中直接解析。
+    """
+    parser_pool.configure(workers)
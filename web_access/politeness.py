@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @Author  : justin.郑
+# @mail    : 3907721@qq.com
+# @Time    : 2026/10/20 02:20
+# @File    : politeness
+# @desc    : 按主机限制并发和请求间隔的网页抓取调度，不同主机的请求互不等待
+
+
+import os
+import time
+import asyncio
+import threading
+from contextlib import asynccontextmanager, contextmanager
+from urllib.parse import urlsplit
+from typing import AsyncIterator, Dict, Iterator, Optional, Tuple
+from web_access.limits import AsyncWaiters, outbound
+
+
+# 同一主机默认的最大并发请求数，可通过环境变量 WEB_ACCESS_HOST_CONCURRENCY 调整
+DEFAULT_HOST_CONCURRENCY = int(os.getenv("WEB_ACCESS_HOST_CONCURRENCY", "4"))
+# 同一主机相邻两次请求开始的默认最小间隔（秒），可通过环境变量 WEB_ACCESS_HOST_INTERVAL 调整
+DEFAULT_HOST_INTERVAL = float(os.getenv("WEB_ACCESS_HOST_INTERVAL", "0.1"))
+# 单独配置的主机，格式为 "主机=并发:间隔,主机=并发:间隔"，例如 "zh.wikipedia.org=8:0.05,example.com=1:2"
+HOST_POLICIES = os.getenv("WEB_ACCESS_HOST_POLICIES", "")
+# 记录的空闲主机超过该数量时清理
+_MAX_IDLE_HOSTS = 1024
+
+
+class _HostState:
+    __slots__ = ("active", "next_start")
+
+    def __init__(self) -> None:
+        self.active = 0
+        self.next_start = 0.0
+
+
+class PolitenessScheduler:
+    """
+    网页抓取的礼貌性调度。同一主机的请求不超过并发上限，且相邻两次请求的开始时间至少间隔 min_interval，
+    不同主机的请求立即并行发出；获得主机名额后再占用进程内共享的出站请求名额（全局上限）。
+    """
+    def __init__(self, concurrency: int = DEFAULT_HOST_CONCURRENCY, min_interval: float = DEFAULT_HOST_INTERVAL,
+                 policies: str = HOST_POLICIES) -> None:
+        """
+        Args:
+            concurrency (int): 每个主机的默认并发上限。
+            min_interval (float): 每个主机相邻请求开始的默认最小间隔（秒）。
+            policies (str): 单独配置的主机，格式见 HOST_POLICIES。
+        """
+        self.concurrency = max(1, int(concurrency))
+        self.min_interval = max(0.0, float(min_interval))
+        self._policies: Dict[str, Tuple[int, float]] = {}
+        self._hosts: Dict[str, _HostState] = {}
+        self._condition = threading.Condition()
+        self._async_waiters = AsyncWaiters()
+        for item in filter(None, (part.strip() for part in policies.split(","))):
+            host, _, limits = item.partition("=")
+            concurrency, _, interval = limits.partition(":")
+            self.set_policy(host, int(concurrency or self.concurrency), float(interval or self.min_interval))
+
+    def set_policy(self, host: str, concurrency: int, min_interval: float) -> None:
+        """
+        为指定主机设置并发上限和最小间隔。
+        """
+        with self._condition:
+            self._policies[host.lower()] = (max(1, int(concurrency)), max(0.0, float(min_interval)))
+            self._condition.notify_all()
+            self._async_waiters.wake_all()
+
+    def policy(self, host: str) -> Tuple[int, float]:
+        """
+        返回主机的（并发上限、最小间隔）。
+        """
+        return self._policies.get(host, (self.concurrency, self.min_interval))
+
+    @contextmanager
+    def slot(self, url: str) -> Iterator[None]:
+        """
+        在礼貌性限制和全局出站上限内请求 url，名额不足或间隔未到时阻塞等待。
+        """
+        host = (urlsplit(url).hostname or "").lower()
+        with self._condition:
+            while True:
+                state, timeout = self._try_acquire_locked(host)
+                if state is not None:
+                    break
+                self._condition.wait(timeout)
+        try:
+            with outbound.slot():
+                yield
+        finally:
+            self._release(state)
+
+    @asynccontextmanager
+    async def aslot(self, url: str) -> AsyncIterator[None]:
+        """
+        slot() 的协程版本，等待时挂起当前协程而不阻塞事件循环。
+        """
+        host = (urlsplit(url).hostname or "").lower()
+        while True:
+            with self._condition:
+                state, timeout = self._try_acquire_locked(host)
+                if state is not None:
+                    break
+                waiter = self._async_waiters.add()
+            await asyncio.wait({waiter}, timeout=timeout)
+        try:
+            async with outbound.aslot():
+                yield
+        finally:
+            self._release(state)
+
+    def _try_acquire_locked(self, host: str) -> Tuple[Optional[_HostState], Optional[float]]:
+        """
+        尝试占用主机名额。成功时返回（主机状态，None）；失败时返回（None，最多等待的秒数），
+        并发已满时等待时间为 None（等到有请求结束），只是间隔未到时等到可以开始的时间。
+        """
+        concurrency, min_interval = self.policy(host)
+        state = self._hosts.get(host)
+        if state is None:
+            state = self._hosts[host] = _HostState()
+        now = time.monotonic()
+        if state.active < concurrency and now >= state.next_start:
+            state.active += 1
+            state.next_start = now + min_interval
+            return state, None
+        return None, (None if state.active >= concurrency else state.next_start - now)
+
+    def _release(self, state: _HostState) -> None:
+        with self._condition:
+            state.active -= 1
+            self._prune_locked()
+            self._condition.notify_all()
+            self._async_waiters.wake_all()
+
+    def _prune_locked(self) -> None:
+        if len(self._hosts) <= _MAX_IDLE_HOSTS:
+            return
+        now = time.monotonic()
+        for host in [host for host, state in self._hosts.items() if not state.active and state.next_start <= now]:
+            del self._hosts[host]
+
+
+# 进程内共享的网页抓取调度器
+host_scheduler = PolitenessScheduler()
+
+
+def set_host_policy(host: str, concurrency: int, min_interval: Optional[float] = None) -> None:
+    """
+    为指定主机设置并发上限和最小间隔（秒），间隔默认沿用全局设置。
+    """
+    host_scheduler.set_policy(host, concurrency, host_scheduler.min_interval if min_interval is None else min_interval)
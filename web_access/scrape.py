@@ -8,15 +8,11 @@
 # @desc    : 采集
 
 
-import os
-import re
-import json
-import time
-import hashlib
-import requests
-from bs4 import BeautifulSoup
 from utils.logger import logger
-from typing import Tuple, List, Dict, Any
+from web_access.fetcher import FetchError, FetchResponse, fetcher
+from web_access.page_cache import CachedPage, PageCache, get_page_cache
+from web_access.parsing import MAX_PAGE_BYTES, clean_text, parser_pool
+from typing import List, Dict, Any, Optional, Union
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
 
@@ -24,57 +20,15 @@ class WebScrapeAgent:
     """
     负责从搜索结果中抓取网页内容的类。
     """
-    def __init__(self):
-        self.INPUT_DIR = '../web_access/data/output/search'
-        self.OUTPUT_DIR = '../web_access/data/output/scrape'
-        self.MAX_WORKERS = 5  # 最大线程数
-
-    def generate_filename(self, query: str, extension: str) -> str:
-        """
-        根据提供的查询生成唯一哈希的文件名。
-
-        :param query: 用于生成唯一哈希文件名的查询字符串。
-        :param extension: 文件扩展名（例如 'json' 或 'txt'）。
-        :return: 表示生成的文件名的字符串。
-        :raises ValueError: 如果未提供查询，则引发异常。
+    def __init__(self, page_cache: Optional[PageCache] = None, use_page_cache: bool = True):
         """
-        try:
-            if not query:
-                raise ValueError("Query is missing")
-
-            encoded_query = query.encode('utf-8')
-            filename = hashlib.md5(encoded_query).hexdigest()
-            return f"{filename}.{extension}"
-        except Exception as e:
-            logger.error(f"Error generating filename: {e}")
-            raise
-
-    def load_search_results(self, query: str, location: str) -> List[Dict[str, Any]]:
-        """
-        从 JSON 文件中根据查询和位置加载搜索结果。
-
         Args:
-            query (str): 用于生成文件名的查询字符串。
-            location (str): 用于附加文件上下文的位置标识符。
-
-        Returns:
-            List[Dict[str, Any]]: 搜索结果字典的列表。
+            page_cache (Optional[PageCache]): 网页正文缓存，默认使用进程内共享的缓存。
+            use_page_cache (bool): 是否使用网页正文缓存。
         """
-        try:
-            filename = self.generate_filename(query, 'json')
-            file_path = os.path.join(self.INPUT_DIR, filename)
-            if not os.path.exists(file_path):
-                raise FileNotFoundError(
-                    f"Search results file not found for query: '{query}' and location: '{location}'")
-
-            with open(file_path, 'r') as file:
-                data = json.load(file)
-
-            logger.info(f"Loaded search results from '{filename}'")
-            return data.get('Top Results', [])
-        except Exception as e:
-            logger.error(f"Error loading search results: {e}")
-            raise
+        self.MAX_WORKERS = 5  # 最大线程数
+        self.MAX_PAGE_BYTES = MAX_PAGE_BYTES  # 每个网页最多读取的字节数
+        self.page_cache = (page_cache or get_page_cache()) if use_page_cache else None
 
     def _clean_text(self, text: str) -> str:
         """
@@ -86,11 +40,13 @@ class WebScrapeAgent:
         Returns：
             str：去除不必要空格后的清理文本。
         """
-        return re.sub(r'\s+', ' ', text).strip()
+        return clean_text(text)
 
     def scrape_website(self, url: str) -> str:
         """
-        从指定的 URL 抓取内容，超时时间为 5 秒。
+        从指定的 URL 抓取内容。请求由共享的 HTTP 抓取器发出（连接/读取超时、瞬时错误重试、按主机的礼貌性调度），
+        响应体超过 MAX_PAGE_BYTES 后不再下载；正文解析交给解析进程池。
+        网页缓存中新鲜的条目直接使用，过期的条目用条件请求重新验证。
 
         Args：
             url (str)：要抓取的网页 URL。
@@ -98,105 +54,133 @@ class WebScrapeAgent:
         Returns：
             str：提取的文本内容，如果发生错误则返回空字符串。
         """
+        cached = self._get_cached(url)
+        if cached is not None and cached.fresh:
+            return cached.text
         try:
-            response = requests.get(url, timeout=5)
-            response.raise_for_status()
-            soup = BeautifulSoup(response.content, 'html.parser')
-            text_elements = soup.find_all(['p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6'])
-            extracted_text = ' '.join(elem.get_text() for elem in text_elements)
-            return self._clean_text(extracted_text)
-        except requests.Timeout:
-            logger.warning(f"Skipping {url} due to timeout.")
-            return ""
-        except requests.RequestException as e:
-            logger.warning(f"Error scraping {url}: {e}")
+            response = fetcher.fetch_sync(url, headers=self._conditional_headers(cached),
+                                          max_bytes=self.MAX_PAGE_BYTES, polite=True)
+        except FetchError as e:
+            response = e
+        return self._resolve_content(url, cached, response)
+
+    def _get_cached(self, url: str) -> Optional[CachedPage]:
+        return self.page_cache.get(url) if self.page_cache is not None else None
+
+    @staticmethod
+    def _conditional_headers(cached: Optional[CachedPage]) -> Optional[Dict[str, str]]:
+        return cached.conditional_headers() if cached is not None else None
+
+    def _resolve_content(self, url: str, cached: Optional[CachedPage],
+                         response: Optional[Union[FetchResponse, FetchError]]) -> str:
+        """
+        根据缓存条目和请求结果确定网页正文：
+            - 没有发出请求（缓存新鲜）或返回 304 时使用缓存的正文，304 时延长缓存有效期；
+            - 网络错误、超时或 5xx 等瞬时错误时使用过期的缓存正文，否则返回空字符串；
+            - 否则提取响应中的正文并写入缓存。
+        """
+        if response is None:
+            return cached.text
+        if isinstance(response, FetchError):
+            if cached is not None and (response.status is None or response.transient):
+                logger.warning(f"Error scraping {url}: {response}，使用过期的缓存内容")
+                return cached.text
+            logger.warning(f"Error scraping {url}: {response}")
             return ""
+        if response.status == 304 and cached is not None:
+            self.page_cache.refresh(cached, response.headers)
+            return cached.text
+        content = self.parse_response(response)
+        if content and self.page_cache is not None:
+            self.page_cache.put(url, content, response.headers)
+        return content
 
-    def scrape_with_delay(self, result: Dict[str, Any], delay: int) -> Tuple[Dict[str, Any], str]:
+    def parse_response(self, response: FetchResponse) -> str:
         """
-        在一段时间后再次访问网站，以避免服务器过载
+        提取响应中的网页正文。
 
         Args:
-            result (Dict[str, Any]): 包含 URL 和元数据的搜索结果。
-            delay (int): 启动抓取操作前的延迟时间（单位：秒）。
+            response (FetchResponse): 抓取器返回的响应。
 
         Returns:
-            Tuple[Dict[str, Any], str]: 原始结果和抓取内容。
+            str: 提取的文本内容。
         """
-        time.sleep(delay)
-        content = self.scrape_website(result['Link'])
-        return result, content
+        if response.truncated:
+            logger.info(f"{response.url} 超过 {self.MAX_PAGE_BYTES} 字节，只解析前面的部分")
+        return parser_pool.parse(response.content, response.charset)
 
     def scrape_results(self, results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """
-        从提供的搜索结果中抓取内容。
+        从提供的搜索结果中抓取内容。网页缓存中新鲜的条目直接使用，其余网页（过期的条目带条件请求头）
+        由共享的 HTTP 抓取器在一个事件循环中并发下载，每个网页下载完成后立即在线程池中提取正文
+        （解析本身在解析进程池中执行），不等待其余网页。结果按搜索结果的顺序返回。
         Args：
             results (List[Dict[str, Any]]):搜索结果的列表，每个元素为一个字典。
         返回值：
             List[Dict[str, Any]]: 包含标题、网址、摘要和内容的字典列表。
         """
-        os.makedirs(self.OUTPUT_DIR, exist_ok=True)
-        scraped_results = []
+        cached_pages = [self._get_cached(result['Link']) for result in results]
+        stale = [index for index, cached in enumerate(cached_pages) if cached is None or not cached.fresh]
         with ThreadPoolExecutor(max_workers=self.MAX_WORKERS) as executor:
-            future_to_result = {executor.submit(self.scrape_with_delay, result, i): result for i, result in enumerate(results)}
-            for future in as_completed(future_to_result):
+            future_to_index = {}
+            for index, (result, cached) in enumerate(zip(results, cached_pages)):
+                if cached is not None and cached.fresh:
+                    future_to_index[executor.submit(self._resolve_content, result['Link'], cached, None)] = index
+            for position, response in fetcher.fetch_iter_sync(
+                [results[index]['Link'] for index in stale],
+                headers_list=[self._conditional_headers(cached_pages[index]) for index in stale],
+                max_bytes=self.MAX_PAGE_BYTES, polite=True
+            ):
+                index = stale[position]
+                future = executor.submit(self._resolve_content, results[index]['Link'], cached_pages[index], response)
+                future_to_index[future] = index
+
+            contents: Dict[int, str] = {}
+            for future in as_completed(future_to_index):
+                index = future_to_index[future]
+                result = results[index]
                 try:
-                    result, content = future.result()
-                    if content:
-                        scraped_results.append({
-                            'title': result['Title'],
-                            'url': result['Link'],
-                            'snippet': result['Snippet'],
-                            'content': content
-                        })
-                        logger.info(f"Scraped: {result['Title']}")
-                    else:
-                        logger.info(f"Skipping {result['Title']} due to empty content.")
+                    contents[index] = future.result()
                 except Exception as e:
                     logger.error(f"Error processing result: {e}")
-        return scraped_results
-
-    def save_results(self, query: str, scraped_results: List[Dict[str, Any]]) -> None:
-        """
-        将抓取到的结果保存到文本文件中。
+                    continue
+                if contents[index]:
+                    logger.info(f"Scraped: {result['Title']}")
+                else:
+                    logger.info(f"Skipping {result['Title']} due to empty content.")
+
+        return [
+            {
+                'title': result['Title'],
+                'url': result['Link'],
+                'snippet': result['Snippet'],
+                'content': contents[index]
+            }
+            for index, result in enumerate(results) if contents.get(index)
+        ]
+
+    @staticmethod
+    def format_results(scraped_results: List[Dict[str, Any]]) -> str:
+        """
+        把抓取结果格式化为汇总阶段使用的文本。
 
         Args:
-            query (str): 用于生成文件名的查询字符串。
             scraped_results (List[Dict[str, Any]]): 抓取到的结果列表。
-        """
-        try:
-            output_path = os.path.join(self.OUTPUT_DIR, self.generate_filename(query, 'txt'))
-
-            with open(output_path, 'w', encoding='utf-8') as outfile:
-                for result in scraped_results:
-                    outfile.write("==== BEGIN ENTRY ====\n")
-                    outfile.write(f"TITLE: {result['title']}\n")
-                    outfile.write(f"URL: {result['url']}\n")
-                    outfile.write(f"SNIPPET: {result['snippet']}\n")
-                    outfile.write(f"CONTENT:\n{result['content']}\n")
-                    outfile.write("==== END ENTRY ====\n\n")
-            logger.info(f"采集完成，保存 '{output_path}'")
-            time.sleep(3)
-        except Exception as e:
-            logger.error(f"保存采集数据错误: {e}")
-
-    def run(self, query: str, location: str = '') -> None:
-        """
-        抓取与查询相关的网页内容。
-        Args:
-            query (str): 搜索关键词。
-            location (str): 搜索位置。
+
         Returns:
-            str: 抓取的网页内容摘要。
-        """
-        try:
-            logger.info(f"Initiating scraping process for query: '{query}' and location: '{location}'")
-            results = self.load_search_results(query, location)
-            scraped_results = self.scrape_results(results)
-            self.save_results(query, scraped_results)
-        except Exception as e:
-            logger.error(f"Error during scraping process: {e}")
-            raise
+            str: 按条目排列的文本。
+        """
+        entries = []
+        for result in scraped_results:
+            entries.append(
+                "==== BEGIN ENTRY ====\n"
+                f"TITLE: {result['title']}\n"
+                f"URL: {result['url']}\n"
+                f"SNIPPET: {result['snippet']}\n"
+                f"CONTENT:\n{result['content']}\n"
+                "==== END ENTRY ====\n\n"
+            )
+        return "".join(entries)
 
 
 if __name__ == '__main__':
@@ -7,10 +7,11 @@
 # @File    : search
 # @desc    :
 
+from typing import Any, Dict, List
 from utils.logger import logger
 from utils.ChatModel import ChatModel
 from web_access.prompts import SEARCH_SYSTEM, SEARCH_USER
-from web_access.serp import run as google_search
+from web_access.serp import search_top_results
 
 
 class WebSearchAgent:
@@ -19,25 +20,38 @@ class WebSearchAgent:
         self.agent = agent_factory.create_agent()
 
 
-    def run(self, query: str, location: str) -> str:
+    def _search_terms(self, query: str) -> str:
+        """
+        由大模型把用户问题改写为搜索关键词。
+        """
         search_user = SEARCH_USER.format(query=query)
-        try:
-            result = (
-                self.agent
-                .general(SEARCH_SYSTEM)
-                .input(search_user)
-                .output({
-                    "search_terms": ("str", "搜索关键词")
-                })
-                .start()
-            )
-            logger.debug(f"搜索关键词: {result['search_terms']}")
-            google_search(raw_query=query, search_query=result["search_terms"], location=location)
-        except Exception as e:
-            return f"搜索失败，原因是: {str(e)}"
+        result = (
+            self.agent
+            .general(SEARCH_SYSTEM)
+            .input(search_user)
+            .output({
+                "search_terms": ("str", "搜索关键词")
+            })
+            .start()
+        )
+        logger.debug(f"搜索关键词: {result['search_terms']}")
+        return result["search_terms"]
+
+    def search(self, query: str, location: str) -> List[Dict[str, Any]]:
+        """
+        搜索并直接返回排名靠前的结果，不经过文件。
+
+        Args:
+            query (str): 用户问题。
+            location (str): 搜索位置。
+
+        Returns:
+            List[Dict[str, Any]]: 搜索结果（Position、Title、Link、Snippet）。
+        """
+        return search_top_results(self._search_terms(query), location=location)
 
 
 if __name__ == "__main__":
     query = "中美贸易战的影响"
-    results = WebSearchAgent().run(query)
+    results = WebSearchAgent().search(query, location="")
     print(results)
\ No newline at end of file
@@ -12,16 +12,11 @@ import os
 from dotenv import load_dotenv
 load_dotenv()
 
-import json
-import hashlib
-import requests
 from utils.logger import logger
-from typing import Union, Tuple, Dict, Any
+from web_access.fetcher import FetchError, fetcher
+from typing import Dict, Any, List
 
 
-# Static paths
-SEARCH_RESULTS_OUTPUT_DIR = '../web_access/data/output/search'
-
 class SerpAPIClient:
     """
     Client for interacting with the SERP API to perform search queries.
@@ -37,7 +32,7 @@ class SerpAPIClient:
         self.api_key = api_key
         self.base_url = "https://serpapi.com/search.json"
 
-    def search(self, query: str, engine: str = "google", location: str = "") -> Union[Dict[str, Any], Tuple[int, str]]:
+    def search(self, query: str, engine: str = "google", location: str = "") -> Dict[str, Any]:
         """
         Executes a search query using the SERP API.
 
@@ -47,8 +42,11 @@ class SerpAPIClient:
             location (str, optional): Location for the search query (default is "").
 
         Returns:
-            Union[Dict[str, Any], Tuple[int, str]]: Search results as a JSON dictionary if successful,
-            or a tuple with HTTP status code and error message if the request fails.
+            Dict[str, Any]: Search results as a JSON dictionary.
+
+        Raises:
+            FetchError: If the request fails (status and transient describe the failure)
+                or the response is not valid JSON.
         """
         params = {
             "engine": engine,
@@ -58,12 +56,15 @@ class SerpAPIClient:
         }
 
         try:
-            response = requests.get(self.base_url, params=params)
-            response.raise_for_status()
-            return response.json()
-        except requests.RequestException as e:
+            response = fetcher.fetch_sync(self.base_url, params=params)
+        except FetchError as e:
             logger.error(f"Request to SERP API failed: {e}")
-            return response.status_code, str(e)
+            raise
+        try:
+            return response.json()
+        except ValueError as e:
+            logger.error(f"Invalid response from SERP API: {e}")
+            raise FetchError(f"Invalid response from SERP API: {e}", response.status) from e
 
 def log_top_search_results(results: Dict[str, Any], top_n: int = 10) -> None:
     """
@@ -82,16 +83,18 @@ def log_top_search_results(results: Dict[str, Any], top_n: int = 10) -> None:
         logger.info(f"  Snippet: {result.get('snippet')}")
         logger.info('-' * 100)
 
-def save_top_search_results_to_json(results: Dict[str, Any], output_path: str, top_n: int = 3) -> None:
+def extract_top_search_results(results: Dict[str, Any], top_n: int = 3) -> List[Dict[str, Any]]:
     """
-    Saves the top N search results to a JSON file.
+    Extracts the top N search results in the format consumed by WebScrapeAgent.
 
     Args:
         results (Dict[str, Any]): Search results from the SERP API.
-        output_path (str): File path to save the JSON output.
-        top_n (int, optional): Number of top results to save (default is 10).
+        top_n (int, optional): Number of top results to keep (default is 3).
+
+    Returns:
+        List[Dict[str, Any]]: Results with Position, Title, Link and Snippet keys.
     """
-    top_results = [
+    return [
         {
             "Position": result.get('position'),
             "Title": result.get('title'),
@@ -101,60 +104,27 @@ def save_top_search_results_to_json(results: Dict[str, Any], output_path: str, t
         for result in results.get('organic_results', [])[:top_n]
     ]
 
-    with open(output_path, 'w', encoding='utf-8') as json_file:
-        json.dump({"Top Results": top_results}, json_file, indent=4)
-
-    logger.info(f"Top {top_n} search results saved to {output_path}")
-
-
-def generate_filename(query: str, extension: str) -> str:
-    """
-    Generate a filename based on a unique hash of the provided query.
-
-    :param query: The query string for generating a unique hashed filename.
-    :param extension: The file extension (e.g., 'json' or 'txt').
-    :return: A string representing the generated filename.
-    :raises ValueError: If the query is not provided.
-    """
-    try:
-        if not query:
-            raise ValueError("Query is missing")
-
-        encoded_query = query.encode('utf-8')
-        filename = hashlib.md5(encoded_query).hexdigest()
-        return f"{filename}.{extension}"
-    except Exception as e:
-        logger.error(f"Error generating filename: {e}")
-        raise
-
-def run(raw_query: str, search_query: str, location: str = "") -> None:
+def search_top_results(search_query: str, location: str = "", top_n: int = 3) -> List[Dict[str, Any]]:
     """
-    Executes the search using SERP API, logs the top results, and saves them to a JSON file.
+    Executes the search using SERP API and returns the top results in memory.
 
     Args:
-        raw_query (str): Raw query string for filename generation.
         search_query (str): Search query for the SERP API.
         location (str): Location for the search query.
+        top_n (int, optional): Number of top results to return (default is 3).
+
+    Returns:
+        List[Dict[str, Any]]: Top search results.
+
+    Raises:
+        FetchError: If the SERP API request fails.
     """
-    # Initialize the SERP API client
     serp_client = SerpAPIClient(api_key=os.getenv("SERPAPI_API_KEY"))
-
-    # Perform the search
     results = serp_client.search(search_query, location=location)
-
-    # Process results if the search was successful
-    if isinstance(results, dict):
-        # Log and save the top search results
-        log_top_search_results(results)
-        output_path = os.path.join(SEARCH_RESULTS_OUTPUT_DIR, generate_filename(raw_query, 'json'))
-        save_top_search_results_to_json(results, output_path)
-    else:
-        # Handle the error response
-        status_code, error_message = results
-        logger.error(f"Search failed with status code {status_code}: {error_message}")
+    log_top_search_results(results)
+    return extract_top_search_results(results, top_n)
 
 if __name__ == "__main__":
     search_query = "武汉小吃"
     location = 'china'
-    raw_query = "abc"
-    run(raw_query, search_query, location)
+    print(search_top_results(search_query, location))